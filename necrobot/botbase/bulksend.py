@@ -0,0 +1,82 @@
+"""
+Sending one message each to many destinations (e.g. DMing every daily subscriber) without doing it one at a
+time.
+
+Sends run concurrently, up to a limit, so as to stay well inside Discord's rate limits (discord.py itself waits
+out any 429 responses). Sends that fail with a rate-limit or server error are retried with exponential backoff;
+sends that can never succeed (e.g. the user doesn't accept DMs) are not.
+"""
+
+import aiohttp
+import asyncio
+import discord
+from typing import Iterable, Tuple
+
+from necrobot.botbase import server
+from necrobot.util import console
+
+from necrobot.util.backoff import ExponentialBackoff
+
+
+class BulkSendResult(object):
+    def __init__(self):
+        self.num_sent = 0       # type: int
+        self.num_failed = 0     # type: int
+        self.num_retries = 0    # type: int
+
+    def __str__(self):
+        return '{0} sent, {1} failed, {2} retries'.format(self.num_sent, self.num_failed, self.num_retries)
+
+
+async def send_to_all(
+        messages: Iterable[Tuple[discord.User, str]],
+        concurrency: int,
+        retries: int
+) -> BulkSendResult:
+    """Send each (destination, text) pair.
+
+    Parameters
+    ----------
+    messages: Iterable[Tuple[discord.User, str]]
+        The destinations (users or channels) and the text to send to each.
+    concurrency: int
+        The maximum number of sends in flight at once.
+    retries: int
+        The number of times to retry a send that failed with a transient error.
+
+    Returns
+    -------
+    BulkSendResult
+        The number of messages sent and failed.
+    """
+    result = BulkSendResult()
+    semaphore = asyncio.Semaphore(max(concurrency, 1))
+
+    async def send_one(destination, text):
+        async with semaphore:
+            backoff = ExponentialBackoff(base=1)
+            for attempt in range(retries + 1):
+                try:
+                    await server.client.send_message(destination, text)
+                    result.num_sent += 1
+                    return
+                except (discord.Forbidden, discord.NotFound):
+                    break
+                except (discord.HTTPException, aiohttp.ClientError) as e:
+                    if not is_transient(e) or attempt == retries:
+                        console.warning('Failed to send a message to {0}: {1}'.format(destination, e))
+                        break
+                    result.num_retries += 1
+                    await asyncio.sleep(backoff.delay())
+            result.num_failed += 1
+
+    await asyncio.gather(*[send_one(destination, text) for destination, text in messages])
+    return result
+
+
+def is_transient(e: Exception) -> bool:
+    """True if the error is one that retrying might fix (a rate limit, server error, or connection problem)"""
+    if isinstance(e, discord.HTTPException):
+        status = e.response.status if e.response is not None else None
+        return status is None or status == 429 or status >= 500
+    return True
@@ -0,0 +1,43 @@
+"""
+In-memory record of when each channel last saw a message, so that idle channels can be detected without
+fetching message history from Discord.
+
+Necrobot records every message it sees in on_message (including its own, which the gateway echoes back);
+BotChannels may also call record() directly after sending, so that the time is correct even before the echo
+arrives.
+"""
+
+import datetime
+import time
+import unittest
+from typing import Dict, Optional
+
+
+_last_activity = dict()     # type: Dict[int, float]    # channel ID -> time.monotonic() of last message
+
+
+def record(channel_id: int) -> None:
+    """Note that a message was just posted in the channel with the given ID"""
+    _last_activity[int(channel_id)] = time.monotonic()
+
+
+def idle_time(channel_id: int) -> Optional[datetime.timedelta]:
+    """The time since the last message in the channel with the given ID, or None if none has been seen"""
+    last = _last_activity.get(int(channel_id))
+    if last is None:
+        return None
+    return datetime.timedelta(seconds=time.monotonic() - last)
+
+
+def forget(channel_id: int) -> None:
+    """Stop tracking the channel with the given ID (e.g., because it was deleted)"""
+    _last_activity.pop(int(channel_id), None)
+
+
+class TestChannelActivity(unittest.TestCase):
+    def test_idle_time(self):
+        self.assertIsNone(idle_time(1))
+        record('1')
+        self.assertLess(idle_time(1), datetime.timedelta(seconds=1))
+        forget(1)
+        self.assertIsNone(idle_time(1))
@@ -1,6 +1,11 @@
 import necrobot.exception
+from necrobot.util import liveprofile
+
 from necrobot.botbase.commandtype import CommandType
+from necrobot.botbase.loopwatchdog import LoopWatchdog
 from necrobot.botbase.necrobot import Necrobot
+from necrobot.botbase.scheduler import Scheduler
+from necrobot.config import Config
 
 
 class Die(CommandType):
@@ -33,6 +38,72 @@ class RedoInit(CommandType):
         await Necrobot().redo_init()
 
 
+class LoopLag(CommandType):
+    def __init__(self, bot_channel):
+        CommandType.__init__(self, bot_channel, 'looplag')
+        self.help_text = 'Show recent event loop lag, and where the loop was last blocked.'
+        self.admin_only = True
+
+    async def _do_execute(self, cmd):
+        await self.client.send_message(cmd.channel, '```\n{0}\n```'.format(LoopWatchdog().status_str()))
+
+
+class Profile(CommandType):
+    MAX_SECONDS = 600
+    MAX_CALLS = 100
+
+    def __init__(self, bot_channel):
+        CommandType.__init__(self, bot_channel, 'profile')
+        self.help_text = 'Profile the bot. `{0} [seconds]` profiles everything for that long (default 30); ' \
+                         '`{0} command_name [N]` profiles the next N calls to that command (default 1), waiting ' \
+                         'up to {1} seconds for them. Add `sample` to sample the stack instead of tracing every ' \
+                         'call. `{0} stop` ends the profile early.'.format(self.mention, self.MAX_SECONDS)
+        self.admin_only = True
+
+    async def _do_execute(self, cmd):
+        args = [arg.lower() for arg in cmd.args]
+        mode = liveprofile.MODE_SAMPLE if 'sample' in args else liveprofile.MODE_PROFILE
+        args = [arg for arg in args if arg != 'sample']
+
+        if args == ['stop']:
+            if liveprofile.stop() is None:
+                await self.client.send_message(cmd.channel, 'No profile is running.')
+            return
+
+        try:
+            if not args or (len(args) == 1 and args[0].isdigit()):
+                seconds = int(args[0]) if args else 30
+                if not 1 <= seconds <= self.MAX_SECONDS:
+                    raise ValueError('Can only profile for 1 to {0} seconds.'.format(self.MAX_SECONDS))
+                session = liveprofile.start_for_duration(seconds, mode=mode)
+                scope = '{0} seconds'.format(seconds)
+            elif len(args) <= 2:
+                command_name = args[0].lstrip(Config.BOT_COMMAND_PREFIX)
+                num_calls = int(args[1]) if len(args) == 2 else 1
+                if not 1 <= num_calls <= self.MAX_CALLS:
+                    raise ValueError('Can only profile 1 to {0} calls.'.format(self.MAX_CALLS))
+                session = liveprofile.start_for_command(
+                    command_name, num_calls, self._command_types(), mode=mode, timeout=self.MAX_SECONDS)
+                scope = 'the next {0} call(s) to `{1}{2}` (for up to {3} seconds)'.format(
+                    num_calls, Config.BOT_COMMAND_PREFIX, command_name, self.MAX_SECONDS)
+            else:
+                raise ValueError('Couldn\'t parse cmd. See `{0}help {1}`.'.format(
+                    Config.BOT_COMMAND_PREFIX, self.command_name))
+        except (ValueError, RuntimeError) as e:
+            await self.client.send_message(cmd.channel, 'Error: {0}'.format(e))
+            return
+
+        await self.client.send_message(cmd.channel, 'Profiling {0}.'.format(scope))
+        await session.done
+        for block in session.summary():
+            await self.client.send_message(cmd.channel, block)
+
+    def _command_types(self) -> list:
+        """The commands that can be called on this channel or on any of the bot's channels"""
+        bot_channels = [self.bot_channel] + list(self.necrobot.all_channels)
+        return [command_type for bot_channel in bot_channels for command_type in bot_channel.all_commands]
+
+
 class RaiseException(CommandType):
     def __init__(self, bot_channel):
         CommandType.__init__(self, bot_channel, 'raiseexception')
@@ -42,3 +113,13 @@ class RaiseException(CommandType):
 
     async def _do_execute(self, cmd):
         raise necrobot.exception.NecroException('Raised by RaiseException.')
+
+
+class Timers(CommandType):
+    def __init__(self, bot_channel):
+        CommandType.__init__(self, bot_channel, 'timers')
+        self.help_text = 'Show the number of pending timers and how late timers have been firing.'
+        self.admin_only = True
+
+    async def _do_execute(self, cmd):
+        await self.client.send_message(cmd.channel, '```\n{0}\n```'.format(Scheduler().status_str()))
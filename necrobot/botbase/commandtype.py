@@ -2,9 +2,10 @@ import asyncio
 import discord
 
 from necrobot.botbase import server
-from necrobot.util import console
+from necrobot.util import console, liveprofile
 
 from necrobot.botbase.command import Command
+from necrobot.botbase.loopwatchdog import LoopWatchdog
 from necrobot.botbase.necrobot import Necrobot
 from necrobot.config import Config
 
@@ -80,16 +81,22 @@ class CommandType(object):
                 self.execution_id += 1
                 this_id = self.execution_id
 
-            console.info(
-                'Call {0}: <ID={1}> <Caller={2}> <Channel={3}> <Message={4}>'.format(
-                    type(self).__name__,
-                    this_id,
-                    command.author.name,
-                    command.channel.name,
-                    command.content
-                )
+            description = 'Call {0}: <ID={1}> <Caller={2}> <Channel={3}> <Message={4}>'.format(
+                type(self).__name__,
+                this_id,
+                command.author.name,
+                command.channel.name,
+                command.content
             )
-            await self._do_execute(command)
+            console.info(description)
+            LoopWatchdog().command_started((id(self), this_id), description)
+            try:
+                if liveprofile.running:
+                    await liveprofile.run_command(self, self._do_execute(command))
+                else:
+                    await self._do_execute(command)
+            finally:
+                LoopWatchdog().command_finished((id(self), this_id))
             console.info('Exit {0}: <ID={1}>'.format(type(self).__name__, this_id))
 
     async def reparse_as(self, new_name: str, command: Command) -> None:
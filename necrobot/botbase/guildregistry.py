@@ -0,0 +1,303 @@
+import asyncio
+import discord
+import itertools
+import unittest
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from necrobot.config import Config
+
+
+class GuildRegistry(object):
+    """Indexes the channels, members, and roles of a discord.Server by ID and by name, and caches which members
+    are admins.
+
+    The registry is built once from the server, and should then be kept up to date with the add/remove/update
+    methods as the corresponding gateway events come in (see Necrobot.ready_client_events).
+
+    Parameters
+    ----------
+    the_server: discord.Server
+        The server to index.
+    admin_role_names: list[str]
+        The names of the roles that give admin access.
+    """
+    def __init__(self, the_server: discord.Server, admin_role_names: Iterable[str]):
+        self._admin_role_names = list(admin_role_names)
+
+        self._channels_by_id = dict()               # type: Dict[int, discord.Channel]
+        self._channels_by_name = dict()             # type: Dict[str, List[discord.Channel]]
+        self._members_by_id = dict()                # type: Dict[int, discord.Member]
+        self._members_by_display_name = dict()      # type: Dict[str, List[discord.Member]]
+        self._members_by_name = dict()              # type: Dict[str, List[discord.Member]]
+        self._member_order = dict()                 # type: Dict[int, int]      # Position in the server's list
+        self._member_seq = itertools.count()
+        self._roles_by_id = dict()                  # type: Dict[int, discord.Role]
+        self._roles_by_name = dict()                # type: Dict[str, List[discord.Role]]
+
+        # The name keys each object is currently indexed under (objects may be modified in place before we see
+        # the update event, so we can't rely on their current names for removal)
+        self._channel_keys = dict()                 # type: Dict[int, str]
+        self._member_keys = dict()                  # type: Dict[int, Tuple[str, str]]
+        self._role_keys = dict()                    # type: Dict[int, str]
+
+        self._admin_role_ids = set()                # type: Set[int]
+        self._is_admin_cache = dict()               # type: Dict[int, bool]
+
+        for channel in the_server.channels:
+            self.add_channel(channel)
+        for member in the_server.members:
+            self.add_member(member)
+        for role in the_server.roles:
+            self.add_role(role)
+
+    @property
+    def admin_roles(self) -> List[discord.Role]:
+        return [self._roles_by_id[role_id] for role_id in self._admin_role_ids if role_id in self._roles_by_id]
+
+    @property
+    def num_members(self) -> int:
+        return len(self._members_by_id)
+
+    # Lookups ---------------------------------------------------------------------------------------------------
+    def get_channel(self, channel_id: int) -> Optional[discord.Channel]:
+        return self._channels_by_id.get(int(channel_id))
+
+    def get_channel_by_name(self, channel_name: str) -> Optional[discord.Channel]:
+        channels = self._channels_by_name.get(channel_name.lower())
+        if channels:
+            for channel in channels:
+                if channel.name == channel_name:
+                    return channel
+        return None
+
+    def get_member(self, member_id: int) -> Optional[discord.Member]:
+        return self._members_by_id.get(int(member_id))
+
+    def get_member_by_name(self, name: str) -> Optional[discord.Member]:
+        """Returns the first member (in the server's order) whose display name or username is the given name
+        (capitalization ignored)"""
+        name = name.lower()
+        members = self._members_by_display_name.get(name, []) + self._members_by_name.get(name, [])
+        if not members:
+            return None
+        return min(members, key=lambda member: self._member_order[int(member.id)])
+
+    def get_members_by_display_name(self, display_name: str) -> List[discord.Member]:
+        return list(self._members_by_display_name.get(display_name.lower(), []))
+
+    def get_role_by_name(self, role_name: str) -> Optional[discord.Role]:
+        roles = self._roles_by_name.get(role_name.lower())
+        return roles[0] if roles else None
+
+    def is_admin(self, member: discord.Member) -> bool:
+        member_id = int(member.id)
+        cached = self._is_admin_cache.get(member_id)
+        if cached is None:
+            cached = any(int(role.id) in self._admin_role_ids for role in member.roles)
+            self._is_admin_cache[member_id] = cached
+        return cached
+
+    # Channels --------------------------------------------------------------------------------------------------
+    def add_channel(self, channel: discord.Channel) -> None:
+        channel_id = int(channel.id)
+        self.remove_channel(channel)
+        self._channels_by_id[channel_id] = channel
+        self._channel_keys[channel_id] = self._add_to_index(self._channels_by_name, channel.name, channel)
+
+    def remove_channel(self, channel: discord.Channel) -> None:
+        channel_id = int(channel.id)
+        self._channels_by_id.pop(channel_id, None)
+        self._remove_from_index(self._channels_by_name, self._channel_keys.pop(channel_id, None), channel_id)
+
+    def update_channel(self, before: discord.Channel, after: discord.Channel) -> None:
+        self.remove_channel(before)
+        self.add_channel(after)
+
+    # Members ---------------------------------------------------------------------------------------------------
+    def add_member(self, member: discord.Member) -> None:
+        member_id = int(member.id)
+        order = self._member_order.get(member_id)
+        self.remove_member(member)
+        self._member_order[member_id] = order if order is not None else next(self._member_seq)
+        self._members_by_id[member_id] = member
+        self._member_keys[member_id] = (
+            self._add_to_index(self._members_by_display_name, member.display_name, member),
+            self._add_to_index(self._members_by_name, member.name, member),
+        )
+
+    def remove_member(self, member: discord.Member) -> None:
+        member_id = int(member.id)
+        self._members_by_id.pop(member_id, None)
+        self._member_order.pop(member_id, None)
+        self._is_admin_cache.pop(member_id, None)
+        keys = self._member_keys.pop(member_id, None)
+        if keys is not None:
+            self._remove_from_index(self._members_by_display_name, keys[0], member_id)
+            self._remove_from_index(self._members_by_name, keys[1], member_id)
+
+    def update_member(self, before: discord.Member, after: discord.Member) -> None:
+        # add_member drops the member's old index entries itself, and keeps its place in the server's order
+        self.add_member(after)
+
+    # Roles -----------------------------------------------------------------------------------------------------
+    def add_role(self, role: discord.Role) -> None:
+        role_id = int(role.id)
+        self.remove_role(role)
+        self._roles_by_id[role_id] = role
+        self._role_keys[role_id] = self._add_to_index(self._roles_by_name, role.name, role)
+        if role.name in self._admin_role_names:
+            self._admin_role_ids.add(role_id)
+            self._is_admin_cache.clear()
+
+    def remove_role(self, role: discord.Role) -> None:
+        role_id = int(role.id)
+        self._roles_by_id.pop(role_id, None)
+        self._remove_from_index(self._roles_by_name, self._role_keys.pop(role_id, None), role_id)
+        if role_id in self._admin_role_ids:
+            self._admin_role_ids.discard(role_id)
+            self._is_admin_cache.clear()
+
+    def update_role(self, before: discord.Role, after: discord.Role) -> None:
+        self.remove_role(before)
+        self.add_role(after)
+
+    # Private ---------------------------------------------------------------------------------------------------
+    @staticmethod
+    def _add_to_index(index: dict, name: str, item) -> Optional[str]:
+        """Index the item under its (lowercased) name, and return the key used"""
+        if name is None:
+            return None
+        key = name.lower()
+        index.setdefault(key, []).append(item)
+        return key
+
+    @staticmethod
+    def _remove_from_index(index: dict, key: Optional[str], item_id: int) -> None:
+        if key is None or key not in index:
+            return
+        items = [i for i in index[key] if int(i.id) != item_id]
+        if items:
+            index[key] = items
+        else:
+            del index[key]
+
+
+class TestGuildRegistry(unittest.TestCase):
+    def setUp(self):
+        from necrobot.test.discordsim import SimClient
+        self.client = SimClient()
+        self.sim_server = self.client.add_server('guildregistry')
+        self.sim_server.add_channel(Config.MAIN_CHANNEL_NAME, default=True)
+        self.admin_role = self.sim_server.add_role('Admin')
+
+    def test_member_lookups(self):
+        first = self.sim_server.add_member('bravo')
+        first.nick = 'Xray'
+        second = self.sim_server.add_member('alpha')
+        second.nick = 'Bravo'
+        registry = GuildRegistry(self.sim_server, ['Admin'])
+
+        # The first member in the server's order wins, whether it matched by username or display name
+        self.assertIs(registry.get_member_by_name('BRAVO'), first)
+        self.assertIs(registry.get_member_by_name('xray'), first)
+        self.assertIs(registry.get_member_by_name('alpha'), second)
+        self.assertEqual(registry.get_members_by_display_name('bravo'), [second])
+
+        registry.update_member(first.copy(), first)
+        self.assertIs(registry.get_member_by_name('bravo'), first)
+
+        renamed = first.copy()
+        renamed.name = 'charlie'
+        registry.update_member(first, renamed)
+        self.assertIs(registry.get_member_by_name('bravo'), second)
+        self.assertIs(registry.get_member_by_name('charlie'), renamed)
+
+        registry.remove_member(second)
+        self.assertIsNone(registry.get_member_by_name('bravo'))
+        self.assertIsNone(registry.get_member(second.id))
+        self.assertEqual(registry.num_members, 2)    # The bot and charlie
+
+    def test_channels_and_roles(self):
+        registry = GuildRegistry(self.sim_server, ['Admin'])
+        channel = self.sim_server.add_channel('races')
+        registry.add_channel(channel)
+        self.assertIs(registry.get_channel(int(channel.id)), channel)
+        self.assertIs(registry.get_channel_by_name('races'), channel)
+        self.assertIsNone(registry.get_channel_by_name('Races'))
+
+        renamed = channel.copy()
+        renamed.name = 'matches'
+        registry.update_channel(channel, renamed)
+        self.assertIsNone(registry.get_channel_by_name('races'))
+        self.assertIs(registry.get_channel_by_name('matches'), renamed)
+        registry.remove_channel(renamed)
+        self.assertIsNone(registry.get_channel(channel.id))
+
+        member = self.sim_server.add_member('racer')
+        registry.add_member(member)
+        self.assertEqual(registry.admin_roles, [self.admin_role])
+        self.assertIs(registry.get_role_by_name('admin'), self.admin_role)
+        self.assertFalse(registry.is_admin(member))
+        member.roles.append(self.admin_role)
+        registry.update_member(member, member)
+        self.assertTrue(registry.is_admin(member))
+        registry.remove_role(self.admin_role)
+        self.assertFalse(registry.is_admin(member))
+        self.assertEqual(registry.admin_roles, [])
+
+    def test_gateway_events(self):
+        from necrobot.botbase import server
+        from necrobot.botbase.necrobot import Necrobot
+
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        saved_server = server.client, server.server, server.main_channel, server.registry
+        server.init(self.client, self.sim_server)
+        Necrobot().ready_client_events(client=self.client, load_config_fn=lambda necrobot: None)
+
+        async def events_done():
+            for _ in range(3):
+                await asyncio.sleep(0)
+
+        async def run():
+            channel = await self.client.create_channel(self.sim_server, 'new_channel')
+            await events_done()
+            self.assertIs(server.find_channel(channel_id=channel.id), channel)
+            await self.client.edit_channel(channel, name='renamed_channel')
+            await events_done()
+            self.assertIs(server.find_channel(channel_name='renamed_channel'), channel)
+            await self.client.delete_channel(channel)
+            await events_done()
+            self.assertIsNone(server.find_channel(channel_id=channel.id))
+
+            member = self.sim_server.add_member('newcomer')
+            self.client.dispatch('member_join', member)
+            await events_done()
+            self.assertIs(server.find_member(discord_name='newcomer'), member)
+            await self.client.change_nickname(member, 'Nickname')
+            await events_done()
+            self.assertIs(server.find_member(discord_name='nickname'), member)
+            self.assertFalse(server.is_admin(member))
+
+            role = await self.client.create_role(self.sim_server, name='Staff')
+            await events_done()
+            self.assertIs(server.find_role('staff'), role)
+            await self.client.add_roles(member, self.admin_role)
+            await events_done()
+            self.assertTrue(server.is_admin(member))
+
+            self.sim_server.members.remove(member)
+            self.client.dispatch('member_remove', member)
+            await events_done()
+            self.assertIsNone(server.find_member(discord_id=member.id))
+
+            self.sim_server.roles.remove(self.admin_role)
+            self.client.dispatch('server_role_delete', self.admin_role)
+            await events_done()
+            self.assertEqual(server.admin_roles, [])
+
+        try:
+            loop.run_until_complete(run())
+        finally:
+            server.client, server.server, server.main_channel, server.registry = saved_server
+            loop.close()
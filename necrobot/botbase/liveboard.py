@@ -0,0 +1,312 @@
+"""
+Live boards: Discord content (a channel topic or a bot message) that is repeatedly edited to reflect some
+changing state, such as a race leaderboard or the match schedule.
+
+A LiveBoard remembers a hash of the last content it published, and skips edits that would not change anything.
+Updates that arrive within Config.BOARD_DEBOUNCE_SEC of each other are collapsed, so that only the latest
+content is published. A publish that fails (a Discord error, or a channel that isn't in the server registry yet)
+is logged and retried after RETRY_DELAY_SEC, up to PUBLISH_RETRIES times, unless a later update supersedes it.
+
+Boards are shared per target; use topic_board() and message_board() to get the board for a given channel topic
+or message. Message boards keep the discord.Message they edit, so a message is only fetched from Discord the
+first time it is edited (or again after an edit fails).
+"""
+
+import asyncio
+import discord
+import hashlib
+import unittest
+from typing import Dict, List, Optional, Tuple
+
+import necrobot.exception
+from necrobot.botbase import server
+from necrobot.util import console
+
+from necrobot.config import Config
+
+PUBLISH_RETRIES = 3
+RETRY_DELAY_SEC = 5.0
+
+
+class LiveBoard(object):
+    """A single published piece of content.
+
+    Parameters
+    ----------
+    publish_fn: [coro] (str) -> None
+        The coroutine that actually publishes content to Discord.
+    window: float
+        The number of seconds over which to collapse updates.
+    retry_delay: float
+        The number of seconds to wait before retrying a failed publish.
+    """
+    def __init__(self, publish_fn, window: float = None, retry_delay: float = None):
+        self._publish_fn = publish_fn
+        self._window = window if window is not None else Config.BOARD_DEBOUNCE_SEC
+        self._retry_delay = retry_delay if retry_delay is not None else RETRY_DELAY_SEC
+
+        self._last_hash = None          # type: Optional[bytes]
+        self._latest = None             # type: Optional[str]
+        self._publish_future = None     # type: asyncio.Future
+        self._lock = asyncio.Lock()
+        self._num_failures = 0          # type: int     # Consecutive failures to publish the pending content
+
+        self._edits_published = 0       # type: int
+        self._edits_skipped = 0         # type: int
+
+    @property
+    def edits_published(self) -> int:
+        return self._edits_published
+
+    @property
+    def edits_skipped(self) -> int:
+        """The number of updates that didn't result in an edit (no-ops or superseded by a later update)"""
+        return self._edits_skipped
+
+    def mark_published(self, content: str) -> None:
+        """Record that the given content is already on Discord (e.g. if it was posted outside of this board)"""
+        self._last_hash = self._hash(content)
+
+    async def update(self, content: str) -> None:
+        """Publish the content within the debounce window (unless a later update supersedes it)"""
+        if self._latest is not None:
+            self._edits_skipped += 1
+        self._latest = content
+
+        if self._window <= 0:
+            await self.flush()
+        elif self._publish_future is None:
+            self._publish_future = asyncio.ensure_future(self._publish_after(self._window))
+
+    async def update_now(self, content: str) -> None:
+        """Publish the content immediately (if it differs from what's published)"""
+        if self._latest is not None:
+            self._edits_skipped += 1
+        self._latest = content
+        await self.flush()
+
+    async def flush(self) -> None:
+        """Publish any pending update now"""
+        if self._publish_future is not None:
+            self._publish_future.cancel()
+            self._publish_future = None
+
+        async with self._lock:
+            content = self._latest
+            self._latest = None
+            if content is None:
+                return
+
+            content_hash = self._hash(content)
+            if content_hash == self._last_hash:
+                self._edits_skipped += 1
+                return
+
+            try:
+                await self._publish_fn(content)
+            except (discord.HTTPException, necrobot.exception.NotFoundException) as e:
+                self._on_publish_failed(content, e)
+                return
+
+            self._num_failures = 0
+            self._last_hash = content_hash
+            self._edits_published += 1
+
+    def cancel(self) -> None:
+        """Drop any pending update"""
+        if self._publish_future is not None:
+            self._publish_future.cancel()
+            self._publish_future = None
+        self._latest = None
+        self._num_failures = 0
+
+    def _on_publish_failed(self, content: str, error: Exception) -> None:
+        """Requeue the content that failed to publish, unless a later update has superseded it"""
+        if self._latest is not None:
+            console.warning('Failed to publish to a live board (a later update is pending): {0}'.format(error))
+            return
+
+        self._num_failures += 1
+        if self._num_failures > PUBLISH_RETRIES:
+            console.warning('Failed to publish to a live board; giving up after {0} tries: {1}'.format(
+                self._num_failures, error))
+            self._num_failures = 0
+            return
+
+        console.warning('Failed to publish to a live board (retrying in {0}s): {1}'.format(self._retry_delay, error))
+        self._latest = content
+        if self._publish_future is None:
+            self._publish_future = asyncio.ensure_future(self._publish_after(self._retry_delay))
+
+    async def _publish_after(self, delay: float) -> None:
+        await asyncio.sleep(delay)
+        self._publish_future = None
+        await self.flush()
+
+    @staticmethod
+    def _hash(content: str) -> bytes:
+        return hashlib.sha1(content.encode('utf-8')).digest()
+
+
+_boards = dict()            # type: Dict[Tuple[str, int], LiveBoard]
+_message_handles = dict()   # type: Dict[int, discord.Message]
+
+
+def topic_board(channel: discord.Channel) -> LiveBoard:
+    """Get the LiveBoard for the topic of the given channel"""
+    key = ('topic', int(channel.id))
+    if key not in _boards:
+        channel_id = int(channel.id)
+
+        async def publish(content: str) -> None:
+            the_channel = server.find_channel(channel_id=channel_id)
+            if the_channel is None:
+                raise necrobot.exception.NotFoundException('No channel with ID {0}.'.format(channel_id))
+            await server.client.edit_channel(the_channel, topic=content)
+
+        _boards[key] = LiveBoard(publish_fn=publish)
+    return _boards[key]
+
+
+def message_board(channel: discord.Channel, message_id: int, message: discord.Message = None) -> LiveBoard:
+    """Get the LiveBoard for the message with the given ID, which should be a message by the bot in the given
+    channel. If the discord.Message itself is at hand (e.g. because it was just sent), pass it as `message` to
+    save fetching it on the first edit.
+    """
+    message_id = int(message_id)
+    if message is not None:
+        _message_handles[message_id] = message
+
+    key = ('message', message_id)
+    if key not in _boards:
+        channel_id = int(channel.id)
+
+        async def publish(content: str) -> None:
+            handle = _message_handles.get(message_id)
+            if handle is None:
+                the_channel = server.find_channel(channel_id=channel_id)
+                if the_channel is None:
+                    raise necrobot.exception.NotFoundException('No channel with ID {0}.'.format(channel_id))
+                handle = await server.client.get_message(the_channel, str(message_id))
+
+            try:
+                _message_handles[message_id] = await server.client.edit_message(handle, content)
+            except discord.HTTPException:
+                _message_handles.pop(message_id, None)
+                raise
+
+        _boards[key] = LiveBoard(publish_fn=publish)
+    return _boards[key]
+
+
+def discard_topic_board(channel: discord.Channel) -> None:
+    """Stop tracking the topic of the given channel (e.g., because it was deleted)"""
+    board = _boards.pop(('topic', int(channel.id)), None)
+    if board is not None:
+        board.cancel()
+
+
+def discard_message_board(message_id: int) -> None:
+    """Stop tracking the given message"""
+    _message_handles.pop(int(message_id), None)
+    board = _boards.pop(('message', int(message_id)), None)
+    if board is not None:
+        board.cancel()
+
+
+async def flush_all() -> None:
+    """Publish all pending updates now (call on shutdown)"""
+    for board in list(_boards.values()):
+        await board.flush()
+
+
+class TestLiveBoard(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.published = []     # type: List[str]
+
+    def tearDown(self):
+        self.loop.close()
+
+    async def _publish(self, content: str) -> None:
+        self.published.append(content)
+
+    def test_coalescing(self):
+        board = LiveBoard(publish_fn=self._publish, window=0.02)
+
+        async def run():
+            for content in ['1st', '2nd', '3rd']:
+                await board.update(content)
+            await asyncio.sleep(0.05)
+            await board.update('3rd')
+            await asyncio.sleep(0.05)
+
+        self.loop.run_until_complete(run())
+        self.assertEqual(self.published, ['3rd'])
+        self.assertEqual(board.edits_published, 1)
+        self.assertEqual(board.edits_skipped, 3)     # Two superseded updates, and one no-op
+
+    def test_flush(self):
+        board = LiveBoard(publish_fn=self._publish, window=60)
+
+        async def run():
+            await board.update('pending')
+            await board.flush()
+            await board.update_now('now')
+            await board.update('dropped')
+            board.cancel()
+            await board.flush()
+
+        self.loop.run_until_complete(run())
+        self.assertEqual(self.published, ['pending', 'now'])
+
+    def test_missing_channel(self):
+        from necrobot.test.discordsim import SimClient
+        client = SimClient()
+        sim_server = client.add_server('liveboard')
+        sim_server.add_channel(Config.MAIN_CHANNEL_NAME, default=True)
+        saved_server = server.client, server.server, server.main_channel, server.registry
+        server.init(client, sim_server)
+        global RETRY_DELAY_SEC
+        saved_retry_delay = RETRY_DELAY_SEC
+        RETRY_DELAY_SEC = 0.02
+
+        # A channel that the registry hasn't heard about yet
+        channel = sim_server.add_channel('new_channel')
+        try:
+            board = topic_board(channel)
+
+            async def run():
+                with self.assertLogs('necrobot', level='WARNING'):
+                    await board.update_now('topic')
+                topic_before = channel.topic
+                server.registry.add_channel(channel)
+                await asyncio.sleep(0.05)
+                return topic_before
+
+            self.assertIsNone(self.loop.run_until_complete(run()))
+            self.assertEqual(channel.topic, 'topic')
+            self.assertEqual(board.edits_published, 1)
+        finally:
+            discard_topic_board(channel)
+            RETRY_DELAY_SEC = saved_retry_delay
+            server.client, server.server, server.main_channel, server.registry = saved_server
+
+    def test_gives_up(self):
+        async def fail(content: str) -> None:
+            self.published.append(content)
+            raise necrobot.exception.NotFoundException('gone')
+
+        board = LiveBoard(publish_fn=fail, window=0, retry_delay=0.01)
+
+        async def run():
+            with self.assertLogs('necrobot', level='WARNING') as logs:
+                await board.update('topic')
+                await asyncio.sleep(0.1)
+            return logs.output
+
+        output = self.loop.run_until_complete(run())
+        self.assertEqual(len(self.published), PUBLISH_RETRIES + 1)
+        self.assertIn('giving up', output[-1])
+        self.assertEqual(board.edits_published, 0)
@@ -0,0 +1,228 @@
+"""
+A watchdog for event loop lag, i.e. time the loop spends stuck in a synchronous call (a database query, a Sheets
+API request, a file write, ...) instead of running other coroutines.
+
+A heartbeat coroutine sleeps for a short interval over and over, recording how late each sleep ends. A background
+thread watches the heartbeat; if it is overdue by more than the stall threshold, the loop is blocked, and the
+thread logs the stack of the event loop thread (showing the blocking call site) along with the commands in
+progress. The .looplag command shows lag percentiles, the number of stalls, and where the last one happened.
+"""
+
+import asyncio
+import collections
+import datetime
+import os
+import sys
+import threading
+import time
+import traceback
+import unittest
+from typing import Dict, Hashable, Optional
+
+from necrobot.util import console, stats
+
+from necrobot.util.singleton import Singleton
+
+HEARTBEAT_INTERVAL = 0.1
+STALL_THRESHOLD = 0.25
+NUM_RECENT_LAGS = 3000          # About five minutes of heartbeats
+
+_PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class LoopWatchdog(object, metaclass=Singleton):
+    def __init__(self):
+        self.interval = HEARTBEAT_INTERVAL                  # type: float
+        self.threshold = STALL_THRESHOLD                    # type: float
+
+        self._heartbeat = None                              # type: asyncio.Future
+        self._watcher = None                                # type: threading.Thread
+        self._stop_event = threading.Event()
+        self._loop_thread_id = None                         # type: int
+        self._last_beat = None                              # type: float
+        self._reported_beat = None                          # type: float
+        self._active_commands = dict()                      # type: Dict[Hashable, str]
+
+        self._recent_lags = collections.deque(maxlen=NUM_RECENT_LAGS)   # type: collections.deque
+        self._max_lag = 0.0                                 # type: float
+        self._num_stalls = 0                                # type: int
+        self._last_stall_time = None                        # type: datetime.datetime
+        self._last_stall_site = None                        # type: str
+
+    @property
+    def running(self) -> bool:
+        return self._heartbeat is not None and not self._heartbeat.done()
+
+    @property
+    def num_stalls(self) -> int:
+        return self._num_stalls
+
+    @property
+    def last_stall_site(self) -> Optional[str]:
+        return self._last_stall_site
+
+    def start(self) -> None:
+        """Start (or restart, e.g. after a reconnect) watching the event loop. Call from the event loop thread."""
+        if self.running:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._heartbeat = asyncio.ensure_future(self._beat())
+        if self._watcher is None or not self._watcher.is_alive():
+            self._stop_event.clear()
+            self._watcher = threading.Thread(target=self._watch, name='loopwatchdog', daemon=True)
+            self._watcher.start()
+
+    def stop(self) -> None:
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            self._heartbeat = None
+        self._stop_event.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+    def command_started(self, key: Hashable, description: str) -> None:
+        """Note that a command is executing, so that it is listed if the loop stalls"""
+        self._active_commands[key] = description
+
+    def command_finished(self, key: Hashable) -> None:
+        self._active_commands.pop(key, None)
+
+    def lag_percentile(self, pct: float) -> Optional[float]:
+        if not self._recent_lags:
+            return None
+        return stats.percentile(self._recent_lags, pct)
+
+    def status_str(self) -> str:
+        """A summary of recent loop lag and stalls"""
+        lines = []
+        if self._recent_lags:
+            lines.append('Loop lag over the last {0} heartbeats: p50 {1:.3f}s, p90 {2:.3f}s, p99 {3:.3f}s, '
+                         'max {4:.3f}s (max since start {5:.3f}s).'.format(
+                             len(self._recent_lags),
+                             self.lag_percentile(50),
+                             self.lag_percentile(90),
+                             self.lag_percentile(99),
+                             max(self._recent_lags),
+                             self._max_lag))
+        else:
+            lines.append('No heartbeats yet.')
+        lines.append('{0} stalls over {1:.2f}s; watchdog {2}.'.format(
+            self._num_stalls, self.threshold, 'running' if self.running else 'stopped'))
+        if self._last_stall_time is not None:
+            lines.append('Last stall: {0} UTC, at {1}'.format(
+                self._last_stall_time.strftime('%Y-%m-%d %H:%M:%S'), self._last_stall_site))
+        return '\n'.join(lines)
+
+    async def _beat(self) -> None:
+        loop = asyncio.get_event_loop()
+        while True:
+            begin = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(loop.time() - begin - self.interval, 0.0)
+            self._last_beat = time.monotonic()
+            self._recent_lags.append(lag)
+            self._max_lag = max(self._max_lag, lag)
+            if lag > self.threshold:
+                self._num_stalls += 1
+
+    def _watch(self) -> None:
+        while not self._stop_event.wait(self.threshold / 4):
+            try:
+                last_beat = self._last_beat
+                if last_beat is None or last_beat == self._reported_beat:
+                    continue
+                overdue = time.monotonic() - last_beat - self.interval
+                if overdue > self.threshold:
+                    self._reported_beat = last_beat
+                    self._report_stall(overdue)
+            except Exception:
+                console.error('Error in the event loop watchdog.')
+
+    def _report_stall(self, overdue: float) -> None:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return
+        stack = traceback.extract_stack(frame)
+        self._last_stall_time = datetime.datetime.utcnow()
+        self._last_stall_site = _blocking_site(stack)
+        console.warning(
+            'Event loop blocked for over {0:.2f}s, at {1}. Commands in progress: {2}\n'
+            'Event loop thread stack:\n{3}'.format(
+                overdue,
+                self._last_stall_site,
+                '; '.join(list(self._active_commands.values())) or 'none',
+                ''.join(traceback.format_list(stack))
+            )
+        )
+
+
+def _blocking_site(stack: traceback.StackSummary) -> str:
+    """Describe the innermost frame of the stack in necrobot's own code, and the innermost frame overall"""
+    innermost = stack[-1]
+    site = '{0} ({1}:{2})'.format(innermost.name, os.path.basename(innermost.filename), innermost.lineno)
+    for frame in reversed(stack):
+        if frame.filename.startswith(_PACKAGE_DIR):
+            own_site = '{0} ({1}:{2})'.format(
+                frame.name, os.path.relpath(frame.filename, os.path.dirname(_PACKAGE_DIR)), frame.lineno)
+            return own_site if frame is innermost else '{0}, in {1}'.format(own_site, site)
+    return site
+
+
+class TestLoopWatchdog(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.watchdog = LoopWatchdog()
+        self.watchdog.interval = 0.01
+        self.watchdog.threshold = 0.05
+
+    def tearDown(self):
+        self.watchdog.stop()
+        self.watchdog.interval = HEARTBEAT_INTERVAL
+        self.watchdog.threshold = STALL_THRESHOLD
+        self.loop.close()
+
+    @staticmethod
+    def _block_loop(seconds: float):
+        time.sleep(seconds)
+
+    def test_reports_stall(self):
+        async def run():
+            self.watchdog.start()
+            await asyncio.sleep(0.05)
+            num_stalls = self.watchdog.num_stalls
+            self.watchdog.command_started(1, 'Test <Message=.block>')
+            self._block_loop(0.2)
+            await asyncio.sleep(0.05)
+            self.watchdog.command_finished(1)
+            return num_stalls
+
+        with self.assertLogs('necrobot', level='WARNING') as logs:
+            num_stalls_before = self.loop.run_until_complete(run())
+        self.assertEqual(self.watchdog.num_stalls, num_stalls_before + 1)
+        self.assertIn('_block_loop', self.watchdog.last_stall_site)
+        self.assertIn('.block', logs.output[0])
+        self.assertIn('p99', self.watchdog.status_str())
+
+    def test_watcher_survives_report_error(self):
+        def fail_once(overdue):
+            del self.watchdog._report_stall
+            raise RuntimeError('dictionary changed size during iteration')
+
+        self.watchdog._report_stall = fail_once
+        self.addCleanup(lambda: self.watchdog.__dict__.pop('_report_stall', None))
+
+        async def run():
+            self.watchdog.start()
+            await asyncio.sleep(0.05)
+            self._block_loop(0.2)
+            await asyncio.sleep(0.05)
+            self._block_loop(0.2)
+            await asyncio.sleep(0.05)
+
+        with self.assertLogs('necrobot', level='WARNING') as logs:
+            self.loop.run_until_complete(run())
+        self.assertIn('Error in the event loop watchdog', logs.output[0])
+        self.assertTrue(any('Event loop blocked' in line for line in logs.output[1:]))
@@ -4,13 +4,15 @@ from typing import Dict, Callable, List, ValuesView
 
 from necrobot.test import msgqueue
 
-from necrobot.botbase import server
-from necrobot.util import console
+from necrobot.botbase import channelactivity, liveboard, server
+from necrobot.util import console, startupprofile
 
 # from necrobot.botbase.botchannel import BotChannel
 from necrobot.config import Config
 from necrobot.botbase.command import Command, TestCommand
+from necrobot.botbase.loopwatchdog import LoopWatchdog
 from necrobot.botbase.manager import Manager
+from necrobot.botbase.scheduler import Scheduler
 from necrobot.util.singleton import Singleton
 
 
@@ -49,6 +51,8 @@ class Necrobot(object, metaclass=Singleton):
         self._initted = False
         self._quitting = False
         self._load_config_fn = None
+        Scheduler().clear()
+        LoopWatchdog().stop()
 
     def get_bot_channel(self, discord_channel: discord.Channel):  # -> BotChannel:
         """Returns the BotChannel corresponding to the given discord.Channel, if one exists"""
@@ -105,11 +109,18 @@ class Necrobot(object, metaclass=Singleton):
 
         server.init(client, the_server)
 
+        # (Re)start the timer service; timers scheduled before a reconnect are still pending
+        Scheduler().start()
+        LoopWatchdog().start()
+
         if not self._initted:
-            await self._load_config_fn(self)
+            with startupprofile.timed('load config'):
+                await self._load_config_fn(self)
             self._initted = True
             for manager in self._managers:
-                await manager.initialize()
+                with startupprofile.timed('{0}.initialize'.format(type(manager).__name__)):
+                    await manager.initialize()
+            startupprofile.report()
         else:
             await self.refresh()
 
@@ -142,6 +153,7 @@ class Necrobot(object, metaclass=Singleton):
         """Called on shutdown"""
         for manager in self._managers:
             await manager.close()
+        await liveboard.flush_all()
 
     async def logout(self) -> None:
         """Log out of discord"""
@@ -175,6 +187,11 @@ class Necrobot(object, metaclass=Singleton):
         elif cmd.channel in self._bot_channels:
             await self._bot_channels[cmd.channel].execute(cmd)
 
+    @staticmethod
+    def _tracks_server(the_server: discord.Server) -> bool:
+        """True if the given server is the one whose channels, members, and roles are indexed in server.registry"""
+        return server.registry is not None and the_server is not None and the_server.id == server.server.id
+
     def ready_client_events(
             self,
             client: discord.Client,
@@ -200,6 +217,9 @@ class Necrobot(object, metaclass=Singleton):
             if not self._initted:
                 return
 
+            if not message.channel.is_private:
+                channelactivity.record(message.channel.id)
+
             if Config.testing():
                 await msgqueue.send_message(message)
 
@@ -209,6 +229,55 @@ class Necrobot(object, metaclass=Singleton):
             cmd = Command(message)
             await self._execute(cmd)
 
+        @client.event
+        async def on_member_join(member: discord.Member):
+            if self._tracks_server(member.server):
+                server.registry.add_member(member)
+
+        @client.event
+        async def on_member_remove(member: discord.Member):
+            if self._tracks_server(member.server):
+                server.registry.remove_member(member)
+
+        @client.event
+        async def on_member_update(member_before: discord.Member, member_after: discord.Member):
+            if self._tracks_server(member_after.server):
+                server.registry.update_member(member_before, member_after)
+
+        @client.event
+        async def on_channel_create(channel: discord.Channel):
+            if not channel.is_private and self._tracks_server(channel.server):
+                server.registry.add_channel(channel)
+
+        @client.event
+        async def on_channel_delete(channel: discord.Channel):
+            channelactivity.forget(channel.id)
+            if not channel.is_private and self._tracks_server(channel.server):
+                server.registry.remove_channel(channel)
+
+        @client.event
+        async def on_channel_update(channel_before: discord.Channel, channel_after: discord.Channel):
+            if not channel_after.is_private and self._tracks_server(channel_after.server):
+                server.registry.update_channel(channel_before, channel_after)
+
+        @client.event
+        async def on_server_role_create(role: discord.Role):
+            if self._tracks_server(role.server):
+                server.registry.add_role(role)
+                server.on_roles_changed()
+
+        @client.event
+        async def on_server_role_delete(role: discord.Role):
+            if self._tracks_server(role.server):
+                server.registry.remove_role(role)
+                server.on_roles_changed()
+
+        @client.event
+        async def on_server_role_update(role_before: discord.Role, role_after: discord.Role):
+            if self._tracks_server(role_after.server):
+                server.registry.update_role(role_before, role_after)
+                server.on_roles_changed()
+
         # noinspection PyUnusedLocal
         @client.event
         async def on_error(event: str, *args, **kwargs):
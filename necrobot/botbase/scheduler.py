@@ -0,0 +1,217 @@
+"""
+A single service owning all of the bot's deadline-based work (match warnings, race room cleanup checks, race
+finalization, daily rollover, ladder automatching, ...).
+
+Timers are identified by a key, which should be a tuple whose first element names the kind of timer, e.g.
+('match_start', match_id). Scheduling a timer under a key that is already in use replaces the old timer, so
+rescheduling and cancellation are both done by key.
+
+Deadlines are held in a heap rather than in sleeping tasks, so they survive the task cancellation that happens
+when the client reconnects: Necrobot restarts the runner in post_login_init, and any timers that came due in
+the meantime fire immediately (their lateness shows up in the lag statistics).
+"""
+
+import asyncio
+import collections
+import datetime
+import heapq
+import itertools
+import unittest
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+from necrobot.util import console, stats
+
+from necrobot.util.singleton import Singleton
+
+
+class _Timer(object):
+    def __init__(self, key: Hashable, deadline: float, callback: Callable, seq: int):
+        self.key = key
+        self.deadline = deadline
+        self.callback = callback
+        self.seq = seq
+
+
+class Scheduler(object, metaclass=Singleton):
+    def __init__(self):
+        self._timers = dict()                               # type: Dict[Hashable, _Timer]
+        self._heap = list()                                 # type: List[Tuple[float, int, Hashable]]
+        self._counter = itertools.count()
+        self._wakeup = None                                 # type: asyncio.Event
+        self._runner = None                                 # type: asyncio.Future
+
+        self._num_fired = 0                                 # type: int
+        self._num_cancelled = 0                             # type: int
+        self._max_lag = 0.0                                 # type: float
+        self._recent_lags = collections.deque(maxlen=200)   # type: collections.deque
+
+    @property
+    def num_timers(self) -> int:
+        return len(self._timers)
+
+    @property
+    def running(self) -> bool:
+        return self._runner is not None and not self._runner.done()
+
+    def start(self) -> None:
+        """Start (or restart, e.g. after a reconnect) the task that fires timers"""
+        if self.running:
+            return
+        self._wakeup = asyncio.Event()
+        self._runner = asyncio.ensure_future(self._run())
+
+    def clear(self) -> None:
+        """Stop the runner and drop all timers"""
+        if self._runner is not None:
+            self._runner.cancel()
+            self._runner = None
+        self._timers.clear()
+        self._heap.clear()
+
+    def schedule(self, key: Hashable, delay: float, callback: Callable) -> None:
+        """Call `callback` (a coroutine function taking no arguments) in `delay` seconds, replacing any timer
+        already scheduled under `key`.
+        """
+        deadline = asyncio.get_event_loop().time() + max(delay, 0.0)
+        timer = _Timer(key=key, deadline=deadline, callback=callback, seq=next(self._counter))
+        self._timers[key] = timer
+        heapq.heappush(self._heap, (deadline, timer.seq, key))
+        self._maybe_compact()
+        if self._wakeup is not None and self._heap[0][1] == timer.seq:
+            self._wakeup.set()
+
+    def schedule_at(self, key: Hashable, when: datetime.datetime, callback: Callable) -> None:
+        """As schedule(), but at the given time (either timezone-aware, or naive UTC)"""
+        if when.tzinfo is None:
+            delay = (when - datetime.datetime.utcnow()).total_seconds()
+        else:
+            delay = (when - datetime.datetime.now(datetime.timezone.utc)).total_seconds()
+        self.schedule(key, delay, callback)
+
+    def cancel(self, key: Hashable) -> bool:
+        """Cancel the timer with the given key. Return False if there was no such timer."""
+        if self._timers.pop(key, None) is None:
+            return False
+        self._num_cancelled += 1
+        self._maybe_compact()
+        return True
+
+    def is_scheduled(self, key: Hashable) -> bool:
+        return key in self._timers
+
+    def time_until(self, key: Hashable) -> Optional[float]:
+        """The number of seconds until the timer with the given key fires, or None if there is no such timer"""
+        timer = self._timers.get(key)
+        if timer is None:
+            return None
+        return max(timer.deadline - asyncio.get_event_loop().time(), 0.0)
+
+    def counts_by_kind(self) -> Dict[str, int]:
+        counts = dict()
+        for key in self._timers:
+            kind = str(key[0]) if isinstance(key, tuple) and key else str(key)
+            counts[kind] = counts.get(kind, 0) + 1
+        return counts
+
+    def status_str(self) -> str:
+        """A summary of pending timers and firing lag"""
+        if self._recent_lags:
+            lag_str = 'median {0:.3f}s, p99 {1:.3f}s, max {2:.3f}s'.format(
+                stats.percentile(self._recent_lags, 50),
+                stats.percentile(self._recent_lags, 99),
+                self._max_lag
+            )
+        else:
+            lag_str = 'no timers fired yet'
+
+        lines = ['{0} timers pending ({1} fired, {2} cancelled); runner {3}.'.format(
+            self.num_timers, self._num_fired, self._num_cancelled, 'running' if self.running else 'stopped')]
+        for kind, count in sorted(self.counts_by_kind().items()):
+            lines.append('   {0}: {1}'.format(kind, count))
+        lines.append('Firing lag: {0}'.format(lag_str))
+        return '\n'.join(lines)
+
+    async def _run(self) -> None:
+        loop = asyncio.get_event_loop()
+        while True:
+            self._wakeup.clear()
+            now = loop.time()
+            while self._heap and self._heap[0][0] <= now:
+                deadline, seq, key = heapq.heappop(self._heap)
+                timer = self._timers.get(key)
+                if timer is None or timer.seq != seq:
+                    continue    # Cancelled or rescheduled
+                del self._timers[key]
+                self._record_lag(now - deadline)
+                asyncio.ensure_future(self._fire(timer))
+
+            timeout = self._heap[0][0] - now if self._heap else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _fire(self, timer: _Timer) -> None:
+        self._num_fired += 1
+        try:
+            await timer.callback()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            console.error('Error running scheduled timer {0}.'.format(timer.key))
+
+    def _maybe_compact(self) -> None:
+        """Drop heap entries for cancelled or rescheduled timers once they make up most of the heap"""
+        if len(self._heap) > 2*len(self._timers) + 64:
+            self._heap = [(t.deadline, t.seq, t.key) for t in self._timers.values()]
+            heapq.heapify(self._heap)
+
+    def _record_lag(self, lag: float) -> None:
+        self._recent_lags.append(lag)
+        self._max_lag = max(self._max_lag, lag)
+
+
+class TestScheduler(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.fired = []
+        self.scheduler = Scheduler()
+        self.scheduler.clear()
+
+    def tearDown(self):
+        self.scheduler.clear()
+        self.loop.close()
+
+    def _callback(self, name):
+        async def fire():
+            self.fired.append(name)
+        return fire
+
+    def test_order_cancel_and_reschedule(self):
+        async def run():
+            self.scheduler.start()
+            self.scheduler.schedule(('test', 2), 0.04, self._callback('b'))
+            self.scheduler.schedule(('test', 1), 0.02, self._callback('a'))
+            self.scheduler.schedule(('test', 3), 0.01, self._callback('c'))
+            self.scheduler.cancel(('test', 3))
+            self.scheduler.schedule(('test', 2), 0.06, self._callback('b2'))
+            self.assertEqual(self.scheduler.counts_by_kind(), {'test': 2})
+            await asyncio.sleep(0.1)
+
+        self.loop.run_until_complete(run())
+        self.assertEqual(self.fired, ['a', 'b2'])
+        self.assertEqual(self.scheduler.num_timers, 0)
+
+    def test_survives_runner_restart(self):
+        async def run():
+            self.scheduler.start()
+            self.scheduler.schedule(('test', 1), 0.02, self._callback('a'))
+            self.scheduler._runner.cancel()
+            await asyncio.sleep(0.05)
+            self.assertEqual(self.fired, [])
+            self.scheduler.start()
+            await asyncio.sleep(0.01)
+
+        self.loop.run_until_complete(run())
+        self.assertEqual(self.fired, ['a'])
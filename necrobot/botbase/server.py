@@ -1,5 +1,6 @@
 import discord
 from typing import List, Optional, Union
+from necrobot.botbase.guildregistry import GuildRegistry
 from necrobot.config import Config
 
 
@@ -9,19 +10,24 @@ server = None           # type: discord.Server
 main_channel = None     # type: discord.Channel
 admin_roles = list()    # type: List[discord.Role]
 staff_role = None       # type: Optional[discord.Role]
+registry = None         # type: GuildRegistry
 
 
 def init(client_: discord.Client, server_: discord.Server) -> None:
-    global client, server, main_channel, admin_roles, staff_role
+    global client, server, main_channel, admin_roles, staff_role, registry
     client = client_
     server = server_
     main_channel = server.default_channel
-    for rolename in Config.ADMIN_ROLE_NAMES:
-        for role in server.roles:
-            if role.name == rolename:
-                admin_roles.append(role)
-            if role.name == Config.STAFF_ROLE:
-                staff_role = role
+    registry = GuildRegistry(server, Config.ADMIN_ROLE_NAMES)
+    admin_roles = registry.admin_roles
+    staff_role = next((role for role in server.roles if role.name == Config.STAFF_ROLE), None)
+
+
+def on_roles_changed() -> None:
+    """Recompute the cached admin and staff roles (call after the registry's roles have been updated)"""
+    global admin_roles, staff_role
+    admin_roles = registry.admin_roles
+    staff_role = next((role for role in server.roles if role.name == Config.STAFF_ROLE), None)
 
 
 def find_admin(ignore=list()) -> Optional[discord.Member]:
@@ -38,13 +44,9 @@ def find_admin(ignore=list()) -> Optional[discord.Member]:
 def find_channel(channel_name: str = None, channel_id: Union[str, int] = None) -> Optional[discord.Channel]:
     """Returns the channel with the given name on the server, if any"""
     if channel_id is not None:
-        for channel in server.channels:
-            if int(channel.id) == int(channel_id):
-                return channel
+        return registry.get_channel(channel_id)
     elif channel_name is not None:
-        for channel in server.channels:
-            if channel.name == channel_name:
-                return channel
+        return registry.get_channel_by_name(channel_name)
     return None
 
 
@@ -54,45 +56,29 @@ def find_member(discord_name: str = None, discord_id: Union[str, int] = None) ->
         return None
 
     if discord_id is not None:
-        for member in server.members:
-            if int(member.id) == int(discord_id):
-                return member
+        return registry.get_member(discord_id)
     elif discord_name is not None:
-        for member in server.members:
-            if member.display_name.lower() == discord_name.lower() \
-                    or member.name.lower() == discord_name.lower():
-                return member
+        return registry.get_member_by_name(discord_name)
 
 
 def find_members(username: str) -> List[discord.Member]:
     """Returns a list of all members with a given username (capitalization ignored)"""
-    to_return = []
-    for member in server.members:
-        if member.display_name.lower() == username.lower():
-            to_return.append(member)
-    return to_return
+    return registry.get_members_by_display_name(username)
 
 
 def find_role(role_name: str) -> Optional[discord.Role]:
     """Finds a discord.Role with the given name, if any"""
-    for role in server.roles:
-        if role.name.lower() == role_name.lower():
-            return role
-    return None
+    return registry.get_role_by_name(role_name)
 
 
 def get_as_member(user: discord.User) -> Optional[discord.Member]:
     """Returns the given Discord user as a member of the server"""
-    for member in server.members:
-        if int(member.id) == int(user.id):
-            return member
-    return None
+    return registry.get_member(user.id)
 
 
 def is_admin(user: discord.User) -> bool:
     """True if user is a server admin"""
     member = get_as_member(user)
-    for role in member.roles:
-        if role in admin_roles:
-            return True
-    return False
+    if member is None:
+        return False
+    return registry.is_admin(member)
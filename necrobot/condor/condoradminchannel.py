@@ -31,6 +31,7 @@ class CondorAdminChannel(BotChannel):
             cmd_sheet.GetGSheet(self),
             cmd_sheet.MakeFromSheet(self),
             cmd_sheet.SetGSheet(self),
+            cmd_sheet.SyncSheet(self),
 
             cmd_seedgen.RandomSeed(self),
 
@@ -1,14 +1,14 @@
 import asyncio
 import unittest
 
-from necrobot.botbase import server
+from necrobot.botbase import liveboard, server
 from necrobot.condor import cmd_condor
 from necrobot.gsheet import cmd_sheet
 from necrobot.match import matchutil
-from necrobot.gsheet import sheetlib
+from necrobot.gsheet import sheetlib, sheetwritebuffer
 from necrobot.stats import statfn
 from necrobot.user import userlib
-from necrobot.util import strutil
+from necrobot.util import console, strutil
 
 from necrobot.botbase.manager import Manager
 from necrobot.gsheet.matchupsheet import MatchupSheet
@@ -28,6 +28,7 @@ class CondorMgr(Manager, metaclass=Singleton):
         self._main_channel = None
         self._notifications_channel = None
         self._schedule_channel = None
+        self._schedule_board = None
         self._client = None
         NEDispatch().subscribe(self)
 
@@ -46,7 +47,8 @@ class CondorMgr(Manager, metaclass=Singleton):
         await self.update_schedule_channel()
 
     async def close(self):
-        pass
+        await sheetwritebuffer.flush_all()
+        console.info('GSheet writes:\n{0}'.format(sheetwritebuffer.stats_str()))
 
     def on_botchannel_create(self, channel, bot_channel):
         bot_channel.default_commands.append(cmd_condor.StaffAlert(bot_channel))
@@ -55,8 +57,10 @@ class CondorMgr(Manager, metaclass=Singleton):
 
     async def ne_process(self, ev: NecroEvent):
         if ev.event_type == 'begin_match_race':
-            await VodRecorder().start_record(ev.match.racer_1.rtmp_name)
-            await VodRecorder().start_record(ev.match.racer_2.rtmp_name)
+            await asyncio.gather(
+                VodRecorder().start_record(ev.match.racer_1.rtmp_name),
+                VodRecorder().start_record(ev.match.racer_2.rtmp_name)
+            )
         elif ev.event_type == 'end_match':
             sheet = await self.get_gsheet(wks_id=ev.match.sheet_id)
             await sheet.record_score(
@@ -71,6 +75,8 @@ class CondorMgr(Manager, metaclass=Singleton):
                 r1_wins=ev.r1_wins,
                 r2_wins=ev.r2_wins
             )
+            # Send the score and both standings cells in one batch
+            await sheetwritebuffer.flush(standings.gsheet_id)
             await server.client.send_message(
                 self._main_channel,
                 'Match complete: **{r1}** [{w1}-{w2}] **{r2}** :tada:'.format(
@@ -81,8 +87,10 @@ class CondorMgr(Manager, metaclass=Singleton):
                 )
             )
         elif ev.event_type == 'end_match_race':
-            await VodRecorder().end_record(ev.match.racer_1.rtmp_name)
-            await VodRecorder().end_record(ev.match.racer_2.rtmp_name)
+            await asyncio.gather(
+                VodRecorder().end_record(ev.match.racer_1.rtmp_name),
+                VodRecorder().end_record(ev.match.racer_2.rtmp_name)
+            )
         elif ev.event_type == 'match_alert':
             if ev.final:
                 await self.match_alert(ev.match)
@@ -93,16 +101,19 @@ class CondorMgr(Manager, metaclass=Singleton):
                 await self._client.send_message(self._notifications_channel, ev.message)
         elif ev.event_type == 'schedule_match':
             sheet = await self.get_gsheet(wks_id=ev.match.sheet_id)
-            await sheet.schedule_match(ev.match)
+            written = await sheet.schedule_match(ev.match)
             await self.update_schedule_channel()
+            asyncio.ensure_future(self._report_unwritten(written, 'the scheduled time', ev.match))
         elif ev.event_type == 'set_cawmentary':
             if ev.match.sheet_id is not None:
                 sheet = await self.get_gsheet(wks_id=ev.match.sheet_id)
-                await sheet.set_cawmentary(match=ev.match)
+                written = await sheet.set_cawmentary(match=ev.match)
+                asyncio.ensure_future(self._report_unwritten(written, 'the cawmentary', ev.match))
         elif ev.event_type == 'set_vod':
             if ev.match.sheet_id is not None:
                 sheet = await self.get_gsheet(wks_id=ev.match.sheet_id)
-                await sheet.set_vod(match=ev.match, vod_link=ev.url)
+                written = await sheet.set_vod(match=ev.match, vod_link=ev.url)
+                asyncio.ensure_future(self._report_unwritten(written, 'the vod', ev.match))
                 cawmentator = await ev.match.get_cawmentator()
                 await server.client.send_message(
                     self._main_channel,
@@ -114,6 +125,21 @@ class CondorMgr(Manager, metaclass=Singleton):
                     )
                 )
 
+    async def _report_unwritten(self, written: asyncio.Future, what: str, match: Match) -> None:
+        """Once a buffered GSheet write is sent, tell the staff if it failed (so they can fix the sheet by hand)"""
+        if await written or self._notifications_channel is None:
+            return
+        await self._client.send_message(
+            self._notifications_channel,
+            'Failed to write {what} for **{r1}** - **{r2}** to the GSheet. (Use `{prefix}updategsheet` in the '
+            'match room to try again.)'.format(
+                what=what,
+                r1=match.racer_1.display_name,
+                r2=match.racer_2.display_name,
+                prefix=Config.BOT_COMMAND_PREFIX
+            )
+        )
+
     @staticmethod
     async def get_gsheet(wks_id: str) -> MatchupSheet:
         return await sheetlib.get_sheet(
@@ -194,23 +220,24 @@ class CondorMgr(Manager, metaclass=Singleton):
     async def update_schedule_channel(self):
         infotext = await matchutil.get_schedule_infotext()
 
-        # Find the message:
-        the_msg = None
-        async for msg in server.client.logs_from(self._schedule_channel):
-            if msg.author.id == server.client.user.id:
-                the_msg = msg
-                break
+        # Find the message, if we aren't already tracking it
+        if self._schedule_board is None:
+            the_msg = None
+            async for msg in server.client.logs_from(self._schedule_channel):
+                if msg.author.id == server.client.user.id:
+                    the_msg = msg
+                    break
 
-        if the_msg is None:
-            await server.client.send_message(
-                self._schedule_channel,
-                infotext
-            )
-        else:
-            await server.client.edit_message(
-                message=the_msg,
-                new_content=infotext
-            )
+            if the_msg is None:
+                the_msg = await server.client.send_message(
+                    self._schedule_channel,
+                    infotext
+                )
+
+            self._schedule_board = liveboard.message_board(self._schedule_channel, the_msg.id)
+            self._schedule_board.mark_published(the_msg.content)
+
+        await self._schedule_board.update(infotext)
 
 
 class TestCondorMgr(unittest.TestCase):
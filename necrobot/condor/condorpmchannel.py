@@ -11,9 +11,12 @@ class CondorPMChannel(BotChannel):
         BotChannel.__init__(self)
         self.channel_commands = [
             cmd_admin.Die(self),
+            cmd_admin.LoopLag(self),
+            cmd_admin.Profile(self),
             cmd_admin.RaiseException(self),
             cmd_admin.Reboot(self),
             cmd_admin.RedoInit(self),
+            cmd_admin.Timers(self),
 
             cmd_match.Vod(self),
 
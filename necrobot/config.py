@@ -29,11 +29,18 @@ LADDER_ADMIN_CHANNEL_NAME: str
     The channel for general ladder admin commands.
 RACE_RESULTS_CHANNEL_NAME: str
     The channel where the bot posts public race results.
+BOARD_DEBOUNCE_SEC: float
+    The window, in seconds, over which rapid edits to a channel topic or leaderboard message are
+    collapsed into a single edit.
 
 Daily
 -----
 DAILY_GRACE_PERIOD: datetime.timedelta
     The amount of time after a new daily opens before the previous daily closes.
+DAILY_ALERT_CONCURRENCY: int
+    The maximum number of new-daily alert DMs to send at once.
+DAILY_ALERT_RETRIES: int
+    The number of times to retry a new-daily alert DM that fails with a transient error.
 
 Database
 --------
@@ -50,6 +57,16 @@ GSheet
 ------
 OAUTH_CREDENTIALS_JSON: str
     The filename where GSheet OAuth credentials are stored.
+GSHEET_MAX_WORKERS: int
+    The number of threads in which GSheet requests are run.
+GSHEET_CONCURRENCY_PER_SHEET: int
+    The maximum number of requests to a single GSheet to have in flight at once.
+GSHEET_BACKOFF_TIMEOUT: int
+    The number of seconds to keep retrying a GSheet request that is being rate-limited before giving up.
+GSHEET_WRITE_WINDOW_SEC: float
+    The window, in seconds, over which writes to a GSheet are collected and sent as a single batch update.
+GSHEET_SNAPSHOT_TTL_SEC: int
+    The number of seconds for which a cached copy of a worksheet is used before it is re-read.
 
 Ladder
 ------
@@ -79,6 +96,10 @@ MATCH_FIRST_WARNING: datetime.timedelta
     The time before match start at which to first ping the racers.
 MATCH_FINAL_WARNING: datetime.timedelta
     The time before match start at which to make the final ping to the racers.
+MATCH_RECOVERY_CONCURRENCY: int
+    The maximum number of match rooms to initialize at once when recovering rooms on startup.
+MATCH_CREATE_CONCURRENCY: int
+    The maximum number of match channels to create at once when making matches from a worksheet.
 
 Races
 -----
@@ -104,6 +125,9 @@ NO_ENTRANTS_CLEANUP_WARNING: datetime.timedelta
     deleted from having zero entrants.
 RACE_POKE_DELAY: int
     The minimum number of seconds between .poke mentions.
+WRITE_COALESCE_SEC: float
+    The window, in seconds, in which non-critical race room messages are merged into a single
+    message. Set to 0 to send every message separately.
 
 Vod recording
 -------------
@@ -149,6 +173,7 @@ class Config(object):
     LADDER_ADMIN_CHANNEL_NAME = 'ladder_admin'
     RACE_RESULTS_CHANNEL_NAME = 'race_results'
     NOTIFICATIONS_CHANNEL_NAME = 'bot_notifications'
+    BOARD_DEBOUNCE_SEC = float(2)
 
     # Database --------------------------------------------------------------------------------
     MYSQL_DB_HOST = 'localhost'
@@ -158,9 +183,16 @@ class Config(object):
 
     # Daily -----------------------------------------------------------------------------------
     DAILY_GRACE_PERIOD = datetime.timedelta(minutes=60)
+    DAILY_ALERT_CONCURRENCY = int(5)
+    DAILY_ALERT_RETRIES = int(3)
 
     # GSheet ----------------------------------------------------------------------------------
     OAUTH_CREDENTIALS_JSON = 'data/necrobot-service-acct.json'
+    GSHEET_MAX_WORKERS = int(4)
+    GSHEET_CONCURRENCY_PER_SHEET = int(2)
+    GSHEET_BACKOFF_TIMEOUT = int(15)
+    GSHEET_WRITE_WINDOW_SEC = float(2)
+    GSHEET_SNAPSHOT_TTL_SEC = int(300)
 
     # Ladder ----------------------------------------------------------------------------------
     RATINGS_IN_NICKNAMES = True
@@ -177,6 +209,8 @@ class Config(object):
     MATCH_AUTOCONTEST_IF_WITHIN_HUNDREDTHS = 500
     MATCH_FIRST_WARNING = datetime.timedelta(minutes=15)
     MATCH_FINAL_WARNING = datetime.timedelta(minutes=5)
+    MATCH_RECOVERY_CONCURRENCY = int(10)
+    MATCH_CREATE_CONCURRENCY = int(3)
 
     # Races -----------------------------------------------------------------------------------
     COUNTDOWN_LENGTH = int(10)
@@ -189,6 +223,7 @@ class Config(object):
     NO_ENTRANTS_CLEANUP = datetime.timedelta(minutes=2)
     NO_ENTRANTS_CLEANUP_WARNING = datetime.timedelta(minutes=1, seconds=30)
     RACE_POKE_DELAY = int(10)
+    WRITE_COALESCE_SEC = float(1)
 
     # Vod recording ---------------------------------------------------------------------------
     VODRECORD_USERNAME = ''
@@ -1,18 +1,20 @@
-import asyncio
 import datetime
 import discord
+import time
 from enum import Enum
+from typing import Dict
 
-from necrobot.botbase import server
+from necrobot.botbase import bulksend, liveboard, server
 from necrobot.database import dailydb, userdb
 from necrobot.daily import dailytype
-from necrobot.util import level, seedgen, racetime
+from necrobot.util import console, level, seedgen, racetime
 from necrobot.user import userlib
-from necrobot.util import strutil
 
 from necrobot.config import Config
+from necrobot.daily.dailyleaderboard import DailyLeaderboard
 from necrobot.daily.dailytype import DailyType
 from necrobot.botbase.necrobot import Necrobot
+from necrobot.botbase.scheduler import Scheduler
 from necrobot.user.userprefs import UserPrefs
 from necrobot.util import timestr
 
@@ -46,11 +48,15 @@ class Daily(object):
 
     def __init__(self, daily_type: DailyType):
         self._daily_type = daily_type
-        self._daily_update_future = asyncio.ensure_future(self._daily_update())
+        self._rollover_key = ('daily_rollover', daily_type.value)
+        self._next_daily_number = None  # type: int      # The daily the scheduled rollover is for
+        self._message_ids = dict()  # type: Dict[int, int]     # Leaderboard message IDs, by daily number
+        self._leaderboards = dict()  # type: Dict[int, DailyLeaderboard]     # Loaded results, by daily number
         self._leaderboard_channel = server.find_channel(channel_name=Config.DAILY_LEADERBOARDS_CHANNEL_NAME)
+        self._schedule_rollover()
 
     def close(self):
-        self._daily_update_future.cancel()
+        Scheduler().cancel(self._rollover_key)
 
     @property
     def client(self) -> discord.Client:
@@ -142,44 +148,11 @@ class Daily(object):
                 text += "Seed: {}\n".format(row[0])
                 break
 
-        no_entries = True
-        rank = int(0)
-
-        prior_result = ''   # detect and handle ties
-        rank_to_display = int(1)
-        reverse_levelsort = dailytype.character(daily_type=self.daily_type, daily_number=daily_number) == 'Aria'
-        daily_times = sorted(
-                await dailydb.get_daily_times(daily_id=daily_number, daily_type=self.daily_type.value),
-                key=lambda x: level.level_sortval(int(x[1]), reverse=reverse_levelsort),
-                reverse=True)
-
-        for row in daily_times:
-            name = strutil.tickless(row[0])
-            lv = row[1]
-            time = row[2]
-            if lv == level.LEVEL_FINISHED:
-                result_string = racetime.to_str(time)
-            elif lv == level.LEVEL_NOS:
-                continue
-            else:
-                result_string = level.to_str(lv)
-                if result_string == '':
-                    result_string = "death"
-                else:
-                    result_string = "death ({0})".format(result_string)
-
-            rank += 1
-            no_entries = False
-
-            # update the rank only if we've gotten a different result than the last entrant
-            if result_string != prior_result:   # kinda hacky to use a string comparison here, but works
-                rank_to_display = rank
-
-            prior_result = result_string
-
-            text += '{0: >3}. {1: <24} {2}\n'.format(rank_to_display, name, result_string)
+        lines = (await self._get_leaderboard(daily_number)).lines()
+        for line in lines:
+            text += line + '\n'
 
-        if no_entries:
+        if not lines:
             text += 'No entries yet.\n'
 
         text += '```'
@@ -266,6 +239,14 @@ class Daily(object):
             level=lv,
             time=time)
 
+        leaderboard = self._leaderboards.get(daily_number)
+        if leaderboard is not None:
+            user = await userlib.get_user(user_id=user_id)
+            if user is not None:
+                leaderboard.set_result(int(user_id), user.discord_name, lv, time)
+            else:
+                del self._leaderboards[daily_number]    # Reload from the DB next time
+
     async def delete_from_daily(self, daily_number: int, user_id: int) -> None:
         """Delete a run from the daily"""
         await dailydb.delete_from_daily(
@@ -273,6 +254,10 @@ class Daily(object):
             daily_id=daily_number,
             daily_type=self.daily_type.value)
 
+        leaderboard = self._leaderboards.get(daily_number)
+        if leaderboard is not None:
+            leaderboard.remove(int(user_id))
+
     async def get_seed(self, daily_number: int) -> int:
         """Return the seed for the given daily number. (Creates seed if it doesn't already exist.)"""
         for row in await dailydb.get_daily_seed(daily_id=daily_number, daily_type=self.daily_type.value):
@@ -288,25 +273,22 @@ class Daily(object):
 
     async def register_message(self, daily_number: int, message_id: int) -> None:
         """Registers the given Message ID in the database for the given daily number"""
-        for _ in await dailydb.get_daily_seed(daily_id=daily_number, daily_type=self.daily_type.value):
-            # if here, there was an entry in the table, so we will update it
-            await dailydb.register_daily_message(
-                daily_id=daily_number,
-                daily_type=self.daily_type.value,
-                message_id=message_id)
-            return
-
-        # else, there was no entry, so make a new daily
-        today_seed = seedgen.get_new_seed()
-        await dailydb.create_daily(
+        # The seed is only used if the daily doesn't exist yet; otherwise just the message ID is updated
+        await dailydb.create_or_update_daily_message(
             daily_id=daily_number,
             daily_type=self.daily_type.value,
-            seed=today_seed,
+            seed=seedgen.get_new_seed(),
             message_id=message_id)
+        self._message_ids[daily_number] = int(message_id)
 
     async def get_message_id(self, daily_number) -> int:
         """Returns the Discord Message ID for the leaderboard entry for the given daily number"""
-        return await dailydb.get_daily_message_id(daily_id=daily_number, daily_type=self.daily_type.value)
+        msg_id = self._message_ids.get(daily_number)
+        if msg_id is None:
+            msg_id = await dailydb.get_daily_message_id(daily_id=daily_number, daily_type=self.daily_type.value)
+            if msg_id:
+                self._message_ids[daily_number] = msg_id
+        return msg_id
 
     async def user_status(self, user_id: int, daily_number: int) -> DailyUserStatus:
         """Return a DailyUserStatus corresponding to the status of the current daily for the given user"""
@@ -322,46 +304,101 @@ class Daily(object):
     async def update_leaderboard(self, daily_number: int, display_seed: bool = False) -> None:
         """Update an existing leaderboard message for the given daily number"""
         msg_id = await self.get_message_id(daily_number)
+        text = await self.leaderboard_text(daily_number, display_seed)
 
         # If no message, make one
         if not msg_id:
-            text = await self.leaderboard_text(daily_number, display_seed)
             msg = await self.client.send_message(self._leaderboard_channel, text)
             await self.register_message(daily_number, msg.id)
+            liveboard.message_board(self._leaderboard_channel, msg.id, message=msg).mark_published(text)
         else:
-            async for msg in self.client.logs_from(self._leaderboard_channel, limit=10):
-                if int(msg.id) == msg_id:
-                    await self.client.edit_message(msg, await self.leaderboard_text(daily_number, display_seed))
+            await liveboard.message_board(self._leaderboard_channel, msg_id).update(text)
 
     async def on_new_daily(self) -> None:
         """Run when a new daily happens"""
+        # Only today's and yesterday's dailies are still open, so stop holding older results in memory
+        for daily_number in [n for n in self._leaderboards if n < self.today_number - 1]:
+            del self._leaderboards[daily_number]
+
         # Make the leaderboard message
         text = await self.leaderboard_text(self.today_number, display_seed=False)
         msg = await self.client.send_message(self._leaderboard_channel, text)
         await self.register_message(self.today_number, msg.id)
+        liveboard.message_board(self._leaderboard_channel, msg.id, message=msg).mark_published(text)
 
         # Update yesterday's leaderboard with the seed
         await self.update_leaderboard(self.today_number - 1, display_seed=True)
 
-        # PM users with the daily_alert preference
+        # Register and PM users with the daily_alert preference
+        await self._alert_subscribers()
+
+    async def _alert_subscribers(self) -> None:
+        """Register every user with the daily_alert preference for today's daily, and PM them the seed"""
+        daily_number = self.today_number
+        phase_start = time.monotonic()
+        timings = []
+
+        seed = await self.get_seed(daily_number)
         auto_pref = UserPrefs(daily_alert=True, race_alert=None)
-        for member_id in await userdb.get_all_discord_ids_matching_prefs(auto_pref):
-            member = server.find_member(discord_id=member_id)
+        subscribers = []
+        for user_id, discord_id in await userdb.get_all_users_matching_prefs(auto_pref):
+            member = server.find_member(discord_id=discord_id)
             if member is not None:
-                await self.register(self.today_number, member.id)
-                await self.client.send_message(
-                    member,
-                    "({0}) Today's {2} speedrun seed: {1}".format(
-                        self.today_date.strftime("%d %b"),
-                        await self.get_seed(self.today_number),
-                        dailytype.character(self.daily_type, self.today_number)))
+                subscribers.append((user_id, member))
+        timings.append(('lookup', time.monotonic() - phase_start))
+
+        phase_start = time.monotonic()
+        await dailydb.register_daily_bulk(
+            user_ids=[user_id for user_id, _ in subscribers],
+            daily_id=daily_number,
+            daily_type=self.daily_type.value)
+        timings.append(('register', time.monotonic() - phase_start))
+
+        phase_start = time.monotonic()
+        alert_text = "({0}) Today's {2} speedrun seed: {1}".format(
+            self.daily_to_date(daily_number).strftime("%d %b"),
+            seed,
+            dailytype.character(self.daily_type, daily_number))
+        send_result = await bulksend.send_to_all(
+            messages=[(member, alert_text) for _, member in subscribers],
+            concurrency=Config.DAILY_ALERT_CONCURRENCY,
+            retries=Config.DAILY_ALERT_RETRIES)
+        timings.append(('send', time.monotonic() - phase_start))
+
+        console.info('New {0} daily alerted {1} subscribers ({2}); {3}.'.format(
+            self.daily_type,
+            len(subscribers),
+            send_result,
+            ', '.join('{0} {1:.2f}s'.format(name, elapsed) for name, elapsed in timings)))
+
+    async def _get_leaderboard(self, daily_number: int) -> DailyLeaderboard:
+        """The results for the given daily, loaded from the database the first time they're needed"""
+        leaderboard = self._leaderboards.get(daily_number)
+        if leaderboard is None:
+            leaderboard = DailyLeaderboard(
+                reverse_levelsort=dailytype.character(daily_type=self.daily_type, daily_number=daily_number) == 'Aria'
+            )
+            for row in await dailydb.get_daily_times(daily_id=daily_number, daily_type=self.daily_type.value):
+                leaderboard.set_result(user_id=int(row[3]), name=row[0], lv=int(row[1]), time=int(row[2]))
+            self._leaderboards[daily_number] = leaderboard
+        return leaderboard
+
+    def _schedule_rollover(self) -> None:
+        """Schedule _daily_update for just after this daily next rolls over"""
+        self._next_daily_number = self.today_number + 1
+        Scheduler().schedule(self._rollover_key, self.time_until_next.total_seconds() + 1, self._daily_update)
 
     async def _daily_update(self) -> None:
         """Call DailyManager's on_new_daily coroutine when this daily rolls over"""
-        while True:
-            await asyncio.sleep(self.time_until_next.total_seconds() + 1)  # sleep until next daily
-            await self.on_new_daily()
-            await asyncio.sleep(120)  # buffer b/c i'm worried for some reason about idk
+        # If the timer fired early (e.g. the clock was adjusted), wait for the real rollover; otherwise the same
+        # daily would be announced twice
+        if self.today_number < self._next_daily_number:
+            Scheduler().schedule(self._rollover_key, self.time_until_next.total_seconds() + 1, self._daily_update)
+            return
+
+        # Schedule the next rollover first, so that a failure here doesn't stop future dailies
+        self._schedule_rollover()
+        await self.on_new_daily()
 
     @staticmethod
     def _format_as_timestr(td: datetime.timedelta) -> str:
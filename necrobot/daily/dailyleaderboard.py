@@ -0,0 +1,104 @@
+"""
+The results for a single daily, kept sorted in memory so that a submission only has to place one entry rather
+than re-fetch and re-sort every run.
+"""
+
+import bisect
+import unittest
+from typing import Dict, List, Tuple
+
+from necrobot.util import level, racetime, strutil
+
+
+class DailyLeaderboard(object):
+    """Sorted results for one daily.
+
+    Entries are kept in a list ordered by (level sort value, level, time), best first, and placed with bisect;
+    ties (equal finishing times, or deaths on the same level) share a rank when rendered.
+
+    Parameters
+    ----------
+    reverse_levelsort: bool
+        True if dying on an earlier level is better (as for Aria).
+    """
+    def __init__(self, reverse_levelsort: bool = False):
+        self._reverse_levelsort = reverse_levelsort
+        self._sorted_keys = list()      # type: List[Tuple[int, int, int, int]]
+        self._keys = dict()             # type: Dict[int, Tuple[int, int, int, int]]    # user ID -> sort key
+        self._names = dict()            # type: Dict[int, str]                          # user ID -> name
+
+    def __len__(self):
+        return len(self._sorted_keys)
+
+    def set_result(self, user_id: int, name: str, lv: int, time: int) -> None:
+        """Add or replace the result for the given user. A level of LEVEL_NOS removes the user's result."""
+        self.remove(user_id)
+        if lv == level.LEVEL_NOS:
+            return
+
+        key = (-level.level_sortval(lv, reverse=self._reverse_levelsort), -lv, time, user_id)
+        bisect.insort(self._sorted_keys, key)
+        self._keys[user_id] = key
+        self._names[user_id] = name
+
+    def remove(self, user_id: int) -> None:
+        """Remove the result for the given user, if any"""
+        key = self._keys.pop(user_id, None)
+        if key is None:
+            return
+        del self._sorted_keys[bisect.bisect_left(self._sorted_keys, key)]
+        del self._names[user_id]
+
+    def lines(self) -> List[str]:
+        """The leaderboard lines, in rank order"""
+        lines = []
+        prior_tie_key = None
+        rank_to_display = 0
+        for rank, key in enumerate(self._sorted_keys, start=1):
+            lv, time, user_id = -key[1], key[2], key[3]
+            if lv == level.LEVEL_FINISHED:
+                result_string = racetime.to_str(time)
+                tie_key = (lv, time)
+            else:
+                level_str = level.to_str(lv)
+                result_string = 'death ({0})'.format(level_str) if level_str else 'death'
+                tie_key = (lv,)
+
+            # Update the displayed rank only if this result differs from the previous entrant's
+            if tie_key != prior_tie_key:
+                rank_to_display = rank
+            prior_tie_key = tie_key
+
+            lines.append('{0: >3}. {1: <24} {2}'.format(
+                rank_to_display, strutil.tickless(self._names[user_id]), result_string))
+        return lines
+
+
+class TestDailyLeaderboard(unittest.TestCase):
+    def test_order_and_ties(self):
+        board = DailyLeaderboard()
+        board.set_result(1, 'a', level.LEVEL_FINISHED, 60000)
+        board.set_result(2, 'b', level.from_str('3-2'), -1)
+        board.set_result(3, 'c', level.LEVEL_FINISHED, 50000)
+        board.set_result(4, 'd', level.LEVEL_FINISHED, 60000)
+        board.set_result(5, 'e', level.from_str('3-2'), -1)
+        board.set_result(6, 'f', level.LEVEL_NOS, -1)
+
+        ranks_and_names = [(line.split('.')[0].strip(), line.split()[1]) for line in board.lines()]
+        self.assertEqual(ranks_and_names, [('1', 'c'), ('2', 'a'), ('2', 'd'), ('4', 'b'), ('4', 'e')])
+
+    def test_resubmit_and_remove(self):
+        board = DailyLeaderboard()
+        board.set_result(1, 'a', level.LEVEL_FINISHED, 60000)
+        board.set_result(2, 'b', level.LEVEL_FINISHED, 70000)
+        board.set_result(2, 'b', level.LEVEL_FINISHED, 50000)
+        self.assertEqual([line.split()[1] for line in board.lines()], ['b', 'a'])
+        board.remove(2)
+        self.assertEqual(len(board), 1)
+
+    def test_reverse_levelsort(self):
+        board = DailyLeaderboard(reverse_levelsort=True)
+        board.set_result(1, 'a', level.from_str('4-1'), -1)
+        board.set_result(2, 'b', level.from_str('1-2'), -1)
+        board.set_result(3, 'c', level.LEVEL_FINISHED, 60000)
+        self.assertEqual([line.split()[1] for line in board.lines()], ['c', 'b', 'a'])
@@ -24,7 +24,7 @@ async def get_daily_times(daily_id, daily_type):
         params = (daily_id, daily_type,)
         cursor.execute(
             """
-            SELECT users.discord_name,daily_runs.level,daily_runs.time
+            SELECT users.discord_name,daily_runs.level,daily_runs.time,daily_runs.user_id
             FROM daily_runs 
                 INNER JOIN users ON daily_runs.user_id=users.user_id
             WHERE daily_runs.daily_id=%s AND daily_runs.type=%s
@@ -78,6 +78,29 @@ async def register_daily(user_id, daily_id, daily_type, level=necrobot.util.leve
             params)
 
 
+async def register_daily_bulk(user_ids, daily_id, daily_type):
+    """Register all the given users for the daily with a single statement, leaving existing entries (and so any
+    submissions) untouched.
+    """
+    if not user_ids:
+        return
+
+    params = []
+    for user_id in user_ids:
+        params.extend([user_id, daily_id, daily_type, necrobot.util.level.LEVEL_NOS, -1])
+
+    async with DBConnect(commit=True) as cursor:
+        cursor.execute(
+            """
+            INSERT INTO daily_runs
+                (user_id, daily_id, type, level, time)
+            VALUES {0}
+            ON DUPLICATE KEY UPDATE
+                level=level
+            """.format(', '.join(['(%s,%s,%s,%s,%s)'] * len(user_ids))),
+            tuple(params))
+
+
 async def registered_daily(user_id, daily_type):
     async with DBConnect(commit=False) as cursor:
         params = (user_id, daily_type,)
@@ -134,6 +157,21 @@ async def create_daily(daily_id, daily_type, seed, message_id=0):
             params)
 
 
+async def create_or_update_daily_message(daily_id, daily_type, seed, message_id):
+    """Set the leaderboard message for the daily, creating the daily with the given seed if it doesn't exist"""
+    async with DBConnect(commit=True) as cursor:
+        params = (daily_id, daily_type, seed, message_id)
+        cursor.execute(
+            """
+            INSERT INTO dailies 
+            (daily_id, type, seed, msg_id) 
+            VALUES (%s,%s,%s,%s) 
+            ON DUPLICATE KEY UPDATE 
+                msg_id=VALUES(msg_id)
+            """,
+            params)
+
+
 async def register_daily_message(daily_id, daily_type, message_id):
     async with DBConnect(commit=True) as cursor:
         params = (message_id, daily_id, daily_type,)
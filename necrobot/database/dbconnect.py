@@ -9,10 +9,24 @@ class DBConnect(object):
     _lock = asyncio.Lock()
     _db_connection = None
 
+    # If count_queries is True, every statement executed is counted in num_queries, and the rows it returns or
+    # changes in num_rows_read and num_rows_written (for benchmarks)
+    count_queries = False
+    num_queries = 0
+    num_rows_read = 0
+    num_rows_written = 0
+
     def __init__(self, commit=False):
         self.cursor = None
         self.commit = commit
 
+    @staticmethod
+    def close() -> None:
+        """Close the connection; the next DBConnect reconnects (e.g., after Config.MYSQL_DB_NAME is changed)"""
+        if DBConnect._db_connection is not None:
+            DBConnect._db_connection.close()
+            DBConnect._db_connection = None
+
     async def __aenter__(self):
         await DBConnect._lock.acquire()
         try:
@@ -40,10 +54,12 @@ class DBConnect(object):
         if not DBConnect._db_connection.is_connected():
             raise RuntimeError('Couldn\'t connect to the MySQL database.')
 
+        cursor = DBConnect._db_connection.cursor()
         if Config.debugging():
-            self.cursor = LoggingCursor(DBConnect._db_connection.cursor())
-        else:
-            self.cursor = DBConnect._db_connection.cursor()
+            cursor = LoggingCursor(cursor)
+        if DBConnect.count_queries:
+            cursor = CountingCursor(cursor)
+        self.cursor = cursor
         return self.cursor
 
     def __exit__(self, exc_type, exc_val, exc_tb):
@@ -70,3 +86,46 @@ class LoggingCursor(object):
     def execute(self, operation, *args, **kwargs):
         console.debug('Execute SQL: <{0}> <args={1}> <kwargs={2}>'.format(operation, args, kwargs))
         return self.cursor.execute(operation, *args, **kwargs)
+
+
+class CountingCursor(LoggingCursor):
+    def __next__(self):
+        row = self.fetchone()
+        if row is None:
+            raise StopIteration
+        return row
+
+    def __iter__(self):
+        return self
+
+    def execute(self, operation, *args, **kwargs):
+        DBConnect.num_queries += 1
+        result = self.cursor.execute(operation, *args, **kwargs)
+        self._count_written()
+        return result
+
+    def executemany(self, operation, *args, **kwargs):
+        DBConnect.num_queries += 1
+        result = self.cursor.executemany(operation, *args, **kwargs)
+        self._count_written()
+        return result
+
+    def fetchone(self):
+        row = self.cursor.fetchone()
+        if row is not None:
+            DBConnect.num_rows_read += 1
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        rows = self.cursor.fetchmany(*args, **kwargs)
+        DBConnect.num_rows_read += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self.cursor.fetchall()
+        DBConnect.num_rows_read += len(rows)
+        return rows
+
+    def _count_written(self):
+        if not self.cursor.with_rows and self.cursor.rowcount > 0:
+            DBConnect.num_rows_written += self.cursor.rowcount
@@ -1,7 +1,8 @@
 """
-Interaction with matches and match_races tables (in the necrobot schema, or a condor event schema).
+Interaction with matches, match_races, and sheet_rows tables (in the necrobot schema, or a condor event schema).
 """
 import datetime
+from typing import Dict, List
 
 from necrobot.database import racedb
 from necrobot.database.dbconnect import DBConnect
@@ -240,6 +241,178 @@ async def get_channeled_matches_raw_data(
         return cursor.fetchall()
 
 
+async def get_sheet_matches_raw_data(sheet_id: int) -> list:
+    """Get the raw data for every match created from the worksheet with the given ID, with a single query"""
+    params = (sheet_id,)
+
+    async with DBConnect(commit=False) as cursor:
+        cursor.execute(
+            """
+            SELECT 
+                 match_id, 
+                 race_type_id, 
+                 racer_1_id, 
+                 racer_2_id, 
+                 suggested_time, 
+                 r1_confirmed, 
+                 r2_confirmed, 
+                 r1_unconfirmed, 
+                 r2_unconfirmed, 
+                 ranked, 
+                 is_best_of, 
+                 number_of_races, 
+                 cawmentator_id, 
+                 channel_id,
+                 sheet_id,
+                 sheet_row,
+                 finish_time
+            FROM {matches} 
+            WHERE sheet_id=%s AND sheet_row IS NOT NULL
+            ORDER BY match_id ASC
+            """.format(matches=tn('matches')),
+            params
+        )
+        return cursor.fetchall()
+
+
+async def register_matches_bulk(matches: list) -> None:
+    """Register all of the given (unregistered) matches with a single multi-row insert, and set their match IDs.
+
+    Every match must have been created from a worksheet (have a sheet_id and sheet_row); the new match IDs are
+    read back by sheet row.
+    """
+    if not matches:
+        return
+
+    race_type_ids = await _get_race_type_ids(matches)
+    async with DBConnect(commit=True) as cursor:
+        new_ids = _insert_matches(cursor, matches, race_type_ids)
+    _set_match_ids(matches, new_ids)
+
+
+async def get_sheet_row_hashes(sheet_id: int) -> Dict[int, str]:
+    """Get the content hash, by row, of each row of the worksheet as of its last sync"""
+    params = (sheet_id,)
+    async with DBConnect(commit=False) as cursor:
+        _create_sheet_rows_table(cursor)
+        cursor.execute(
+            """
+            SELECT sheet_row, row_hash 
+            FROM {sheet_rows} 
+            WHERE sheet_id=%s
+            """.format(sheet_rows=tn('sheet_rows')),
+            params
+        )
+        return {int(row[0]): row[1] for row in cursor.fetchall()}
+
+
+async def apply_sheet_sync(
+        sheet_id: int,
+        match_updates: List[tuple],
+        row_hashes: Dict[int, str],
+        detached_rows: List[int],
+        match_moves: List[tuple] = (),
+        new_matches: list = ()
+) -> None:
+    """Write the result of syncing a worksheet, including registering its new matches, in a single transaction.
+
+    Parameters
+    ----------
+    sheet_id: int
+        The worksheet's sheetID.
+    match_updates: list[tuple]
+        For each match to change: (race_type_id, racer_1_id, racer_2_id, suggested_time, ranked, is_best_of,
+        number_of_races, match_id).
+    row_hashes: dict[int, str]
+        The new content hash of each row to record.
+    detached_rows: list[int]
+        Rows that no longer have a match on the worksheet; their matches are unlinked from the row, and their
+        hashes forgotten.
+    match_moves: list[tuple]
+        For each match that moved to a new row: (sheet_row, match_id). These are linked after the detached rows
+        are unlinked, so a match can move to a row that was detached.
+    new_matches: list[Match]
+        The unregistered Matches made from the worksheet's new rows; they are inserted as by register_matches_bulk,
+        and their match IDs set once the transaction commits.
+    """
+    race_type_ids = await _get_race_type_ids(new_matches)
+    async with DBConnect(commit=True) as cursor:
+        _create_sheet_rows_table(cursor)
+        if match_updates:
+            cursor.executemany(
+                """
+                UPDATE {matches}
+                SET
+                   race_type_id=%s,
+                   racer_1_id=%s,
+                   racer_2_id=%s,
+                   suggested_time=%s,
+                   ranked=%s,
+                   is_best_of=%s,
+                   number_of_races=%s
+                WHERE match_id=%s
+                """.format(matches=tn('matches')),
+                match_updates
+            )
+
+            user_ids = set()
+            for update in match_updates:
+                user_ids.add(update[1])
+                user_ids.add(update[2])
+            cursor.execute(
+                """
+                INSERT IGNORE INTO {entrants} (user_id)
+                VALUES {values}
+                """.format(entrants=tn('entrants'), values=', '.join(['(%s)'] * len(user_ids))),
+                tuple(user_ids)
+            )
+
+        if detached_rows:
+            params = (sheet_id,) + tuple(detached_rows)
+            cursor.execute(
+                """
+                UPDATE {matches}
+                SET sheet_row=NULL
+                WHERE sheet_id=%s AND sheet_row IN ({rows})
+                """.format(matches=tn('matches'), rows=', '.join(['%s'] * len(detached_rows))),
+                params
+            )
+            cursor.execute(
+                """
+                DELETE FROM {sheet_rows} 
+                WHERE sheet_id=%s AND sheet_row IN ({rows})
+                """.format(sheet_rows=tn('sheet_rows'), rows=', '.join(['%s'] * len(detached_rows))),
+                params
+            )
+
+        if match_moves:
+            cursor.executemany(
+                """
+                UPDATE {matches}
+                SET sheet_row=%s
+                WHERE match_id=%s
+                """.format(matches=tn('matches')),
+                match_moves
+            )
+
+        # After unlinking detached rows, so a new match on a reused row doesn't lose its link
+        new_ids = _insert_matches(cursor, new_matches, race_type_ids) if new_matches else dict()
+
+        if row_hashes:
+            params = tuple()
+            for sheet_row, row_hash in sorted(row_hashes.items()):
+                params += (sheet_id, sheet_row, row_hash,)
+            cursor.execute(
+                """
+                INSERT INTO {sheet_rows} (sheet_id, sheet_row, row_hash)
+                VALUES {values}
+                ON DUPLICATE KEY UPDATE row_hash=VALUES(row_hash)
+                """.format(sheet_rows=tn('sheet_rows'), values=', '.join(['(%s, %s, %s)'] * len(row_hashes))),
+                params
+            )
+    _set_match_ids(new_matches, new_ids)
+
+
 async def delete_match(match_id: int):
     params = (match_id,)
     async with DBConnect(commit=True) as cursor:
@@ -270,20 +443,39 @@ async def get_match_race_data(match_id: int) -> MatchRaceData:
             """.format(match_races=tn('match_races')),
             params
         )
-        finished = 0
-        canceled = 0
-        r1_wins = 0
-        r2_wins = 0
+        match_race_data = MatchRaceData()
+        for row in cursor:
+            _add_to_match_race_data(match_race_data, canceled=row[0], winner=row[1])
+        return match_race_data
+
+
+async def get_match_race_data_bulk(match_ids: list) -> Dict[int, MatchRaceData]:
+    """Get the MatchRaceData for each of the given matches with a single query.
+
+    Returns
+    -------
+    dict[int, MatchRaceData]
+        A dict from match IDs to their MatchRaceData. Every given match ID is a key.
+    """
+    match_race_data = dict()
+    for match_id in match_ids:
+        match_race_data[int(match_id)] = MatchRaceData()
+    if not match_race_data:
+        return match_race_data
+
+    params = tuple(match_race_data.keys())
+    async with DBConnect(commit=False) as cursor:
+        cursor.execute(
+            """
+            SELECT match_id, canceled, winner 
+            FROM {match_races} 
+            WHERE match_id IN ({id_list})
+            """.format(match_races=tn('match_races'), id_list=', '.join(['%s'] * len(params))),
+            params
+        )
         for row in cursor:
-            if bool(row[0]):
-                canceled += 1
-            else:
-                finished += 1
-                if int(row[1]) == 1:
-                    r1_wins += 1
-                elif int(row[1]) == 2:
-                    r2_wins += 1
-        return MatchRaceData(finished=finished, canceled=canceled, r1_wins=r1_wins, r2_wins=r2_wins)
+            _add_to_match_race_data(match_race_data[int(row[0])], canceled=row[1], winner=row[2])
+        return match_race_data
 
 
 async def get_match_id(
@@ -545,3 +737,143 @@ async def _get_new_race_number(match: Match) -> int:
         )
         row = cursor.fetchone()
         return int(row[0]) + 1 if row is not None else 1
+
+
+_sheet_rows_tables = set()
+
+
+def _insert_matches(cursor, matches: list, race_type_ids: Dict[tuple, int]) -> Dict[tuple, int]:
+    """Insert the (unregistered) matches with a single multi-row insert, and return the new match ID for each
+    (sheet_id, sheet_row)
+    """
+    params = tuple()
+    for match in matches:
+        params += (
+            race_type_ids[_race_type_key(match.race_info)],
+            match.racer_1.user_id,
+            match.racer_2.user_id,
+            match.suggested_time,
+            match.confirmed_by_r1,
+            match.confirmed_by_r2,
+            match.r1_wishes_to_unconfirm,
+            match.r2_wishes_to_unconfirm,
+            match.ranked,
+            match.is_best_of,
+            match.number_of_races,
+            match.cawmentator_id,
+            match.sheet_id,
+            match.sheet_row,
+            match.finish_time,
+        )
+
+    user_ids = set()
+    for match in matches:
+        user_ids.add(match.racer_1.user_id)
+        user_ids.add(match.racer_2.user_id)
+
+    sheet_ids = set(match.sheet_id for match in matches)
+    sheet_rows = set(match.sheet_row for match in matches)
+
+    cursor.execute(
+        """
+        INSERT INTO {matches} 
+        (
+           race_type_id, 
+           racer_1_id, 
+           racer_2_id, 
+           suggested_time, 
+           r1_confirmed, 
+           r2_confirmed, 
+           r1_unconfirmed, 
+           r2_unconfirmed, 
+           ranked, 
+           is_best_of, 
+           number_of_races, 
+           cawmentator_id,
+           sheet_id,
+           sheet_row,
+           finish_time
+        )
+        VALUES {values}
+        """.format(
+            matches=tn('matches'),
+            values=', '.join(['(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)'] * len(matches))
+        ),
+        params
+    )
+
+    cursor.execute(
+        """
+        INSERT IGNORE INTO {entrants} (user_id)
+        VALUES {values}
+        """.format(entrants=tn('entrants'), values=', '.join(['(%s)'] * len(user_ids))),
+        tuple(user_ids)
+    )
+
+    cursor.execute(
+        """
+        SELECT match_id, sheet_id, sheet_row 
+        FROM {matches} 
+        WHERE sheet_id IN ({sheet_ids}) AND sheet_row IN ({sheet_rows})
+        ORDER BY match_id ASC
+        """.format(
+            matches=tn('matches'),
+            sheet_ids=', '.join(['%s'] * len(sheet_ids)),
+            sheet_rows=', '.join(['%s'] * len(sheet_rows))
+        ),
+        tuple(sheet_ids) + tuple(sheet_rows)
+    )
+    # Later rows (with larger IDs) overwrite earlier ones, so each sheet row gets its newest match
+    new_ids = dict()
+    for row in cursor.fetchall():
+        new_ids[(int(row[1]), int(row[2]))] = int(row[0])
+    return new_ids
+
+
+async def _get_race_type_ids(matches: list) -> Dict[tuple, int]:
+    """Look up the race type of each of the matches, once per distinct type"""
+    race_type_ids = dict()
+    for match in matches:
+        key = _race_type_key(match.race_info)
+        if key not in race_type_ids:
+            race_type_ids[key] = await racedb.get_race_type_id(race_info=match.race_info, register=True)
+    return race_type_ids
+
+
+def _race_type_key(race_info) -> tuple:
+    return (race_info.character_str, race_info.descriptor, race_info.seeded, race_info.amplified,
+            race_info.seed_fixed,)
+
+
+def _set_match_ids(matches: list, new_ids: Dict[tuple, int]) -> None:
+    for match in matches:
+        match.set_match_id(new_ids[(int(match.sheet_id), int(match.sheet_row))])
+
+
+def _create_sheet_rows_table(cursor) -> None:
+    """Create the sheet_rows table, if this is the first sync since it was added to the schema"""
+    table_name = tn('sheet_rows')
+    if table_name in _sheet_rows_tables:
+        return
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS {sheet_rows} (
+            `sheet_id` bigint NOT NULL,
+            `sheet_row` int NOT NULL,
+            `row_hash` char(32) NOT NULL,
+            PRIMARY KEY (`sheet_id`, `sheet_row`)
+        ) DEFAULT CHARSET=utf8
+        """.format(sheet_rows=table_name)
+    )
+    _sheet_rows_tables.add(table_name)
+
+
+def _add_to_match_race_data(match_race_data: MatchRaceData, canceled, winner) -> None:
+    if bool(canceled):
+        match_race_data.num_canceled += 1
+    else:
+        match_race_data.num_finished += 1
+        if int(winner) == 1:
+            match_race_data.r1_wins += 1
+        elif int(winner) == 2:
+            match_race_data.r2_wins += 1
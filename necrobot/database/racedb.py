@@ -1,6 +1,7 @@
 """
 Interaction with the races, race_types, and race_runs databases (necrobot or condor event schema).
 """
+from typing import Dict
 
 from necrobot.database.dbconnect import DBConnect
 from necrobot.database.dbutil import tn
@@ -112,17 +113,43 @@ async def get_race_info_from_type_id(race_type: int) -> RaceInfo or None:
 
         row = cursor.fetchone()
         if row is not None:
-            race_info = RaceInfo()
-            race_info.set_char(row[0])
-            race_info.descriptor = row[1]
-            race_info.seeded = bool(row[2])
-            race_info.amplified = bool(row[3])
-            race_info.seed_fixed = bool(row[4])
-            return race_info
+            return _race_info_from_row(row)
         else:
             return None
 
 
+async def get_race_infos_from_type_ids(race_types: list) -> Dict[int, RaceInfo]:
+    """Get the RaceInfo for each of the given race type IDs with a single query. Unknown types are omitted."""
+    params = tuple(set(int(race_type) for race_type in race_types))
+    if not params:
+        return dict()
+
+    async with DBConnect(commit=False) as cursor:
+        cursor.execute(
+            """
+            SELECT `type_id`, `character`, `descriptor`, `seeded`, `amplified`, `seed_fixed` 
+            FROM `race_types` 
+            WHERE `type_id` IN ({0})
+            """.format(', '.join(['%s'] * len(params))),
+            params
+        )
+
+        race_infos = dict()
+        for row in cursor.fetchall():
+            race_infos[int(row[0])] = _race_info_from_row(row[1:])
+        return race_infos
+
+
+def _race_info_from_row(row) -> RaceInfo:
+    race_info = RaceInfo()
+    race_info.set_char(row[0])
+    race_info.descriptor = row[1]
+    race_info.seeded = bool(row[2])
+    race_info.amplified = bool(row[3])
+    race_info.seed_fixed = bool(row[4])
+    return race_info
+
+
 # Stat functions-------------------------------------------------------------------
 async def get_allzones_race_numbers(user_id: int, amplified: bool) -> list:
     async with DBConnect(commit=False) as cursor:
@@ -6,7 +6,10 @@ Methods
 write_user
 get_users_with_any
 get_users_with_all
+get_users_with_ids
+get_users_with_any_names
 get_all_discord_ids_matching_prefs
+get_all_users_matching_prefs
 register_discord_user
 """
 import discord
@@ -140,6 +143,61 @@ async def get_users_with_all(
     )
 
 
+async def get_users_with_ids(user_ids: list) -> list:
+    """Get the raw data for every user whose user ID is in the given list, with a single query"""
+    params = tuple(set(int(user_id) for user_id in user_ids))
+    if not params:
+        return []
+
+    async with DBConnect(commit=False) as cursor:
+        cursor.execute(
+            """
+            SELECT 
+               discord_id, 
+               discord_name, 
+               twitch_name, 
+               rtmp_name, 
+               timezone, 
+               user_info, 
+               daily_alert, 
+               race_alert, 
+               user_id 
+            FROM users 
+            WHERE user_id IN ({0})
+            """.format(', '.join(['%s'] * len(params))),
+            params)
+        return cursor.fetchall()
+
+
+async def get_users_with_any_names(names: list) -> list:
+    """Get the raw data for every user with an rtmp, discord, or twitch name (case-insensitive) equal to any of the
+    given names, with a single query
+    """
+    params = tuple(set(name.lower() for name in names))
+    if not params:
+        return []
+
+    name_list = ', '.join(['%s'] * len(params))
+    async with DBConnect(commit=False) as cursor:
+        cursor.execute(
+            """
+            SELECT 
+               discord_id, 
+               discord_name, 
+               twitch_name, 
+               rtmp_name, 
+               timezone, 
+               user_info, 
+               daily_alert, 
+               race_alert, 
+               user_id 
+            FROM users 
+            WHERE LOWER(rtmp_name) IN ({0}) OR LOWER(discord_name) IN ({0}) OR LOWER(twitch_name) IN ({0})
+            """.format(name_list),
+            params * 3)
+        return cursor.fetchall()
+
+
 async def get_all_discord_ids_matching_prefs(user_prefs: UserPrefs) -> list:
     if user_prefs.is_empty:
         return []
@@ -164,6 +222,28 @@ async def get_all_discord_ids_matching_prefs(user_prefs: UserPrefs) -> list:
         return to_return
 
 
+async def get_all_users_matching_prefs(user_prefs: UserPrefs) -> list:
+    """As get_all_discord_ids_matching_prefs, but returns a list of (user_id, discord_id) pairs"""
+    if user_prefs.is_empty:
+        return []
+
+    where_query = ''
+    if user_prefs.daily_alert is not None:
+        where_query += ' AND daily_alert={0}'.format('TRUE' if user_prefs.daily_alert else 'FALSE')
+    if user_prefs.race_alert is not None:
+        where_query += ' AND race_alert={0}'.format('TRUE' if user_prefs.race_alert else 'FALSE')
+    where_query = where_query[5:]
+
+    async with DBConnect(commit=False) as cursor:
+        cursor.execute(
+            """
+            SELECT user_id, discord_id 
+            FROM users 
+            WHERE discord_id IS NOT NULL AND {0}
+            """.format(where_query))
+        return [(int(row[0]), int(row[1])) for row in cursor.fetchall()]
+
+
 async def register_discord_user(user: discord.User):
     params = (user.id, user.display_name,)
     async with DBConnect(commit=True) as cursor:
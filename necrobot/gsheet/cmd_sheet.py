@@ -1,9 +1,12 @@
-import googleapiclient.errors
 import necrobot.exception
 
-from necrobot.util import console
+from necrobot.util import console, lazyimport
+from necrobot.botbase import liveboard
+from necrobot.gsheet import makematches
 from necrobot.gsheet import sheetlib
+from necrobot.gsheet import sheetsync
 from necrobot.gsheet import sheetutil
+from necrobot.gsheet import sheetwritebuffer
 from necrobot.match import matchutil
 
 from necrobot.botbase.command import Command
@@ -14,6 +17,8 @@ from necrobot.gsheet.matchupsheet import MatchupSheet
 from necrobot.gsheet.standingssheet import StandingsSheet
 from necrobot.league.leaguemgr import LeagueMgr
 
+gapi_errors = lazyimport.lazy_module('googleapiclient.errors')
+
 
 class GetGSheet(CommandType):
     def __init__(self, bot_channel):
@@ -39,7 +44,7 @@ class GetGSheet(CommandType):
 
         try:
             perm_info = await sheetutil.has_read_write_permissions(LeagueMgr().league.gsheet_id)
-        except googleapiclient.errors.Error as e:
+        except gapi_errors.Error as e:
             await self.client.send_message(
                 cmd.channel,
                 'Error: {0}'.format(e)
@@ -68,7 +73,8 @@ class MakeFromSheet(CommandType):
         CommandType.__init__(self, bot_channel, 'makematches', 'makefromsheet', 'makeweek')
         self.help_text = '`{0} sheetname`: make races from the worksheet `sheetname`. (Note that the ' \
                          'bot must be pointed at the correct GSheet for this to work; this can be set via the bot\'s ' \
-                         'config file, or by calling `.setgsheet`.'.format(self.mention)
+                         'config file, or by calling `.setgsheet`.) If interrupted, calling this again on the same ' \
+                         'worksheet picks up where it left off, processing only rows that changed.'.format(self.mention)
         self.admin_only = True
 
     @property
@@ -84,11 +90,11 @@ class MakeFromSheet(CommandType):
             return
 
         wks_name = cmd.args[0]
-        await self.client.send_message(
+        progress_msg = await self.client.send_message(
             cmd.channel,
             'Creating matches from worksheet `{0}`...'.format(wks_name)
         )
-        await self.client.send_typing(cmd.channel)
+        progress_board = liveboard.message_board(cmd.channel, progress_msg.id, progress_msg)
 
         match_info = LeagueMgr().league.match_info
 
@@ -99,56 +105,71 @@ class MakeFromSheet(CommandType):
                     wks_name=wks_name,
                     sheet_type=sheetlib.SheetType.MATCHUP
                 )  # type: MatchupSheet
-            matches = await matchup_sheet.get_matches(register=False, match_info=match_info)
-        except (googleapiclient.errors.Error, necrobot.exception.NecroException) as e:
+            result = await makematches.make_matches_from_sheet(
+                matchup_sheet=matchup_sheet,
+                match_info=match_info,
+                progress_fn=progress_board.update
+            )
+        except (gapi_errors.Error, necrobot.exception.NecroException) as e:
+            await progress_board.update_now('Error while making matchups: `{0}`'.format(e))
+            return
+
+        report_str = 'Done creating matches from worksheet `{0}`: {1}.'.format(wks_name, result)
+        if result.not_found:
+            report_str += ' The following matches were not made: {0}'.format(', '.join(result.not_found))
+        if result.held:
+            report_str += ' The following rows changed, but their matches have already started, so were left ' \
+                          'alone: {0}'.format(', '.join(result.held))
+        if result.failed:
+            report_str += ' Failed to set up rooms for the following matches (call this again to retry those ' \
+                          'without rooms): {0}'.format(', '.join(result.failed))
+        await progress_board.update_now(report_str)
+
+
+class SyncSheet(CommandType):
+    def __init__(self, bot_channel):
+        CommandType.__init__(self, bot_channel, 'syncsheet')
+        self.help_text = '`{0} sheetname`: update the matches made from the worksheet `sheetname` with any ' \
+                         'changes to its racers, match types, and dates, without making match rooms. Matches ' \
+                         'that have already started are left alone.'.format(self.mention)
+        self.admin_only = True
+
+    @property
+    def short_help_text(self):
+        return 'Sync matches with a worksheet.'
+
+    async def _do_execute(self, cmd: Command):
+        if len(cmd.args) != 1:
             await self.client.send_message(
                 cmd.channel,
-                'Error while making matchups: `{0}`'.format(e)
+                'Wrong number of arguments for `{0}`.'.format(self.mention)
             )
             return
 
-        console.info('MakeFromSheet: Creating Match objects...')
-        not_found_matches = matchup_sheet.uncreated_matches()
-        matches_with_channels = await matchutil.get_matches_with_channels()
-        channeled_matchroom_names = dict()
-        for match in matches_with_channels:
-            if match.matchroom_name in channeled_matchroom_names:
-                channeled_matchroom_names[match.matchroom_name] += 1
-            else:
-                channeled_matchroom_names[match.matchroom_name] = 1
-
-        console.info('MakeFromSheet: Removing duplicate matches...')
-        # Remove matches that have the same name as current channels (but only one per channel)
-        unchanneled_matches = []
-        for match in matches:
-            channeled_name = match.matchroom_name in channeled_matchroom_names
-            if not channeled_name or channeled_matchroom_names[match.matchroom_name] <= 0:
-                unchanneled_matches.append(match)
-            if channeled_name:
-                channeled_matchroom_names[match.matchroom_name] -= 1
-
-        console.info('MakeFromSheet: Sorting matches...')
-        # Sort the remaining matches
-        unchanneled_matches = sorted(unchanneled_matches, key=lambda m: m.matchroom_name)
-
-        console.debug('MakeFromSheet: Matches to make: {0}'.format(unchanneled_matches))
-        console.info('MakeFromSheet: Creating match channels...')
-        for match in unchanneled_matches:
-            console.info('MakeFromSheet: Creating {0}...'.format(match.matchroom_name))
-            new_room = await matchutil.make_match_room(match=match, register=True)
-            await new_room.send_channel_start_text()
-
-        uncreated_str = ''
-        for match_str in not_found_matches:
-            uncreated_str += match_str + ', '
-        if uncreated_str:
-            uncreated_str = uncreated_str[:-2]
-
-        if uncreated_str:
-            report_str = 'Done creating matches. The following matches were not made: {0}'.format(uncreated_str)
-        else:
-            report_str = 'All matches created successfully.'
+        wks_name = cmd.args[0]
+        await self.client.send_typing(cmd.channel)
+        try:
+            matchup_sheet = await sheetlib.get_sheet(
+                    gsheet_id=LeagueMgr().league.gsheet_id,
+                    wks_name=wks_name,
+                    sheet_type=sheetlib.SheetType.MATCHUP
+                )  # type: MatchupSheet
+            result = await sheetsync.sync_matchup_sheet(
+                matchup_sheet=matchup_sheet,
+                match_info=LeagueMgr().league.match_info
+            )
+        except (gapi_errors.Error, necrobot.exception.NecroException) as e:
+            await self.client.send_message(
+                cmd.channel,
+                'Error while syncing worksheet: `{0}`'.format(e)
+            )
+            return
 
+        report_str = 'Synced worksheet `{0}`: {1}.'.format(wks_name, result)
+        if result.not_found:
+            report_str += ' Couldn\'t find racers for: {0}'.format(', '.join(result.not_found))
+        if result.held:
+            report_str += ' Left alone (already started): {0}'.format(', '.join(result.held))
         await self.client.send_message(cmd.channel, report_str)
 
 
@@ -187,13 +208,17 @@ class PushMatchToSheet(CommandType):
                     wks_name='Standings',
                     sheet_type=sheetlib.SheetType.STANDINGS
                 )  # type: StandingsSheet
-        except (googleapiclient.errors.Error, necrobot.exception.NecroException) as e:
+        except (gapi_errors.Error, necrobot.exception.NecroException) as e:
             await self.client.send_message(
                 cmd.channel,
                 'Error accessing GSheet: `{0}`'.format(e)
             )
             return
 
+        # Staff use this to fix up the sheet, so don't trust cached values
+        matchup_sheet.column_data.snapshot.invalidate()
+        standings_sheet.column_data.snapshot.invalidate()
+
         # TODO after combining MatchRaceData with match, simplify (code duping with MatchRoom)
         if match.is_scheduled:
             await matchup_sheet.schedule_match(match)
@@ -229,6 +254,13 @@ class PushMatchToSheet(CommandType):
                 r2_wins=match_race_data.r2_wins
             )
 
+        if not await sheetwritebuffer.flush(matchup_sheet.gsheet_id):
+            await self.client.send_message(
+                cmd.channel,
+                'Error writing to the GSheet; see the log for details.'
+            )
+            return
+
         await self.client.send_message(
             cmd.channel,
             'Sheet updated.'
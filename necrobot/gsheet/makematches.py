@@ -0,0 +1,282 @@
+"""
+Bulk creation of matches and match rooms from a matchup worksheet (the `.makematches` command).
+
+Matches are made in two stages, each of which does its work in bulk:
+    1. Sync the matches table with the worksheet (see sheetsync), which registers a match for each new row.
+    2. Create the channels for the worksheet's matches that don't have one, several at a time
+       (Config.MATCH_CREATE_CONCURRENCY), and post each room's start text. discord.py waits out rate limits itself;
+       creations and posts that fail with a transient error are retried with exponential backoff.
+
+Matches remember the worksheet row they were made from, so the process can be resumed: running it again on the
+same worksheet only processes the rows that changed, and only creates the channels still missing.
+"""
+
+import asyncio
+import discord
+import aiohttp
+import time
+import unittest
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from necrobot.botbase import bulksend, server
+from necrobot.database import matchdb, racedb
+from necrobot.gsheet import sheetsync
+from necrobot.match import matchutil
+from necrobot.user import userlib
+from necrobot.util import console
+
+from necrobot.botbase.necrobot import Necrobot
+from necrobot.config import Config
+from necrobot.gsheet.matchgsheetinfo import MatchGSheetInfo
+from necrobot.gsheet.matchupsheet import MatchupSheet
+from necrobot.gsheet.sheetsync import SheetSyncResult
+from necrobot.gsheet.spreadsheets import Spreadsheets
+from necrobot.match.match import Match
+from necrobot.match.matchinfo import MatchInfo
+from necrobot.util.backoff import ExponentialBackoff
+
+CREATE_RETRIES = 3
+
+
+class MakeMatchesResult(object):
+    def __init__(self, sync_result: SheetSyncResult):
+        self.sync_result = sync_result
+        self.num_rooms_made = 0         # type: int
+        self.num_skipped = 0            # type: int     # Matches that already had channels, or are finished
+        self.failed = []                # type: List[str]
+
+    @property
+    def not_found(self) -> List[str]:
+        return self.sync_result.not_found
+
+    @property
+    def held(self) -> List[str]:
+        return self.sync_result.held
+
+    def __str__(self):
+        return '{0}; {1} match rooms made, {2} matches skipped'.format(
+            self.sync_result, self.num_rooms_made, self.num_skipped)
+
+
+async def make_matches_from_sheet(
+        matchup_sheet: MatchupSheet,
+        match_info: MatchInfo,
+        progress_fn: Callable = None
+) -> MakeMatchesResult:
+    """Make a match, and a room for it, for each row of the worksheet.
+
+    Parameters
+    ----------
+    matchup_sheet: MatchupSheet
+        The worksheet to make matches from.
+    match_info: MatchInfo
+        The default type of match (rows may modify this with their "type" column).
+    progress_fn: [coro] (str) -> None
+        Called with a short description of progress after each stage, and after each room is made.
+
+    Returns
+    -------
+    MakeMatchesResult
+    """
+    begin = time.monotonic()
+
+    async def report(text):
+        if progress_fn is not None:
+            await progress_fn(text)
+
+    # Stage 1: Sync the matches with the sheet
+    await report('Reading worksheet `{0}`...'.format(matchup_sheet.wks_name))
+    result = MakeMatchesResult(await sheetsync.sync_matchup_sheet(matchup_sheet, match_info))
+    sync_time = time.monotonic()
+
+    # Find the matches that still need rooms
+    db_rows = dict()
+    for row in await matchdb.get_sheet_matches_raw_data(matchup_sheet.wks_id):
+        db_rows[int(row[15])] = row     # Rows are ordered by match ID, so the newest match for a row wins
+    await userlib.prefetch_users([int(row[2]) for row in db_rows.values()]
+                                 + [int(row[3]) for row in db_rows.values()])
+    race_infos = await racedb.get_race_infos_from_type_ids(
+        [int(row[1]) for row in db_rows.values() if row[1] is not None]
+    )
+
+    matches = []    # type: List[Match]
+    for row in db_rows.values():
+        match = await matchutil.make_match_from_raw_db_data(
+            row=row,
+            race_info=race_infos.get(int(row[1])) if row[1] is not None else None
+        )
+        if match.finish_time is not None or _has_channel(match):
+            result.num_skipped += 1
+        else:
+            matches.append(match)
+
+    to_make = await _remove_channeled_duplicates(matches, sheet_id=matchup_sheet.wks_id)
+    result.num_skipped += len(matches) - len(to_make)
+
+    # Stage 2: Make the rooms. Channel names are chosen up front, so that rooms made at once don't take the same name
+    to_make = sorted(to_make, key=lambda m: m.matchroom_name)
+    channel_names = dict()  # type: Dict[int, str]
+    for match in to_make:
+        channel_names[match.match_id] = matchutil.get_matchroom_name(match, reserved_names=channel_names.values())
+
+    semaphore = asyncio.Semaphore(max(Config.MATCH_CREATE_CONCURRENCY, 1))
+
+    async def make_room(the_match: Match) -> None:
+        async with semaphore:
+            _, new_room = await _with_retries(
+                lambda: matchutil.make_match_room(match=the_match, channel_name=channel_names[the_match.match_id]),
+                'make a room for match {0}'.format(the_match.matchroom_name)
+            )
+            if new_room is None:
+                result.failed.append(the_match.matchroom_name)
+                return
+            posted, _ = await _with_retries(
+                new_room.send_channel_start_text,
+                'post the start text for match {0}'.format(the_match.matchroom_name)
+            )
+            if not posted:
+                # The room exists, so running this again won't retry it; say so
+                result.failed.append('{0} (room made, but its start text wasn\'t posted)'.format(
+                    the_match.matchroom_name))
+                return
+        result.num_rooms_made += 1
+        await report('Creating match channels: {0}/{1}'.format(result.num_rooms_made, len(to_make)))
+
+    await report('Creating match channels: 0/{0}'.format(len(to_make)))
+    outcomes = await asyncio.gather(*[make_room(match) for match in to_make], return_exceptions=True)
+    for match, outcome in zip(to_make, outcomes):
+        if isinstance(outcome, Exception):
+            console.warning('Error making a room for match {0}: {1}'.format(match.matchroom_name, outcome))
+            result.failed.append(match.matchroom_name)
+    end = time.monotonic()
+
+    console.info(
+        'MakeFromSheet: {result}. Synced sheet in {0:.2f}s, made {1} rooms in {2:.2f}s.'.format(
+            sync_time - begin, result.num_rooms_made, end - sync_time, result=result
+        )
+    )
+    return result
+
+
+def _has_channel(match: Match) -> bool:
+    return match.channel_id is not None and server.find_channel(channel_id=match.channel_id) is not None
+
+
+async def _remove_channeled_duplicates(matches: List[Match], sheet_id: int) -> List[Match]:
+    """Remove matches that have the same name as a current match channel (not made from this sheet), but only one
+    per channel
+    """
+    channeled_matchroom_names = dict()
+    for match in await matchutil.get_matches_with_channels():
+        if match.sheet_id is not None and match.sheet_id == sheet_id:
+            continue
+        channeled_matchroom_names[match.matchroom_name] = channeled_matchroom_names.get(match.matchroom_name, 0) + 1
+
+    unchanneled_matches = []
+    for match in matches:
+        if channeled_matchroom_names.get(match.matchroom_name, 0) > 0:
+            channeled_matchroom_names[match.matchroom_name] -= 1
+        else:
+            unchanneled_matches.append(match)
+    return unchanneled_matches
+
+
+async def _with_retries(call: Callable[[], Awaitable], description: str) -> Tuple[bool, Optional[object]]:
+    """Await call(), retrying transient Discord errors with backoff. Return whether it succeeded, and its result."""
+    backoff = ExponentialBackoff(base=1)
+    for attempt in range(CREATE_RETRIES + 1):
+        try:
+            return True, await call()
+        except (discord.HTTPException, aiohttp.ClientError) as e:
+            if isinstance(e, discord.Forbidden) or not bulksend.is_transient(e) or attempt == CREATE_RETRIES:
+                console.warning('Failed to {0}: {1}'.format(description, e))
+                return False, None
+            await asyncio.sleep(backoff.delay())
+    return False, None
+
+
+class TestMakeMatches(unittest.TestCase):
+    """Runs against a scratch database (see dbbench.ScratchHistory), the sheet emulator, and a simulated server"""
+    def setUp(self):
+        from necrobot.test.discordsim import SimClient
+        from necrobot.test.sheetemulator import SheetEmulator
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+        self.client = SimClient()
+        self.sim_server = self.client.add_server('makematches')
+        self.sim_server.add_channel(Config.MAIN_CHANNEL_NAME, default=True)
+        self._saved_server = server.client, server.server, server.main_channel, server.registry
+        server.init(self.client, self.sim_server)
+        Necrobot().clean_init()
+
+        self.emulator = SheetEmulator()
+        Spreadsheets.set_service(self.emulator)
+        self._saved_concurrency = Config.MATCH_CREATE_CONCURRENCY
+        Config.MATCH_CREATE_CONCURRENCY = 1
+
+    def tearDown(self):
+        Config.MATCH_CREATE_CONCURRENCY = self._saved_concurrency
+        Spreadsheets.reset_service()
+        Necrobot().clean_init()
+        server.client, server.server, server.main_channel, server.registry = self._saved_server
+        self.loop.close()
+
+    @staticmethod
+    async def _new_match(racer_1_id: int, racer_2_id: int, sheet_id: int, row: int) -> Match:
+        return await matchutil.make_match(
+            racer_1_id=racer_1_id,
+            racer_2_id=racer_2_id,
+            gsheet_info=MatchGSheetInfo(wks_id=sheet_id, row=row),
+            register=False
+        )
+
+    def test_register_matches_bulk(self):
+        from necrobot.test import dbbench
+
+        async def run():
+            async with dbbench.ScratchHistory():
+                sheet_id = dbbench.SHEET_ID + 1
+                first = await self._new_match(1, 2, sheet_id, row=0)
+                other = await self._new_match(3, 4, sheet_id, row=1)
+                await matchdb.register_matches_bulk([first, other])
+
+                # A later match for the same row (as when the row is edited) takes the newer ID
+                replacement = await self._new_match(5, 6, sheet_id, row=0)
+                await matchdb.register_matches_bulk([replacement])
+                return first, other, replacement, await matchdb.get_sheet_matches_raw_data(sheet_id)
+
+        first, other, replacement, db_rows = self.loop.run_until_complete(run())
+        self.assertEqual(len({first.match_id, other.match_id, replacement.match_id}), 3)
+        self.assertGreater(replacement.match_id, first.match_id)
+        self.assertEqual(
+            [int(row[0]) for row in db_rows], sorted([first.match_id, other.match_id, replacement.match_id]))
+
+    def test_make_matches_from_sheet(self):
+        from necrobot.gsheet import sheetlib
+        from necrobot.test import dbbench
+
+        self.emulator.add_worksheet('makematches', 'Week 1', values=[
+            ['Match ID', 'Tier', 'Racer 1', 'Racer 2', 'Date', 'Type', 'Cawmentary', 'Winner', 'Score', 'Vod'],
+            ['', '1', 'benchuser1', 'benchuser2'],
+            ['', '1', 'benchuser3', 'benchuser4'],
+            ['', '1', 'benchuser5', 'benchuser6'],
+        ])
+
+        async def run():
+            async with dbbench.ScratchHistory():
+                matchup_sheet = await sheetlib.get_sheet(
+                    gsheet_id='makematches', wks_name='Week 1', sheet_type=sheetlib.SheetType.MATCHUP)
+
+                # The first room's channel needs a retry; its start text then fails outright
+                self.client.fail_next('create_channel', 503)
+                self.client.fail_next('send_message', 403)
+                return await make_matches_from_sheet(matchup_sheet, MatchInfo())
+
+        with self.assertLogs('necrobot', level='WARNING'):
+            result = self.loop.run_until_complete(run())
+        self.assertEqual(self.client.calls['create_channel'], 4)
+        self.assertEqual(len(self.sim_server.channels), 4)
+        self.assertEqual(result.num_rooms_made, 2)
+        self.assertEqual(len(result.failed), 1)
+        self.assertIn('start text', result.failed[0])
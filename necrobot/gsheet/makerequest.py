@@ -1,23 +1,126 @@
+"""
+Executing Google Sheets API requests without blocking the event loop.
+
+The Google API client is synchronous, so each request is run in a small thread pool. Requests to the same
+spreadsheet are limited to a few at a time (rather than one request at a time across all spreadsheets), and
+requests that fail with a rate-limit or server error are retried with exponential backoff. The concurrency slot is
+released while backing off, so a throttled request doesn't hold up others to the same spreadsheet.
+
+Since requests no longer wait on one global lock, code that reads a spreadsheet and then writes to it based on what
+it read (e.g. finding a match's row, then writing to that row) should hold sheet_lock() for the spreadsheet
+throughout, so that another such sequence can't re-read the sheet between its read and its write.
+"""
+
 import asyncio
-import googleapiclient.errors
+import concurrent.futures
+import re
+import threading
+import unittest
+from typing import Dict, Optional
+
 import necrobot.exception
+from necrobot.util import lazyimport
 
+from necrobot.config import Config
+from necrobot.gsheet.spreadsheets import Spreadsheets
 from necrobot.util.backoff import ExponentialBackoff
 
+gapi_errors = lazyimport.lazy_module('googleapiclient.errors')
+
+BACKOFF_ERRORS = [429, 500, 502, 503]
+
+_executor = None                # type: concurrent.futures.ThreadPoolExecutor
+_semaphores = dict()            # type: Dict[str, asyncio.Semaphore]
+_sheet_locks = dict()           # type: Dict[str, asyncio.Lock]
+_thread_local = threading.local()
+_spreadsheet_id_regex = re.compile(r'/spreadsheets/([^/?:]+)')
+
 
 async def make_request(request):
-    backoff = ExponentialBackoff(base=1, timeout=15)
+    """Execute the request, and return its response.
+
+    Parameters
+    ----------
+    request: googleapiclient.http.HttpRequest
+        The request to execute (e.g. `spreadsheets.values().get(...)`).
+
+    Raises
+    ------
+    googleapiclient.errors.HttpError
+        If the request fails, or if it was still being throttled after backing off for GSHEET_BACKOFF_TIMEOUT
+        seconds.
+    """
+    loop = asyncio.get_event_loop()
+    semaphore = _semaphore_for(_spreadsheet_id(request))
+    backoff = ExponentialBackoff(base=1, timeout=Config.GSHEET_BACKOFF_TIMEOUT)
 
     while True:
         try:
-            return request.execute()
-        except googleapiclient.errors.HttpError as e:
-            backoff_errors = [429, 502]
-            error_type = e.resp.status
-            if error_type in backoff_errors:
+            async with semaphore:
+                return await loop.run_in_executor(_get_executor(), _execute, request)
+        except gapi_errors.HttpError as e:
+            if e.resp.status in BACKOFF_ERRORS:
                 try:
                     await asyncio.sleep(backoff.delay())
                 except necrobot.exception.TimeoutException:
                     raise e
             else:
                 raise
+
+
+def sheet_lock(gsheet_id: str) -> asyncio.Lock:
+    """The lock for read-then-write sequences on the given spreadsheet. (Requests themselves don't take it, so
+    reads and writes made while holding it don't deadlock.)"""
+    if gsheet_id not in _sheet_locks:
+        _sheet_locks[gsheet_id] = asyncio.Lock()
+    return _sheet_locks[gsheet_id]
+
+
+def _execute(request):
+    # httplib2.Http objects aren't thread-safe, so each worker thread authorizes its own
+    http = getattr(_thread_local, 'http', None)
+    if Spreadsheets.emulated:
+        http = None
+    elif http is None:
+        http = Spreadsheets.authorized_http()
+        _thread_local.http = http
+    return request.execute(http=http)
+
+
+def _get_executor() -> concurrent.futures.ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = concurrent.futures.ThreadPoolExecutor(max_workers=Config.GSHEET_MAX_WORKERS)
+    return _executor
+
+
+def _semaphore_for(gsheet_id: Optional[str]) -> asyncio.Semaphore:
+    if gsheet_id not in _semaphores:
+        _semaphores[gsheet_id] = asyncio.Semaphore(Config.GSHEET_CONCURRENCY_PER_SHEET)
+    return _semaphores[gsheet_id]
+
+
+def _spreadsheet_id(request) -> Optional[str]:
+    match = _spreadsheet_id_regex.search(getattr(request, 'uri', ''))
+    return match.group(1) if match else None
+
+
+class TestMakeRequest(unittest.TestCase):
+    def test_spreadsheet_id(self):
+        class Request(object):
+            def __init__(self, uri):
+                self.uri = uri
+
+        self.assertEqual(
+            _spreadsheet_id(Request('https://sheets.googleapis.com/v4/spreadsheets/abc-123/values/A1%3AB2?alt=json')),
+            'abc-123'
+        )
+        self.assertEqual(
+            _spreadsheet_id(Request('https://sheets.googleapis.com/v4/spreadsheets/abc-123:batchUpdate?alt=json')),
+            'abc-123'
+        )
+        self.assertIsNone(_spreadsheet_id(Request('https://sheets.googleapis.com/v4/spreadsheets')))
+
+    def test_sheet_lock(self):
+        self.assertIs(sheet_lock('abc-123'), sheet_lock('abc-123'))
+        self.assertIsNot(sheet_lock('abc-123'), sheet_lock('def-456'))
@@ -3,20 +3,27 @@ import datetime
 import pytz
 import shlex
 import string
+import typing
 import unittest
 
 import necrobot.exception
+from necrobot.gsheet import makerequest
 from necrobot.match import matchinfo
 from necrobot.match import matchutil
 from necrobot.user import userlib
 from necrobot.util import console
 
 from necrobot.gsheet.matchgsheetinfo import MatchGSheetInfo
-from necrobot.gsheet.spreadsheets import Spreadsheets
 from necrobot.match.match import Match
 from necrobot.match.matchinfo import MatchInfo
 from necrobot.gsheet.worksheetindexdata import WorksheetIndexData
 
+SHEET_TIMEZONE = pytz.timezone('US/Eastern')
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Row index, racer 1 name, racer 2 name, "type" cell, "date" cell
+MatchRow = typing.Tuple[int, str, str, typing.Optional[str], typing.Optional[str]]
+
 
 class MatchupSheetIndexData(WorksheetIndexData):
     def __init__(self, gsheet_id: str):
@@ -71,8 +78,63 @@ class MatchupSheet(object):
         """
         return self._not_found_matches
 
-    async def initialize(self, wks_name: str = None, wks_id: str = None):
-        await self.column_data.initialize(wks_name=wks_name, wks_id=wks_id)
+    async def initialize(self, wks_name: str = None, wks_id: str = None, sheet_properties: typing.List[dict] = None):
+        await self.column_data.initialize(wks_name=wks_name, wks_id=wks_id, sheet_properties=sheet_properties)
+
+    async def get_match_rows(self) -> typing.List[MatchRow]:
+        """Read the racer names, match types, and dates from the GSheet.
+        
+        Returns
+        -------
+        list[tuple[int, str, str, Optional[str], Optional[str]]]
+            For each row with two racer names: the row index, the two names, and the contents of the "type" and
+            "date" columns (or None if there is no such column).
+        """
+        await self.column_data.refresh_footer()
+        values = await self.column_data.snapshot.get_values()
+        console.debug('get_match_rows: Values: {0}'.format(values))
+
+        match_rows = []
+        for row_idx, row_values in enumerate(values):
+            try:
+                racer_1_name = row_values[self.column_data.racer_1].rstrip(' ')
+                racer_2_name = row_values[self.column_data.racer_2].rstrip(' ')
+            except IndexError:
+                console.warning('Failed to make match from sheet row: <{}>'.format(row_values))
+                continue
+
+            if not racer_1_name or not racer_2_name:
+                continue
+
+            type_str = None
+            if self.column_data.type is not None and self.column_data.type < len(row_values):
+                type_str = row_values[self.column_data.type]
+
+            date_str = None
+            if self.column_data.date is not None and self.column_data.date < len(row_values):
+                date_str = row_values[self.column_data.date]
+
+            match_rows.append((row_idx, racer_1_name, racer_2_name, type_str, date_str,))
+        return match_rows
+
+    def get_match_info(self, type_str: typing.Optional[str], match_info: MatchInfo) -> MatchInfo:
+        """The MatchInfo for a row, given the contents of its "type" column and the default MatchInfo"""
+        if type_str is None:
+            return match_info
+        return matchinfo.parse_args_modify(shlex.split(type_str), match_info)
+
+    @staticmethod
+    def parse_date(date_str: typing.Optional[str]) -> typing.Optional[datetime.datetime]:
+        """The UTC time written in a "date" cell (as written by schedule_match), or None if it can't be read"""
+        if not date_str:
+            return None
+        for date_format in [DATE_FORMAT, '%Y-%m-%d %H:%M']:
+            try:
+                local_time = datetime.datetime.strptime(date_str.strip(), date_format)
+            except ValueError:
+                continue
+            return SHEET_TIMEZONE.localize(local_time).astimezone(pytz.utc)
+        return None
 
     async def get_matches(self, **kwargs):
         """Read racer names and match types from the GSheet; create corresponding matches.
@@ -88,38 +150,14 @@ class MatchupSheet(object):
             The list of created Matches.
         """
         console.debug('get_matches begin...')
-        await self.column_data.refresh_footer()
-
         matches = []
         self._not_found_matches = []
         write_match_ids = self.column_data.match_id is not None and 'register' in kwargs and kwargs['register']
         match_ids = []
 
-        async with Spreadsheets() as spreadsheets:
-            value_range = await self.column_data.get_values(spreadsheets)
-            console.debug('get_matches: Got values from spreadsheets.')
-
-            if 'values' not in value_range:
-                console.debug('get_matches: Values is empty.')
-                return matches
-            else:
-                console.debug('get_matches: Values: {0}'.format(value_range['values']))
-
-            for row_idx, row_values in enumerate(value_range['values']):
-                try:
-                    racer_1_name = row_values[self.column_data.racer_1].rstrip(' ')
-                    racer_2_name = row_values[self.column_data.racer_2].rstrip(' ')
-                except IndexError:
-                    console.warning('Failed to make match from sheet row: <{}>'.format(row_values))
-                    continue
-
-                if not racer_1_name or not racer_2_name:
-                    continue
-
-                # if racer_1_name[0] not in string.ascii_letters or racer_2_name[0] not in string.ascii_letters:
-                #     self._not_found_matches.append('{0}-{1}'.format(racer_1_name, racer_2_name))
-                #     continue
-
+        # Hold the lock from reading the rows until the match IDs are written to them
+        async with makerequest.sheet_lock(self.gsheet_id):
+            for row_idx, racer_1_name, racer_2_name, type_str, _ in await self.get_match_rows():
                 console.debug('get_matches: Creating {0}-{1}'.format(racer_1_name, racer_2_name))
 
                 racer_1 = await userlib.get_user(any_name=racer_1_name, register=True)
@@ -136,13 +174,9 @@ class MatchupSheet(object):
                 sheet_info.row = row_idx
 
                 kwarg_copy = kwargs.copy()
-                if self.column_data.type is not None:
+                if type_str is not None:
                     match_info = kwarg_copy['match_info'] if 'match_info' in kwargs else matchinfo.MatchInfo()
-                    try:
-                        parsed_args = shlex.split(row_values[self.column_data.type])
-                        kwarg_copy['match_info'] = matchinfo.parse_args_modify(parsed_args, match_info)
-                    except IndexError:
-                        pass
+                    kwarg_copy['match_info'] = self.get_match_info(type_str, match_info)
 
                 new_match = await matchutil.make_match(
                     racer_1_id=racer_1.user_id,
@@ -158,38 +192,43 @@ class MatchupSheet(object):
                 if write_match_ids:
                     match_ids.append([new_match.match_id])
 
-        if write_match_ids:
-            ids_range = self.column_data.get_range_for_column(self.column_data.match_id)
-            await self.column_data.update_cells(sheet_range=ids_range, values=match_ids, raw_input=True)
+            if write_match_ids:
+                ids_range = self.column_data.get_range_for_column(self.column_data.match_id)
+                await self.column_data.update_cells(sheet_range=ids_range, values=match_ids, raw_input=True)
 
         console.debug('get_matches: Returning Matches=<{}>'.format(matches))
         return matches
 
-    async def schedule_match(self, match: Match):
+    async def schedule_match(self, match: Match) -> asyncio.Future:
         """Write scheduling data for the match into the GSheet.
         
         Parameters
         ----------
         match: Match
 
+        Returns
+        -------
+        asyncio.Future
+            Resolves to True once the write is sent, or to False if it failed (or the match isn't on the sheet).
         """
-        row = await self._get_match_row(match)
-        if row is None:
-            return
-
-        if match.suggested_time is None:
-            value = ''
-        else:
-            value = match.suggested_time.astimezone(pytz.timezone('US/Eastern')).strftime('%Y-%m-%d %H:%M:%S')
-
-        await self.column_data.update_cell(
-            row=row,
-            col=self.column_data.date,
-            value=value,
-            raw_input=False
-        )
+        async with makerequest.sheet_lock(self.gsheet_id):
+            row = await self._get_match_row(match)
+            if row is None:
+                return _not_written()
+
+            if match.suggested_time is None:
+                value = ''
+            else:
+                value = match.suggested_time.astimezone(SHEET_TIMEZONE).strftime(DATE_FORMAT)
+
+            return await self.column_data.update_cell(
+                row=row,
+                col=self.column_data.date,
+                value=value,
+                raw_input=False
+            )
 
-    async def set_vod(self, match: Match, vod_link: str):
+    async def set_vod(self, match: Match, vod_link: str) -> asyncio.Future:
         """Add a vod link to the GSheet.
         
         Parameters
@@ -198,44 +237,56 @@ class MatchupSheet(object):
             The match to add a link for.
         vod_link: str
             The full URL of the VOD.
+
+        Returns
+        -------
+        asyncio.Future
+            Resolves to True once the write is sent, or to False if it failed (or there's nowhere to write it).
         """
-        row = await self._get_match_row(match)
-        if row is None:
-            return
-        if self.column_data.vod is None:
-            console.warning('No Vod column on GSheet.')
-            return
-
-        await self.column_data.update_cell(
-            row=row,
-            col=self.column_data.vod,
-            value=vod_link,
-            raw_input=False
-        )
+        async with makerequest.sheet_lock(self.gsheet_id):
+            row = await self._get_match_row(match)
+            if row is None:
+                return _not_written()
+            if self.column_data.vod is None:
+                console.warning('No Vod column on GSheet.')
+                return _not_written()
+
+            return await self.column_data.update_cell(
+                row=row,
+                col=self.column_data.vod,
+                value=vod_link,
+                raw_input=False
+            )
 
-    async def set_cawmentary(self, match: Match):
+    async def set_cawmentary(self, match: Match) -> asyncio.Future:
         """Add a cawmentator to the GSheet.
         
         Parameters
         ----------
         match: Match
             The match to add cawmentary for.
+
+        Returns
+        -------
+        asyncio.Future
+            Resolves to True once the write is sent, or to False if it failed (or there's nowhere to write it).
         """
-        row = await self._get_match_row(match)
-        if row is None:
-            return
-        if self.column_data.cawmentary is None:
-            console.warning('No Cawmentary column on GSheet.')
-            return
-
-        cawmentator = await userlib.get_user(user_id=match.cawmentator_id)
-
-        await self.column_data.update_cell(
-            row=row,
-            col=self.column_data.cawmentary,
-            value='twitch.tv/{0}'.format(cawmentator.twitch_name) if cawmentator is not None else '',
-            raw_input=False
-        )
+        async with makerequest.sheet_lock(self.gsheet_id):
+            row = await self._get_match_row(match)
+            if row is None:
+                return _not_written()
+            if self.column_data.cawmentary is None:
+                console.warning('No Cawmentary column on GSheet.')
+                return _not_written()
+
+            cawmentator = await userlib.get_user(user_id=match.cawmentator_id)
+
+            return await self.column_data.update_cell(
+                row=row,
+                col=self.column_data.cawmentary,
+                value='twitch.tv/{0}'.format(cawmentator.twitch_name) if cawmentator is not None else '',
+                raw_input=False
+            )
 
     async def record_score(self, match: Match, winner: str, winner_wins: int, loser_wins: int):
         """Record the winner and final score of the match.
@@ -247,28 +298,30 @@ class MatchupSheet(object):
         winner_wins: int
         loser_wins: int
         """
-        row = await self._get_match_row(match)
-        if row is None:
-            return
-        if self.column_data.winner is None:
-            console.warning('No "Winner" column on GSheet.')
-            return
-        if self.column_data.score is None:
-            console.warning('No "Score" column on GSheet.')
-            return
-        if self.column_data.score != self.column_data.winner + 1:
-            console.warning("Can't record score; algorithm assumes the score column is one right of the winner column.")
-            return
-
-        sheet_range = self.column_data.get_range(
-            top=row, bottom=row, left=self.column_data.winner, right=self.column_data.score
-        )
+        async with makerequest.sheet_lock(self.gsheet_id):
+            row = await self._get_match_row(match)
+            if row is None:
+                return
+            if self.column_data.winner is None:
+                console.warning('No "Winner" column on GSheet.')
+                return
+            if self.column_data.score is None:
+                console.warning('No "Score" column on GSheet.')
+                return
+            if self.column_data.score != self.column_data.winner + 1:
+                console.warning(
+                    "Can't record score; algorithm assumes the score column is one right of the winner column.")
+                return
+
+            sheet_range = self.column_data.get_range(
+                top=row, bottom=row, left=self.column_data.winner, right=self.column_data.score
+            )
 
-        await self.column_data.update_cells(
-            sheet_range=sheet_range,
-            values=[[winner, '{0}-{1}'.format(winner_wins, loser_wins)]],
-            raw_input=True
-        )
+            await self.column_data.update_cells(
+                sheet_range=sheet_range,
+                values=[[winner, '{0}-{1}'.format(winner_wins, loser_wins)]],
+                raw_input=True
+            )
 
     async def _get_match_row(self, match: Match) -> int or None:
         """Get the index of the row containing the Match.
@@ -300,26 +353,42 @@ class MatchupSheet(object):
         if match.sheet_id is not None and match.sheet_row is not None:
             return match.sheet_row
 
-        async with Spreadsheets() as spreadsheets:
-            value_range = await self.column_data.get_values(spreadsheets)
-            if 'values' not in value_range:
-                return None
-
-            match_regex_1 = match.racer_1.name_regex
-            match_regex_2 = match.racer_2.name_regex
-
-            values = value_range['values']
-            for row, row_values in enumerate(values):
-                gsheet_name_1 = row_values[self.column_data.racer_1]
-                gsheet_name_2 = row_values[self.column_data.racer_2]
-                if (match_regex_1.match(gsheet_name_1) and match_regex_2.match(gsheet_name_2)) \
-                        or (match_regex_1.match(gsheet_name_2) and match_regex_2.match(gsheet_name_1)):
-                    return row
-            console.warning('Couldn\'t find match {0}-{1} on the GSheet.'.format(
-                match.racer_1.rtmp_name,
-                match.racer_2.rtmp_name
-            ))
-            return None
+        # If the match isn't in a cached snapshot, the sheet may have changed since, so re-read it and look again
+        snapshot = self.column_data.snapshot
+        num_reads = snapshot.num_reads
+        row = await self._find_match_row_in_snapshot(match)
+        if row is None and snapshot.num_reads == num_reads:
+            snapshot.invalidate()
+            row = await self._find_match_row_in_snapshot(match)
+        if row is not None:
+            return row
+
+        console.warning('Couldn\'t find match {0}-{1} on the GSheet.'.format(
+            match.racer_1.rtmp_name,
+            match.racer_2.rtmp_name
+        ))
+        return None
+
+    async def _find_match_row_in_snapshot(self, match: Match) -> int or None:
+        snapshot = self.column_data.snapshot
+        if self.column_data.match_id is not None and match.match_id is not None:
+            rows = await snapshot.find_rows(self.column_data.match_id, [str(match.match_id)])
+            if rows:
+                return rows[0]
+
+        r1_as_1 = set(await snapshot.find_rows(self.column_data.racer_1, match.racer_1.names))
+        r2_as_2 = set(await snapshot.find_rows(self.column_data.racer_2, match.racer_2.names))
+        r1_as_2 = set(await snapshot.find_rows(self.column_data.racer_2, match.racer_1.names))
+        r2_as_1 = set(await snapshot.find_rows(self.column_data.racer_1, match.racer_2.names))
+        rows = (r1_as_1 & r2_as_2) | (r1_as_2 & r2_as_1)
+        return min(rows) if rows else None
+
+
+def _not_written() -> asyncio.Future:
+    """The outcome of a write that was never made"""
+    written = asyncio.Future()
+    written.set_result(False)
+    return written
 
 
 class TestMatchupSheet(unittest.TestCase):
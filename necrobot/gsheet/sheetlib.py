@@ -1,13 +1,15 @@
-from typing import Optional, Union
+from typing import List, Optional, Union
 from enum import Enum
 
 import necrobot.exception
+from necrobot.gsheet import sheetutil
 from necrobot.gsheet.matchupsheet import MatchupSheet
 from necrobot.gsheet.standingssheet import StandingsSheet
 
 
 _matchup_sheet_lib = {}
 _sheets_by_id_lib = {}
+_sheet_properties_lib = {}
 
 
 class SheetType(Enum):
@@ -58,7 +60,18 @@ async def get_sheet(
     else:
         raise necrobot.exception.BadInputException('get_sheet: Not a recognized sheet type.')
 
-    await sheet.initialize(wks_name=wks_name, wks_id=wks_id)
+    was_cached = gsheet_id in _sheet_properties_lib
+    try:
+        await sheet.initialize(
+            wks_name=wks_name, wks_id=wks_id, sheet_properties=await get_sheet_properties(gsheet_id)
+        )
+    except necrobot.exception.NotFoundException:
+        if not was_cached:
+            raise
+        # The worksheet may have been added since we cached the GSheet's properties
+        await sheet.initialize(
+            wks_name=wks_name, wks_id=wks_id, sheet_properties=await get_sheet_properties(gsheet_id, refresh=True)
+        )
 
     # Check for name changes
     if (gsheet_id, sheet.wks_id,) in _sheets_by_id_lib:
@@ -78,3 +91,24 @@ async def get_sheet(
     _matchup_sheet_lib[(gsheet_id, wks_name)] = sheet
     _sheets_by_id_lib[(gsheet_id, sheet.wks_id)] = sheet
     return sheet
+
+
+async def get_sheet_properties(gsheet_id: str, refresh: bool = False) -> List[dict]:
+    """Get the properties of every worksheet on the GSheet, reading them only if they aren't already cached
+    
+    Parameters
+    ----------
+    gsheet_id: str
+        The ID of the GSheet
+    refresh: bool
+        If True, re-read the properties even if they're cached.
+
+    Returns
+    -------
+    list[dict]
+        The 'properties' of each worksheet.
+    """
+    if refresh or gsheet_id not in _sheet_properties_lib:
+        _sheet_properties_lib[gsheet_id] = await sheetutil.get_sheet_properties(gsheet_id)
+    return _sheet_properties_lib[gsheet_id]
+
@@ -0,0 +1,329 @@
+"""
+Incremental sync from a matchup worksheet to the matches table.
+
+Each sync records a hash of every row's contents (racer names, type, and date) in the sheet_rows table. The
+next sync reads the worksheet once, and compares hashes to find the rows that were added, changed, or removed
+since; only those rows are processed. All of the changes, including a single insert registering the new matches,
+are written in a single transaction. A sync that finds nothing changed makes no writes at all.
+
+Matches that have started (they have a channel, or are finished) are owned by their match rooms, and are never
+changed by a sync. A changed row for a started match is accepted if its racers and match type still agree with
+the match (so the change was to the date, which the bot writes itself when the match is scheduled); otherwise
+the row is held, and reported again on each sync until it is fixed by hand. Rows of started matches that are
+removed from the worksheet are likewise held (unless another match has moved into the row).
+
+Rows are hashed by position, so a row that moves (e.g., when a row above it is deleted) is matched up with its old
+position by its hash: its match is moved to the new row, rather than every later row being treated as changed.
+"""
+
+import datetime
+import hashlib
+import pytz
+import unittest
+from typing import Dict, List, Optional, Tuple
+
+from necrobot.database import matchdb, racedb
+from necrobot.gsheet import worksheetsnapshot
+from necrobot.match import matchutil
+from necrobot.user import userlib
+from necrobot.util import console
+
+from necrobot.gsheet.matchgsheetinfo import MatchGSheetInfo
+from necrobot.gsheet.matchupsheet import MatchupSheet
+from necrobot.match.matchinfo import MatchInfo
+from necrobot.race.raceinfo import RaceInfo
+
+
+class SheetDiff(object):
+    """The rows of a worksheet that differ from its last sync"""
+    def __init__(self):
+        self.added = []             # type: List[int]
+        self.changed = []           # type: List[int]
+        self.moved = []             # type: List[Tuple[int, int]]
+        self.removed = []           # type: List[int]
+        self.num_unchanged = 0      # type: int
+
+    @property
+    def empty(self) -> bool:
+        return not self.added and not self.changed and not self.moved and not self.removed
+
+    def __str__(self):
+        return '{0} added, {1} changed, {2} moved, {3} removed, {4} unchanged'.format(
+            len(self.added), len(self.changed), len(self.moved), len(self.removed), self.num_unchanged)
+
+
+class SheetSyncResult(object):
+    def __init__(self, diff: SheetDiff):
+        self.diff = diff
+        self.held = []              # type: List[str]
+        self.not_found = []         # type: List[str]
+
+    def __str__(self):
+        result_str = 'Rows {0}'.format(self.diff)
+        if self.held:
+            result_str += ' ({0} held)'.format(len(self.held))
+        return result_str
+
+
+def row_hash(racer_1_name: str, racer_2_name: str, type_str: Optional[str], date_str: Optional[str]) -> str:
+    """The hash of the contents of a worksheet row"""
+    contents = '\n'.join([
+        worksheetsnapshot.name_key(racer_1_name),
+        worksheetsnapshot.name_key(racer_2_name),
+        type_str.strip() if type_str is not None else '',
+        date_str.strip() if date_str is not None else '',
+    ])
+    return hashlib.md5(contents.encode('utf-8')).hexdigest()
+
+
+def diff_rows(sheet_hashes: Dict[int, str], stored_hashes: Dict[int, Optional[str]]) -> SheetDiff:
+    """Compare a worksheet against its last sync.
+
+    Parameters
+    ----------
+    sheet_hashes: dict[int, str]
+        The hash of each row on the worksheet that has a match.
+    stored_hashes: dict[int, Optional[str]]
+        The hash of each row that has a match in the database, as of the last sync (or None, if the row's match
+        was made before rows were hashed).
+
+    A row whose hash differs from the stored hash for its position, but equals the stored hash of a row that
+    otherwise has no match on the worksheet, is taken to have moved there from that row. Stored rows left over
+    (neither unchanged, changed, nor moved) are removed.
+    """
+    diff = SheetDiff()
+    paired_rows = set()             # Stored rows accounted for by a row on the worksheet
+    unmatched_rows = []
+    for sheet_row in sorted(sheet_hashes.keys()):
+        if sheet_row in stored_hashes and stored_hashes[sheet_row] == sheet_hashes[sheet_row]:
+            diff.num_unchanged += 1
+            paired_rows.add(sheet_row)
+        else:
+            unmatched_rows.append(sheet_row)
+
+    # The rows each stored hash could have moved from, in order
+    old_rows_by_hash = dict()       # type: Dict[str, List[int]]
+    for sheet_row in sorted(stored_hashes.keys()):
+        stored_hash = stored_hashes[sheet_row]
+        if stored_hash is not None and sheet_hashes.get(sheet_row) != stored_hash:
+            old_rows_by_hash.setdefault(stored_hash, []).append(sheet_row)
+
+    not_moved_rows = []
+    for sheet_row in unmatched_rows:
+        old_rows = old_rows_by_hash.get(sheet_hashes[sheet_row])
+        if old_rows:
+            old_row = old_rows.pop(0)
+            diff.moved.append((old_row, sheet_row,))
+            paired_rows.add(old_row)
+        else:
+            not_moved_rows.append(sheet_row)
+
+    for sheet_row in not_moved_rows:
+        if sheet_row in stored_hashes and sheet_row not in paired_rows:
+            diff.changed.append(sheet_row)
+            paired_rows.add(sheet_row)
+        else:
+            diff.added.append(sheet_row)
+    diff.removed = sorted(sheet_row for sheet_row in stored_hashes.keys() if sheet_row not in paired_rows)
+    return diff
+
+
+async def sync_matchup_sheet(matchup_sheet: MatchupSheet, match_info: MatchInfo) -> SheetSyncResult:
+    """Bring the matches made from the worksheet up to date with it.
+
+    Parameters
+    ----------
+    matchup_sheet: MatchupSheet
+        The worksheet to sync.
+    match_info: MatchInfo
+        The default type of match (rows may modify this with their "type" column).
+
+    Returns
+    -------
+    SheetSyncResult
+    """
+    wks_id = matchup_sheet.wks_id
+    match_rows = {row[0]: row for row in await matchup_sheet.get_match_rows()}
+    sheet_hashes = {sheet_row: row_hash(*row[1:]) for sheet_row, row in match_rows.items()}
+
+    db_rows = dict()
+    for db_row in await matchdb.get_sheet_matches_raw_data(wks_id):
+        db_rows[int(db_row[15])] = db_row   # Rows are ordered by match ID, so the newest match for a row wins
+    stored_hashes = await matchdb.get_sheet_row_hashes(wks_id)
+    diff = diff_rows(sheet_hashes, {sheet_row: stored_hashes.get(sheet_row) for sheet_row in db_rows.keys()})
+
+    result = SheetSyncResult(diff)
+    console.info('Syncing worksheet {0}: {1}.'.format(matchup_sheet.wks_name, diff))
+    if diff.empty:
+        return result
+
+    names = []
+    for sheet_row in diff.added + diff.changed:
+        names += [match_rows[sheet_row][1], match_rows[sheet_row][2]]
+    users = await userlib.get_users_with_any_names(names, register=True)
+
+    race_type_ids = dict()
+
+    async def get_race_type_id(race_info: RaceInfo) -> int:
+        key = (race_info.character_str, race_info.descriptor, race_info.seeded, race_info.amplified,
+               race_info.seed_fixed,)
+        if key not in race_type_ids:
+            race_type_ids[key] = await racedb.get_race_type_id(race_info=race_info, register=True)
+        return race_type_ids[key]
+
+    new_matches = []
+    match_updates = []
+    match_moves = []
+    new_hashes = dict()
+    detached_rows = []
+    changed_match_ids = []
+
+    changed_rows = set(diff.changed)
+    for sheet_row in diff.added + diff.changed:
+        _, racer_1_name, racer_2_name, type_str, date_str = match_rows[sheet_row]
+        racer_1 = users.get(racer_1_name)
+        racer_2 = users.get(racer_2_name)
+        if racer_1 is None or racer_2 is None:
+            console.warning('Couldn\'t find racers for match {0}-{1}.'.format(racer_1_name, racer_2_name))
+            result.not_found.append('{0}-{1}'.format(racer_1_name, racer_2_name))
+            continue
+
+        try:
+            row_match_info = matchup_sheet.get_match_info(type_str, match_info)
+        except ValueError as e:
+            console.warning('Bad match type "{0}" for {1}-{2}: {3}'.format(type_str, racer_1_name, racer_2_name, e))
+            row_match_info = match_info
+        suggested_time = MatchupSheet.parse_date(date_str)
+
+        # An added row may be one a match moved away from, so only changed rows have a db_row
+        db_row = db_rows[sheet_row] if sheet_row in changed_rows else None
+        if db_row is None:
+            new_matches.append(await matchutil.make_match(
+                racer_1_id=racer_1.user_id,
+                racer_2_id=racer_2.user_id,
+                match_info=row_match_info,
+                suggested_time=suggested_time,
+                gsheet_info=MatchGSheetInfo(wks_id=wks_id, row=sheet_row),
+                register=False
+            ))
+            new_hashes[sheet_row] = sheet_hashes[sheet_row]
+            continue
+
+        new_values = (
+            await get_race_type_id(row_match_info.race_info),
+            racer_1.user_id,
+            racer_2.user_id,
+            row_match_info.ranked,
+            row_match_info.is_best_of,
+            row_match_info.max_races,
+        )
+        old_values = (
+            int(db_row[1]) if db_row[1] is not None else None,
+            int(db_row[2]),
+            int(db_row[3]),
+            bool(db_row[9]),
+            bool(db_row[10]),
+            int(db_row[11]),
+        )
+
+        if _has_started(db_row):
+            if new_values != old_values:
+                result.held.append('{0}-{1}'.format(racer_1_name, racer_2_name))
+            else:
+                new_hashes[sheet_row] = sheet_hashes[sheet_row]
+            continue
+
+        # Keep the current time if the date cell can't be read
+        if suggested_time is None and date_str:
+            suggested_time = _as_utc(db_row[4])
+        if new_values != old_values or suggested_time != _as_utc(db_row[4]):
+            match_id = int(db_row[0])
+            match_updates.append(new_values[:3] + (suggested_time,) + new_values[3:] + (match_id,))
+            changed_match_ids.append(match_id)
+        new_hashes[sheet_row] = sheet_hashes[sheet_row]
+
+    # Moved matches are unlinked from their old rows first, then linked to their new ones
+    moved_to_rows = set()
+    for old_row, sheet_row in diff.moved:
+        match_id = int(db_rows[old_row][0])
+        match_moves.append((sheet_row, match_id,))
+        detached_rows.append(old_row)
+        changed_match_ids.append(match_id)
+        new_hashes[sheet_row] = sheet_hashes[sheet_row]
+        moved_to_rows.add(sheet_row)
+
+    for sheet_row in diff.removed:
+        db_row = db_rows[sheet_row]
+        if _has_started(db_row) and sheet_row not in moved_to_rows:
+            result.held.append('match {0}'.format(db_row[0]))
+        else:
+            detached_rows.append(sheet_row)
+            changed_match_ids.append(int(db_row[0]))
+
+    await matchdb.apply_sheet_sync(
+        sheet_id=wks_id,
+        match_updates=match_updates,
+        row_hashes=new_hashes,
+        detached_rows=detached_rows,
+        match_moves=match_moves,
+        new_matches=new_matches
+    )
+    matchutil.cache_matches(new_matches)
+    matchutil.forget_matches(changed_match_ids)
+
+    if result.held:
+        console.warning('Sync of worksheet {0} held rows for started matches: {1}'.format(
+            matchup_sheet.wks_name, ', '.join(result.held)))
+    return result
+
+
+def _has_started(db_row) -> bool:
+    return db_row[13] is not None or db_row[16] is not None
+
+
+def _as_utc(time: Optional[datetime.datetime]) -> Optional[datetime.datetime]:
+    if time is None or time.tzinfo is not None:
+        return time
+    return pytz.utc.localize(time)
+
+
+class TestSheetSync(unittest.TestCase):
+    def test_row_hash(self):
+        self.assertEqual(row_hash('incnone', 'macnd', None, ''), row_hash(' Incnone', 'MACND ', '', None))
+        self.assertNotEqual(row_hash('incnone', 'macnd', None, None), row_hash('macnd', 'incnone', None, None))
+        self.assertNotEqual(
+            row_hash('incnone', 'macnd', '-bestof 3', '2069-04-20 04:20:00'),
+            row_hash('incnone', 'macnd', '-bestof 3', '2069-04-20 05:20:00')
+        )
+
+    def test_diff_rows(self):
+        diff = diff_rows(
+            sheet_hashes={0: 'a', 1: 'b', 2: 'c', 4: 'e'},
+            stored_hashes={0: 'a', 1: 'x', 3: 'd', 4: None}
+        )
+        self.assertEqual(diff.added, [2])
+        self.assertEqual(diff.changed, [1, 4])
+        self.assertEqual(diff.removed, [3])
+        self.assertEqual(diff.num_unchanged, 1)
+        self.assertTrue(diff_rows({0: 'a'}, {0: 'a'}).empty)
+
+    def test_diff_moved_rows(self):
+        # Row 2 deleted; the rows below it move up
+        diff = diff_rows(
+            sheet_hashes={0: 'a', 1: 'b', 2: 'd', 3: 'e', 4: 'f'},
+            stored_hashes={0: 'a', 1: 'b', 2: 'c', 3: 'd', 4: 'e'}
+        )
+        self.assertEqual(diff.moved, [(3, 2), (4, 3)])
+        self.assertEqual(diff.added, [4])
+        self.assertEqual(diff.changed, [])
+        self.assertEqual(diff.removed, [2])
+        self.assertEqual(diff.num_unchanged, 2)
+
+        # Two rows swapped, and a third edited in place
+        diff = diff_rows(
+            sheet_hashes={0: 'b', 1: 'a', 2: 'x'},
+            stored_hashes={0: 'a', 1: 'b', 2: 'c'}
+        )
+        self.assertEqual(diff.moved, [(1, 0), (0, 1)])
+        self.assertEqual(diff.changed, [2])
+        self.assertEqual(diff.removed, [])
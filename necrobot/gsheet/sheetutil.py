@@ -1,12 +1,15 @@
 import string
+import typing
 # import unittest
 
-import googleapiclient.errors
 import necrobot.exception
 
+from necrobot.util import lazyimport
 from necrobot.gsheet.makerequest import make_request
 from necrobot.gsheet.spreadsheets import Spreadsheets
 
+gapi_errors = lazyimport.lazy_module('googleapiclient.errors')
+
 
 def num_to_colname(num: int) -> str:
     """Convert the given number to a gsheet column name.
@@ -26,6 +29,26 @@ def num_to_colname(num: int) -> str:
     return colname[::-1]    # [::-1] reverses the sequence
 
 
+async def get_sheet_properties(gsheet_id: str) -> typing.List[dict]:
+    """Read the properties (title, sheetId, gridProperties, ...) of every worksheet on the GSheet.
+    
+    Parameters
+    ----------
+    gsheet_id: str
+        The GSheet ID.
+    
+    Returns
+    -------
+    list[dict]
+        The 'properties' of each worksheet, as described at 
+        https://developers.google.com/sheets/api/reference/rest/v4/spreadsheets/sheets#SheetProperties
+    """
+    async with Spreadsheets() as spreadsheets:
+        request = spreadsheets.get(spreadsheetId=gsheet_id, fields='sheets.properties')
+        sheet_data = await make_request(request)
+        return [sheet['properties'] for sheet in sheet_data['sheets']]
+
+
 async def has_read_write_permissions(gsheet_id: str) -> (bool, str):
     """Checks that the bot has read/write permissions to the GSheet.
     
@@ -49,7 +72,7 @@ async def has_read_write_permissions(gsheet_id: str) -> (bool, str):
         try:
             spreadsheet = await make_request(request)
             return True, spreadsheet['properties']['title']
-        except googleapiclient.errors.HttpError as e:
+        except gapi_errors.HttpError as e:
             # noinspection PyProtectedMember
             e_as_str = e._get_reason()
             return False, e_as_str if e_as_str else 'Unknown error.'
@@ -0,0 +1,308 @@
+"""
+Buffered writes to a GSheet.
+
+Cell and range updates to a spreadsheet are collected for a short window (Config.GSHEET_WRITE_WINDOW_SEC), then
+sent together in a single values().batchUpdate call (two, if both raw and auto-formatted values are pending).
+Writes to the same cell are merged, so only the last value written is sent.
+
+Buffers are shared per spreadsheet; use get_buffer() to get the buffer for a given GSheet ID. Reads are not
+served from the buffer, so code that reads back a cell it has just written should flush() first.
+
+Each update returns a Future that resolves once the write has been sent: to True if it was written, or to False if
+its batch failed (or was cancelled). Code that needs to know whether a write reached the sheet should await it.
+"""
+
+import asyncio
+import unittest
+from typing import Dict, List, Tuple
+
+from necrobot.gsheet.makerequest import make_request
+from necrobot.util import console
+
+from necrobot.config import Config
+from necrobot.gsheet.sheetcell import SheetCell
+from necrobot.gsheet.spreadsheets import Spreadsheets
+
+
+class SheetWriteBuffer(object):
+    """Pending writes to a single spreadsheet.
+
+    Parameters
+    ----------
+    gsheet_id: str
+        The ID of the GSheet to write to.
+    window: float
+        The number of seconds to hold writes before sending them. If 0, every write is sent immediately.
+    """
+    def __init__(self, gsheet_id: str, window: float = None):
+        self.gsheet_id = gsheet_id
+        self._window = window if window is not None else Config.GSHEET_WRITE_WINDOW_SEC
+
+        self._pending = dict()              # type: Dict[Tuple[str, int, int], Tuple[str, bool]]
+        self._pending_updates = 0           # type: int
+        self._waiters = []                  # type: List[Tuple[asyncio.Future, bool]]
+        self._flush_future = None           # type: asyncio.Future
+        self._lock = asyncio.Lock()
+
+        self._updates_requested = 0         # type: int
+        self._api_calls_made = 0            # type: int
+        self._api_calls_saved = 0           # type: int
+
+    @property
+    def num_pending_cells(self) -> int:
+        return len(self._pending)
+
+    @property
+    def updates_requested(self) -> int:
+        """The number of update_cell/update_range calls made on this buffer"""
+        return self._updates_requested
+
+    @property
+    def api_calls_made(self) -> int:
+        return self._api_calls_made
+
+    @property
+    def api_calls_saved(self) -> int:
+        """The number of API calls avoided by batching (compared to one call per update)"""
+        return self._api_calls_saved
+
+    async def update_cell(
+            self, wks_name: str, row: int, col: int, value: str, raw_input: bool = True) -> asyncio.Future:
+        """Buffer a write to a single cell.
+
+        Parameters
+        ----------
+        wks_name: str
+            The name of the worksheet.
+        row: int
+            The row (begins at 1).
+        col: int
+            The column (begins at 1).
+        value: str
+            The cell value.
+        raw_input: bool
+            If False, GSheets will auto-format the input.
+
+        Returns
+        -------
+        asyncio.Future
+            Resolves to True once the write is sent, or to False if it failed.
+        """
+        return await self.update_range(wks_name=wks_name, top=row, left=col, values=[[value]], raw_input=raw_input)
+
+    async def update_range(
+            self, wks_name: str, top: int, left: int, values: list, raw_input: bool = True) -> asyncio.Future:
+        """Buffer a write to a rectangular range.
+
+        Parameters
+        ----------
+        wks_name: str
+            The name of the worksheet.
+        top: int
+            The top row of the range (begins at 1).
+        left: int
+            The leftmost column of the range (begins at 1).
+        values: list[list[str]]
+            An array of values; values[i][j] is written to row top+i, column left+j.
+        raw_input: bool
+            If False, GSheets will auto-format the input.
+
+        Returns
+        -------
+        asyncio.Future
+            Resolves to True once the write is sent, or to False if it failed.
+        """
+        written = asyncio.Future()
+        self._updates_requested += 1
+        self._pending_updates += 1
+        self._waiters.append((written, raw_input))
+        for i, row_values in enumerate(values):
+            for j, value in enumerate(row_values):
+                self._pending[(wks_name, top + i, left + j)] = (value, raw_input)
+
+        if self._window <= 0:
+            await self.flush()
+        elif self._flush_future is None or self._flush_future.done():
+            self._flush_future = asyncio.ensure_future(self._flush_after_window())
+        return written
+
+    async def flush(self) -> bool:
+        """Send all pending writes now. Return False if any batch failed to send."""
+        async with self._lock:
+            if self._flush_future is not None:
+                self._flush_future.cancel()
+                self._flush_future = None
+
+            waiters = self._waiters
+            self._waiters = []
+            if not self._pending:
+                _resolve(waiters, {}, True)
+                return True
+
+            pending = self._pending
+            num_updates = self._pending_updates
+            self._pending = dict()
+            self._pending_updates = 0
+
+            batches = [
+                (raw_input, [(key, value) for key, (value, raw) in sorted(pending.items()) if raw == raw_input])
+                for raw_input in (True, False)
+            ]
+            batch_success = dict()
+            for raw_input, cells in batches:
+                if not cells:
+                    continue
+                try:
+                    await self._batch_update(cells, raw_input)
+                    batch_success[raw_input] = True
+                except Exception as e:
+                    batch_success[raw_input] = False
+                    console.warning('Failed to write {0} cells to GSheet {1}: {2}'.format(
+                        len(cells), self.gsheet_id, e))
+
+            success = all(batch_success.values())
+            _resolve(waiters, batch_success, success)
+            self._api_calls_made += len(batch_success)
+            self._api_calls_saved += max(num_updates - len(batch_success), 0)
+            return success
+
+    def cancel(self) -> None:
+        """Drop all pending writes without sending them"""
+        if self._flush_future is not None:
+            self._flush_future.cancel()
+            self._flush_future = None
+        self._pending = dict()
+        self._pending_updates = 0
+        _resolve(self._waiters, {}, False)
+        self._waiters = []
+
+    async def _flush_after_window(self) -> None:
+        await asyncio.sleep(self._window)
+        self._flush_future = None
+        await self.flush()
+
+    async def _batch_update(self, cells: List[Tuple[Tuple[str, int, int], str]], raw_input: bool) -> None:
+        body = {
+            'valueInputOption': 'RAW' if raw_input else 'USER_ENTERED',
+            'data': [
+                {'range': str(SheetCell(row, col, wks_name=wks_name)), 'values': [[value]]}
+                for (wks_name, row, col), value in cells
+            ]
+        }
+        async with Spreadsheets() as spreadsheets:
+            request = spreadsheets.values().batchUpdate(spreadsheetId=self.gsheet_id, body=body)
+            await make_request(request)
+
+
+_buffers = dict()   # type: Dict[str, SheetWriteBuffer]
+
+
+def _resolve(waiters: List[Tuple[asyncio.Future, bool]], batch_success: Dict[bool, bool], default: bool) -> None:
+    """Resolve each write's future with the outcome of the batch its cells were sent in. (If its cells were all
+    overwritten by writes of the other input type, they went in neither batch; it gets the overall outcome.)
+    """
+    for written, raw_input in waiters:
+        if not written.done():
+            written.set_result(batch_success.get(raw_input, default))
+
+
+def get_buffer(gsheet_id: str) -> SheetWriteBuffer:
+    """The write buffer for the given GSheet"""
+    if gsheet_id not in _buffers:
+        _buffers[gsheet_id] = SheetWriteBuffer(gsheet_id=gsheet_id)
+    return _buffers[gsheet_id]
+
+
+async def flush(gsheet_id: str) -> bool:
+    """Send all pending writes to the given GSheet now"""
+    if gsheet_id not in _buffers:
+        return True
+    return await _buffers[gsheet_id].flush()
+
+
+async def flush_all() -> None:
+    """Send all pending writes now (call on shutdown)"""
+    for buffer in list(_buffers.values()):
+        await buffer.flush()
+
+
+def stats_str() -> str:
+    """A summary of writes batched, per GSheet"""
+    if not _buffers:
+        return 'No GSheet writes made.'
+    return '\n'.join(
+        '{0}: {1} updates in {2} API calls ({3} calls saved, {4} cells pending)'.format(
+            gsheet_id, buffer.updates_requested, buffer.api_calls_made, buffer.api_calls_saved,
+            buffer.num_pending_cells)
+        for gsheet_id, buffer in _buffers.items()
+    )
+
+
+class TestSheetWriteBuffer(unittest.TestCase):
+    class _RecordingBuffer(SheetWriteBuffer):
+        def __init__(self, window):
+            SheetWriteBuffer.__init__(self, gsheet_id='test', window=window)
+            self.batches = []
+
+        async def _batch_update(self, cells, raw_input):
+            self.batches.append((raw_input, cells))
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        self.loop.close()
+
+    def test_merge_within_window(self):
+        async def run():
+            buffer = self._RecordingBuffer(window=0.05)
+            await buffer.update_cell('Week 1', row=3, col=2, value='a')
+            await buffer.update_range('Week 1', top=3, left=2, values=[['b', '2-1']])
+            await buffer.update_cell('Standings', row=5, col=7, value='2', raw_input=False)
+            await buffer.update_cell('Standings', row=6, col=5, value='1', raw_input=False)
+            await asyncio.sleep(0.1)
+            return buffer
+
+        buffer = self.loop.run_until_complete(run())
+        self.assertEqual(buffer.batches, [
+            (True, [(('Week 1', 3, 2), 'b'), (('Week 1', 3, 3), '2-1')]),
+            (False, [(('Standings', 5, 7), '2'), (('Standings', 6, 5), '1')]),
+        ])
+        self.assertEqual(buffer.api_calls_made, 2)
+        self.assertEqual(buffer.api_calls_saved, 2)
+        self.assertEqual(buffer.num_pending_cells, 0)
+
+    def test_flush_on_demand(self):
+        async def run():
+            buffer = self._RecordingBuffer(window=10)
+            await buffer.update_cell('Week 1', row=3, col=2, value='a')
+            await buffer.update_cell('Week 1', row=3, col=2, value='b', raw_input=False)
+            self.assertTrue(await buffer.flush())
+            return buffer
+
+        buffer = self.loop.run_until_complete(run())
+        self.assertEqual(buffer.batches, [(False, [(('Week 1', 3, 2), 'b')])])
+        self.assertEqual(buffer.api_calls_saved, 1)
+
+    def test_write_outcomes(self):
+        class FailingBuffer(self._RecordingBuffer):
+            async def _batch_update(self, cells, raw_input):
+                if not raw_input:
+                    raise RuntimeError('Write failed')
+                await TestSheetWriteBuffer._RecordingBuffer._batch_update(self, cells, raw_input)
+
+        async def run():
+            buffer = FailingBuffer(window=0.01)
+            raw_written = await buffer.update_cell('Week 1', row=3, col=2, value='a')
+            formatted_written = await buffer.update_cell('Week 1', row=3, col=3, value='b', raw_input=False)
+            self.assertFalse(raw_written.done())
+            outcomes = await asyncio.gather(raw_written, formatted_written)
+            cancelled_written = await buffer.update_cell('Week 1', row=4, col=2, value='c')
+            buffer.cancel()
+            return outcomes, await cancelled_written
+
+        with self.assertLogs('necrobot', level='WARNING'):
+            outcomes, cancelled_outcome = self.loop.run_until_complete(run())
+        self.assertEqual(outcomes, [True, False])
+        self.assertFalse(cancelled_outcome)
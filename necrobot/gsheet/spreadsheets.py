@@ -3,14 +3,16 @@ Tools for interacting with a GSheet, typically for a CoNDOR Event.
 """
 
 import asyncio
-import httplib2
 import unittest
 
-from googleapiclient import discovery
-from oauth2client.service_account import ServiceAccountCredentials
-
+from necrobot.util import lazyimport
 from necrobot.config import Config
 
+# The Google API client libraries are slow to import; only load them once a sheet is actually used
+discovery = lazyimport.lazy_module('googleapiclient.discovery')
+httplib2 = lazyimport.lazy_module('httplib2')
+service_account = lazyimport.lazy_module('oauth2client.service_account')
+
 
 DISCOVERY_URL = 'https://sheets.googleapis.com/$discovery/rest?version=v4'
 SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
@@ -21,11 +23,17 @@ class Spreadsheets(object):
     Context manager; Returns a spreadsheets() majig 
     (https://developers.google.com/resources/api-libraries/documentation/sheets/v4/python/latest/
     sheets_v4.spreadsheets.html)
+
+    This doesn't lock anything; requests built from it should be run with makerequest.make_request, which limits
+    the number of concurrent requests per spreadsheet.
+
+    For tests and benchmarks, set_service() replaces the Google service with a stand-in (such as
+    necrobot.test.sheetemulator.SheetEmulator), so that no credentials or network access are needed.
     """
     initted = False
     credentials = None
     sheet_service = None
-    _sheet_lock = asyncio.Lock()
+    emulated = False
 
     def __init__(self):
         if not Spreadsheets.initted:
@@ -34,23 +42,46 @@ class Spreadsheets(object):
             Spreadsheets.initted = True
 
     async def __aenter__(self):
-        await Spreadsheets._sheet_lock.acquire()
         return Spreadsheets.sheet_service.spreadsheets()
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        Spreadsheets._sheet_lock.release()
+        pass
+
+    @staticmethod
+    def set_service(sheet_service) -> None:
+        """Use the given object in place of the Google Sheets service. Its spreadsheets() resource must build
+        requests with the same interface as the Google API client's (an execute(http) method, and a uri).
+        """
+        Spreadsheets.sheet_service = sheet_service
+        Spreadsheets.initted = True
+        Spreadsheets.emulated = True
+
+    @staticmethod
+    def reset_service() -> None:
+        """Go back to using the Google Sheets service (built on next use)"""
+        Spreadsheets.sheet_service = None
+        Spreadsheets.initted = False
+        Spreadsheets.emulated = False
+
+    @staticmethod
+    def authorized_http():
+        """A new authorized httplib2.Http (these aren't thread-safe, so each thread making requests needs its own)"""
+        if Spreadsheets.emulated:
+            return None
+        Spreadsheets._get_credentials()
+        return Spreadsheets.credentials.authorize(httplib2.Http())
 
     @staticmethod
     def _get_credentials():
         if Spreadsheets.credentials is None:
-            Spreadsheets.credentials = ServiceAccountCredentials.from_json_keyfile_name(
+            Spreadsheets.credentials = service_account.ServiceAccountCredentials.from_json_keyfile_name(
                 filename=Config.OAUTH_CREDENTIALS_JSON,
                 scopes=SCOPES
             )
 
     @staticmethod
     def _build_service():
-        http = Spreadsheets.credentials.authorize(httplib2.Http())
+        http = Spreadsheets.authorized_http()
         Spreadsheets.sheet_service = discovery.build(
             'sheets', 'v4', http=http, discoveryServiceUrl=DISCOVERY_URL)
 
@@ -3,13 +3,14 @@ import datetime
 import typing
 import unittest
 
-from necrobot.gsheet.makerequest import make_request
+from necrobot.gsheet import makerequest
+from necrobot.gsheet import sheetutil
+from necrobot.gsheet import worksheetsnapshot
 from necrobot.match import matchutil
 from necrobot.user import userlib
 from necrobot.util import console
 
 from necrobot.gsheet.matchgsheetinfo import MatchGSheetInfo
-from necrobot.gsheet.spreadsheets import Spreadsheets
 from necrobot.match.match import Match
 from necrobot.match.matchinfo import MatchInfo
 from necrobot.gsheet.worksheetindexdata import WorksheetIndexData
@@ -50,22 +51,25 @@ class StandingsSheet(object):
     def wks_id(self) -> str:
         return self.column_data.wks_id
 
-    async def initialize(self, wks_name: str = None, wks_id: str = None) -> None:
+    async def initialize(
+            self,
+            wks_name: str = None,
+            wks_id: str = None,
+            sheet_properties: typing.List[dict] = None
+    ) -> None:
+        if sheet_properties is None:
+            sheet_properties = await sheetutil.get_sheet_properties(self.gsheet_id)
+
+        # Get names of other spreadsheets
         colnames = list()
-        async with Spreadsheets() as spreadsheets:
-            # Get names of other spreadsheets
-            request = spreadsheets.get(spreadsheetId=self.gsheet_id)
-            sheet_data = await make_request(request)
-            for sheet in sheet_data['sheets']:
-                props = sheet['properties']
-                if (wks_name is not None and props['title'] != wks_name) \
-                        or (wks_id is not None and props['sheetId'] != str(wks_id)):
-                    colnames.append(props['title'])
-
-            colnames.extend(['racer', 'results'])
+        for props in sheet_properties:
+            if (wks_name is not None and props['title'] != wks_name) \
+                    or (wks_id is not None and props['sheetId'] != str(wks_id)):
+                colnames.append(props['title'])
+        colnames.extend(['racer', 'results'])
 
         self.column_data.reset(columns=colnames)
-        await self.column_data.initialize(wks_name=wks_name, wks_id=wks_id)
+        await self.column_data.initialize(wks_name=wks_name, wks_id=wks_id, sheet_properties=sheet_properties)
         min_col = None
         for colname in colnames:
             if colname == 'racer' or colname == 'results':
@@ -77,11 +81,12 @@ class StandingsSheet(object):
         self._offset = min_col - self.column_data.results
 
     async def update_standings(self, match: Match, r1_wins: int, r2_wins: int) -> None:
-        row_1, col_1, row_2, col_2 = await self._get_match_cells(match)
-        if row_1 is not None and col_1 is not None:
-            await self.column_data.update_cell(row_1, col_1 - self._offset, str(r1_wins), raw_input=False)
-        if row_2 is not None and col_2 is not None:
-            await self.column_data.update_cell(row_2, col_2 - self._offset, str(r2_wins), raw_input=False)
+        async with makerequest.sheet_lock(self.gsheet_id):
+            row_1, col_1, row_2, col_2 = await self._get_match_cells(match)
+            if row_1 is not None and col_1 is not None:
+                await self.column_data.update_cell(row_1, col_1 - self._offset, str(r1_wins), raw_input=False)
+            if row_2 is not None and col_2 is not None:
+                await self.column_data.update_cell(row_2, col_2 - self._offset, str(r2_wins), raw_input=False)
 
     async def _get_match_cells(self, match: Match) \
             -> typing.Tuple[typing.Optional[int], typing.Optional[int], typing.Optional[int], typing.Optional[int]]:
@@ -105,55 +110,49 @@ class StandingsSheet(object):
             )
             return None, None, None, None
 
-        async with Spreadsheets() as spreadsheets:
-            # Get the column name for this match
-            colname = None
-            request = spreadsheets.get(spreadsheetId=self.gsheet_id)
-            sheet_data = await make_request(request)
-            for sheet in sheet_data['sheets']:
-                props = sheet['properties']
-                if match.sheet_id == props['sheetId']:
-                    colname = props['title']
-
-            if colname is None:
-                console.warning(
-                    'Trying to get cells for match {0} fails because the sheet corresponding to its sheetID '
-                    'could not be found.'.format(match.matchroom_name)
-                )
-                return None, None, None, None
-            if self.column_data.getcol(colname) is None:
-                console.warning(
-                    'Trying to get cells for match {0} fails because the column corresponding to its worksheet '
-                    '("{1}") could not be found.'.format(match.matchroom_name, colname)
-                )
-                return None, None, None, None
-
-            value_range = await self.column_data.get_values(spreadsheets, extend_right=True)
-            if 'values' not in value_range:
-                return None, None, None, None
-
-            r1_row = None
-            r2_row = None
-            r1_col = None
-            r2_col = None
-            values = value_range['values']
-
-            for row, row_values in enumerate(values):
-                gsheet_name = row_values[self.column_data.racer]
-                if match.racer_1.name_regex.match(gsheet_name):
-                    r1_row = row
-                    for col in range(self.column_data.getcol(colname), len(row_values)):
-                        if match.racer_2.name_regex.match(row_values[col]):
-                            r1_col = col
-                            break
-                elif match.racer_2.name_regex.match(gsheet_name):
-                    r2_row = row
-                    for col in range(self.column_data.getcol(colname), len(row_values)):
-                        if match.racer_1.name_regex.match(row_values[col]):
-                            r2_col = col
-                            break
-
-            return r1_row, r1_col, r2_row, r2_col
+        snapshot = self.column_data.snapshot
+
+        # Get the column name for this match
+        colname = await snapshot.sheet_title(match.sheet_id)
+        if colname is None:
+            console.warning(
+                'Trying to get cells for match {0} fails because the sheet corresponding to its sheetID '
+                'could not be found.'.format(match.matchroom_name)
+            )
+            return None, None, None, None
+        if self.column_data.getcol(colname) is None:
+            console.warning(
+                'Trying to get cells for match {0} fails because the column corresponding to its worksheet '
+                '("{1}") could not be found.'.format(match.matchroom_name, colname)
+            )
+            return None, None, None, None
+
+        values = await snapshot.get_values()
+        first_col = self.column_data.getcol(colname)
+        r1_rows = await snapshot.find_rows(self.column_data.racer, match.racer_1.names)
+        r2_rows = await snapshot.find_rows(self.column_data.racer, match.racer_2.names)
+        r1_row = r1_rows[-1] if r1_rows else None
+        r2_row = r2_rows[-1] if r2_rows else None
+        r1_col = self._find_opponent_col(values, r1_row, first_col, match.racer_2.names)
+        r2_col = self._find_opponent_col(values, r2_row, first_col, match.racer_1.names)
+        return r1_row, r1_col, r2_row, r2_col
+
+    @staticmethod
+    def _find_opponent_col(
+            values: typing.List[typing.List[str]],
+            row: typing.Optional[int],
+            first_col: int,
+            opponent_names: typing.List[str]
+    ) -> typing.Optional[int]:
+        """The first column (from first_col) in the given row that names the opponent"""
+        if row is None:
+            return None
+        name_keys = set(worksheetsnapshot.name_key(name) for name in opponent_names)
+        row_values = values[row]
+        for col in range(first_col, len(row_values)):
+            if worksheetsnapshot.name_key(row_values[col]) in name_keys:
+                return col
+        return None
 
 
 class TestStandingsSheet(unittest.TestCase):
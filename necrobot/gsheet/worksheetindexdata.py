@@ -1,9 +1,14 @@
+import asyncio
 import typing
+import unittest
+
 import necrobot.exception
+from necrobot.gsheet import sheetutil
+from necrobot.gsheet import sheetwritebuffer
 from necrobot.gsheet.makerequest import make_request
-from necrobot.gsheet.sheetcell import SheetCell
 from necrobot.gsheet.sheetrange import SheetRange
 from necrobot.gsheet.spreadsheets import Spreadsheets
+from necrobot.gsheet.worksheetsnapshot import WorksheetSnapshot
 
 
 class WorksheetIndexData(object):
@@ -29,6 +34,10 @@ class WorksheetIndexData(object):
         self._col_names = columns
         self._col_indicies = dict()
 
+        # Cached values
+        self.sheet_properties = list()
+        self.snapshot = WorksheetSnapshot(self)
+
     def __getattr__(self, item):
         return self.getcol(item)
 
@@ -59,7 +68,11 @@ class WorksheetIndexData(object):
         self._col_names = columns
         self._col_indicies = dict()
 
-    async def initialize(self, wks_name: str, wks_id: str) -> None:
+        # Cached values
+        self.sheet_properties = list()
+        self.snapshot = WorksheetSnapshot(self)
+
+    async def initialize(self, wks_name: str, wks_id: str, sheet_properties: typing.List[dict] = None) -> None:
         """Read the GSheet and store the indicies of columns
         
         Parameters
@@ -68,6 +81,8 @@ class WorksheetIndexData(object):
             The name of the worksheet to initialize from.
         wks_id: int
             The ID of the worksheet to initialize from.
+        sheet_properties: list[dict]
+            The properties of each worksheet on the GSheet, if already known (see sheetlib.get_sheet_properties).
         
         Raises
         ------
@@ -83,34 +98,34 @@ class WorksheetIndexData(object):
                 'Worksheet already initialized <wks_name = {]> <wks_id = {}>'.format(self.wks_name, self.wks_id)
             )
 
-        async with Spreadsheets() as spreadsheets:
-            # Find the size of the worksheet
-            request = spreadsheets.get(spreadsheetId=self.gsheet_id)
-            sheet_data = await make_request(request)
-            for sheet in sheet_data['sheets']:
-                props = sheet['properties']
-                if wks_name is not None and props['title'] == wks_name:
-                    self.wks_name = wks_name
-                    self.wks_id = props['sheetId']
-                    self._sheet_size = (int(props['gridProperties']['rowCount']),
-                                        int(props['gridProperties']['columnCount']),)
-                    break
-                elif wks_id is not None and props['sheetId'] == wks_id:
-                    self.wks_name = props['title']
-                    self.wks_id = wks_id
-                    self._sheet_size = (int(props['gridProperties']['rowCount']),
-                                        int(props['gridProperties']['columnCount']),)
-                    break
-
-            if self.wks_id is None:
-                raise necrobot.exception.NotFoundException(
-                    "No worksheet with name {wks_name} on GSheet {gsheetid}".format(
-                        wks_name=wks_name,
-                        gsheetid=self.gsheet_id
-                    )
+        if sheet_properties is None:
+            sheet_properties = await sheetutil.get_sheet_properties(self.gsheet_id)
+        self.sheet_properties = sheet_properties
+
+        # Find the size of the worksheet
+        for props in sheet_properties:
+            if wks_name is not None and props['title'] == wks_name:
+                self.wks_name = wks_name
+                self.wks_id = props['sheetId']
+                self._sheet_size = (int(props['gridProperties']['rowCount']),
+                                    int(props['gridProperties']['columnCount']),)
+                break
+            elif wks_id is not None and props['sheetId'] == wks_id:
+                self.wks_name = props['title']
+                self.wks_id = wks_id
+                self._sheet_size = (int(props['gridProperties']['rowCount']),
+                                    int(props['gridProperties']['columnCount']),)
+                break
+
+        if self.wks_id is None:
+            raise necrobot.exception.NotFoundException(
+                "No worksheet with name {wks_name} on GSheet {gsheetid}".format(
+                    wks_name=wks_name,
+                    gsheetid=self.gsheet_id
                 )
+            )
 
-            await self._refresh(spreadsheets)
+        await self._refresh()
 
     @property
     def valid(self):
@@ -157,58 +172,28 @@ class WorksheetIndexData(object):
 
     async def refresh_all(self):
         """Refresh all data"""
-        async with Spreadsheets() as spreadsheets:
-            # Find the size of the worksheet
-            request = spreadsheets.get(spreadsheetId=self.gsheet_id)
-            sheet_data = await make_request(request)
-            for sheet in sheet_data['sheets']:
-                props = sheet['properties']
-                if props['sheetId'] == self.wks_id:
-                    self.wks_name = props['title']
-                    self._sheet_size = (int(props['gridProperties']['rowCount']),
-                                        int(props['gridProperties']['columnCount']),)
-                    break
-
-            await self._refresh_all(spreadsheets)
+        self.sheet_properties = await sheetutil.get_sheet_properties(self.gsheet_id)
+        for props in self.sheet_properties:
+            if props['sheetId'] == self.wks_id:
+                self.wks_name = props['title']
+                self._sheet_size = (int(props['gridProperties']['rowCount']),
+                                    int(props['gridProperties']['columnCount']),)
+                break
+
+        self.header_row = None
+        self.footer_row = None
+        self._col_indicies = dict()
+        await self._refresh()
 
     async def refresh_footer(self):
         """Refresh the self.footer_row property from the GSheet"""
-        async with Spreadsheets() as spreadsheets:
-            # Find the header row and the column indicies
-            row_query_min = 1
-            row_query_max = 10
-            while self.footer_row is None and row_query_min <= self._sheet_size[0]:
-                # Get the cells
-                range_to_get = SheetRange(
-                    ul_cell=(row_query_min, 1,),
-                    lr_cell=(row_query_max, self._sheet_size[1],),
-                    wks_name=self.wks_name
-                )
-                request = spreadsheets.values().get(
-                    spreadsheetId=self.gsheet_id,
-                    range=range_to_get,
-                    majorDimension='ROWS'
-                )
-                value_range = await make_request(request)
-
-                # Check if the cells we got are completely empty
-                if 'values' not in value_range:
-                    if self.header_row is not None:
-                        self.footer_row = row_query_min
-
-                # If there are values in the cells, find header and footers
-                else:
-                    values = value_range['values']
-                    # If we got fewer than the requested number of rows, we've found the footer
-                    if len(values) < row_query_max - row_query_min + 1:
-                        self.footer_row = row_query_min + len(values)
-
-                # Prepare for next loop
-                row_query_min = row_query_max + 1
-                row_query_max = min(2*row_query_max, self._sheet_size[0])
+        values = await self._get_all_values()
+        if self.header_row is not None:
+            self.footer_row = len(values) + 1
+        self._load_snapshot(values)
 
-    async def update_cell(self, row: int, col: int, value: str, raw_input: bool = True) -> bool:
-        """Update a single cell.
+    async def update_cell(self, row: int, col: int, value: str, raw_input: bool = True) -> asyncio.Future:
+        """Update a single cell. The write is buffered, and sent in a batch with other writes to this GSheet.
 
         Parameters
         ----------
@@ -223,29 +208,25 @@ class WorksheetIndexData(object):
 
         Returns
         -------
-        bool
-            True if the update was successful.
+        asyncio.Future
+            Resolves to True once the write is sent to the GSheet, or to False if it failed. (The snapshot is
+            updated right away.)
         """
         if not self.valid:
             raise RuntimeError('Trying to update a cell on an invalid MatchupSheet.')
 
-        row += self.header_row + 1
-        col += self.min_column
-        range_str = str(SheetCell(row, col, wks_name=self.wks_name))
-        value_input_option = 'RAW' if raw_input else 'USER_ENTERED'
-        value_range_body = {'values': [[value]]}
-        async with Spreadsheets() as spreadsheets:
-            request = spreadsheets.values().update(
-                spreadsheetId=self.gsheet_id,
-                range=range_str,
-                valueInputOption=value_input_option,
-                body=value_range_body
-            )
-            response = await make_request(request)
-            return response is not None
+        written = await sheetwritebuffer.get_buffer(self.gsheet_id).update_cell(
+            wks_name=self.wks_name,
+            row=row + self.header_row + 1,
+            col=col + self.min_column,
+            value=value,
+            raw_input=raw_input
+        )
+        self.snapshot.set_cell(row, col, value)
+        return written
 
-    async def update_cells(self, sheet_range: SheetRange, values: list, raw_input=True) -> bool:
-        """Update all cells in a range.
+    async def update_cells(self, sheet_range: SheetRange, values: list, raw_input=True) -> asyncio.Future:
+        """Update all cells in a range. The write is buffered, and sent in a batch with other writes to this GSheet.
 
         Parameters
         ----------
@@ -258,73 +239,72 @@ class WorksheetIndexData(object):
 
         Returns
         -------
-        bool
-            True if the update was successful.
+        asyncio.Future
+            Resolves to True once the write is sent to the GSheet, or to False if it failed. (The snapshot is
+            updated right away.)
         """
         if not self.valid:
             raise RuntimeError('Trying to update a cell on an invalid MatchupSheet.')
 
-        range_str = str(sheet_range)
-        value_input_option = 'RAW' if raw_input else 'USER_ENTERED'
-        value_range_body = {'values': values}
-        async with Spreadsheets() as spreadsheets:
-            request = spreadsheets.values().update(
-                spreadsheetId=self.gsheet_id,
-                range=range_str,
-                valueInputOption=value_input_option,
-                body=value_range_body
-            )
-            response = await make_request(request)
-            return response is not None
+        written = await sheetwritebuffer.get_buffer(self.gsheet_id).update_range(
+            wks_name=sheet_range.wks_name if sheet_range.wks_name else self.wks_name,
+            top=sheet_range.top,
+            left=sheet_range.left,
+            values=values,
+            raw_input=raw_input
+        )
+        for i, row_values in enumerate(values):
+            for j, value in enumerate(row_values):
+                self.snapshot.set_cell(
+                    sheet_range.top - self.header_row - 1 + i, sheet_range.left - self.min_column + j, value)
+        return written
 
-    async def _refresh(self, spreadsheets):
+    async def _refresh(self):
         """Find the array bounds and the column indicies"""
+        values = await self._get_all_values()
+
         # Find the header row and the column indicies
-        row_query_min = 1
-        row_query_max = 10
         col_vals = []
-        while self.footer_row is None and row_query_min <= self._sheet_size[0]:
-            # Get the cells
-            range_to_get = SheetRange(
-                ul_cell=(row_query_min, 1,),
-                lr_cell=(row_query_max, self._sheet_size[1],),
-                wks_name=self.wks_name
-            )
+        for row, row_values in enumerate(values, start=1):
+            if self.header_row is not None:
+                break
+            for col, cell_value in enumerate(row_values, start=1):
+                if self._make_index(cell_value, col):
+                    self.header_row = row
+                    col_vals.append(col)
+
+        # The footer is the first row after the last nonempty one (blank rows within the table, e.g. between
+        # tiers, are part of it)
+        if self.header_row is not None:
+            self.footer_row = len(values) + 1
+
+        if col_vals:
+            self.min_column = min(self.min_column, min(col_vals)) if self.min_column is not None else min(col_vals)
+            self.max_column = max(self.max_column, max(col_vals)) if self.max_column is not None else max(col_vals)
+
+        self._load_snapshot(values)
+
+    async def _get_all_values(self) -> typing.List[typing.List[str]]:
+        """Read the whole worksheet in a single request. (Trailing empty rows and columns are omitted.)"""
+        # Send any buffered writes first, so that the read (and the snapshot loaded from it) includes them
+        await sheetwritebuffer.get_buffer(self.gsheet_id).flush()
+        async with Spreadsheets() as spreadsheets:
             request = spreadsheets.values().get(
                 spreadsheetId=self.gsheet_id,
-                range=range_to_get,
+                range=SheetRange(ul_cell=(1, 1,), lr_cell=self._sheet_size, wks_name=self.wks_name),
                 majorDimension='ROWS'
             )
             value_range = await make_request(request)
+        return value_range['values'] if 'values' in value_range else []
 
-            # Check if the cells we got are completely empty
-            if 'values' not in value_range:
-                if self.header_row is not None:
-                    self.footer_row = row_query_min
-
-            # If there are values in the cells, find header and footers
-            else:
-                values = value_range['values']
-                for row, row_values in enumerate(values):
-                    row += 1
-                    if self.header_row is None:
-                        for col, cell_value in enumerate(row_values):
-                            col += 1
-                            if self._make_index(cell_value, col):
-                                self.header_row = row
-                                col_vals.append(col)
-
-                # If we got fewer than the requested number of rows, we've found the footer
-                if len(values) < row_query_max - row_query_min + 1:
-                    self.footer_row = row_query_min + len(values)
-
-            # Prepare for next loop
-            row_query_min = row_query_max + 1
-            row_query_max = min(2 * row_query_max, self._sheet_size[0])
-
-        if col_vals:
-            self.min_column = min(self.min_column, min(col_vals)) if self.min_column is not None else min(col_vals)
-            self.max_column = max(self.max_column, max(col_vals)) if self.max_column is not None else max(col_vals)
+    def _load_snapshot(self, values: typing.List[typing.List[str]]) -> None:
+        """Fill the snapshot from a read of the whole worksheet, so it needn't be read again"""
+        if not self.valid:
+            return
+        self.snapshot.load(
+            sheet_properties=self.sheet_properties,
+            values=[row_values[self.min_column - 1:] for row_values in values[self.header_row:self.footer_row - 1]]
+        )
 
     def _make_index(self, cell_value: str, col: int) -> bool:
         for colname in self._col_names:
@@ -336,3 +316,45 @@ class WorksheetIndexData(object):
     @staticmethod
     def _convert_colname(c):
         return c.replace(' ', '_')
+
+
+class TestWorksheetIndexData(unittest.TestCase):
+    def setUp(self):
+        from necrobot.test.sheetemulator import SheetEmulator
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.emulator = SheetEmulator()
+        self.emulator.add_worksheet('test', 'Week 1', values=[
+            ['Week 1 matches'],
+            ['Tier', 'Racer 1', 'Racer 2'],
+            ['1', 'incnone', 'macnd'],
+            ['1', 'elad', 'wilarseny'],
+            [],
+            ['2', 'yjalexis', 'pancelor'],
+            ['2', 'naymin', 'cyber_1'],
+        ])
+        Spreadsheets.set_service(self.emulator)
+
+    def tearDown(self):
+        Spreadsheets.reset_service()
+        self.loop.close()
+
+    def test_footer_after_last_row(self):
+        index_data = WorksheetIndexData('test', ['racer 1', 'racer 2'])
+        self.loop.run_until_complete(index_data.initialize(wks_name='Week 1', wks_id=None))
+        self.assertEqual(index_data.header_row, 2)
+        self.assertEqual(index_data.footer_row, 8)
+        self.assertEqual(index_data.bottom_idx, 4)
+        self.assertEqual(index_data.getcol('racer 2'), 1)
+
+        # Rows after a blank gap stay in the table
+        find_rows = index_data.snapshot.find_rows
+        self.assertEqual(self.loop.run_until_complete(find_rows(0, ['elad'])), [1])
+        self.assertEqual(self.loop.run_until_complete(find_rows(0, ['yjalexis'])), [3])
+        self.assertEqual(self.loop.run_until_complete(find_rows(1, ['cyber_1'])), [4])
+
+        # A row added at the bottom moves the footer down
+        self.emulator._get_worksheet('test', 'Week 1').write(8, 2, [['mudjoe2', 'tufwfo']])
+        self.loop.run_until_complete(index_data.refresh_footer())
+        self.assertEqual(index_data.footer_row, 9)
+        self.assertEqual(self.loop.run_until_complete(find_rows(0, ['mudjoe2'])), [5])
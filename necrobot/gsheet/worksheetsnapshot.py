@@ -0,0 +1,196 @@
+"""
+A locally cached copy of a worksheet's values, so that finding the row for a match (or the standings cells for a
+pair of racers) doesn't cost a round trip to Google every time.
+
+A snapshot holds the values of the worksheet's data range, indexed by row (from 0, the first row below the
+header) and column (from 0, the worksheet's leftmost indexed column) exactly as WorksheetIndexData addresses
+cells. It also holds the properties of every worksheet on the GSheet (as last read by sheetlib), so that a
+worksheet ID can be mapped to its title without another request.
+
+The snapshot is re-read once it is older than Config.GSHEET_SNAPSHOT_TTL_SEC, or after invalidate(). Writes made
+through WorksheetIndexData are applied to it in place, so the bot's own writes never make it stale. (Values
+written with raw_input=False are stored as written, not as GSheets will format them.)
+"""
+
+import asyncio
+import time
+import unittest
+from typing import Dict, Iterable, List, Optional
+
+from necrobot.config import Config
+
+
+def name_key(name: str) -> str:
+    """Normalize a cell value or racer name for index lookups (matching NecroUser.name_regex)"""
+    return name.strip().lower()
+
+
+class WorksheetSnapshot(object):
+    """Cached values for one worksheet.
+
+    Parameters
+    ----------
+    column_data: WorksheetIndexData
+        The worksheet whose values to cache.
+    ttl: float
+        The number of seconds after which to re-read the worksheet.
+    """
+    def __init__(self, column_data, ttl: float = None):
+        self._column_data = column_data
+        self._ttl = ttl if ttl is not None else Config.GSHEET_SNAPSHOT_TTL_SEC
+
+        self._values = None                 # type: Optional[List[List[str]]]
+        self._sheet_titles = dict()         # type: Dict[int, str]
+        self._indexes = dict()              # type: Dict[int, Dict[str, List[int]]]   # col -> key -> rows
+        self._fetched_at = None             # type: Optional[float]
+        self._version = 0                   # type: int
+        self._lock = asyncio.Lock()
+
+        self._num_reads = 0                 # type: int
+        self._num_hits = 0                  # type: int
+
+    @property
+    def version(self) -> int:
+        """Incremented every time the cached values change"""
+        return self._version
+
+    @property
+    def num_reads(self) -> int:
+        """The number of times the worksheet has been read from Google"""
+        return self._num_reads
+
+    @property
+    def num_hits(self) -> int:
+        """The number of lookups served without reading from Google"""
+        return self._num_hits
+
+    @property
+    def stale(self) -> bool:
+        return self._values is None or time.monotonic() - self._fetched_at > self._ttl
+
+    def invalidate(self) -> None:
+        """Re-read the worksheet on the next lookup"""
+        self._values = None
+
+    def load(self, sheet_properties: List[dict], values: List[List[str]]) -> None:
+        """Replace the cached data.
+
+        Parameters
+        ----------
+        sheet_properties: list[dict]
+            The 'properties' of each worksheet on the GSheet, as returned by spreadsheets().get().
+        values: list[list[str]]
+            The values of the data range, by row.
+        """
+        self._sheet_titles = {int(props['sheetId']): props['title'] for props in sheet_properties}
+        self._values = [list(row_values) for row_values in values]
+        self._indexes = dict()
+        self._fetched_at = time.monotonic()
+        self._version += 1
+
+    async def get_values(self) -> List[List[str]]:
+        """The values of the data range, by row (re-read if stale)"""
+        await self._ensure_fresh()
+        return self._values
+
+    async def sheet_title(self, sheet_id: int) -> Optional[str]:
+        """The title of the worksheet with the given ID, or None if there is no such worksheet"""
+        await self._ensure_fresh()
+        return self._sheet_titles.get(int(sheet_id))
+
+    async def find_rows(self, col: int, names: Iterable[str]) -> List[int]:
+        """The rows, in order, whose value in the given column is any of the given names (ignoring case and
+        surrounding whitespace).
+        """
+        await self._ensure_fresh()
+        index = self._get_index(col)
+        rows = set()
+        for name in names:
+            rows.update(index.get(name_key(name), []))
+        return sorted(rows)
+
+    def set_cell(self, row: int, col: int, value: str) -> None:
+        """Record that the given cell was written"""
+        if self._values is None or row < 0 or col < 0:
+            return
+
+        while len(self._values) <= row:
+            self._values.append([])
+        row_values = self._values[row]
+        while len(row_values) <= col:
+            row_values.append('')
+
+        index = self._indexes.get(col)
+        if index is not None:
+            old_rows = index.get(name_key(row_values[col]))
+            if old_rows is not None and row in old_rows:
+                old_rows.remove(row)
+            index.setdefault(name_key(value), []).append(row)
+        row_values[col] = value
+        self._version += 1
+
+    async def _ensure_fresh(self) -> None:
+        if not self.stale:
+            self._num_hits += 1
+            return
+
+        async with self._lock:
+            if self.stale:
+                await self._refresh()
+
+    async def _refresh(self) -> None:
+        # Re-reading the footer reads the whole worksheet in one request, and loads this snapshot from it
+        self._num_reads += 1
+        await self._column_data.refresh_footer()
+        if self._values is None:
+            self.load(sheet_properties=self._column_data.sheet_properties, values=[])
+
+    def _get_index(self, col: int) -> Dict[str, List[int]]:
+        if col not in self._indexes:
+            index = dict()
+            for row, row_values in enumerate(self._values):
+                if col < len(row_values):
+                    index.setdefault(name_key(row_values[col]), []).append(row)
+            self._indexes[col] = index
+        return self._indexes[col]
+
+
+class TestWorksheetSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.snapshot = WorksheetSnapshot(column_data=None, ttl=60)
+        self.snapshot.load(
+            sheet_properties=[{'sheetId': 0, 'title': 'Week 1'}, {'sheetId': 12, 'title': 'Standings'}],
+            values=[
+                ['1', 'incnone', 'macnd'],
+                ['2', ' Elad ', 'wilarseny'],
+                [],
+                ['4', 'incnone', 'elad'],
+            ]
+        )
+
+    def tearDown(self):
+        self.loop.close()
+
+    def test_lookups(self):
+        find_rows = self.snapshot.find_rows
+        self.assertEqual(self.loop.run_until_complete(find_rows(1, ['INCNONE', 'incnone_twitch'])), [0, 3])
+        self.assertEqual(self.loop.run_until_complete(find_rows(1, ['elad'])), [1])
+        self.assertEqual(self.loop.run_until_complete(find_rows(0, ['4'])), [3])
+        self.assertEqual(self.loop.run_until_complete(self.snapshot.sheet_title(12)), 'Standings')
+        self.assertEqual(self.snapshot.num_reads, 0)
+
+    def test_set_cell(self):
+        self.loop.run_until_complete(self.snapshot.find_rows(1, ['incnone']))
+        version = self.snapshot.version
+        self.snapshot.set_cell(0, 1, 'yjalexis')
+        self.snapshot.set_cell(2, 4, 'macnd')
+        self.assertEqual(self.loop.run_until_complete(self.snapshot.find_rows(1, ['incnone'])), [3])
+        self.assertEqual(self.loop.run_until_complete(self.snapshot.find_rows(1, ['yjalexis'])), [0])
+        self.assertEqual(self.loop.run_until_complete(self.snapshot.get_values())[2], ['', '', '', '', 'macnd'])
+        self.assertEqual(self.snapshot.version, version + 2)
+
+    def test_invalidate(self):
+        self.assertFalse(self.snapshot.stale)
+        self.snapshot.invalidate()
+        self.assertTrue(self.snapshot.stale)
@@ -1,7 +1,7 @@
-import asyncio
 import datetime
 import pytz
 from necrobot.botbase import server
+from necrobot.botbase.scheduler import Scheduler
 
 
 DO_AUTOMATCHING = False
@@ -11,30 +11,34 @@ AUTOMATCH_HOUR = 12  # Noon UTC
 
 class Ladder(object):
     def __init__(self):
-        self._ladder_automatch_future = asyncio.ensure_future(self._wait_and_automatch())
+        self._schedule_automatch()
 
     def refresh(self):
         pass
 
     def close(self):
-        self._ladder_automatch_future.cancel()
+        Scheduler().cancel(('ladder_automatch',))
 
     @property
     def client(self):
         return server.client
 
-    async def _wait_and_automatch(self):
+    def _schedule_automatch(self):
         if not DO_AUTOMATCHING:
             return
 
-        utcnow_dt = datetime.datetime.utcnow()
+        utcnow_dt = pytz.utc.localize(datetime.datetime.utcnow())
         today_date = utcnow_dt.date()
         automatch_date = today_date + datetime.timedelta(days=((AUTOMATCH_WEEKDAY - today_date.weekday()) % 7))
         automatch_dt = pytz.utc.localize(
             datetime.datetime.combine(automatch_date, datetime.time(hour=AUTOMATCH_HOUR)))
-        time_until_automatch = automatch_dt - utcnow_dt
+        if automatch_dt <= utcnow_dt:
+            automatch_dt += datetime.timedelta(days=7)
 
-        await asyncio.sleep(time_until_automatch)
+        Scheduler().schedule_at(('ladder_automatch',), automatch_dt, self._automatch)
+
+    async def _automatch(self):
+        self._schedule_automatch()
         await self._make_automatches()
 
     async def _make_automatches(self):
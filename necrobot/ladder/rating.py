@@ -1,4 +1,6 @@
-import trueskill
+from necrobot.util import lazyimport
+
+trueskill = lazyimport.lazy_module('trueskill')
 
 
 class Rating(object):
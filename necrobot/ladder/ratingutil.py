@@ -1,10 +1,10 @@
 from math import sqrt, erf
 
-import trueskill
-
-from necrobot.util import console
+from necrobot.util import console, lazyimport
 from necrobot.ladder.rating import Rating
 
+trueskill = lazyimport.lazy_module('trueskill')
+
 
 def init():
     trueskill.setup(
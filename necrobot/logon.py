@@ -17,9 +17,11 @@ import warnings
 import websockets
 
 from necrobot import config
-from necrobot.util import backoff, console, seedgen
+from necrobot.util import backoff, console, lazyimport, seedgen
 from necrobot.botbase.necrobot import Necrobot
-from necrobot.stream.vodrecord import VodRecorder
+
+# Only imported if something actually records a VOD
+vodrecord = lazyimport.lazy_module('necrobot.stream.vodrecord')
 
 
 def logon(config_filename: str, load_config_fn: types.FunctionType, on_ready_fn: types.FunctionType = None) -> None:
@@ -163,6 +165,8 @@ def logon(config_filename: str, load_config_fn: types.FunctionType, on_ready_fn:
                 break
 
     finally:
+        if lazyimport.is_loaded('necrobot.stream.vodrecord'):
+            asyncio.get_event_loop().run_until_complete(vodrecord.VodRecorder().end_all())
+            asyncio.get_event_loop().run_until_complete(vodrecord.VodRecorder().close())
         asyncio.get_event_loop().close()
-        VodRecorder().end_all_async_unsafe()
         config.Config.write()
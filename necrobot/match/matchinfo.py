@@ -46,7 +46,7 @@ def parse_args(args: list) -> MatchInfo:
     Parameters
     ----------
     args: list[str]
-        The list of command-line args. Warning: list will be empty after this method.
+        The list of command-line args.
 
     Returns
     -------
@@ -67,7 +67,7 @@ def parse_args_modify(args: list, match_info: MatchInfo) -> MatchInfo:
     Parameters
     ----------
     args: list[str]
-        The list of command-line args. Warning: list will be empty after this method.
+        The list of command-line args.
     match_info: MatchInfo
         The RaceInfo to get a modified version of.
 
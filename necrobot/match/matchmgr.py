@@ -1,15 +1,19 @@
+import asyncio
 import discord
+import time
 
 from necrobot.botbase import server
 from necrobot.util import console
-from necrobot.database import matchdb
+from necrobot.database import matchdb, racedb
 from necrobot.match import matchutil
+from necrobot.user import userlib
 
 from necrobot.botbase.necrobot import Necrobot
 from necrobot.match.matchroom import MatchRoom
 from necrobot.necroevent.necroevent import NEDispatch, NecroEvent
 from necrobot.util.singleton import Singleton
 from necrobot.botbase.manager import Manager
+from necrobot.config import Config
 
 
 class MatchMgr(Manager, metaclass=Singleton):
@@ -48,18 +52,63 @@ class MatchMgr(Manager, metaclass=Singleton):
         """Recover MatchRoom objects on bot init
         
         Creates MatchRoom objects for `Match`es in the database which are registered (via their `channel_id`) to
-        some discord.Channel on the server.
+        some discord.Channel on the server. All data needed by the rooms is fetched up front in bulk, and the rooms
+        are then initialized concurrently (at most Config.MATCH_RECOVERY_CONCURRENCY at a time). Each room begins
+        accepting commands as soon as it is initialized.
         """
         console.info('Recovering stored match rooms------------')
+        begin_time = time.monotonic()
+
+        # Find the channels
+        room_rows = []
         for row in await matchdb.get_channeled_matches_raw_data():
             channel_id = int(row[13])
             channel = server.find_channel(channel_id=channel_id)
             if channel is not None:
-                match = await matchutil.make_match_from_raw_db_data(row=row)
-                new_room = MatchRoom(match_discord_channel=channel, match=match)
-                Necrobot().register_bot_channel(channel, new_room)
-                await new_room.initialize()
-                console.info('  Channel ID: {0}  Match: {1}'.format(channel_id, match))
+                room_rows.append((row, channel,))
             else:
                 console.info('  Couldn\'t find channel with ID {0}.'.format(channel_id))
+        query_time = time.monotonic()
+
+        # Prefetch everything the rooms need
+        user_ids = []
+        for row, _ in room_rows:
+            user_ids += [int(row[2]), int(row[3])]
+        await userlib.prefetch_users(user_ids)
+        race_infos = await racedb.get_race_infos_from_type_ids(
+            [int(row[1]) for row, _ in room_rows if row[1] is not None]
+        )
+        match_race_data = await matchdb.get_match_race_data_bulk([int(row[0]) for row, _ in room_rows])
+        prefetch_time = time.monotonic()
+
+        # Initialize the rooms
+        semaphore = asyncio.Semaphore(max(Config.MATCH_RECOVERY_CONCURRENCY, 1))
+
+        async def recover_room(the_row, the_channel) -> None:
+            async with semaphore:
+                try:
+                    match = await matchutil.make_match_from_raw_db_data(
+                        row=the_row,
+                        race_info=race_infos.get(int(the_row[1])) if the_row[1] is not None else None
+                    )
+                    new_room = MatchRoom(match_discord_channel=the_channel, match=match)
+                    await new_room.initialize(match_race_data=match_race_data.get(match.match_id))
+                    Necrobot().register_bot_channel(the_channel, new_room)
+                    console.info('  Channel ID: {0}  Match: {1}'.format(the_channel.id, match))
+                except Exception as e:
+                    console.error('  Failed to recover room in channel {0}: {1}'.format(the_channel.id, e))
+
+        await asyncio.gather(*[recover_room(row, channel) for row, channel in room_rows])
+        end_time = time.monotonic()
+
+        console.info(
+            'Recovered {num} match rooms in {total:.2f}s (query {query:.2f}s, prefetch {prefetch:.2f}s, '
+            'initialize {init:.2f}s).'.format(
+                num=len(room_rows),
+                total=end_time - begin_time,
+                query=query_time - begin_time,
+                prefetch=prefetch_time - query_time,
+                init=end_time - prefetch_time
+            )
+        )
         console.info('-----------------------------------------')
@@ -3,11 +3,11 @@
 import asyncio
 import datetime
 import discord
+import functools
 import pytz
 import typing
 
 from necrobot.botbase import server
-from necrobot.util import console
 from necrobot.util import ordinal
 from necrobot.util import timestr
 
@@ -21,6 +21,7 @@ from necrobot.ladder import ratingutil
 from necrobot.race import raceinfo
 
 from necrobot.botbase.botchannel import BotChannel
+from necrobot.botbase.scheduler import Scheduler
 from necrobot.config import Config
 from necrobot.match.match import Match
 from necrobot.match.matchracedata import MatchRaceData
@@ -47,8 +48,6 @@ class MatchRoom(BotChannel):
         self._current_race = None               # type: Race
         self._last_begun_race = None            # type: Race
 
-        self._countdown_to_match_future = None  # type: asyncio.Future
-
         self._current_race_number = None        # type: typing.Optional[int]
 
         self._last_begun_race_number = None     # type: typing.Optional[int]
@@ -176,12 +175,19 @@ class MatchRoom(BotChannel):
             contested=True
         )
 
-    async def initialize(self) -> None:
-        """Async initialization method"""
-        if self._countdown_to_match_future is not None:
-            self._countdown_to_match_future.cancel()
-        self._countdown_to_match_future = asyncio.ensure_future(self._countdown_to_match_start(warn=True))
-        self._match_race_data = await matchdb.get_match_race_data(self.match.match_id)
+    async def initialize(self, match_race_data: MatchRaceData = None) -> None:
+        """Async initialization method
+
+        Parameters
+        ----------
+        match_race_data: MatchRaceData
+            The race data for this match, if already known; otherwise, it is fetched from the database.
+        """
+        Scheduler().schedule(
+            self._countdown_key, 0, functools.partial(self._countdown_to_match_start, warn=True))
+        if match_race_data is None:
+            match_race_data = await matchdb.get_match_race_data(self.match.match_id)
+        self._match_race_data = match_race_data
         self._current_race_number = self._match_race_data.num_finished + self._match_race_data.num_canceled
         self._last_begun_race_number = self._current_race_number
         self._set_channel_commands()
@@ -244,12 +250,9 @@ class MatchRoom(BotChannel):
 
     async def update(self) -> None:
         if self.match.is_scheduled and self.current_race is None:
-            if self._countdown_to_match_future is not None:
-                self._countdown_to_match_future.cancel()
-            self._countdown_to_match_future = asyncio.ensure_future(self._countdown_to_match_start())
+            Scheduler().schedule(self._countdown_key, 0, self._countdown_to_match_start)
         elif not self.match.is_scheduled:
-            if self._countdown_to_match_future is not None:
-                self._countdown_to_match_future.cancel()
+            Scheduler().cancel(self._countdown_key)
             self._current_race = None
 
         self._set_channel_commands()
@@ -321,7 +324,8 @@ class MatchRoom(BotChannel):
             if not self.played_all_races:
                 await self._begin_new_race()
 
-    async def write(self, text: str) -> None:
+    # noinspection PyUnusedLocal
+    async def write(self, text: str, critical: bool = False) -> None:
         """Write text to the channel"""
         await self.client.send_message(self.channel, text)
 
@@ -372,52 +376,66 @@ class MatchRoom(BotChannel):
         )
         self._update_race_data(race_winner=winner)
 
+    @staticmethod
+    def countdown_key(match_id: int) -> tuple:
+        """The Scheduler key for the countdown to the match with the given ID"""
+        return 'match_start', match_id
+
+    @property
+    def _countdown_key(self) -> tuple:
+        return MatchRoom.countdown_key(self.match.match_id)
+
     async def _countdown_to_match_start(self, warn: bool = False) -> None:
         """Does things at certain times before the match
         
         Posts alerts to racers in this channel, and sends NecroEvents at alert times. Begins the match
-        at the appropriate time. This is stored as a future in this object, and is meant to be canceled
-        if this object closes.
+        at the appropriate time. Each step is run by the Scheduler under self._countdown_key, so the
+        countdown is stopped or restarted by cancelling or rescheduling that key.
         """
-        try:
-            if not self.match.is_scheduled:
-                return
-
-            time_until_match = self.match.time_until_match
-
-            # Begin match now if appropriate
-            if time_until_match < datetime.timedelta(seconds=0):
-                if not self.played_all_races:
-                    if warn:
-                        await self.write(
-                            'I believe that I was just restarted; an error may have occurred. I am '
-                            'beginning a new race and attempting to pick up this match where we left '
-                            'off. If this is an error, or if there are unrecorded races, please contact '
-                            'an admin.')
-                    await self._begin_new_race()
-                return
-
-            # Wait until the first warning
-            if time_until_match > Config.MATCH_FIRST_WARNING:
-                await asyncio.sleep((time_until_match - Config.MATCH_FIRST_WARNING).total_seconds())
-                await self.alert_racers()
-                await NEDispatch().publish('match_alert', match=self.match, final=False)
-
-            # Wait until the final warning
-            time_until_match = self.match.time_until_match
-            if time_until_match > Config.MATCH_FINAL_WARNING:
-                await asyncio.sleep((time_until_match - Config.MATCH_FINAL_WARNING).total_seconds())
-
-            # At this time, we've either just passed the FINAL_MATCH_WARNING or the function was just called
-            # (happens if the call comes sometime after the FINAL_MATCH_WARNING but before the match).
-            await self.alert_racers()
-            await NEDispatch().publish('match_alert', match=self.match, final=True)
-
-            await asyncio.sleep(self.match.time_until_match.total_seconds())
-            await self._begin_new_race()
-        except asyncio.CancelledError:
-            console.info('MatchRoom._countdown_to_match_start() was cancelled.')
-            raise
+        if not self.match.is_scheduled:
+            return
+
+        time_until_match = self.match.time_until_match
+
+        # Begin match now if appropriate
+        if time_until_match < datetime.timedelta(seconds=0):
+            if not self.played_all_races:
+                if warn:
+                    await self.write(
+                        'I believe that I was just restarted; an error may have occurred. I am '
+                        'beginning a new race and attempting to pick up this match where we left '
+                        'off. If this is an error, or if there are unrecorded races, please contact '
+                        'an admin.')
+                await self._begin_new_race()
+            return
+
+        # Wait until the first warning
+        if time_until_match > Config.MATCH_FIRST_WARNING:
+            self._schedule_countdown_step(time_until_match - Config.MATCH_FIRST_WARNING, self._first_match_warning)
+        # Wait until the final warning
+        elif time_until_match > Config.MATCH_FINAL_WARNING:
+            self._schedule_countdown_step(time_until_match - Config.MATCH_FINAL_WARNING, self._final_match_warning)
+        # We're already past the final warning (but before the match)
+        else:
+            await self._final_match_warning()
+
+    async def _first_match_warning(self) -> None:
+        await self.alert_racers()
+        await NEDispatch().publish('match_alert', match=self.match, final=False)
+
+        time_until_match = self.match.time_until_match
+        if time_until_match > Config.MATCH_FINAL_WARNING:
+            self._schedule_countdown_step(time_until_match - Config.MATCH_FINAL_WARNING, self._final_match_warning)
+        else:
+            await self._final_match_warning()
+
+    async def _final_match_warning(self) -> None:
+        await self.alert_racers()
+        await NEDispatch().publish('match_alert', match=self.match, final=True)
+        self._schedule_countdown_step(self.match.time_until_match, self._begin_new_race)
+
+    def _schedule_countdown_step(self, delay: datetime.timedelta, step) -> None:
+        Scheduler().schedule(self._countdown_key, delay.total_seconds(), step)
 
     async def _begin_new_race(self):
         """Begin a new race"""
@@ -442,8 +460,7 @@ class MatchRoom(BotChannel):
                 ordinal.num_to_text(match_race_data.num_finished + 1),
                 self.current_race.race_info.seed))
 
-        if self._countdown_to_match_future is not None:
-            self._countdown_to_match_future.cancel()
+        Scheduler().cancel(self._countdown_key)
 
     async def _end_match(self):
         """End the match"""
@@ -1,12 +1,15 @@
 import datetime
 import discord
+import itertools
 import pytz
+from typing import Iterable
 
 from necrobot.botbase import server
 from necrobot.database import matchdb, racedb
 from necrobot.util import console, timestr, writechannel, strutil
 
 from necrobot.botbase.necrobot import Necrobot
+from necrobot.botbase.scheduler import Scheduler
 from necrobot.gsheet.matchgsheetinfo import MatchGSheetInfo
 from necrobot.match.match import Match
 from necrobot.match.matchinfo import MatchInfo
@@ -95,13 +98,16 @@ async def get_match_from_id(match_id: int) -> Match or None:
         return None
 
 
-def get_matchroom_name(match: Match) -> str:
+def get_matchroom_name(match: Match, reserved_names: Iterable[str] = ()) -> str:
     """Get a new unique channel name corresponding to the match.
     
     Parameters
     ----------
     match: Match
         The match whose info determines the name.
+    reserved_names: Iterable[str]
+        Names to avoid in addition to those of existing channels (e.g. names chosen for channels that are about to
+        be created).
         
     Returns
     -------
@@ -113,11 +119,11 @@ def get_matchroom_name(match: Match) -> str:
     largest_postfix = 1
 
     found = False
-    for channel in server.server.channels:
-        if channel.name.startswith(name_prefix):
+    for channel_name in itertools.chain((channel.name for channel in server.server.channels), reserved_names):
+        if channel_name.startswith(name_prefix):
             found = True
             try:
-                val = int(channel.name[cut_length:])
+                val = int(channel_name[cut_length:])
                 largest_postfix = max(largest_postfix, val)
             except ValueError:
                 pass
@@ -218,7 +224,34 @@ async def delete_all_match_channels(log=False, completed_only=False) -> None:
             await matchdb.register_match_channel(match_id, None)
 
 
-async def make_match_room(match: Match, register=False) -> MatchRoom or None:
+async def register_matches(matches: list) -> None:
+    """Register all of the given Matches in the database at once (see matchdb.register_matches_bulk).
+    
+    Parameters
+    ----------
+    matches: list[Match]
+        The unregistered Matches, all of which must have been made from a worksheet.
+    """
+    await matchdb.register_matches_bulk(matches)
+    cache_matches(matches)
+
+
+def cache_matches(matches: list) -> None:
+    """Add the given (just registered) Matches to the match library"""
+    for match in matches:
+        match_library[match.match_id] = match
+
+
+def forget_matches(match_ids: Iterable[int]) -> None:
+    """Drop the cached Matches with the given IDs, so they are re-read from the database when next needed (e.g.
+    after changing them directly in the database).
+    """
+    for match_id in match_ids:
+        if match_id in match_library:
+            del match_library[match_id]
+
+
+async def make_match_room(match: Match, register=False, channel_name: str = None) -> MatchRoom or None:
     """Create a discord.Channel and a corresponding MatchRoom for the given Match. 
     
     Parameters
@@ -227,6 +260,9 @@ async def make_match_room(match: Match, register=False) -> MatchRoom or None:
         The Match to create a room for.
     register: bool
         If True, will register the Match in the database.
+    channel_name: str
+        The name of the channel to create, if one is created. If None, a new name is chosen with
+        get_matchroom_name.
 
     Returns
     -------
@@ -259,7 +295,7 @@ async def make_match_room(match: Match, register=False) -> MatchRoom or None:
         # noinspection PyUnresolvedReferences
         match_channel = await server.client.create_channel(
             server.server,
-            get_matchroom_name(match),
+            channel_name if channel_name is not None else get_matchroom_name(match),
             discord.ChannelPermissions(target=server.server.default_role, overwrite=deny_read),
             discord.ChannelPermissions(target=server.server.me, overwrite=permit_read),
             *racer_permissions,
@@ -297,6 +333,7 @@ async def close_match_room(match: Match) -> None:
                         '(match_id={1}).'.format(channel_id, match.match_id))
         return
 
+    Scheduler().cancel(MatchRoom.countdown_key(match.match_id))
     await Necrobot().unregister_bot_channel(channel)
     await server.client.delete_channel(channel)
     match.set_channel_id(None)
@@ -337,13 +374,25 @@ async def delete_match(match_id: int) -> None:
         del match_library[match_id]
 
 
-async def make_match_from_raw_db_data(row: list) -> Match:
+async def make_match_from_raw_db_data(row: list, race_info: RaceInfo = None) -> Match:
+    """Make a Match from a row of raw data from the matches table.
+
+    Parameters
+    ----------
+    row: list
+        The raw data (as returned by matchdb.get_raw_match_data).
+    race_info: RaceInfo
+        The RaceInfo for the row's race_type_id, if already known; otherwise, it is fetched from the database.
+    """
     match_id = int(row[0])
     if match_id in match_library:
         return match_library[match_id]
 
+    if race_info is None:
+        race_info = await racedb.get_race_info_from_type_id(int(row[1])) if row[1] is not None else RaceInfo()
+
     match_info = MatchInfo(
-        race_info=await racedb.get_race_info_from_type_id(int(row[1])) if row[1] is not None else RaceInfo(),
+        race_info=race_info,
         ranked=bool(row[9]),
         is_best_of=bool(row[10]),
         max_races=int(row[11])
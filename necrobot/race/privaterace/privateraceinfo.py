@@ -5,7 +5,6 @@ from necrobot.race import raceinfo
 
 # Attempts to parse the given command-line args into a race-info
 # Returns the RacePrivateInfo on success, None on failure
-# Warning: destroys information in the list args
 def parse_args(args):
     race_private_info = PrivateRaceInfo()
     race_private_info.race_info = raceinfo.RaceInfo()
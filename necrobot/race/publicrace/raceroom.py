@@ -1,22 +1,23 @@
 # A necrobot "casual" race room.
 
 import asyncio
-import datetime
 import discord
 
-from necrobot.botbase import server
+from necrobot.botbase import channelactivity, liveboard, server
 from necrobot.race import cmd_race
 from necrobot.race.publicrace import cmd_publicrace
 from necrobot.test import cmd_test
 
 from necrobot.database import racedb
 from necrobot.race import raceinfo
-from necrobot.util import strutil
+from necrobot.util import console, strutil
 
 from necrobot.botbase.botchannel import BotChannel
 from necrobot.botbase.necrobot import Necrobot
+from necrobot.botbase.scheduler import Scheduler
 from necrobot.config import Config
 from necrobot.race.race import Race, RaceEvent
+from necrobot.util.writecoalescer import WriteCoalescer
 
 
 class RaceRoom(BotChannel):
@@ -33,6 +34,10 @@ class RaceRoom(BotChannel):
         self._mentioned_users = []              # A list of users that were @mentioned when this race was created
         self._nopoke = False                    # When True, the .poke command fails
 
+        self._coalescer = None                  # Merges bursts of non-critical writes (None if disabled)
+        if Config.WRITE_COALESCE_SEC > 0:
+            self._coalescer = WriteCoalescer(send_fn=self._send_message, window=Config.WRITE_COALESCE_SEC)
+
         self.channel_commands = [
             cmd_race.Enter(self),
             cmd_race.Unenter(self),
@@ -141,14 +146,20 @@ class RaceRoom(BotChannel):
 # Coroutine methods ---------------------------------------------------
     # Set up the leaderboard etc. Should be called after creation; code not put into __init__ b/c coroutine
     async def initialize(self):
-        asyncio.ensure_future(self._monitor_for_cleanup())
+        channelactivity.record(self._channel.id)
+        self._schedule_cleanup_check()
         await self._make_new_race()
         await self.write('Enter the race with `.enter`, and type `.ready` when ready. '
                          'Finish the race with `.done` or `.forfeit`. Use `.help` for a command list.')
 
-    # Write text to the raceroom. Return a Message for the text written
-    async def write(self, text: str):
-        await self.client.send_message(self._channel, text)
+    # Write text to the raceroom. Critical text is sent immediately; other text may be merged with nearby writes.
+    async def write(self, text: str, critical: bool = False):
+        if self._coalescer is None:
+            await self._send_message(text)
+        elif critical:
+            await self._coalescer.write_now(text)
+        else:
+            await self._coalescer.write(text)
 
     # Processes a race event
     async def process(self, race_event: RaceEvent):
@@ -174,7 +185,7 @@ class RaceRoom(BotChannel):
 
     # Updates the leaderboard
     async def update(self):
-        await self.client.edit_channel(self._channel, topic=self.leaderboard)
+        await liveboard.topic_board(self._channel).update(self.leaderboard)
 
     # Post the race result to the race necrobot
     async def post_result(self, race: Race):
@@ -209,6 +220,17 @@ class RaceRoom(BotChannel):
 
     # Close the channel.
     async def close(self):
+        Scheduler().cancel(('raceroom_cleanup', self._channel.id))
+        Scheduler().cancel(('raceroom_nopoke', self._channel.id))
+        if self._coalescer is not None:
+            self._coalescer.cancel()
+            console.info('Closing race room {0}: {1} lines written in {2} messages ({3} saved).'.format(
+                self._channel.name,
+                self._coalescer.lines_written,
+                self._coalescer.messages_sent,
+                self._coalescer.messages_saved))
+        liveboard.discard_topic_board(self._channel)
+        channelactivity.forget(self._channel.id)
         Necrobot().unregister_bot_channel(self._channel)
         await server.client.delete_channel(self._channel)
 
@@ -239,9 +261,14 @@ class RaceRoom(BotChannel):
             for racer in unready_racers:
                 alert_string += racer.member.mention + ', '
             await self.write('Poking {0}.'.format(alert_string[:-2]))
-            asyncio.ensure_future(self._run_nopoke_delay())
+            Scheduler().schedule(('raceroom_nopoke', self._channel.id), Config.RACE_POKE_DELAY, self._end_nopoke)
 
 # Private -----------------------------------------------------------------
+    # Actually send text to the raceroom
+    async def _send_message(self, text: str):
+        await self.client.send_message(self._channel, text)
+        channelactivity.record(self._channel.id)
+
     # Makes a new Race (and stores the previous one in self._previous race)
     async def _make_new_race(self):
         # Make the race
@@ -261,42 +288,42 @@ class RaceRoom(BotChannel):
         self._mention_on_new_race = []
 
         if self.race_info.seeded:
-            await self.client.send_message(
-                self._channel,
+            await self.write(
                 '{0}\nRace number {1} is open for entry. Seed: {2}.'.format(
                     mention_text, self._race_number, self.current_race.race_info.seed))
         else:
-            await self.client.send_message(
-                self._channel,
+            await self.write(
                 '{0}\nRace number {1} is open for entry.'.format(mention_text, self._race_number))
 
+    # Schedules the next check for whether the room should be cleaned
+    def _schedule_cleanup_check(self):
+        Scheduler().schedule(('raceroom_cleanup', self._channel.id), 30, self._check_for_cleanup)
+
     # Checks to see whether the room should be cleaned.
-    async def _monitor_for_cleanup(self):
-        while True:
-            await asyncio.sleep(30)  # Wait between check times
+    async def _check_for_cleanup(self):
+        # No race object
+        if self._current_race is None:
+            await self.close()
+            return
 
-            # No race object
-            if self._current_race is None:
+        # Pre-race
+        elif self._current_race.before_race:
+            if not self._current_race.any_entrants:
+                if self._current_race.passed_no_entrants_cleanup_time:
+                    await self.close()
+                    return
+                elif self._current_race.passed_no_entrants_warning_time:
+                    await self.write('Warning: Race has had zero entrants for some time and will be closed soon.')
+
+        # Post-race
+        elif self._current_race.complete:
+            idle_time = channelactivity.idle_time(self._channel.id)
+            if idle_time is not None and idle_time > Config.CLEANUP_TIME:
                 await self.close()
                 return
 
-            # Pre-race
-            elif self._current_race.before_race:
-                if not self._current_race.any_entrants:
-                    if self._current_race.passed_no_entrants_cleanup_time:
-                        await self.close()
-                        return
-                    elif self._current_race.passed_no_entrants_warning_time:
-                        await self.write('Warning: Race has had zero entrants for some time and will be closed soon.')
-
-            # Post-race
-            elif self._current_race.complete:
-                async for msg in self.client.logs_from(self._channel, 1):
-                    if (datetime.datetime.utcnow() - msg.timestamp) > Config.CLEANUP_TIME:
-                        await self.close()
-                        return
-
-    # Implements a delay before pokes can happen again
-    async def _run_nopoke_delay(self):
-        await asyncio.sleep(Config.RACE_POKE_DELAY)
+        self._schedule_cleanup_check()
+
+    # Ends the delay before pokes can happen again
+    async def _end_nopoke(self):
         self._nopoke = False
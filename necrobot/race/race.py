@@ -1,6 +1,7 @@
 # Class implementing a single race. The parent passed to the constructor should implement the methods:
-#   async def write(str)
+#   async def write(str, critical=False)
 #   async def process(RaceEvent)
+# Writes flagged critical (countdown and GO!) are timing-sensitive and should be sent without delay.
 
 import asyncio
 import datetime
@@ -13,6 +14,7 @@ from necrobot.util import console, seedgen, racetime
 from necrobot.util.ordinal import ordinal
 # from necrobot.util import ratelimit
 
+from necrobot.botbase.scheduler import Scheduler
 from necrobot.race.raceconfig import RaceConfig
 from necrobot.race.raceinfo import RaceInfo
 from necrobot.race.racer import Racer
@@ -106,14 +108,14 @@ class RaceStatus(IntEnum):
 # Race class --------------------------------------------------------------
 class Race(object):
     # NB: Call the coroutine initialize() to set up the room
-    def __init__(self, parent, race_info: RaceInfo, race_config: RaceConfig = RaceConfig()):
+    def __init__(self, parent, race_info: RaceInfo, race_config: RaceConfig = None):
         self.race_id = None                       # After recording, the ID of the race in the DB
         self.parent = parent                      # The parent managing this race. Must implement write() and process().
         self.race_info = RaceInfo.copy(race_info)
         self.racers = []                          # A list of Racer
 
         self._status = RaceStatus.uninitialized   # The status of this race
-        self._config = race_config                # The RaceConfig to use (determines some race behavior)
+        self._config = race_config if race_config is not None else RaceConfig()  # Determines some race behavior
 
         self._countdown = int(0)                  # The current countdown
         self._start_datetime = None               # UTC time for the beginning of the race
@@ -124,7 +126,7 @@ class Race(object):
 
         self._delay_record = False                # If true, delay an extra config.FINALIZE_TIME_SEC before recording
         self._countdown_future = None             # The Future object for the race countdown
-        self._finalize_future = None              # The Future object for the finalization countdown
+        self._finalize_key = ('race_finalize', id(self))   # The Scheduler key for the finalization countdown
 
 # Race data
     # Returns the status string
@@ -618,7 +620,7 @@ class Race(object):
         self._status = RaceStatus.racing
         self._adj_start_time = time.monotonic()
         self._start_datetime = datetime.datetime.utcnow()
-        await self._write(mute=mute, text='GO!')
+        await self._write(mute=mute, text='GO!', critical=True)
         await self._process(RaceEvent.EventType.RACE_BEGIN)
 
     # Checks to see if all racers have either finished or forfeited. If so, ends the race.
@@ -637,7 +639,8 @@ class Race(object):
     async def _end_race(self):
         if self._status == RaceStatus.racing:
             self._status = RaceStatus.completed
-            self._finalize_future = asyncio.ensure_future(self._finalization_countdown())
+            self.delay_record = False
+            Scheduler().schedule(self._finalize_key, self._config.finalize_time_sec, self._finalization_countdown)
             await self._process(RaceEvent.EventType.RACE_END)
 
     # Countdown coroutine to be wrapped in self._countdown_future.
@@ -658,12 +661,15 @@ class Race(object):
         countdown_timer = length
 
         if incremental_start is not None:
-            await self._write(mute=mute, text='The race will begin in {0} seconds.'.format(countdown_timer))
+            await self._write(
+                mute=mute,
+                text='The race will begin in {0} seconds.'.format(countdown_timer),
+                critical=True)
         while countdown_timer > 0:
             sleep_time = float(countdown_systemtime_begin + length - countdown_timer + 1 - time.monotonic())
 
             if incremental_start is None or countdown_timer <= incremental_start:
-                await self._write(mute=mute, text='{}'.format(countdown_timer))
+                await self._write(mute=mute, text='{}'.format(countdown_timer), critical=True)
 
             if sleep_time < fudge:
                 countdown_systemtime_begin += fudge - sleep_time
@@ -687,20 +693,20 @@ class Race(object):
     # Actually unpause the race
     async def _do_unpause_race(self, mute=False):
         if self._status == RaceStatus.paused:
-            await self._write(mute=mute, text='GO!')
+            await self._write(mute=mute, text='GO!', critical=True)
             self._status = RaceStatus.racing
             self._adj_start_time += time.monotonic() - self._last_pause_time
             await self._process(RaceEvent.EventType.RACE_UNPAUSE)
             return True
         return False
 
-    # Countdown coroutine to be wrapped in self._finalize_future.
+    # Run by the Scheduler when the finalization countdown expires.
     # Warning: Do not call this -- use end_race instead.
     async def _finalization_countdown(self):
-        self.delay_record = True
-        while self.delay_record:
+        if self.delay_record:
             self.delay_record = False
-            await asyncio.sleep(self._config.finalize_time_sec)
+            Scheduler().schedule(self._finalize_key, self._config.finalize_time_sec, self._finalization_countdown)
+            return
 
         # Perform the finalization and record the race. At this point, the finalization cannot be canceled.
         self._status = RaceStatus.finalized
@@ -727,15 +733,14 @@ class Race(object):
     # Returns False only if race IS completed, AND we failed to restart it
     async def _cancel_finalization(self, mute=False):
         if self._status == RaceStatus.completed:
-            if self._finalize_future:
-                if self._finalize_future.cancel():
-                    self._finalize_future = None
-                    self._status = RaceStatus.racing
-                    await self._process(RaceEvent.EventType.RACE_CANCEL_FINALIZE)
-                    await self._write(mute=mute, text='Race end canceled -- unfinished racers may continue!')
-                    return True
-                else:
-                    return False
+            # Once the timer has fired, finalization is underway and can no longer be canceled
+            if Scheduler().cancel(self._finalize_key):
+                self._status = RaceStatus.racing
+                await self._process(RaceEvent.EventType.RACE_CANCEL_FINALIZE)
+                await self._write(mute=mute, text='Race end canceled -- unfinished racers may continue!')
+                return True
+            else:
+                return False
         return True
 
     # Causes the racer to forfeit
@@ -744,6 +749,6 @@ class Race(object):
             await self._check_for_race_end()
 
     # Write text
-    async def _write(self, text: str, mute=False):
+    async def _write(self, text: str, mute=False, critical=False):
         if not mute:
-            await self.parent.write(text)
+            await self.parent.write(text, critical=critical)
@@ -2,16 +2,23 @@ from necrobot.config import Config
 
 
 class RaceConfig(object):
+    # Defaults are read from Config when the RaceConfig is made (not when this module is imported), so that
+    # changes to Config apply to new races
     def __init__(
             self,
-            countdown_length=Config.COUNTDOWN_LENGTH,
-            unpause_countdown_length=Config.UNPAUSE_COUNTDOWN_LENGTH,
-            incremental_countdown_start=Config.INCREMENTAL_COUNTDOWN_START,
-            finalize_time_sec=Config.FINALIZE_TIME_SEC,
+            countdown_length=None,
+            unpause_countdown_length=None,
+            incremental_countdown_start=None,
+            finalize_time_sec=None,
             auto_forfeit=0
     ):
-        self.countdown_length = countdown_length
-        self.unpause_countdown_length = unpause_countdown_length
-        self.incremental_countdown_start = incremental_countdown_start
-        self.finalize_time_sec = finalize_time_sec
+        self.countdown_length = \
+            countdown_length if countdown_length is not None else Config.COUNTDOWN_LENGTH
+        self.unpause_countdown_length = \
+            unpause_countdown_length if unpause_countdown_length is not None else Config.UNPAUSE_COUNTDOWN_LENGTH
+        self.incremental_countdown_start = \
+            incremental_countdown_start if incremental_countdown_start is not None \
+            else Config.INCREMENTAL_COUNTDOWN_START
+        self.finalize_time_sec = \
+            finalize_time_sec if finalize_time_sec is not None else Config.FINALIZE_TIME_SEC
         self.auto_forfeit = auto_forfeit
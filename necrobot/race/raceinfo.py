@@ -88,7 +88,7 @@ def parse_args(args: list) -> RaceInfo:
     Parameters
     ----------
     args: list[str]
-        The list of command-line args. Warning: list will be empty after this method.
+        The list of command-line args.
 
     Returns
     -------
@@ -109,7 +109,7 @@ def parse_args_modify(args: list, race_info: RaceInfo) -> RaceInfo:
     Parameters
     ----------
     args: list[str]
-        The list of command-line args. Warning: list will be empty after this method.
+        The list of command-line args.
     race_info: RaceInfo
         The RaceInfo to get a modified version of.
 
@@ -13,8 +13,11 @@ class PMBotChannel(BotChannel):
         BotChannel.__init__(self)
         self.channel_commands = [
             cmd_admin.Die(self),
+            cmd_admin.LoopLag(self),
+            cmd_admin.Profile(self),
             cmd_admin.Reboot(self),
             cmd_admin.RedoInit(self),
+            cmd_admin.Timers(self),
 
             cmd_daily.DailyChar(self),
             cmd_daily.DailyResubmit(self),
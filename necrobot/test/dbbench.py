@@ -0,0 +1,809 @@
+"""
+Benchmark of the database layer (racedb, matchdb, userdb, dailydb, leaguedb and ratingsdb), run against a local
+MySQL or MariaDB server.
+
+The benchmark makes a scratch schema (dropping it first if it exists), creates the necrobot tables in it (as
+described in docs/Database.txt), and fills them with a synthetic history: users, races and race runs, matches and
+match races, dailies and daily runs, and ratings. It then makes several leagues with leaguedb.create_league, each
+holding a slice of that history. The server login is taken from the config file.
+
+Since the scratch schema and the league schemas made from it are dropped and remade, their names must end with
+BENCH_MARKER (e.g. "necrobot__bench", with leagues "necrobot__bench_league0", ...); any other name is refused, so
+that the benchmark can't drop a real database or league.
+
+Each public function in the database package is then called `repeat` times. For each, the benchmark reports the
+wall time per call, and the statements executed and rows read and written per call (counted by DBConnect). Run it
+with run_dbbench.py; --json writes machine-readable results, and --compare prints the change from an earlier JSON
+run. TestDBBench checks that every public function in the package has a benchmark.
+
+Tests that need a database can run inside a ScratchHistory, which builds a small history the same way.
+"""
+
+import datetime
+import inspect
+import json
+import mysql.connector
+import random
+import re
+import time
+import unittest
+from typing import Callable, List
+
+import necrobot.league.the_league
+from necrobot.database import dailydb, leaguedb, matchdb, racedb, ratingsdb, userdb
+from necrobot.ladder import ratingutil
+from necrobot.match import matchutil
+from necrobot.user import userlib
+
+from necrobot.config import Config
+from necrobot.database.dbconnect import DBConnect
+from necrobot.gsheet.matchgsheetinfo import MatchGSheetInfo
+from necrobot.race.raceinfo import RaceInfo
+from necrobot.user.userprefs import UserPrefs
+
+DATABASE_MODULES = [dailydb, leaguedb, matchdb, racedb, ratingsdb, userdb]
+CHARACTERS = ['Cadence', 'Melody', 'Aria', 'Dorian', 'Eli', 'Monk', 'Dove', 'Coda', 'Bolt', 'Bard']
+SHEET_ID = 1000
+INSERT_CHUNK = 5000
+BENCH_MARKER = '__bench'
+_SCRATCH_SCHEMA_REGEX = re.compile(r'^[A-Za-z0-9]\w*' + BENCH_MARKER + '$')
+
+SCHEMA_DDL = [
+    """
+    CREATE TABLE `users` (
+        `user_id` smallint unsigned NOT NULL AUTO_INCREMENT,
+        `discord_id` bigint unsigned DEFAULT NULL,
+        `discord_name` tinytext,
+        `rtmp_name` varchar(25) DEFAULT NULL,
+        `twitch_name` tinytext,
+        `timezone` tinytext,
+        `user_info` text,
+        `daily_alert` bit(1) NOT NULL DEFAULT b'0',
+        `race_alert` bit(1) NOT NULL DEFAULT b'0',
+        PRIMARY KEY (`user_id`),
+        UNIQUE KEY `discord_id` (`discord_id`),
+        UNIQUE KEY `rtmp_name` (`rtmp_name`)
+    ) DEFAULT CHARSET=utf8
+    """,
+    """
+    CREATE TABLE `race_types` (
+        `type_id` mediumint unsigned NOT NULL AUTO_INCREMENT,
+        `character` varchar(50) NOT NULL,
+        `descriptor` varchar(100) NOT NULL,
+        `seeded` bit(1) NOT NULL,
+        `amplified` bit(1) NOT NULL,
+        `seed_fixed` bit(1) NOT NULL,
+        PRIMARY KEY (`type_id`)
+    ) DEFAULT CHARSET=utf8
+    """,
+    """
+    CREATE TABLE `races` (
+        `race_id` int unsigned NOT NULL AUTO_INCREMENT,
+        `timestamp` datetime DEFAULT NULL,
+        `seed` int DEFAULT NULL,
+        `condor` bit(1) NOT NULL DEFAULT b'0',
+        `private` bit(1) NOT NULL DEFAULT b'0',
+        `type_id` mediumint unsigned DEFAULT NULL,
+        PRIMARY KEY (`race_id`),
+        KEY `type_id` (`type_id`)
+    ) DEFAULT CHARSET=utf8
+    """,
+    """
+    CREATE TABLE `race_runs` (
+        `race_id` int unsigned NOT NULL,
+        `user_id` smallint unsigned NOT NULL,
+        `time` int DEFAULT NULL,
+        `rank` tinyint DEFAULT NULL,
+        `igt` int DEFAULT NULL,
+        `comment` text,
+        `level` tinyint DEFAULT NULL,
+        PRIMARY KEY (`race_id`, `user_id`),
+        KEY `user_id` (`user_id`)
+    ) DEFAULT CHARSET=utf8
+    """,
+    """
+    CREATE TABLE `matches` (
+        `match_id` int unsigned NOT NULL AUTO_INCREMENT,
+        `race_type_id` mediumint unsigned DEFAULT NULL,
+        `racer_1_id` smallint unsigned NOT NULL,
+        `racer_2_id` smallint unsigned NOT NULL,
+        `suggested_time` datetime DEFAULT NULL,
+        `r1_confirmed` bit(1) NOT NULL DEFAULT b'0',
+        `r2_confirmed` bit(1) NOT NULL DEFAULT b'0',
+        `r1_unconfirmed` bit(1) NOT NULL DEFAULT b'0',
+        `r2_unconfirmed` bit(1) NOT NULL DEFAULT b'0',
+        `is_best_of` bit(1) NOT NULL DEFAULT b'0',
+        `number_of_races` tinyint NOT NULL DEFAULT 3,
+        `cawmentator_id` bigint unsigned DEFAULT NULL,
+        `channel_id` bigint unsigned DEFAULT NULL,
+        `ranked` bit(1) NOT NULL DEFAULT b'0',
+        `sheet_id` bigint DEFAULT NULL,
+        `sheet_row` int DEFAULT NULL,
+        `finish_time` datetime DEFAULT NULL,
+        PRIMARY KEY (`match_id`),
+        KEY `racer_1_id` (`racer_1_id`),
+        KEY `racer_2_id` (`racer_2_id`)
+    ) DEFAULT CHARSET=utf8
+    """,
+    """
+    CREATE TABLE `match_races` (
+        `match_id` int unsigned NOT NULL,
+        `race_number` smallint unsigned NOT NULL,
+        `race_id` int unsigned DEFAULT NULL,
+        `winner` tinyint DEFAULT NULL,
+        `canceled` bit(1) NOT NULL DEFAULT b'0',
+        `contested` bit(1) NOT NULL DEFAULT b'0',
+        PRIMARY KEY (`match_id`, `race_number`)
+    ) DEFAULT CHARSET=utf8
+    """,
+    """
+    CREATE TABLE `dailies` (
+        `daily_id` int NOT NULL,
+        `type` tinyint unsigned NOT NULL,
+        `seed` int DEFAULT NULL,
+        `msg_id` bigint unsigned DEFAULT NULL,
+        PRIMARY KEY (`daily_id`, `type`)
+    ) DEFAULT CHARSET=utf8
+    """,
+    """
+    CREATE TABLE `daily_runs` (
+        `daily_id` int NOT NULL,
+        `type` tinyint unsigned NOT NULL,
+        `user_id` smallint unsigned NOT NULL,
+        `level` tinyint DEFAULT NULL,
+        `time` int DEFAULT NULL,
+        PRIMARY KEY (`user_id`, `daily_id`, `type`)
+    ) DEFAULT CHARSET=utf8
+    """,
+    """
+    CREATE VIEW `daily_runs_uinfo` AS
+        SELECT
+            `daily_runs`.`daily_id`,
+            `daily_runs`.`type`,
+            `daily_runs`.`user_id`,
+            `daily_runs`.`level`,
+            `daily_runs`.`time`,
+            `users`.`discord_name`
+        FROM `daily_runs`
+            INNER JOIN `users` ON `users`.`user_id` = `daily_runs`.`user_id`
+    """,
+    """
+    CREATE TABLE `leagues` (
+        `schema_name` varchar(25) NOT NULL,
+        `league_name` tinytext,
+        `race_type` mediumint unsigned DEFAULT NULL,
+        `number_of_races` tinyint DEFAULT NULL,
+        `is_best_of` bit(1) DEFAULT NULL,
+        `ranked` bit(1) DEFAULT NULL,
+        `gsheet_id` tinytext,
+        `deadline` tinytext,
+        PRIMARY KEY (`schema_name`)
+    ) DEFAULT CHARSET=utf8
+    """,
+    """
+    CREATE TABLE `ratings` (
+        `discord_id` bigint unsigned NOT NULL,
+        `trueskill_mu` float DEFAULT NULL,
+        `trueskill_sigma` float DEFAULT NULL,
+        PRIMARY KEY (`discord_id`)
+    ) DEFAULT CHARSET=utf8
+    """,
+]
+
+
+class HistorySize(object):
+    """The size of the synthetic history"""
+    def __init__(
+            self,
+            num_users: int = 5000,
+            num_race_runs: int = 500000,
+            num_matches: int = 5000,
+            num_dailies: int = 365,
+            runs_per_daily: int = 60,
+            num_leagues: int = 3
+    ):
+        self.num_users = num_users
+        self.num_race_runs = num_race_runs
+        self.num_matches = num_matches
+        self.num_dailies = num_dailies
+        self.runs_per_daily = runs_per_daily
+        self.num_leagues = num_leagues
+
+    def as_dict(self) -> dict:
+        return dict(self.__dict__)
+
+
+class FunctionResult(object):
+    def __init__(self, name: str):
+        self.name = name
+        self.times = list()         # type: List[float]
+        self.num_queries = 0
+        self.num_rows_read = 0
+        self.num_rows_written = 0
+        self.error = None           # type: str
+
+    @property
+    def num_calls(self) -> int:
+        return len(self.times)
+
+    def per_call(self, total: int) -> float:
+        return total / self.num_calls if self.num_calls else 0.0
+
+    def as_dict(self) -> dict:
+        times = sorted(self.times)
+        return {
+            'function': self.name,
+            'calls': self.num_calls,
+            'mean_ms': round(1000 * sum(times) / len(times), 3) if times else None,
+            'p50_ms': round(1000 * times[len(times) // 2], 3) if times else None,
+            'max_ms': round(1000 * times[-1], 3) if times else None,
+            'queries_per_call': round(self.per_call(self.num_queries), 2),
+            'rows_read_per_call': round(self.per_call(self.num_rows_read), 2),
+            'rows_written_per_call': round(self.per_call(self.num_rows_written), 2),
+            'error': self.error,
+        }
+
+
+class _BenchCase(object):
+    """A benchmark of one database function. args_fn(ctx, i) is a coroutine giving the arguments for the i-th
+    call; it is not timed. League cases run with a league set as the current league.
+    """
+    def __init__(self, fn: Callable, args_fn: Callable, league: bool = False):
+        self.fn = fn
+        self.args_fn = args_fn
+        self.league = league
+
+    @property
+    def name(self) -> str:
+        return '{0}.{1}'.format(self.fn.__module__.split('.')[-1], self.fn.__name__)
+
+
+class _BenchContext(object):
+    """Objects from the synthetic history for the benchmarks to use"""
+    def __init__(self, schema_name: str, size: HistorySize, rng: random.Random):
+        self.schema_name = schema_name
+        self.size = size
+        self.rng = rng
+        self.user_ids = list()          # type: List[int]
+        self.race_type_ids = list()     # type: List[int]
+        self.race_ids = list()          # type: List[int]
+        self.matches = list()           # Registered Match objects
+        self.necro_users = list()       # NecroUser objects
+        self.league = None
+        self.league_schemas = list()    # type: List[str]
+
+    def user_id(self, i: int) -> int:
+        return self.user_ids[i % len(self.user_ids)]
+
+    def discord_id(self, i: int) -> int:
+        return _discord_id(self.user_id(i))
+
+    def match(self, i: int):
+        return self.matches[i % len(self.matches)]
+
+    def daily_id(self, i: int) -> int:
+        return 1 + (i * 37) % self.size.num_dailies
+
+
+class _BenchRacer(object):
+    """The parts of a Racer that racedb.record_race reads"""
+    def __init__(self, user_id: int, racer_time: int, level: int):
+        self.user_id = user_id
+        self.time = racer_time
+        self.igt = -1
+        self.comment = ''
+        self.level = level
+
+    @property
+    def is_finished(self) -> bool:
+        return self.level == -2
+
+
+class _BenchRace(object):
+    """The parts of a Race that racedb.record_race reads"""
+    def __init__(self, race_info: RaceInfo, racers: List[_BenchRacer]):
+        self.race_id = None
+        self.race_info = race_info
+        self.racers = racers
+        self.start_datetime = datetime.datetime.utcnow()
+
+
+class _BenchDiscordUser(object):
+    def __init__(self, discord_id: int, display_name: str):
+        self.id = discord_id
+        self.display_name = display_name
+
+
+async def run_benchmark(
+        schema_name: str = 'necrobot' + BENCH_MARKER,
+        size: HistorySize = None,
+        repeat: int = 5,
+        seed: int = 0
+) -> dict:
+    """Build the synthetic history and benchmark every database function. The config must already be initialized
+    (for the database login).
+
+    Parameters
+    ----------
+    schema_name: str
+        The scratch schema to build the history in; its name must end with BENCH_MARKER. It, and any schema whose
+        name begins with it and an underscore, is dropped first.
+    size: HistorySize
+        The size of the synthetic history.
+    repeat: int
+        The number of calls to make to each function.
+    seed: int
+        The seed for the random history.
+
+    Returns
+    -------
+    dict
+        The history size, the time taken to build it, and a FunctionResult dict for each function.
+    """
+    size = size if size is not None else HistorySize()
+    _check_scratch_schema(schema_name)
+
+    saved_db_name = Config.MYSQL_DB_NAME
+    saved_league = necrobot.league.the_league.league
+    ctx = _BenchContext(schema_name=schema_name, size=size, rng=random.Random(seed))
+    results = []
+    try:
+        begin = time.monotonic()
+        _reset_schemas(schema_name)
+        Config.MYSQL_DB_NAME = schema_name
+        DBConnect.close()
+        await _build_history(ctx)
+        build_time = time.monotonic() - begin
+
+        await _prepare_context(ctx)
+        for case in _cases():
+            results.append(await _run_case(case, ctx, repeat))
+    finally:
+        necrobot.league.the_league.league = saved_league
+        DBConnect.count_queries = False
+        DBConnect.close()
+        Config.MYSQL_DB_NAME = saved_db_name
+
+    return {
+        'history': size.as_dict(),
+        'repeat': repeat,
+        'build_sec': round(build_time, 2),
+        'results': [result.as_dict() for result in results],
+    }
+
+
+class ScratchHistory(object):
+    """A small synthetic history in a scratch schema, for tests that need a database. Used as an async context
+    manager; inside it, the database connection and the current league point at the scratch schema (and its first
+    league), and the context gives the _BenchContext.
+    """
+    def __init__(self, schema_name: str = 'test' + BENCH_MARKER, size: HistorySize = None, seed: int = 0):
+        if size is None:
+            size = HistorySize(
+                num_users=50, num_race_runs=200, num_matches=20, num_dailies=2, runs_per_daily=5, num_leagues=1)
+        self.ctx = _BenchContext(schema_name=schema_name, size=size, rng=random.Random(seed))
+        self._saved_db_name = None
+        self._saved_league = None
+
+    async def __aenter__(self) -> _BenchContext:
+        _check_scratch_schema(self.ctx.schema_name)
+        self._saved_db_name = Config.MYSQL_DB_NAME
+        self._saved_league = necrobot.league.the_league.league
+        _reset_schemas(self.ctx.schema_name)
+        Config.MYSQL_DB_NAME = self.ctx.schema_name
+        DBConnect.close()
+        await _build_history(self.ctx)
+        necrobot.league.the_league.league = self.ctx.league
+        return self.ctx
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        necrobot.league.the_league.league = self._saved_league
+        DBConnect.close()
+        Config.MYSQL_DB_NAME = self._saved_db_name
+
+
+def format_results(run: dict) -> str:
+    lines = [
+        'History: {0} (built in {1:.1f}s)'.format(
+            ', '.join('{0}={1}'.format(key, val) for key, val in sorted(run['history'].items())), run['build_sec']),
+        '',
+        '{0:<42} {1:>9} {2:>9} {3:>8} {4:>10} {5:>10}'.format(
+            'function', 'p50 (ms)', 'max (ms)', 'queries', 'rows read', 'rows writ'),
+    ]
+    for result in run['results']:
+        if result['error'] is not None:
+            lines.append('{0:<42} error: {1}'.format(result['function'], result['error']))
+            continue
+        lines.append('{0:<42} {1:>9.2f} {2:>9.2f} {3:>8.2f} {4:>10.1f} {5:>10.1f}'.format(
+            result['function'],
+            result['p50_ms'],
+            result['max_ms'],
+            result['queries_per_call'],
+            result['rows_read_per_call'],
+            result['rows_written_per_call']
+        ))
+    return '\n'.join(lines)
+
+
+def format_comparison(old_run: dict, new_run: dict) -> str:
+    """Compare two runs (as returned by run_benchmark, e.g. loaded from JSON), function by function"""
+    old_results = {result['function']: result for result in old_run['results']}
+    lines = ['{0:<42} {1:>9} {2:>9} {3:>8} {4:>13}'.format('function', 'old p50', 'new p50', 'change', 'queries')]
+    for new in new_run['results']:
+        old = old_results.get(new['function'])
+        if old is None or old['p50_ms'] is None or new['p50_ms'] is None:
+            lines.append('{0:<42} {1}'.format(new['function'], 'new' if old is None else 'error'))
+            continue
+        change = (new['p50_ms'] - old['p50_ms']) / old['p50_ms'] if old['p50_ms'] else 0.0
+        queries = '{0:.2f}'.format(new['queries_per_call'])
+        if new['queries_per_call'] != old['queries_per_call']:
+            queries = '{0:.2f} -> {1:.2f}'.format(old['queries_per_call'], new['queries_per_call'])
+        lines.append('{0:<42} {1:>9.2f} {2:>9.2f} {3:>+7.0%} {4:>13}'.format(
+            new['function'], old['p50_ms'], new['p50_ms'], change, queries))
+    return '\n'.join(lines)
+
+
+def results_json(run: dict) -> str:
+    return json.dumps(run, indent=2)
+
+
+# Running -----------------------------------------------------------------------------------------------------------
+async def _run_case(case: _BenchCase, ctx: _BenchContext, repeat: int) -> FunctionResult:
+    result = FunctionResult(case.name)
+    necrobot.league.the_league.league = ctx.league if case.league else None
+    try:
+        for i in range(repeat):
+            args = await case.args_fn(ctx, i)
+
+            DBConnect.count_queries = True
+            queries_before = DBConnect.num_queries
+            read_before = DBConnect.num_rows_read
+            written_before = DBConnect.num_rows_written
+            begin = time.perf_counter()
+            try:
+                await case.fn(*args)
+            finally:
+                result.times.append(time.perf_counter() - begin)
+                DBConnect.count_queries = False
+                result.num_queries += DBConnect.num_queries - queries_before
+                result.num_rows_read += DBConnect.num_rows_read - read_before
+                result.num_rows_written += DBConnect.num_rows_written - written_before
+    except Exception as e:
+        result.error = '{0}: {1}'.format(type(e).__name__, e)
+    finally:
+        necrobot.league.the_league.league = None
+    return result
+
+
+def _cases() -> List[_BenchCase]:
+    """The benchmark for each public function in the database package"""
+    async def new_matches(ctx: _BenchContext, i: int, num: int = 20) -> list:
+        matches = []
+        for row in range(num):
+            matches.append(await matchutil.make_match(
+                racer_1_id=ctx.user_id(2*row),
+                racer_2_id=ctx.user_id(2*row + 1),
+                gsheet_info=MatchGSheetInfo(wks_id=SHEET_ID + 1 + i, row=row),
+                register=False
+            ))
+        return matches
+
+    async def sheet_sync_args(ctx: _BenchContext, i: int) -> tuple:
+        rows = await matchdb.get_sheet_matches_raw_data(SHEET_ID)
+        updates = [(row[1], row[2], row[3], row[4], row[9], row[10], row[11], row[0]) for row in rows]
+        return SHEET_ID, updates, {row[15]: '{0:032x}'.format(i) for row in rows}, []
+
+    async def new_race(ctx: _BenchContext, i: int) -> tuple:
+        racers = [_BenchRacer(ctx.user_id(i + idx), 30000 + 1000*idx, -2) for idx in range(4)]
+        return _BenchRace(RaceInfo(), racers),
+
+    def args(fn: Callable) -> Callable:
+        async def args_fn(ctx: _BenchContext, i: int) -> tuple:
+            return fn(ctx, i)
+        return args_fn
+
+    async def registered_new_matches(ctx: _BenchContext, i: int) -> tuple:
+        return await new_matches(ctx, i),
+
+    async def deletable_match_id(ctx: _BenchContext, i: int) -> tuple:
+        matches = await new_matches(ctx, 1000 + i, num=1)
+        await matches[0].commit()
+        return matches[0].match_id,
+
+    return [
+        # dailydb
+        _BenchCase(dailydb.get_daily_seed, args(lambda ctx, i: (ctx.daily_id(i), 0))),
+        _BenchCase(dailydb.get_daily_times, args(lambda ctx, i: (ctx.daily_id(i), 0))),
+        _BenchCase(dailydb.has_submitted_daily, args(lambda ctx, i: (ctx.user_id(i), ctx.daily_id(i), 0))),
+        _BenchCase(dailydb.has_registered_daily, args(lambda ctx, i: (ctx.user_id(i), ctx.daily_id(i), 0))),
+        _BenchCase(dailydb.register_daily, args(lambda ctx, i: (ctx.user_id(i), ctx.daily_id(i), 1))),
+        _BenchCase(dailydb.register_daily_bulk, args(
+            lambda ctx, i: (ctx.user_ids[:ctx.size.runs_per_daily], ctx.size.num_dailies + 1 + i, 1))),
+        _BenchCase(dailydb.registered_daily, args(lambda ctx, i: (ctx.user_id(i), 0))),
+        _BenchCase(dailydb.submitted_daily, args(lambda ctx, i: (ctx.user_id(i), 0))),
+        _BenchCase(dailydb.delete_from_daily, args(lambda ctx, i: (ctx.user_id(i), ctx.daily_id(i), 1))),
+        _BenchCase(dailydb.create_daily, args(lambda ctx, i: (ctx.size.num_dailies + 1 + i, 0, 1000 + i))),
+        _BenchCase(dailydb.create_or_update_daily_message, args(
+            lambda ctx, i: (ctx.size.num_dailies + 101 + i, 0, 1000 + i, 2000 + i))),
+        _BenchCase(dailydb.register_daily_message, args(lambda ctx, i: (ctx.daily_id(i), 0, 3000 + i))),
+        _BenchCase(dailydb.get_daily_message_id, args(lambda ctx, i: (ctx.daily_id(i), 0))),
+
+        # leaguedb
+        _BenchCase(leaguedb.create_league, args(lambda ctx, i: ('{0}_new{1}'.format(ctx.schema_name, i),))),
+        _BenchCase(leaguedb.get_entrant_ids, args(lambda ctx, i: ()), league=True),
+        _BenchCase(leaguedb.get_league, args(lambda ctx, i: (ctx.league_schemas[i % len(ctx.league_schemas)],))),
+        _BenchCase(leaguedb.register_user, args(lambda ctx, i: (ctx.user_id(i),)), league=True),
+        _BenchCase(leaguedb.write_league, args(lambda ctx, i: (ctx.league,))),
+
+        # matchdb
+        _BenchCase(matchdb.record_match_race, args(lambda ctx, i: (ctx.match(i), None, ctx.race_ids[i], 1))),
+        _BenchCase(matchdb.set_match_race_contested, args(lambda ctx, i: (ctx.match(i), 1))),
+        _BenchCase(matchdb.change_winner, args(lambda ctx, i: (ctx.match(i), 1, 2))),
+        _BenchCase(matchdb.cancel_race, args(lambda ctx, i: (ctx.match(i), 1))),
+        _BenchCase(matchdb.write_match, args(lambda ctx, i: (ctx.match(i),))),
+        _BenchCase(matchdb.register_match_channel, args(lambda ctx, i: (ctx.match(i).match_id, 4000 + i))),
+        _BenchCase(matchdb.get_match_channel_id, args(lambda ctx, i: (ctx.match(i).match_id,))),
+        _BenchCase(matchdb.get_channeled_matches_raw_data, args(lambda ctx, i: (i % 2 == 0, i % 2 == 0))),
+        _BenchCase(matchdb.get_sheet_matches_raw_data, args(lambda ctx, i: (SHEET_ID,))),
+        _BenchCase(matchdb.register_matches_bulk, registered_new_matches),
+        _BenchCase(matchdb.get_sheet_row_hashes, args(lambda ctx, i: (SHEET_ID,))),
+        _BenchCase(matchdb.apply_sheet_sync, sheet_sync_args),
+        _BenchCase(matchdb.delete_match, deletable_match_id),
+        _BenchCase(matchdb.get_match_race_data, args(lambda ctx, i: (ctx.match(i).match_id,))),
+        _BenchCase(matchdb.get_match_race_data_bulk, args(
+            lambda ctx, i: ([match.match_id for match in ctx.matches],))),
+        _BenchCase(matchdb.get_match_id, args(
+            lambda ctx, i: (ctx.match(i).racer_1.user_id, ctx.match(i).racer_2.user_id))),
+        _BenchCase(matchdb.get_fastest_wins_raw, args(lambda ctx, i: (20,))),
+        _BenchCase(matchdb.get_matchstats_raw, args(lambda ctx, i: (ctx.user_id(i),)), league=True),
+        _BenchCase(matchdb.get_raw_match_data, args(lambda ctx, i: (ctx.match(i).match_id,))),
+
+        # racedb
+        _BenchCase(racedb.record_race, new_race),
+        _BenchCase(racedb.get_race_type_id, args(lambda ctx, i: (RaceInfo(),))),
+        _BenchCase(racedb.get_race_info_from_type_id, args(
+            lambda ctx, i: (ctx.race_type_ids[i % len(ctx.race_type_ids)],))),
+        _BenchCase(racedb.get_race_infos_from_type_ids, args(lambda ctx, i: (ctx.race_type_ids,))),
+        _BenchCase(racedb.get_allzones_race_numbers, args(lambda ctx, i: (ctx.user_id(i), True))),
+        _BenchCase(racedb.get_all_racedata, args(lambda ctx, i: (ctx.user_id(i), 'Cadence', True))),
+        _BenchCase(racedb.get_fastest_times_leaderboard, args(lambda ctx, i: ('Cadence', True, 20))),
+        _BenchCase(racedb.get_most_races_leaderboard, args(lambda ctx, i: ('Cadence', 20))),
+        _BenchCase(racedb.get_largest_race_number, args(lambda ctx, i: (ctx.user_id(i),))),
+
+        # ratingsdb
+        _BenchCase(ratingsdb.get_rating, args(lambda ctx, i: (ctx.discord_id(i),))),
+        _BenchCase(ratingsdb.set_rating, args(lambda ctx, i: (ctx.discord_id(i), ratingutil.create_rating()))),
+
+        # userdb
+        _BenchCase(userdb.write_user, args(lambda ctx, i: (ctx.necro_users[i % len(ctx.necro_users)],))),
+        _BenchCase(userdb.get_users_with_any, args(lambda ctx, i: (None, None, None, _user_name(ctx.user_id(i))))),
+        _BenchCase(userdb.get_users_with_all, args(lambda ctx, i: (None, None, None, _user_name(ctx.user_id(i))))),
+        _BenchCase(userdb.get_users_with_ids, args(lambda ctx, i: (ctx.user_ids[:100],))),
+        _BenchCase(userdb.get_users_with_any_names, args(
+            lambda ctx, i: ([_user_name(user_id) for user_id in ctx.user_ids[:100]],))),
+        _BenchCase(userdb.get_all_discord_ids_matching_prefs, args(
+            lambda ctx, i: (UserPrefs(daily_alert=True, race_alert=None),))),
+        _BenchCase(userdb.get_all_users_matching_prefs, args(
+            lambda ctx, i: (UserPrefs(daily_alert=None, race_alert=True),))),
+        _BenchCase(userdb.register_discord_user, args(
+            lambda ctx, i: (_BenchDiscordUser(ctx.discord_id(i), 'renamed{0}'.format(i)),))),
+    ]
+
+
+# Building the history -------------------------------------------------------------------------------------------
+def _check_scratch_schema(schema_name: str) -> None:
+    """Refuse to use a schema whose name doesn't mark it as a scratch schema (it, and every schema whose name
+    begins with it, will be dropped)"""
+    if not _SCRATCH_SCHEMA_REGEX.match(schema_name) or schema_name == Config.MYSQL_DB_NAME:
+        raise RuntimeError(
+            'The scratch schema\'s name must end with "{0}" (and must not be the bot\'s database); got "{1}".'.format(
+                BENCH_MARKER, schema_name))
+
+
+def _reset_schemas(schema_name: str) -> None:
+    """Drop the scratch schema and any league schemas made from it, and make the scratch schema again"""
+    _check_scratch_schema(schema_name)
+    connection = mysql.connector.connect(
+        user=Config.MYSQL_DB_USER,
+        password=Config.MYSQL_DB_PASSWD,
+        host=Config.MYSQL_DB_HOST)
+    try:
+        cursor = connection.cursor()
+        cursor.execute(
+            """
+            SELECT SCHEMA_NAME
+            FROM INFORMATION_SCHEMA.SCHEMATA
+            WHERE SCHEMA_NAME = %s OR SCHEMA_NAME LIKE %s
+            """,
+            (schema_name, schema_name.replace('_', '\\_') + '\\_%',)
+        )
+        for row in cursor.fetchall():
+            if BENCH_MARKER in row[0]:
+                cursor.execute('DROP SCHEMA `{0}`'.format(row[0]))
+        cursor.execute('CREATE SCHEMA `{0}` DEFAULT CHARACTER SET = utf8'.format(schema_name))
+        cursor.close()
+    finally:
+        connection.close()
+
+
+async def _insert(table: str, columns: List[str], rows: List[tuple]) -> None:
+    async with DBConnect(commit=True) as cursor:
+        statement = 'INSERT INTO `{0}` ({1}) VALUES ({2})'.format(
+            table,
+            ', '.join('`{0}`'.format(column) for column in columns),
+            ', '.join(['%s'] * len(columns))
+        )
+        for idx in range(0, len(rows), INSERT_CHUNK):
+            cursor.executemany(statement, rows[idx:idx + INSERT_CHUNK])
+
+
+async def _build_history(ctx: _BenchContext) -> None:
+    size = ctx.size
+    rng = ctx.rng
+
+    async with DBConnect(commit=True) as cursor:
+        for statement in SCHEMA_DDL:
+            cursor.execute(statement)
+
+    # Users
+    await _insert('users', ['user_id', 'discord_id', 'discord_name', 'rtmp_name', 'timezone', 'daily_alert',
+                            'race_alert'], [
+        (user_id, _discord_id(user_id), _user_name(user_id), _user_name(user_id), 'US/Eastern',
+         user_id % 3 == 0, user_id % 5 == 0)
+        for user_id in range(1, size.num_users + 1)
+    ])
+
+    # Race types: every character, seeded or not, amplified or not
+    race_types = []
+    for character in CHARACTERS:
+        for seeded in [True, False]:
+            for amplified in [True, False]:
+                race_types.append((len(race_types) + 1, character, 'All-zones', seeded, amplified, False))
+    await _insert('race_types', ['type_id', 'character', 'descriptor', 'seeded', 'amplified', 'seed_fixed'],
+                  race_types)
+    ctx.race_type_ids = [race_type[0] for race_type in race_types]
+
+    # Races and runs
+    races = []
+    race_runs = []
+    start = datetime.datetime(2016, 1, 1)
+    while len(race_runs) < size.num_race_runs:
+        race_id = len(races) + 1
+        races.append((
+            race_id,
+            start + datetime.timedelta(minutes=10*race_id),
+            rng.randrange(1, 10**8),
+            rng.random() < 0.1,
+            rng.choice(ctx.race_type_ids)
+        ))
+        entrants = rng.sample(range(1, size.num_users + 1), min(rng.randint(2, 6), size.num_users))
+        rank = 1
+        for user_id in entrants:
+            finished = rng.random() < 0.6
+            race_runs.append((
+                race_id,
+                user_id,
+                rng.randrange(30000, 120000) if finished else -1,
+                rank if finished else None,
+                -1,
+                '',
+                -2 if finished else rng.randrange(0, 20)
+            ))
+            rank += 1 if finished else 0
+    await _insert('races', ['race_id', 'timestamp', 'seed', 'private', 'type_id'], races)
+    await _insert('race_runs', ['race_id', 'user_id', 'time', 'rank', 'igt', 'comment', 'level'], race_runs)
+    ctx.race_ids = [race[0] for race in races]
+
+    # Matches, each with three races; some from a worksheet, some with channels, most finished
+    matches = []
+    match_races = []
+    for match_id in range(1, size.num_matches + 1):
+        racer_1_id, racer_2_id = rng.sample(range(1, size.num_users + 1), 2)
+        finished = rng.random() < 0.8
+        suggested_time = start + datetime.timedelta(hours=match_id)
+        matches.append((
+            match_id,
+            rng.choice(ctx.race_type_ids),
+            racer_1_id,
+            racer_2_id,
+            suggested_time,
+            True,
+            True,
+            True,
+            3,
+            4000 + match_id if not finished and rng.random() < 0.1 else None,
+            SHEET_ID if match_id <= 200 else None,
+            match_id if match_id <= 200 else None,
+            suggested_time + datetime.timedelta(hours=1) if finished else None,
+        ))
+        if finished:
+            for race_number in range(1, 4):
+                match_races.append((match_id, race_number, rng.choice(ctx.race_ids), rng.randint(1, 2)))
+    await _insert('matches', ['match_id', 'race_type_id', 'racer_1_id', 'racer_2_id', 'suggested_time',
+                              'r1_confirmed', 'r2_confirmed', 'ranked', 'number_of_races', 'channel_id', 'sheet_id',
+                              'sheet_row', 'finish_time'], matches)
+    await _insert('match_races', ['match_id', 'race_number', 'race_id', 'winner'], match_races)
+
+    # Dailies, both types
+    dailies = []
+    daily_runs = []
+    for daily_id in range(1, size.num_dailies + 1):
+        for daily_type in [0, 1]:
+            dailies.append((daily_id, daily_type, rng.randrange(1, 10**8), 10**17 + 2*daily_id + daily_type))
+            for user_id in rng.sample(range(1, size.num_users + 1), min(size.runs_per_daily, size.num_users)):
+                finished = rng.random() < 0.3
+                daily_runs.append((
+                    daily_id,
+                    daily_type,
+                    user_id,
+                    -2 if finished else rng.randrange(-1, 20),
+                    rng.randrange(30000, 120000) if finished else -1
+                ))
+    await _insert('dailies', ['daily_id', 'type', 'seed', 'msg_id'], dailies)
+    await _insert('daily_runs', ['daily_id', 'type', 'user_id', 'level', 'time'], daily_runs)
+
+    # Ratings for a tenth of the users
+    await _insert('ratings', ['discord_id', 'trueskill_mu', 'trueskill_sigma'], [
+        (_discord_id(user_id), rng.gauss(1600, 200), rng.uniform(50, 400))
+        for user_id in range(1, size.num_users + 1, 10)
+    ])
+
+    # Leagues, each with a slice of the matches and races
+    for league_idx in range(size.num_leagues):
+        league_schema = '{0}_league{1}'.format(ctx.schema_name, league_idx)
+        league = await leaguedb.create_league(league_schema)
+        ctx.league_schemas.append(league_schema)
+        if ctx.league is None:
+            ctx.league = league
+
+        def in_slice(column):
+            return '{0} % {1} = {2}'.format(column, size.num_leagues, league_idx)
+
+        async with DBConnect(commit=True) as cursor:
+            for table, column in [('races', 'race_id'), ('race_runs', 'race_id'), ('matches', 'match_id'),
+                                  ('match_races', 'match_id')]:
+                cursor.execute(
+                    'INSERT INTO `{league}`.`{table}` SELECT * FROM `{table}` WHERE {where}'.format(
+                        league=league_schema, table=table, where=in_slice('`{0}`'.format(column)))
+                )
+            cursor.execute(
+                """
+                INSERT IGNORE INTO `{league}`.`entrants` (`user_id`)
+                    SELECT `racer_1_id` FROM `{league}`.`matches`
+                    UNION SELECT `racer_2_id` FROM `{league}`.`matches`
+                """.format(league=league_schema)
+            )
+
+
+async def _prepare_context(ctx: _BenchContext) -> None:
+    ratingutil.init()
+    ctx.user_ids = ctx.rng.sample(range(1, ctx.size.num_users + 1), min(200, ctx.size.num_users))
+    for user_id in ctx.user_ids[:20]:
+        ctx.necro_users.append(await userlib.get_user(user_id=user_id))
+    for match_id in range(1, min(ctx.size.num_matches, 50) + 1):
+        ctx.matches.append(await matchutil.get_match_from_id(match_id))
+
+
+def _discord_id(user_id: int) -> int:
+    return 10**17 + user_id
+
+
+def _user_name(user_id: int) -> str:
+    return 'benchuser{0}'.format(user_id)
+
+
+class TestDBBench(unittest.TestCase):
+    def test_covers_database_package(self):
+        benched = set(case.name for case in _cases())
+        public = set()
+        for module in DATABASE_MODULES:
+            for name, fn in inspect.getmembers(module, inspect.iscoroutinefunction):
+                if not name.startswith('_') and fn.__module__ == module.__name__:
+                    public.add('{0}.{1}'.format(module.__name__.split('.')[-1], name))
+        self.assertEqual(public - benched, set())
+
+    def test_scratch_schema_names(self):
+        for schema_name in ['necrobot__bench', 'test__bench', 'a_b__bench']:
+            _check_scratch_schema(schema_name)
+        for schema_name in ['season', 'necrobot_bench', '__bench_x', 'necrobot__bench_league0', '__bench', 'a`__bench']:
+            self.assertRaises(RuntimeError, _check_scratch_schema, schema_name)
@@ -0,0 +1,517 @@
+"""
+An in-process stand-in for the parts of discord.py that the bot uses, for benchmarks and offline tests.
+
+SimClient duck-types discord.Client: it holds SimServers (with SimChannels, SimMembers, and SimRoles), implements
+the Client methods the bot calls (send_message, create_channel, edit_channel_permissions, and so on), and
+dispatches the same events the gateway would (on_message, on_channel_create, ...). Each API call is counted, and
+takes `latency` seconds, to stand in for the round trip to Discord; fail_next() makes calls fail with an HTTP
+error. Nothing touches the network, so Necrobot and botbase.server can be run against a SimClient with no login
+token:
+
+    client = SimClient(latency=0.05)
+    the_server = client.add_server('necrobot-sim')
+    Necrobot().ready_client_events(client=client, load_config_fn=...)
+    await client.connect()
+
+To act as a user, call SimClient.post(), which dispatches on_message and returns once the bot has handled the
+message. To wait for the bot's reply, call SimClient.expect() *before* posting.
+
+IDs are strings of consecutive integers (as discord.py 0.16 uses string IDs), so the same sequence of calls gives
+the same IDs each run.
+"""
+
+import asyncio
+import collections
+import datetime
+import discord
+import itertools
+import unittest
+from typing import Callable, Dict, Iterable, List, Optional
+
+
+class _SimResponse(object):
+    """Enough of an aiohttp response to build a discord.HTTPException"""
+    def __init__(self, status: int, reason: str):
+        self.status = status
+        self.reason = reason
+
+
+class _SimObject(object):
+    """Discord objects are equal (and hash) by ID"""
+    def __init__(self, sim_id: str):
+        self.id = sim_id
+
+    def __eq__(self, other):
+        return isinstance(other, self.__class__) and other.id == self.id
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return hash(self.id)
+
+
+class SimRole(_SimObject):
+    def __init__(self, sim_id: str, name: str, server, position: int = 0):
+        _SimObject.__init__(self, sim_id)
+        self.name = name
+        self.server = server
+        self.position = position
+
+    @property
+    def is_everyone(self) -> bool:
+        return self.id == self.server.id
+
+    @property
+    def mention(self) -> str:
+        return '<@&{0}>'.format(self.id)
+
+
+class SimMember(_SimObject):
+    def __init__(self, sim_id: str, name: str, server, roles: Iterable[SimRole] = (), bot: bool = False):
+        _SimObject.__init__(self, sim_id)
+        self.name = name
+        self.nick = None
+        self.discriminator = '0001'
+        self.server = server
+        self.roles = list(roles)
+        self.bot = bot
+
+    @property
+    def display_name(self) -> str:
+        return self.nick if self.nick is not None else self.name
+
+    @property
+    def mention(self) -> str:
+        return '<@{0}>'.format(self.id)
+
+    def copy(self):
+        the_copy = SimMember(self.id, self.name, self.server, self.roles, self.bot)
+        the_copy.nick = self.nick
+        return the_copy
+
+
+class SimChannel(_SimObject):
+    def __init__(self, sim_id: str, name: str, server, user: SimMember = None):
+        _SimObject.__init__(self, sim_id)
+        self.name = name
+        self.server = server
+        self.topic = None
+        self.position = 0
+        self.type = discord.ChannelType.private if user is not None else discord.ChannelType.text
+        self.user = user
+        self.overwrites = dict()    # type: Dict[str, discord.PermissionOverwrite]
+        self.messages = list()      # type: List[SimMessage]
+
+    @property
+    def is_private(self) -> bool:
+        return self.user is not None
+
+    @property
+    def is_default(self) -> bool:
+        return self.server is not None and self.id == self.server.id
+
+    @property
+    def recipients(self) -> List[SimMember]:
+        return [self.user] if self.user is not None else []
+
+    @property
+    def mention(self) -> str:
+        return '<#{0}>'.format(self.id)
+
+    def copy(self):
+        the_copy = SimChannel(self.id, self.name, self.server, self.user)
+        the_copy.topic = self.topic
+        the_copy.position = self.position
+        the_copy.overwrites = dict(self.overwrites)
+        the_copy.messages = self.messages
+        return the_copy
+
+
+class SimMessage(_SimObject):
+    def __init__(self, sim_id: str, content: str, author: SimMember, channel: SimChannel, embed=None):
+        _SimObject.__init__(self, sim_id)
+        self.content = content
+        self.author = author
+        self.channel = channel
+        self.server = channel.server
+        self.embeds = [embed] if embed is not None else []
+        self.mentions = []
+        self.attachments = []
+        self.pinned = False
+        self.timestamp = datetime.datetime.utcnow()
+        self.edited_timestamp = None
+
+
+class SimServer(_SimObject):
+    def __init__(self, client, sim_id: str, name: str):
+        _SimObject.__init__(self, sim_id)
+        self.name = name
+        self.channels = list()      # type: List[SimChannel]
+        self.members = list()       # type: List[SimMember]
+        self.roles = list()         # type: List[SimRole]
+
+        self._client = client
+        self.default_role = SimRole(sim_id, '@everyone', self)
+        self.roles.append(self.default_role)
+        self.me = self.add_member(client.user_name, bot=True)
+        self.owner = self.me
+
+    @property
+    def default_channel(self) -> Optional[SimChannel]:
+        return next((channel for channel in self.channels if channel.is_default), None)
+
+    def get_channel(self, channel_id: str) -> Optional[SimChannel]:
+        return next((channel for channel in self.channels if channel.id == channel_id), None)
+
+    def get_member(self, member_id: str) -> Optional[SimMember]:
+        return next((member for member in self.members if member.id == member_id), None)
+
+    def add_channel(self, name: str, default: bool = False) -> SimChannel:
+        """Add a text channel, without dispatching any event (use SimClient.create_channel once connected)"""
+        channel = SimChannel(self.id if default else self._client.next_id(), name, self)
+        channel.position = len(self.channels)
+        self.channels.append(channel)
+        return channel
+
+    def add_role(self, name: str) -> SimRole:
+        """Add a role, without dispatching any event (use SimClient.create_role once connected)"""
+        role = SimRole(self._client.next_id(), name, self, position=len(self.roles))
+        self.roles.append(role)
+        return role
+
+    def add_member(self, name: str, roles: Iterable[SimRole] = (), bot: bool = False) -> SimMember:
+        """Add a member, without dispatching any event"""
+        member = SimMember(self._client.next_id(), name, self, [self.default_role] + list(roles), bot=bot)
+        self.members.append(member)
+        return member
+
+
+class _LogsFromIterator(object):
+    """The async iterator returned by SimClient.logs_from (newest message first)"""
+    def __init__(self, messages: List[SimMessage]):
+        self._messages = iter(messages)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> SimMessage:
+        try:
+            return next(self._messages)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class _Expectation(object):
+    def __init__(self, channel: SimChannel, predicate: Callable[[SimMessage], bool], future: asyncio.Future):
+        self.channel = channel
+        self.predicate = predicate
+        self.future = future
+
+
+class SimClient(object):
+    """Stands in for a discord.Client logged in as a bot.
+
+    Parameters
+    ----------
+    latency: float
+        The number of seconds each API call takes.
+    user_name: str
+        The bot's user name.
+    """
+    def __init__(self, latency: float = 0.0, user_name: str = 'necrobot'):
+        self.latency = latency
+        self.user_name = user_name
+        self.servers = list()                       # type: List[SimServer]
+        self.calls = collections.Counter()          # API calls made by the bot, by method name
+        self._failures = collections.defaultdict(list)     # type: Dict[str, List[int]]
+        self.is_logged_in = False
+        self.is_closed = False
+
+        self._ids = itertools.count(100000)
+        self._private_channels = dict()             # type: Dict[str, SimChannel]
+        self._expectations = list()                 # type: List[_Expectation]
+        self._channel_watchers = list()             # type: List[asyncio.Queue]
+
+    @property
+    def user(self) -> Optional[SimMember]:
+        return self.servers[0].me if self.servers else None
+
+    def next_id(self) -> str:
+        return str(next(self._ids))
+
+    def add_server(self, name: str) -> SimServer:
+        the_server = SimServer(self, self.next_id(), name)
+        self.servers.append(the_server)
+        return the_server
+
+    # Events ----------------------------------------------------------------------------------------------------
+    def event(self, coro):
+        """Register an event handler, as discord.Client.event does"""
+        setattr(self, coro.__name__, coro)
+        return coro
+
+    def dispatch(self, event: str, *args) -> None:
+        """Run the handler for the given event (if any) in a new task, as the gateway does"""
+        if hasattr(self, 'on_' + event):
+            asyncio.ensure_future(self._run_event(event, *args))
+
+    async def connect(self) -> None:
+        """Log in and run on_ready. Unlike other events, exceptions in on_ready are not caught."""
+        self.is_logged_in = True
+        self.is_closed = False
+        if hasattr(self, 'on_ready'):
+            await getattr(self, 'on_ready')()
+
+    async def logout(self) -> None:
+        self.is_logged_in = False
+        self.is_closed = True
+
+    async def _run_event(self, event: str, *args) -> None:
+        try:
+            await getattr(self, 'on_' + event)(*args)
+        except asyncio.CancelledError:
+            pass
+        except Exception:
+            if hasattr(self, 'on_error'):
+                await getattr(self, 'on_error')(event, *args)
+            else:
+                raise
+
+    # Acting as users -------------------------------------------------------------------------------------------
+    async def post(self, channel: SimChannel, author: SimMember, content: str) -> SimMessage:
+        """Post a message as the given member, and return once the bot's on_message handler has finished with it"""
+        message = SimMessage(self.next_id(), content, author, channel)
+        channel.messages.append(message)
+        if hasattr(self, 'on_message'):
+            await self._run_event('message', message)
+        return message
+
+    def expect(self, channel: SimChannel, text: str = '') -> asyncio.Future:
+        """A Future for the next message the bot sends (or edits) in the given channel containing the given text"""
+        return self.expect_message(channel, lambda msg: text in msg.content)
+
+    def expect_message(self, channel: SimChannel, predicate: Callable[[SimMessage], bool]) -> asyncio.Future:
+        """A Future for the next message the bot sends (or edits) in the given channel satisfying the predicate"""
+        future = asyncio.get_event_loop().create_future()
+        self._expectations.append(_Expectation(channel, predicate, future))
+        return future
+
+    def watch_channels(self) -> asyncio.Queue:
+        """A queue that receives every (non-private) channel the bot creates from now on"""
+        queue = asyncio.Queue()
+        self._channel_watchers.append(queue)
+        return queue
+
+    def fail_next(self, method: str, status: int, num_calls: int = 1) -> None:
+        """Make the next num_calls calls to the given Client method fail with the given HTTP status (as a
+        discord.Forbidden, discord.NotFound, or discord.HTTPException)
+        """
+        self._failures[method] += [status] * num_calls
+
+    def private_channel(self, user: SimMember) -> SimChannel:
+        if user.id not in self._private_channels:
+            self._private_channels[user.id] = SimChannel(self.next_id(), user.name, None, user=user)
+        return self._private_channels[user.id]
+
+    # discord.Client methods ------------------------------------------------------------------------------------
+    async def send_message(self, destination, content=None, *, tts=False, embed=None) -> SimMessage:
+        await self._api_call('send_message')
+        channel = self._resolve_channel(destination)
+        message = SimMessage(self.next_id(), str(content) if content is not None else '', self.user, channel, embed)
+        channel.messages.append(message)
+        self._on_bot_message(message)
+        self.dispatch('message', message)
+        return message
+
+    async def send_typing(self, destination) -> None:
+        await self._api_call('send_typing')
+        self._resolve_channel(destination)
+
+    async def edit_message(self, message: SimMessage, new_content=None, *, embed=None) -> SimMessage:
+        await self._api_call('edit_message')
+        if message not in message.channel.messages:
+            raise self._not_found('Unknown Message')
+        if new_content is not None:
+            message.content = str(new_content)
+        if embed is not None:
+            message.embeds = [embed]
+        message.edited_timestamp = datetime.datetime.utcnow()
+        self._on_bot_message(message)
+        return message
+
+    async def delete_message(self, message: SimMessage) -> None:
+        await self._api_call('delete_message')
+        if message not in message.channel.messages:
+            raise self._not_found('Unknown Message')
+        message.channel.messages.remove(message)
+
+    async def get_message(self, channel: SimChannel, message_id: str) -> SimMessage:
+        await self._api_call('get_message')
+        for message in channel.messages:
+            if message.id == message_id:
+                return message
+        raise self._not_found('Unknown Message')
+
+    def logs_from(self, channel: SimChannel, limit: int = 100, **kwargs) -> _LogsFromIterator:
+        self.calls['logs_from'] += 1
+        return _LogsFromIterator(list(reversed(channel.messages))[:limit])
+
+    def get_channel(self, channel_id: str) -> Optional[SimChannel]:
+        for the_server in self.servers:
+            channel = the_server.get_channel(channel_id)
+            if channel is not None:
+                return channel
+        return next((ch for ch in self._private_channels.values() if ch.id == channel_id), None)
+
+    async def start_private_message(self, user: SimMember) -> SimChannel:
+        await self._api_call('start_private_message')
+        return self.private_channel(user)
+
+    async def create_channel(self, server: SimServer, name: str, *overwrites, type=None) -> SimChannel:
+        await self._api_call('create_channel')
+        channel = server.add_channel(name)
+        for target, overwrite in overwrites:
+            channel.overwrites[target.id] = overwrite
+        for queue in self._channel_watchers:
+            queue.put_nowait(channel)
+        self.dispatch('channel_create', channel)
+        return channel
+
+    async def delete_channel(self, channel: SimChannel) -> None:
+        await self._api_call('delete_channel')
+        if channel not in channel.server.channels:
+            raise self._not_found('Unknown Channel')
+        channel.server.channels.remove(channel)
+        self.dispatch('channel_delete', channel)
+
+    async def edit_channel(self, channel: SimChannel, **options) -> None:
+        await self._api_call('edit_channel')
+        before = channel.copy()
+        for key in ('name', 'topic', 'position'):
+            if key in options:
+                setattr(channel, key, options[key])
+        self.dispatch('channel_update', before, channel)
+
+    async def edit_channel_permissions(self, channel: SimChannel, target, overwrite=None) -> None:
+        await self._api_call('edit_channel_permissions')
+        channel.overwrites[target.id] = overwrite
+
+    async def create_role(self, server: SimServer, **fields) -> SimRole:
+        await self._api_call('create_role')
+        role = server.add_role(fields.get('name', 'new role'))
+        self.dispatch('server_role_create', role)
+        return role
+
+    async def add_roles(self, member: SimMember, *roles) -> None:
+        await self._api_call('add_roles')
+        before = member.copy()
+        member.roles += [role for role in roles if role not in member.roles]
+        self.dispatch('member_update', before, member)
+
+    async def remove_roles(self, member: SimMember, *roles) -> None:
+        await self._api_call('remove_roles')
+        before = member.copy()
+        member.roles = [role for role in member.roles if role not in roles]
+        self.dispatch('member_update', before, member)
+
+    async def change_nickname(self, member: SimMember, nickname: Optional[str]) -> None:
+        await self._api_call('change_nickname')
+        before = member.copy()
+        member.nick = nickname
+        self.dispatch('member_update', before, member)
+
+    # Internals -------------------------------------------------------------------------------------------------
+    async def _api_call(self, method: str) -> None:
+        self.calls[method] += 1
+        if self.latency > 0:
+            await asyncio.sleep(self.latency)
+        if self._failures[method]:
+            status = self._failures[method].pop(0)
+            if status == 403:
+                raise discord.Forbidden(_SimResponse(status, 'FORBIDDEN'), 'Missing Permissions')
+            elif status == 404:
+                raise self._not_found('Unknown')
+            raise discord.HTTPException(_SimResponse(status, 'ERROR'), 'Simulated error')
+
+    def _resolve_channel(self, destination) -> SimChannel:
+        if isinstance(destination, SimChannel):
+            return destination
+        elif isinstance(destination, SimMember):
+            return self.private_channel(destination)
+        raise discord.InvalidArgument('Destination must be a channel or a member, not {0}.'.format(destination))
+
+    def _on_bot_message(self, message: SimMessage) -> None:
+        remaining = []
+        for expectation in self._expectations:
+            if expectation.future.done():
+                continue
+            if expectation.channel == message.channel and expectation.predicate(message):
+                expectation.future.set_result(message)
+            else:
+                remaining.append(expectation)
+        self._expectations = remaining
+
+    @staticmethod
+    def _not_found(text: str) -> discord.NotFound:
+        return discord.NotFound(_SimResponse(404, 'NOT FOUND'), text)
+
+
+class TestDiscordSim(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.client = SimClient()
+        self.server = self.client.add_server('sim')
+        self.main = self.server.add_channel('main', default=True)
+        self.alice = self.server.add_member('alice')
+
+    def tearDown(self):
+        self.loop.close()
+
+    def test_post_and_reply(self):
+        @self.client.event
+        async def on_message(message):
+            if message.author != self.client.user:
+                await self.client.send_message(message.channel, 'echo {0}'.format(message.content))
+
+        async def run():
+            reply = self.client.expect(self.main, 'echo')
+            await self.client.post(self.main, self.alice, 'hello')
+            self.assertTrue(reply.done())
+            self.assertEqual(reply.result().content, 'echo hello')
+            self.assertEqual(self.client.calls['send_message'], 1)
+            self.assertEqual([msg.content for msg in self.main.messages], ['hello', 'echo hello'])
+
+        self.loop.run_until_complete(run())
+
+    def test_channels(self):
+        created = []
+
+        @self.client.event
+        async def on_channel_create(channel):
+            created.append(channel)
+
+        async def run():
+            watcher = self.client.watch_channels()
+            channel = await self.client.create_channel(self.server, 'room-1')
+            self.assertIs(await watcher.get(), channel)
+            await asyncio.sleep(0)
+            self.assertEqual(created, [channel])
+            self.assertIs(self.server.default_channel, self.main)
+            self.assertIs(self.client.get_channel(channel.id), channel)
+
+            message = await self.client.send_message(self.alice, 'psst')
+            self.assertTrue(message.channel.is_private)
+            self.assertIs(await self.client.get_message(message.channel, message.id), message)
+
+            await self.client.delete_channel(channel)
+            with self.assertRaises(discord.NotFound):
+                await self.client.delete_channel(channel)
+
+            self.client.fail_next('create_channel', 503)
+            with self.assertRaises(discord.HTTPException):
+                await self.client.create_channel(self.server, 'room-2')
+            await self.client.create_channel(self.server, 'room-2')
+
+        self.loop.run_until_complete(run())
@@ -0,0 +1,391 @@
+"""
+End-to-end load generator: runs the Necrobot against the Discord simulator (necrobot.test.discordsim) and replays
+scripted user traffic, all at once:
+    races       Public races: `.make` in the main channel, then every racer enters, readies, and finishes.
+    matches     Match rooms, each running the TestMatch script (testmatch.run_match_script).
+    dailies     Daily submissions: `.dailyseed`, then `.dailysubmit`, by PM.
+
+It reports, for each command, the latency from the message being posted to the bot having handled it (p50 and p99),
+along with the event loop's lag (how late a short sleep wakes up), and the number of DB statements executed per
+command. The DB statement count is the total over the run, so it includes work done outside of commands, such as
+recording races when they finalize.
+
+The bot runs with its real managers and database: point the config file at a scratch database, since each run
+registers users, matches, races and daily submissions. Race countdowns and finalization are shortened for the run.
+Run it with run_loadtest.py.
+"""
+
+import asyncio
+import collections
+import json
+import time
+import unittest
+from typing import Dict, List
+
+from necrobot.botbase import server
+from necrobot.test import testmatch
+from necrobot.match import matchutil
+from necrobot.user import userlib
+from necrobot.util import stats
+
+from necrobot.botbase.loopwatchdog import LoopWatchdog
+from necrobot.botbase.necrobot import Necrobot
+from necrobot.botbase.scheduler import Scheduler
+from necrobot.config import Config
+from necrobot.daily.dailymgr import DailyMgr
+from necrobot.database.dbconnect import DBConnect
+from necrobot.match.matchinfo import MatchInfo
+from necrobot.match.matchmgr import MatchMgr
+from necrobot.stdconfig.mainchannel import MainBotChannel
+from necrobot.stdconfig.pmbotchannel import PMBotChannel
+from necrobot.test.discordsim import SimChannel, SimClient, SimMember
+
+SERVER_NAME = 'necrobot-loadtest'
+RACER_TIMEZONE = 'US/Eastern'
+
+# Config values changed for the run, so that races don't spend most of their time counting down
+FAST_TIMERS = {
+    'COUNTDOWN_LENGTH': 3,
+    'INCREMENTAL_COUNTDOWN_START': 3,
+    'UNPAUSE_COUNTDOWN_LENGTH': 1,
+    'FINALIZE_TIME_SEC': 1,
+}
+
+
+class LoadScriptError(Exception):
+    pass
+
+
+class LoadResult(object):
+    def __init__(self):
+        self.latencies = collections.defaultdict(list)  # type: Dict[str, List[float]]
+        self.loop_lags = list()                         # type: List[float]
+        self.api_calls = collections.Counter()          # Discord API calls made by the bot, by method
+        self.num_queries = 0
+        self.num_scripts = 0
+        self.errors = list()                            # type: List[str]
+        self.elapsed = 0.0
+
+    @property
+    def num_commands(self) -> int:
+        return sum(len(latencies) for latencies in self.latencies.values())
+
+    @property
+    def all_latencies(self) -> List[float]:
+        return [latency for latencies in self.latencies.values() for latency in latencies]
+
+    @property
+    def queries_per_command(self) -> float:
+        return self.num_queries / self.num_commands if self.num_commands else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            'commands': self.num_commands,
+            'scripts': self.num_scripts,
+            'errors': self.errors,
+            'wall_time_sec': round(self.elapsed, 3),
+            'latency_sec': _summary(self.all_latencies),
+            'latency_sec_by_command': {cmd: _summary(lat) for cmd, lat in sorted(self.latencies.items())},
+            'loop_lag_sec': _summary(self.loop_lags),
+            'db_queries': self.num_queries,
+            'db_queries_per_command': round(self.queries_per_command, 2),
+            'api_calls_by_method': dict(self.api_calls),
+        }
+
+
+class LoopLagProbe(object):
+    """Measures event loop lag: repeatedly sleeps for `interval` seconds, and records how late each sleep ends"""
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.lags = list()      # type: List[float]
+        self._task = None       # type: asyncio.Task
+
+    def start(self) -> None:
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_event_loop()
+        while True:
+            begin = loop.time()
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(loop.time() - begin - self.interval, 0.0))
+
+
+class LoadGenerator(object):
+    """Runs the bot on a SimClient and plays scripted traffic against it (see run_load)"""
+    def __init__(self, api_latency: float, reply_timeout: float):
+        self.client = SimClient(latency=api_latency)
+        self.reply_timeout = reply_timeout
+        self.result = LoadResult()
+
+        self.server = self.client.add_server(SERVER_NAME)
+        self.main_channel = self.server.add_channel(Config.MAIN_CHANNEL_NAME, default=True)
+        for channel_name in [
+            Config.RACE_RESULTS_CHANNEL_NAME,
+            Config.DAILY_LEADERBOARDS_CHANNEL_NAME,
+            Config.NOTIFICATIONS_CHANNEL_NAME
+        ]:
+            self.server.add_channel(channel_name)
+        admin_role = self.server.add_role(Config.ADMIN_ROLE_NAMES[0])
+        self.admin = self.server.add_member('loadadmin', roles=[admin_role])
+
+        self._num_members = 0
+        self._new_rooms = None  # type: asyncio.Queue
+
+    def add_members(self, num: int) -> List[SimMember]:
+        members = []
+        for _ in range(num):
+            members.append(self.server.add_member('loadracer{0:03d}'.format(self._num_members)))
+            self._num_members += 1
+        return members
+
+    async def connect(self) -> None:
+        """Log the Necrobot in to the simulated server"""
+        necrobot = Necrobot()
+        necrobot.clean_init()
+        necrobot.ready_client_events(client=self.client, load_config_fn=_load_loadtest_config)
+        await self.client.connect()
+
+    async def make_match_room(self, racer_1: SimMember, racer_2: SimMember) -> SimChannel:
+        """Register both racers, and make a match between them with a room"""
+        racer_ids = []
+        for member in [racer_1, racer_2]:
+            user = await userlib.get_user(discord_id=int(member.id), register=True)
+            user.set(rtmp_name=member.name, timezone=RACER_TIMEZONE, commit=False)
+            await user.commit()
+            racer_ids.append(user.user_id)
+
+        match = await matchutil.make_match(
+            racer_1_id=racer_ids[0],
+            racer_2_id=racer_ids[1],
+            match_info=MatchInfo(ranked=True),
+            register=True
+        )
+        room = await matchutil.make_match_room(match)
+        if room is None:
+            raise LoadScriptError('Couldn\'t make a room for {0}.'.format(match.matchroom_name))
+        return room.channel
+
+    async def send(self, channel: SimChannel, author: SimMember, content: str, wait_for: str = None) -> None:
+        """Post the message, recording how long the bot takes to handle it. If wait_for is not None, then also
+        wait for the bot to reply in the channel with a message containing wait_for.
+        """
+        reply = self.client.expect(channel, wait_for) if wait_for is not None else None
+        begin = time.monotonic()
+        await self.client.post(channel, author, content)
+        self.result.latencies[content.split()[0]].append(time.monotonic() - begin)
+
+        if reply is not None:
+            try:
+                await asyncio.wait_for(reply, timeout=self.reply_timeout)
+            except asyncio.TimeoutError:
+                raise LoadScriptError(
+                    'No reply containing "{0}" to `{1}` in #{2}.'.format(wait_for, content, channel.name))
+
+    async def run_script(self, name: str, coro) -> None:
+        self.result.num_scripts += 1
+        try:
+            await coro
+        except Exception as e:
+            self.result.errors.append('{0}: {1}: {2}'.format(name, type(e).__name__, e))
+
+    def watch_rooms(self) -> None:
+        """Hand each channel the bot makes from now on to the next public race waiting for a room"""
+        self._new_rooms = self.client.watch_channels()
+
+    async def public_race(self, racers: List[SimMember]) -> None:
+        await self.send(self.main_channel, racers[0], '.make')
+        try:
+            room = await asyncio.wait_for(self._new_rooms.get(), timeout=self.reply_timeout)
+        except asyncio.TimeoutError:
+            raise LoadScriptError('No race room was made.')
+
+        for racer in racers:
+            await self.send(room, racer, '.enter')
+        for racer in racers[:-1]:
+            await self.send(room, racer, '.ready')
+        await self.send(room, racers[-1], '.ready', wait_for='GO!')
+        for racer in racers[:-1]:
+            await self.send(room, racer, '.done')
+        await self.send(room, racers[-1], '.done', wait_for='The race is over')
+
+    async def match(self, room: SimChannel, racer_1: SimMember, racer_2: SimMember) -> None:
+        async def send(author, msg, wait_for=None):
+            await self.send(room, author, msg, wait_for=wait_for)
+        await testmatch.run_match_script(send, racer_1, racer_2, self.admin)
+
+    async def daily_submission(self, member: SimMember, idx: int) -> None:
+        pm_channel = self.client.private_channel(member)
+        await self.send(pm_channel, member, '.dailyseed')
+        await self.send(pm_channel, member, '.dailysubmit {0}:{1:02d}.00'.format(10 + idx // 60, idx % 60))
+
+
+async def run_load(
+        num_races: int = 8,
+        racers_per_race: int = 3,
+        num_matches: int = 4,
+        num_dailies: int = 16,
+        api_latency: float = 0.05,
+        reply_timeout: float = 60.0
+) -> LoadResult:
+    """Run the load test. The config (and its database settings) must already be initialized.
+
+    Parameters
+    ----------
+    num_races: int
+        The number of public races to run at once.
+    racers_per_race: int
+        The number of racers in each public race.
+    num_matches: int
+        The number of match rooms to run the TestMatch script in at once.
+    num_dailies: int
+        The number of racers submitting for the daily.
+    api_latency: float
+        The number of seconds each Discord API call takes.
+    reply_timeout: float
+        The number of seconds a script waits for an expected reply from the bot before giving up.
+
+    Returns
+    -------
+    LoadResult
+    """
+    saved_config = {name: getattr(Config, name) for name in list(FAST_TIMERS) + ['SERVER_ID']}
+    for name, value in FAST_TIMERS.items():
+        setattr(Config, name, value)
+
+    gen = LoadGenerator(api_latency=api_latency, reply_timeout=reply_timeout)
+    race_racers = [gen.add_members(racers_per_race) for _ in range(num_races)]
+    match_racers = [gen.add_members(2) for _ in range(num_matches)]
+    daily_racers = gen.add_members(num_dailies)
+    Config.SERVER_ID = gen.server.id
+
+    probe = LoopLagProbe()
+    try:
+        await gen.connect()
+        match_rooms = [await gen.make_match_room(racer_1, racer_2) for racer_1, racer_2 in match_racers]
+
+        gen.watch_rooms()
+        calls_before = gen.client.calls.copy()
+        DBConnect.count_queries = True
+        DBConnect.num_queries = 0
+        probe.start()
+        begin = time.monotonic()
+
+        scripts = []
+        for idx, racers in enumerate(race_racers):
+            scripts.append(gen.run_script('race {0}'.format(idx), gen.public_race(racers)))
+        for idx, (room, (racer_1, racer_2)) in enumerate(zip(match_rooms, match_racers)):
+            scripts.append(gen.run_script('match {0}'.format(idx), gen.match(room, racer_1, racer_2)))
+        for idx, member in enumerate(daily_racers):
+            scripts.append(gen.run_script('daily {0}'.format(idx), gen.daily_submission(member, idx)))
+        await asyncio.gather(*scripts)
+
+        # Let races that have ended be recorded
+        while Scheduler().counts_by_kind().get('race_finalize', 0) > 0:
+            await asyncio.sleep(0.5)
+
+        gen.result.elapsed = time.monotonic() - begin
+        gen.result.num_queries = DBConnect.num_queries
+        gen.result.api_calls = gen.client.calls - calls_before
+    finally:
+        await probe.stop()
+        gen.result.loop_lags = probe.lags
+        DBConnect.count_queries = False
+        await Necrobot().logout()
+        Scheduler().clear()
+        LoopWatchdog().stop()
+        for name, value in saved_config.items():
+            setattr(Config, name, value)
+
+    return gen.result
+
+
+def format_results(result: LoadResult) -> str:
+    lines = [
+        '{0} commands in {1} scripts over {2:.1f}s; {3} scripts failed.'.format(
+            result.num_commands, result.num_scripts, result.elapsed, len(result.errors)),
+        '',
+        '{0:<16} {1:>6} {2:>9} {3:>9} {4:>9}'.format('command', 'count', 'p50 (ms)', 'p99 (ms)', 'max (ms)'),
+    ]
+    for command, latencies in sorted(result.latencies.items()):
+        lines.append(_latency_line(command, latencies))
+    lines.append(_latency_line('all', result.all_latencies))
+    lines.append('')
+    lines.append('Event loop lag: p50 {0:.1f}ms, p99 {1:.1f}ms, max {2:.1f}ms'.format(
+        1000*stats.percentile(result.loop_lags, 50),
+        1000*stats.percentile(result.loop_lags, 99),
+        1000*max(result.loop_lags or [0])
+    ))
+    lines.append('DB queries: {0} ({1:.2f} per command)'.format(result.num_queries, result.queries_per_command))
+    lines.append('Discord API calls: {0}'.format(
+        ', '.join('{0}: {1}'.format(method, num) for method, num in sorted(result.api_calls.items()))))
+    for error in result.errors:
+        lines.append('Error in {0}'.format(error))
+    return '\n'.join(lines)
+
+
+def results_json(result: LoadResult) -> str:
+    return json.dumps(result.as_dict(), indent=2)
+
+
+def _summary(values: List[float]) -> dict:
+    return {
+        'count': len(values),
+        'p50': round(stats.percentile(values, 50), 4),
+        'p99': round(stats.percentile(values, 99), 4),
+        'max': round(max(values), 4) if values else 0.0,
+    }
+
+
+def _latency_line(name: str, latencies: List[float]) -> str:
+    return '{0:<16} {1:>6} {2:>9.1f} {3:>9.1f} {4:>9.1f}'.format(
+        name,
+        len(latencies),
+        1000*stats.percentile(latencies, 50),
+        1000*stats.percentile(latencies, 99),
+        1000*max(latencies or [0])
+    )
+
+
+async def _load_loadtest_config(necrobot):
+    necrobot.register_pm_channel(PMBotChannel())
+    necrobot.register_bot_channel(server.find_channel(channel_name=Config.MAIN_CHANNEL_NAME), MainBotChannel())
+    necrobot.register_manager(DailyMgr())
+    necrobot.register_manager(MatchMgr())
+
+
+class TestLoadGen(unittest.TestCase):
+    def test_percentile(self):
+        values = [0.001 * idx for idx in range(1, 101)]
+        self.assertAlmostEqual(stats.percentile(values, 50), 0.05)
+        self.assertAlmostEqual(stats.percentile(values, 99), 0.099)
+        self.assertAlmostEqual(stats.percentile(values, 100), 0.1)
+        self.assertAlmostEqual(stats.percentile(values, 0), 0.001)
+        self.assertAlmostEqual(stats.percentile([0.2], 50), 0.2)
+        self.assertEqual(stats.percentile([], 50), 0.0)
+
+    def test_loop_lag_probe(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+
+        async def run():
+            probe = LoopLagProbe(interval=0.01)
+            probe.start()
+            await asyncio.sleep(0.02)
+            time.sleep(0.05)        # Block the loop
+            await asyncio.sleep(0.02)
+            await probe.stop()
+            return probe.lags
+
+        lags = loop.run_until_complete(run())
+        loop.close()
+        self.assertGreaterEqual(max(lags), 0.03)
@@ -0,0 +1,244 @@
+"""
+Micro-benchmarks of the command front end: the parsing and formatting run for every command and leaderboard line.
+
+Each benchmark runs a function over a list of realistic inputs (taken from the commands racers actually type):
+    command             Split a prefixed message into a Command (shlex).
+    get_keyword         Look up each word of a race-type argument list in the matchtype keyword set.
+    matchparse          Parse race-type arguments into a dict (matchparse.parse_matchtype_args).
+    raceinfo            Parse race-type arguments into a RaceInfo.
+    matchinfo           Parse match-type arguments into a MatchInfo.
+    dateparse           Parse a suggested match time (dateparse.parse_datetime).
+    dateparse_nocache   The same, without the result cache.
+    dateparse_fuzzy     The same, always with dateutil's fuzzy parsing (i.e., without the fast path).
+    racetime            Convert race times to and from strings.
+    level               Convert levels to and from strings.
+
+For each, the benchmark reports the best per-input time over several repeats, in microseconds. Run it with
+run_parsebench.py; --json writes the results, which serve as a baseline that a later run can be compared against
+with --compare. TestParseBench checks that every benchmark runs on its inputs.
+"""
+
+import datetime
+import json
+import pytz
+import shlex
+import time
+import unittest
+from typing import Callable, List
+
+from necrobot.match import matchinfo
+from necrobot.race import raceinfo
+from necrobot.util import level, racetime
+from necrobot.util.parse import dateparse, matchparse, parseutil
+
+from necrobot.botbase.command import Command
+from necrobot.config import Config
+
+COMMAND_INPUTS = [
+    '.r',
+    '.done',
+    '.ready',
+    '.enter',
+    '.make',
+    '.make seeded cadence',
+    '.make s nodlc character melody custom "4-shrine"',
+    '.igt 12:34.56',
+    '.death 3-2',
+    '.comment "died to a dragon on 4-3, so it goes"',
+    '.suggest "saturday 8pm"',
+    '.dailysubmit 10:22.33',
+    '.fastest cadence',
+    '.stats incnone',
+    '.timezone US/Eastern',
+    'not a command, just some chat in the room',
+]
+
+MATCHTYPE_INPUTS = [
+    'cadence',
+    'seeded cadence',
+    's nodlc character melody',
+    'cadence s bestof 3 ranked custom "Custom description"',
+    'u dlc aria repeat 2 unranked',
+    'coda seed 12345 nopost',
+]
+
+MATCHINFO_INPUTS = [
+    'bestof 3 ranked',
+    'repeat 2 unranked cadence',
+    'seeded dlc bestof 5 ranked',
+]
+
+DATETIME_INPUTS = [
+    'saturday 8pm',
+    'tomorrow 5:30 PM',
+    'March 3 18:00',
+    '2017-06-10 20:00',
+    'sunday at 3',
+    'now',
+]
+
+# The inputs that reach the parser ('now' is handled before it)
+PARSED_DATETIME_INPUTS = DATETIME_INPUTS[:-1]
+
+RACETIME_INPUTS = ['12:34.56', '1:02:03', '9.58.01', '0:45', '61:00.00', 'dnf']
+TIME_HUNDREDTHS = [0, 4596, 75456, 123400, 360099]
+LEVEL_INPUTS = ['1-1', '3-2', '4-4', '5-5', 'x-1', '']
+LEVEL_NUMBERS = [-2, -1, 0, 1, 7, 14, 21]
+
+TIMEZONE = 'US/Eastern'
+
+
+class BenchResult(object):
+    def __init__(self, name: str, num_inputs: int, best: float, number: int):
+        self.name = name
+        self.num_inputs = num_inputs
+        self.best = best
+        self.number = number
+
+    @property
+    def usec_per_input(self) -> float:
+        return 10**6 * self.best / (self.number * self.num_inputs)
+
+    def as_dict(self) -> dict:
+        return {
+            'benchmark': self.name,
+            'inputs': self.num_inputs,
+            'usec_per_input': round(self.usec_per_input, 3),
+        }
+
+
+class _BenchMessage(object):
+    """The parts of a discord.Message that Command reads"""
+    def __init__(self, content: str):
+        self.content = content
+
+
+def benchmarks() -> List[tuple]:
+    """The (name, function, inputs) of each benchmark. Each function takes one input."""
+    timezone = pytz.timezone(TIMEZONE)
+
+    def lookup_keywords(args):
+        for arg in args:
+            parseutil.get_keyword(arg, matchparse.matchtype_grammar)
+
+    def parse_datetime_uncached(parse_str):
+        today = pytz.utc.localize(datetime.datetime.utcnow()).astimezone(timezone).date()
+        dateparse._parse_on_date.__wrapped__(' '.join(parse_str.lower().split()), timezone.zone, today)
+
+    def parse_datetime_fuzzy(parse_str):
+        default_time = pytz.utc.localize(datetime.datetime.utcnow()).astimezone(timezone)\
+            .replace(tzinfo=None, hour=0, minute=0, second=0, microsecond=0)
+        timezone.localize(dateparse._parse_fuzzy(parse_str, default_time)).astimezone(pytz.utc)
+
+    def convert_racetime(time_str):
+        racetime.from_str(time_str)
+        for time_hund in TIME_HUNDREDTHS:
+            racetime.to_str(time_hund)
+
+    def convert_level(level_str):
+        level.from_str(level_str)
+        for level_num in LEVEL_NUMBERS:
+            level.to_str(level_num)
+            level.level_sortval(level_num)
+
+    matchtype_args = [shlex.split(args_str) for args_str in MATCHTYPE_INPUTS]
+    matchinfo_args = [shlex.split(args_str) for args_str in MATCHINFO_INPUTS]
+    return [
+        ('command', lambda content: Command(_BenchMessage(content)), COMMAND_INPUTS),
+        ('get_keyword', lookup_keywords, matchtype_args),
+        ('matchparse', matchparse.parse_matchtype_args, matchtype_args),
+        ('raceinfo', raceinfo.parse_args, matchtype_args),
+        ('matchinfo', matchinfo.parse_args, matchinfo_args),
+        ('dateparse', lambda parse_str: dateparse.parse_datetime(parse_str, timezone), DATETIME_INPUTS),
+        ('dateparse_nocache', parse_datetime_uncached, PARSED_DATETIME_INPUTS),
+        ('dateparse_fuzzy', parse_datetime_fuzzy, PARSED_DATETIME_INPUTS),
+        ('racetime', convert_racetime, RACETIME_INPUTS),
+        ('level', convert_level, LEVEL_INPUTS),
+    ]
+
+
+def run_benchmark(min_time: float = 0.2, repeat: int = 5, only: List[str] = None) -> List[BenchResult]:
+    """Run each benchmark.
+
+    Parameters
+    ----------
+    min_time: float
+        Each repeat runs the inputs enough times to take at least this long, in seconds.
+    repeat: int
+        The number of repeats; the fastest is reported.
+    only: list[str]
+        If not None, the names of the benchmarks to run.
+
+    Returns
+    -------
+    list[BenchResult]
+        The result of each benchmark.
+    """
+    results = []
+    for name, fn, inputs in benchmarks():
+        if only is not None and name not in only:
+            continue
+        number = _calibrate(fn, inputs, min_time)
+        best = min(_time_inputs(fn, inputs, number) for _ in range(repeat))
+        results.append(BenchResult(name=name, num_inputs=len(inputs), best=best, number=number))
+    return results
+
+
+def format_results(results: List[BenchResult]) -> str:
+    lines = ['{0:<18} {1:>7} {2:>14}'.format('benchmark', 'inputs', 'usec / input')]
+    for result in results:
+        lines.append('{0:<18} {1:>7} {2:>14.2f}'.format(result.name, result.num_inputs, result.usec_per_input))
+    return '\n'.join(lines)
+
+
+def format_comparison(old_results: List[dict], results: List[BenchResult]) -> str:
+    """Compare with the results of an earlier run, as written by results_json"""
+    old_usecs = {result['benchmark']: result['usec_per_input'] for result in old_results}
+    lines = ['{0:<18} {1:>10} {2:>10} {3:>8}'.format('benchmark', 'old usec', 'new usec', 'change')]
+    for result in results:
+        old_usec = old_usecs.get(result.name)
+        if not old_usec:
+            lines.append('{0:<18} {1:>10} {2:>10.2f}'.format(result.name, '-', result.usec_per_input))
+            continue
+        lines.append('{0:<18} {1:>10.2f} {2:>10.2f} {3:>+7.0%}'.format(
+            result.name, old_usec, result.usec_per_input, (result.usec_per_input - old_usec) / old_usec))
+    return '\n'.join(lines)
+
+
+def results_json(results: List[BenchResult]) -> str:
+    return json.dumps([result.as_dict() for result in results], indent=2)
+
+
+def _time_inputs(fn: Callable, inputs: list, number: int) -> float:
+    begin = time.perf_counter()
+    for _ in range(number):
+        for arg in inputs:
+            fn(arg)
+    return time.perf_counter() - begin
+
+
+def _calibrate(fn: Callable, inputs: list, min_time: float) -> int:
+    """Find a number of passes over the inputs that takes at least min_time seconds"""
+    number = 1
+    while True:
+        elapsed = _time_inputs(fn, inputs, number)
+        if elapsed >= min_time:
+            return number
+        number *= 10 if elapsed < min_time / 10 else 2
+
+
+class TestParseBench(unittest.TestCase):
+    def test_benchmarks_run(self):
+        for name, fn, inputs in benchmarks():
+            for arg in inputs:
+                fn(arg)
+
+        command = Command(_BenchMessage('{0}igt 12:34.56'.format(Config.BOT_COMMAND_PREFIX)))
+        self.assertEqual(command.command, 'igt')
+        self.assertEqual(command.args, ['12:34.56'])
+
+    def test_run_benchmark(self):
+        results = run_benchmark(min_time=0.001, repeat=1, only=['racetime', 'level'])
+        self.assertEqual([result.name for result in results], ['racetime', 'level'])
+        for result in results:
+            self.assertGreater(result.usec_per_input, 0)
@@ -0,0 +1,229 @@
+"""
+Benchmark of the Google Sheets API calls made over a week of matches, run against the sheet emulator.
+
+The benchmark builds a matchup worksheet and a standings worksheet, then runs each phase of the week through the
+GSheet layer for every match at once, as the bot would:
+    import      Find the worksheets and read the matchups (as .makematches does).
+    schedule    Write each match's scheduled time.
+    score       Record each match's winner and score.
+    standings   Record each match's result on the standings worksheet.
+
+Each phase ends by flushing buffered writes. For each phase, the benchmark reports the number of API calls
+made, by method, and the wall time. Run it with run_sheetbench.py. TestSheetBench checks the call counts, so
+that a change to the sheet layer that adds API calls is caught.
+"""
+
+import asyncio
+import collections
+import datetime
+import json
+import pytz
+import time
+import unittest
+import uuid
+from typing import List
+
+from necrobot.gsheet import sheetlib
+from necrobot.gsheet import sheetwritebuffer
+
+from necrobot.gsheet.spreadsheets import Spreadsheets
+from necrobot.test.sheetemulator import SheetEmulator
+
+WEEK_NAME = 'Week 1'
+STANDINGS_NAME = 'Standings'
+
+
+class PhaseResult(object):
+    def __init__(self, name: str, calls: collections.Counter, num_throttled: int, elapsed: float):
+        self.name = name
+        self.calls = calls
+        self.num_throttled = num_throttled
+        self.elapsed = elapsed
+
+    @property
+    def num_calls(self) -> int:
+        return sum(self.calls.values())
+
+    def as_dict(self) -> dict:
+        return {
+            'phase': self.name,
+            'calls': self.num_calls,
+            'calls_by_method': dict(self.calls),
+            'throttled': self.num_throttled,
+            'wall_time_sec': round(self.elapsed, 4),
+        }
+
+
+class _BenchRacer(object):
+    def __init__(self, name: str):
+        self.rtmp_name = name
+        self.display_name = name
+
+    @property
+    def names(self) -> List[str]:
+        return [self.rtmp_name]
+
+
+class _BenchMatch(object):
+    """The parts of a Match that the GSheet layer reads"""
+    def __init__(self, match_id: int, racer_1: _BenchRacer, racer_2: _BenchRacer, sheet_id: int, sheet_row: int):
+        self.match_id = match_id
+        self.racer_1 = racer_1
+        self.racer_2 = racer_2
+        self.sheet_id = sheet_id
+        self.sheet_row = sheet_row
+        self.suggested_time = None
+
+    @property
+    def matchroom_name(self) -> str:
+        return '{0}-{1}'.format(self.racer_1.rtmp_name, self.racer_2.rtmp_name)
+
+
+async def run_benchmark(
+        num_matches: int = 32,
+        latency: float = 0.05,
+        throttle_rate: float = 0.0,
+        emulator: SheetEmulator = None
+) -> List[PhaseResult]:
+    """Run the benchmark.
+
+    Parameters
+    ----------
+    num_matches: int
+        The number of matches in the week.
+    latency: float
+        The number of seconds each API call takes.
+    throttle_rate: float
+        The probability that an API call fails with HTTP 429.
+    emulator: SheetEmulator
+        The emulator to run against, if not a new one (in which case latency and throttle_rate are ignored).
+
+    Returns
+    -------
+    list[PhaseResult]
+    """
+    if emulator is None:
+        emulator = SheetEmulator(latency=latency, throttle_rate=throttle_rate)
+
+    # A new GSheet ID each run, so that nothing is cached from a previous run
+    gsheet_id = 'sheetbench-{0}'.format(uuid.uuid4().hex)
+    pairs = [('racer{0:03d}'.format(2*idx), 'racer{0:03d}'.format(2*idx + 1)) for idx in range(num_matches)]
+    emulator.add_worksheet(gsheet_id, WEEK_NAME, values=_matchup_values(pairs))
+    emulator.add_worksheet(gsheet_id, STANDINGS_NAME, values=_standings_values(pairs))
+
+    results = []
+    sheets = dict()
+    matches = []
+
+    async def run_phase(name, phase_fn):
+        calls_before = emulator.calls.copy()
+        throttled_before = emulator.num_throttled
+        begin = time.monotonic()
+        await phase_fn()
+        await sheetwritebuffer.flush(gsheet_id)
+        results.append(PhaseResult(
+            name=name,
+            calls=emulator.calls - calls_before,
+            num_throttled=emulator.num_throttled - throttled_before,
+            elapsed=time.monotonic() - begin
+        ))
+
+    async def import_matches():
+        sheets['matchup'] = await sheetlib.get_sheet(
+            gsheet_id=gsheet_id, wks_name=WEEK_NAME, sheet_type=sheetlib.SheetType.MATCHUP)
+        sheets['standings'] = await sheetlib.get_sheet(
+            gsheet_id=gsheet_id, wks_name=STANDINGS_NAME, sheet_type=sheetlib.SheetType.STANDINGS)
+        for row_idx, racer_1_name, racer_2_name, _, _ in await sheets['matchup'].get_match_rows():
+            matches.append(_BenchMatch(
+                match_id=len(matches) + 1,
+                racer_1=_BenchRacer(racer_1_name),
+                racer_2=_BenchRacer(racer_2_name),
+                sheet_id=sheets['matchup'].wks_id,
+                sheet_row=row_idx
+            ))
+
+    async def schedule():
+        start = datetime.datetime(year=2069, month=4, day=20, hour=16, tzinfo=pytz.utc)
+        for idx, match in enumerate(matches):
+            match.suggested_time = start + datetime.timedelta(hours=idx)
+        await asyncio.gather(*[sheets['matchup'].schedule_match(match) for match in matches])
+
+    async def score():
+        await asyncio.gather(*[
+            sheets['matchup'].record_score(match, match.racer_1.rtmp_name, 2, 1) for match in matches
+        ])
+
+    async def standings():
+        await asyncio.gather(*[sheets['standings'].update_standings(match, 2, 1) for match in matches])
+
+    Spreadsheets.set_service(emulator)
+    try:
+        await run_phase('import', import_matches)
+        await run_phase('schedule', schedule)
+        await run_phase('score', score)
+        await run_phase('standings', standings)
+    finally:
+        Spreadsheets.reset_service()
+    return results
+
+
+def format_results(results: List[PhaseResult]) -> str:
+    lines = ['{0:<10} {1:>6} {2:>10} {3:>9}  {4}'.format('phase', 'calls', 'throttled', 'wall (s)', 'calls by method')]
+    for result in results:
+        lines.append('{0:<10} {1:>6} {2:>10} {3:>9.3f}  {4}'.format(
+            result.name,
+            result.num_calls,
+            result.num_throttled,
+            result.elapsed,
+            ', '.join('{0}: {1}'.format(method, num) for method, num in sorted(result.calls.items()))
+        ))
+    lines.append('{0:<10} {1:>6} {2:>10} {3:>9.3f}'.format(
+        'total',
+        sum(result.num_calls for result in results),
+        sum(result.num_throttled for result in results),
+        sum(result.elapsed for result in results)
+    ))
+    return '\n'.join(lines)
+
+
+def results_json(results: List[PhaseResult]) -> str:
+    return json.dumps([result.as_dict() for result in results], indent=2)
+
+
+def _matchup_values(pairs) -> List[List[str]]:
+    values = [['Match ID', 'Tier', 'Racer 1', 'Racer 2', 'Date', 'Type', 'Cawmentary', 'Winner', 'Score', 'Vod']]
+    for racer_1_name, racer_2_name in pairs:
+        values.append(['', '1', racer_1_name, racer_2_name])
+    return values
+
+
+def _standings_values(pairs) -> List[List[str]]:
+    values = [['Racer', 'Results', WEEK_NAME]]
+    for racer_1_name, racer_2_name in pairs:
+        values.append([racer_1_name, '', racer_2_name])
+        values.append([racer_2_name, '', racer_1_name])
+    return values
+
+
+class TestSheetBench(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        self.loop.close()
+
+    def test_call_counts(self):
+        results = {result.name: result for result in self.loop.run_until_complete(
+            run_benchmark(num_matches=8, latency=0))}
+        self.assertEqual(results['import'].calls, {'get': 1, 'values.get': 3})
+        self.assertEqual(results['schedule'].calls, {'values.batchUpdate': 1})
+        self.assertEqual(results['score'].calls, {'values.batchUpdate': 1})
+        self.assertEqual(results['standings'].calls, {'values.batchUpdate': 1})
+
+    def test_throttled(self):
+        emulator = SheetEmulator()
+        emulator.throttle_next(1)
+        results = self.loop.run_until_complete(run_benchmark(num_matches=2, emulator=emulator))
+        self.assertEqual(results[0].num_throttled, 1)
+        self.assertEqual(results[0].calls['get'], 2)
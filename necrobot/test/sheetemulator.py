@@ -0,0 +1,364 @@
+"""
+An in-process stand-in for the Google Sheets API, for testing and benchmarking the GSheet layer without
+credentials or network access.
+
+SheetEmulator implements the parts of the spreadsheets() resource that the bot uses (get, and values().get,
+batchGet, update, and batchUpdate) over worksheets held in memory. Requests it builds behave like those of the
+Google API client: they are run with makerequest.make_request, which executes them on its worker threads. Each
+request can be made to take a fixed time (to model network latency), and requests can be made to fail with
+HTTP 429 (to exercise backoff), either at random or on demand.
+
+Plug it in with Spreadsheets.set_service():
+
+    emulator = SheetEmulator(latency=0.05)
+    emulator.add_worksheet('gsheet_id', 'Week 1', values=[['Racer 1', 'Racer 2'], ['incnone', 'macnd']])
+    Spreadsheets.set_service(emulator)
+
+Every executed request is counted by method (e.g. 'values.batchUpdate'), so tests can check how many API calls
+an operation makes. Values are stored as strings, exactly as written; no formatting is applied to values written
+with valueInputOption=USER_ENTERED.
+"""
+
+import collections
+import random
+import re
+import threading
+import time
+import unittest
+from typing import Dict, List, Optional, Tuple
+
+from necrobot.util import lazyimport
+
+gapi_errors = lazyimport.lazy_module('googleapiclient.errors')
+httplib2 = lazyimport.lazy_module('httplib2')
+
+API_URL = 'https://sheets.googleapis.com/v4/spreadsheets'
+
+_cell_regex = re.compile(r'^([A-Z]*)([0-9]*)$')
+
+
+class _Worksheet(object):
+    def __init__(self, sheet_id: int, title: str, row_count: int, column_count: int):
+        self.sheet_id = sheet_id
+        self.title = title
+        self.row_count = row_count
+        self.column_count = column_count
+        self.values = []        # type: List[List[str]]
+
+    @property
+    def properties(self) -> dict:
+        return {
+            'sheetId': self.sheet_id,
+            'title': self.title,
+            'index': 0,
+            'sheetType': 'GRID',
+            'gridProperties': {'rowCount': self.row_count, 'columnCount': self.column_count},
+        }
+
+    def read(self, top: int, left: int, bottom: int, right: int) -> List[List[str]]:
+        """The values in the range (1-based, inclusive), with trailing empty rows and cells removed"""
+        rows = []
+        for row_values in self.values[top - 1:bottom]:
+            row = [str(value) for value in row_values[left - 1:right]]
+            while row and row[-1] == '':
+                row.pop()
+            rows.append(row)
+        while rows and not rows[-1]:
+            rows.pop()
+        return rows
+
+    def write(self, top: int, left: int, values: List[List[str]]) -> int:
+        """Write the values, with values[0][0] going to (top, left) (1-based); return the number of cells written"""
+        num_cells = 0
+        for i, row_values in enumerate(values):
+            row = top - 1 + i
+            while len(self.values) <= row:
+                self.values.append([])
+            for j, value in enumerate(row_values):
+                col = left - 1 + j
+                while len(self.values[row]) <= col:
+                    self.values[row].append('')
+                self.values[row][col] = str(value) if value is not None else ''
+                num_cells += 1
+        self.row_count = max(self.row_count, len(self.values))
+        return num_cells
+
+
+class EmulatedRequest(object):
+    """A request built by SheetEmulator, to be run with makerequest.make_request"""
+    def __init__(self, emulator, method: str, gsheet_id: str, fn):
+        self.method = method
+        self.uri = '{0}/{1}?emulated={2}'.format(API_URL, gsheet_id, method)
+        self._emulator = emulator
+        self._fn = fn
+
+    def execute(self, http=None):
+        return self._emulator.execute(self)
+
+
+class SheetEmulator(object):
+    """An in-memory Google Sheets service.
+
+    Parameters
+    ----------
+    latency: float
+        The number of seconds each request takes.
+    throttle_rate: float
+        The probability that a request fails with HTTP 429.
+    seed: int
+        A seed for the random number generator that decides which requests are throttled.
+    """
+    def __init__(self, latency: float = 0.0, throttle_rate: float = 0.0, seed: int = None):
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+
+        self._spreadsheets = dict()             # type: Dict[str, List[_Worksheet]]
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+        self._throttle_next = 0                 # type: int
+
+        self.calls = collections.Counter()      # type: collections.Counter
+        self.num_throttled = 0                  # type: int
+        self.num_cells_read = 0                 # type: int
+        self.num_cells_written = 0              # type: int
+
+    @property
+    def num_calls(self) -> int:
+        """The number of requests executed (including throttled ones)"""
+        return sum(self.calls.values())
+
+    def reset_counts(self) -> None:
+        with self._lock:
+            self.calls = collections.Counter()
+            self.num_throttled = 0
+            self.num_cells_read = 0
+            self.num_cells_written = 0
+
+    def throttle_next(self, num_requests: int = 1) -> None:
+        """Make the next num_requests requests fail with HTTP 429"""
+        with self._lock:
+            self._throttle_next += num_requests
+
+    def add_worksheet(
+            self,
+            gsheet_id: str,
+            title: str,
+            values: List[List[str]] = None,
+            sheet_id: int = None,
+            row_count: int = 1000,
+            column_count: int = 26
+    ) -> int:
+        """Add a worksheet (and the spreadsheet, if it's new). Return the worksheet's sheetId."""
+        worksheets = self._spreadsheets.setdefault(gsheet_id, [])
+        if sheet_id is None:
+            sheet_id = max([wks.sheet_id for wks in worksheets] + [-1]) + 1
+        worksheet = _Worksheet(sheet_id=sheet_id, title=title, row_count=row_count, column_count=column_count)
+        if values:
+            worksheet.write(1, 1, values)
+        worksheets.append(worksheet)
+        return sheet_id
+
+    def get_values(self, gsheet_id: str, title: str) -> List[List[str]]:
+        """All values of the worksheet (for checking results; not counted as a call)"""
+        worksheet = self._get_worksheet(gsheet_id, title)
+        return worksheet.read(1, 1, worksheet.row_count, worksheet.column_count)
+
+    def spreadsheets(self):
+        return _SpreadsheetsResource(self)
+
+    def execute(self, request: EmulatedRequest):
+        """Execute a request (called on makerequest's worker threads)"""
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+        with self._lock:
+            self.calls[request.method] += 1
+            throttle = self._throttle_next > 0 \
+                or (self.throttle_rate > 0 and self._random.random() < self.throttle_rate)
+            if throttle:
+                self._throttle_next = max(self._throttle_next - 1, 0)
+                self.num_throttled += 1
+            else:
+                return request._fn()
+
+        raise gapi_errors.HttpError(
+            resp=httplib2.Response({'status': 429}),
+            content=b'{"error": {"code": 429, "message": "Rate Limit Exceeded", "status": "RESOURCE_EXHAUSTED"}}',
+            uri=request.uri
+        )
+
+    def _request(self, method: str, gsheet_id: str, fn) -> EmulatedRequest:
+        return EmulatedRequest(self, method=method, gsheet_id=gsheet_id, fn=fn)
+
+    def _get_worksheets(self, gsheet_id: str) -> List[_Worksheet]:
+        if gsheet_id not in self._spreadsheets:
+            raise gapi_errors.HttpError(
+                resp=httplib2.Response({'status': 404}),
+                content=b'{"error": {"code": 404, "message": "Requested entity was not found.", '
+                        b'"status": "NOT_FOUND"}}',
+                uri='{0}/{1}'.format(API_URL, gsheet_id)
+            )
+        return self._spreadsheets[gsheet_id]
+
+    def _get_worksheet(self, gsheet_id: str, title: Optional[str]) -> _Worksheet:
+        worksheets = self._get_worksheets(gsheet_id)
+        for worksheet in worksheets:
+            if title is None or worksheet.title == title:
+                return worksheet
+        raise gapi_errors.HttpError(
+            resp=httplib2.Response({'status': 400}),
+            content='{{"error": {{"code": 400, "message": "Unable to parse range: {0}", '
+                    '"status": "INVALID_ARGUMENT"}}}}'.format(title).encode(),
+            uri='{0}/{1}'.format(API_URL, gsheet_id)
+        )
+
+    def _read_range(self, gsheet_id: str, range_name: str, major_dimension: str) -> dict:
+        title, (top, left, bottom, right) = parse_range(range_name)
+        worksheet = self._get_worksheet(gsheet_id, title)
+        bottom = bottom if bottom is not None else worksheet.row_count
+        right = right if right is not None else worksheet.column_count
+        values = worksheet.read(top, left, bottom, right)
+        self.num_cells_read += sum(len(row) for row in values)
+        if major_dimension == 'COLUMNS':
+            num_cols = max([len(row) for row in values] + [0])
+            values = [[row[col] if col < len(row) else '' for row in values] for col in range(num_cols)]
+        value_range = {'range': str(range_name), 'majorDimension': major_dimension}
+        if values:
+            value_range['values'] = values
+        return value_range
+
+    def _write_range(self, gsheet_id: str, range_name: str, values: List[List[str]]) -> dict:
+        title, (top, left, _, _) = parse_range(range_name)
+        num_cells = self._get_worksheet(gsheet_id, title).write(top, left, values)
+        self.num_cells_written += num_cells
+        return {
+            'spreadsheetId': gsheet_id,
+            'updatedRange': str(range_name),
+            'updatedRows': len(values),
+            'updatedCells': num_cells,
+        }
+
+
+class _SpreadsheetsResource(object):
+    def __init__(self, emulator: SheetEmulator):
+        self._emulator = emulator
+
+    def get(self, spreadsheetId: str, fields: str = None, ranges=None, includeGridData: bool = False):
+        def fn():
+            return {
+                'spreadsheetId': spreadsheetId,
+                'properties': {'title': 'Emulated spreadsheet {0}'.format(spreadsheetId)},
+                'sheets': [
+                    {'properties': worksheet.properties}
+                    for worksheet in self._emulator._get_worksheets(spreadsheetId)
+                ],
+            }
+        return self._emulator._request('get', spreadsheetId, fn)
+
+    def values(self):
+        return _ValuesResource(self._emulator)
+
+
+class _ValuesResource(object):
+    def __init__(self, emulator: SheetEmulator):
+        self._emulator = emulator
+
+    def get(self, spreadsheetId: str, range, majorDimension: str = 'ROWS', **kwargs):
+        def fn():
+            return self._emulator._read_range(spreadsheetId, str(range), majorDimension)
+        return self._emulator._request('values.get', spreadsheetId, fn)
+
+    def batchGet(self, spreadsheetId: str, ranges, majorDimension: str = 'ROWS', **kwargs):
+        def fn():
+            return {
+                'spreadsheetId': spreadsheetId,
+                'valueRanges': [
+                    self._emulator._read_range(spreadsheetId, str(range_name), majorDimension)
+                    for range_name in ranges
+                ],
+            }
+        return self._emulator._request('values.batchGet', spreadsheetId, fn)
+
+    def update(self, spreadsheetId: str, range, body: dict, valueInputOption: str = 'RAW', **kwargs):
+        def fn():
+            return self._emulator._write_range(spreadsheetId, str(range), body['values'])
+        return self._emulator._request('values.update', spreadsheetId, fn)
+
+    def batchUpdate(self, spreadsheetId: str, body: dict):
+        def fn():
+            responses = [
+                self._emulator._write_range(spreadsheetId, str(value_range['range']), value_range['values'])
+                for value_range in body['data']
+            ]
+            return {
+                'spreadsheetId': spreadsheetId,
+                'totalUpdatedCells': sum(response['updatedCells'] for response in responses),
+                'responses': responses,
+            }
+        return self._emulator._request('values.batchUpdate', spreadsheetId, fn)
+
+
+def parse_range(range_name: str) -> Tuple[Optional[str], Tuple[int, int, Optional[int], Optional[int]]]:
+    """Parse an A1-notation range (e.g. "'Week 1'!B3:E10", "Sheet1!C4", or "A1:C").
+
+    Returns
+    -------
+    tuple[Optional[str], tuple[int, int, Optional[int], Optional[int]]]
+        The worksheet title (or None, for the first worksheet), and the (top, left, bottom, right) bounds of the
+        range, 1-based and inclusive. Bottom and right are None if the range is unbounded in that direction.
+    """
+    title = None
+    if '!' in range_name:
+        title, range_name = range_name.rsplit('!', 1)
+        if title.startswith("'") and title.endswith("'"):
+            title = title[1:-1].replace("''", "'")
+
+    cells = range_name.split(':')
+    top, left = _parse_cell(cells[0])
+    if len(cells) == 1:
+        return title, (top or 1, left or 1, top, left)
+    bottom, right = _parse_cell(cells[1])
+    return title, (top or 1, left or 1, bottom, right)
+
+
+def _parse_cell(cell_name: str) -> Tuple[Optional[int], Optional[int]]:
+    match = _cell_regex.match(cell_name.upper())
+    if match is None:
+        raise ValueError('Bad cell name: {0}'.format(cell_name))
+    col = 0
+    for char in match.group(1):
+        col = 26 * col + ord(char) - ord('A') + 1
+    return int(match.group(2)) if match.group(2) else None, col if col else None
+
+
+class TestSheetEmulator(unittest.TestCase):
+    def setUp(self):
+        self.emulator = SheetEmulator()
+        self.emulator.add_worksheet('gsheet', 'Week 1', values=[['Racer 1', 'Racer 2'], ['incnone', 'macnd']])
+        self.spreadsheets = self.emulator.spreadsheets()
+
+    def test_parse_range(self):
+        self.assertEqual(parse_range("'Week 1'!B3:AA10"), ('Week 1', (3, 2, 10, 27)))
+        self.assertEqual(parse_range("Standings!C4"), ('Standings', (4, 3, 4, 3)))
+        self.assertEqual(parse_range("A2:C"), (None, (2, 1, None, 3)))
+
+    def test_read_write(self):
+        self.spreadsheets.values().batchUpdate(spreadsheetId='gsheet', body={
+            'valueInputOption': 'RAW',
+            'data': [
+                {'range': "'Week 1'!C2", 'values': [['2-1']]},
+                {'range': "'Week 1'!A4:B4", 'values': [['elad', 'wilarseny']]},
+            ]
+        }).execute()
+        value_range = self.spreadsheets.values().get(spreadsheetId='gsheet', range="'Week 1'!A1:Z1000").execute()
+        self.assertEqual(value_range['values'], [
+            ['Racer 1', 'Racer 2'], ['incnone', 'macnd', '2-1'], [], ['elad', 'wilarseny']
+        ])
+        columns = self.spreadsheets.values().get(
+            spreadsheetId='gsheet', range="'Week 1'!A2:B2", majorDimension='COLUMNS').execute()
+        self.assertEqual(columns['values'], [['incnone'], ['macnd']])
+
+        props = self.spreadsheets.get(spreadsheetId='gsheet', fields='sheets.properties').execute()
+        self.assertEqual(props['sheets'][0]['properties']['title'], 'Week 1')
+        self.assertEqual(self.emulator.calls, {'values.batchUpdate': 1, 'values.get': 2, 'get': 1})
+        self.assertEqual(self.emulator.num_cells_written, 3)
@@ -27,3 +27,96 @@ async def get_match(
         cawmentator_id=cawmentator_id,
         register=False
     )
+
+
+async def run_match_script(send, racer_1, racer_2, admin, fancy: bool = False) -> None:
+    """Run through a full match in a match room, as the TestMatch command does.
+
+    Parameters
+    ----------
+    send: [coro] (discord.Member, str, wait_for: str = None) -> None
+        Posts the given message as the given member in the match room. If wait_for is not None, returns once the
+        bot has replied with a message containing wait_for.
+    racer_1: discord.Member
+        The match's first racer.
+    racer_2: discord.Member
+        The match's second racer.
+    admin: discord.Member
+        A bot admin (for the admin commands).
+    fancy: bool
+        If True, also run through canceling, recording, and rerunning races.
+    """
+    # Match info
+    await send(racer_1, '.matchinfo', wait_for='')
+    await send(admin, '.setmatchtype bestof 5', wait_for='This match has been set')
+    await send(admin, '.setmatchtype repeat 3', wait_for='This match has been set')
+
+    # Time suggestion
+    await send(racer_1, '.suggest friday 8p', wait_for='This match is suggested')
+    await send(racer_2, '.suggest tomorrow 12:30', wait_for='This match is suggested')
+    await send(racer_1, '.confirm', wait_for='officially scheduled')
+    await send(racer_2, '.unconfirm', wait_for='wishes to remove')
+    await send(racer_1, '.unconfirm', wait_for='has been unscheduled')
+
+    # Prematch admin commands
+    await send(admin, '.f-schedule tomorrow 21:15', wait_for='This match is suggested')
+    await send(admin, '.f-confirm', wait_for='Forced confirmation')
+    await send(admin, '.postpone', wait_for='has been postponed')
+    await send(admin, '.f-begin', wait_for='Please input')
+
+    # Race 1
+    await send(racer_1, '.ready', wait_for='is ready')
+    await send(racer_2, '.ready', wait_for='The race will begin')
+    await send(racer_1, '.unready', wait_for='is no longer ready')
+    await send(racer_1, '.r', wait_for='GO!')
+    await send(racer_1, '.d', wait_for='Please input')
+
+    # Race 2
+    await send(admin, '.reseed', wait_for='Changed seed')
+    await send(racer_2, '.ready', wait_for='is ready')
+    await send(racer_1, '.ready', wait_for='GO!')
+    await send(admin, '.pause', wait_for='Race paused')
+    await send(admin, '.unpause', wait_for='GO!')
+    await send(racer_1, '.time', wait_for='The current race time')
+    await send(racer_2, '.d', wait_for='has finished in')
+    await send(racer_1, '.d', wait_for='Please input')
+
+    # Race 3:
+    if not fancy:
+        await send(racer_1, '.ready', wait_for='is ready')
+        await send(racer_2, '.ready', wait_for='GO!')
+        await send(racer_1, '.d', wait_for='Match complete')
+    else:
+        await send(admin, '.cancelrace 1', wait_for='')
+        await send(admin, '.recordrace "{0}"'.format(racer_2.display_name), wait_for='')
+        await send(admin, '.changewinner 2 "{0}"'.format(racer_1.display_name), wait_for='')
+        await send(admin, '.postpone', wait_for='has been postponed')
+        await send(admin, '.f-begin', wait_for='Please input')
+        await send(admin, '.changerules diamond u', wait_for='Changed rules')
+        await send(admin, '.matchinfo', wait_for='')
+        await send(admin, '.changerules cadence s', wait_for='Changed rules')
+        await send(admin, '.matchinfo', wait_for='')
+        await send(racer_1, '.r', wait_for='is ready')
+        await send(racer_2, '.r', wait_for='GO!')
+        await send(admin, '.pause', wait_for='Race paused')
+        await send(admin, '.cancelrace', wait_for='Please input')
+
+        # Race 4:
+        await send(racer_1, '.r', wait_for='is ready')
+        await send(racer_2, '.r', wait_for='GO!')
+        await send(admin, '.pause', wait_for='Race paused')
+        await send(admin, '.newrace', wait_for='Please input')
+
+        # Race 5:
+        await send(racer_1, '.r', wait_for='is ready')
+        await send(racer_2, '.r', wait_for='GO!')
+        await send(racer_1, '.d', wait_for='Match complete')
+        await send(admin, '.matchinfo', wait_for='')
+        await send(admin, '.newrace', wait_for='Please input')
+
+        # Race 6:
+        await send(racer_1, '.r', wait_for='is ready')
+        await send(racer_2, '.r', wait_for='GO!')
+        await send(racer_2, '.d', wait_for='Match complete')
+
+        await send(admin, '.cancelrace 3')
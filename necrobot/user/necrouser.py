@@ -4,7 +4,7 @@ import pytz
 import re
 import textwrap
 import unittest
-from typing import Callable
+from typing import Callable, List
 
 from necrobot.botbase import server
 from necrobot.stats.leaguestats import LeagueStats
@@ -59,6 +59,11 @@ class NecroUser(object):
     def user_id(self) -> int:
         return self._user_id
 
+    @property
+    def names(self) -> List[str]:
+        """The racer's various names (those matched by name_regex)"""
+        return [name for name in (self.rtmp_name, self.discord_name, self.twitch_name) if name is not None]
+
     @property
     def name_regex(self):
         """A compiled Regular Expression Object matching the racer's various names"""
@@ -6,6 +6,8 @@ the database. This module is responsible for checking out users from the databas
 by user ID, of checked out users.
 """
 
+from typing import Dict
+
 import necrobot.exception
 from necrobot.botbase import server
 from necrobot.database import userdb
@@ -110,6 +112,57 @@ async def get_user(
     return None
 
 
+async def prefetch_users(user_ids: list) -> None:
+    """Check out all of the given users with a single query, so that later calls to get_user(user_id=...) for
+    these users don't hit the database.
+    """
+    uncached_ids = [user_id for user_id in user_ids if user_id is not None and user_id not in user_library_by_uid]
+    for row in await userdb.get_users_with_ids(uncached_ids):
+        _get_user_from_db_row(row)
+
+
+async def get_users_with_any_names(names: list, register: bool = False) -> Dict[str, NecroUser]:
+    """As get_user(any_name=...), but for many names at once, with a single query for all names not already
+    checked out.
+
+    Parameters
+    ----------
+    names: list[str]
+        The names to look up.
+    register: bool
+        If True, will register a new user (with that RTMP name) for each name that isn't found.
+
+    Returns
+    -------
+    dict[str, NecroUser]
+        The user found for each name. Names with no user (if register is False) are omitted.
+    """
+    users = dict()
+    uncached_names = []
+    for name in set(names):
+        cached_user = _get_cached_user(rtmp_name=name)
+        if cached_user is not None:
+            users[name] = cached_user
+        else:
+            uncached_names.append(name)
+
+    rows_by_name = dict()
+    for row in await userdb.get_users_with_any_names(uncached_names):
+        for row_name in set(n.lower() for n in (row[1], row[2], row[3]) if n is not None):
+            rows_by_name.setdefault(row_name, []).append(row)
+
+    for name in uncached_names:
+        rows = rows_by_name.get(name.lower())
+        if rows:
+            best_row = max(rows, key=lambda r: _any_name_priority(r, name))
+            cached_user = _get_cached_user(user_id=int(best_row[8]))
+            users[name] = cached_user if cached_user is not None else _get_user_from_db_row(best_row)
+        elif register:
+            users[name] = await _get_user_any_name(name, register=True)
+
+    return users
+
+
 async def commit_all_checked_out_users():
     for user in user_library_by_uid.values():
         await user.commit()
@@ -154,20 +207,23 @@ async def _get_user_any_name(name: str, register: bool) -> NecroUser or None:
             _cache_user(user)
             return user
     elif len(raw_db_data) > 1:
-        def sort_fn(row):
-            return \
-                32*int(row[3] == name) \
-                + 16*int(row[3].lower() == name.lower() if row[3] is not None else 0) + \
-                8*int(row[1] == name) \
-                + 4*int(row[1].lower() == name.lower() if row[1] is not None else 0) + \
-                2*int(row[2] == name) \
-                + 1*int(row[2].lower() == name.lower() if row[2] is not None else 0)
-        raw_db_data = sorted(raw_db_data, key=lambda x: sort_fn(x), reverse=True)
+        raw_db_data = sorted(raw_db_data, key=lambda x: _any_name_priority(x, name), reverse=True)
 
     for user_row in raw_db_data:
         return _get_user_from_db_row(user_row)
 
 
+def _any_name_priority(user_row, name: str) -> int:
+    """Priority of a matching user row for an any_name search: rtmp > discord > twitch, exact case first"""
+    return \
+        32*int(user_row[3] == name) \
+        + 16*int(user_row[3].lower() == name.lower() if user_row[3] is not None else 0) + \
+        8*int(user_row[1] == name) \
+        + 4*int(user_row[1].lower() == name.lower() if user_row[1] is not None else 0) + \
+        2*int(user_row[2] == name) \
+        + 1*int(user_row[2].lower() == name.lower() if user_row[2] is not None else 0)
+
+
 def _cache_user(user: NecroUser):
     if user.user_id is None:
         console.warning('Trying to cache a user with no user ID.')
@@ -0,0 +1,73 @@
+"""
+Deferred imports for heavy optional dependencies (the Google API client, pycurl, trueskill, dateutil).
+
+A module-level `foo = lazyimport.lazy_module('foo')` binds a proxy; the real module is only imported the first
+time an attribute of `foo` is accessed. Bots that never touch the subsystem never pay for loading it.
+"""
+
+import importlib
+import sys
+import types
+import unittest
+
+
+class LazyModule(types.ModuleType):
+    """Stands in for a module until one of its attributes is first needed.
+
+    Parameters
+    ----------
+    name: str
+        The fully qualified name of the module to import.
+    """
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.__dict__['_lazy_module'] = None
+
+    def __getattr__(self, item):
+        # Only called for attributes not found normally, i.e. anything belonging to the real module
+        return getattr(self._load(), item)
+
+    def __setattr__(self, key, value):
+        setattr(self._load(), key, value)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = 'loaded' if self.__dict__['_lazy_module'] is not None else 'not loaded'
+        return '<lazy module {0!r} ({1})>'.format(self.__name__, state)
+
+    def _load(self) -> types.ModuleType:
+        module = self.__dict__['_lazy_module']
+        if module is None:
+            module = importlib.import_module(self.__name__)
+            self.__dict__['_lazy_module'] = module
+        return module
+
+
+def lazy_module(name: str) -> types.ModuleType:
+    """Return the module with the given name if it has already been imported; otherwise, return a proxy that
+    imports it on first attribute access.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    return LazyModule(name)
+
+
+def is_loaded(name: str) -> bool:
+    """True if the module with the given name has actually been imported"""
+    return name in sys.modules
+
+
+class TestLazyImport(unittest.TestCase):
+    def test_loaded_on_first_use(self):
+        sys.modules.pop('colorsys', None)
+        mod = lazy_module('colorsys')
+        self.assertFalse(is_loaded('colorsys'))
+        repr(mod)
+        self.assertFalse(is_loaded('colorsys'))
+        self.assertEqual(mod.rgb_to_hsv(0.0, 0.0, 0.0), (0.0, 0.0, 0.0))
+        self.assertTrue(is_loaded('colorsys'))
+
+    def test_already_imported(self):
+        self.assertIs(lazy_module('unittest'), unittest)
@@ -0,0 +1,437 @@
+"""
+On-demand profiling of the running bot, started with the admin command .profile.
+
+A profiling session runs either for a number of seconds, or for the next few invocations of a named command (giving
+up after COMMAND_TIMEOUT seconds, in case the command isn't called that often). It records the wall and CPU time of
+each command executed while it runs, and profiles the event loop thread in one of two ways:
+    profile     Deterministic profiling with cProfile (wall time per function; coroutines appear as functions).
+    sample      Sampling: a background thread records the event loop thread's stack every few milliseconds.
+
+When the session ends, the full profile is written to Config.LOG_DIRECTORY and summary() gives the top functions.
+While no session is running, the only cost is CommandType.execute checking `liveprofile.running`.
+"""
+
+import asyncio
+import cProfile
+import datetime
+import os
+import pstats
+import sys
+import threading
+import time
+import unittest
+from typing import Dict, Iterable, List, Tuple
+
+from necrobot.util import console
+
+from necrobot.config import Config
+
+MODE_PROFILE = 'profile'
+MODE_SAMPLE = 'sample'
+SAMPLE_INTERVAL = 0.005
+NUM_TOP_FUNCTIONS = 20
+NUM_TOP_COMMANDS = 20
+COMMAND_TIMEOUT = 600
+
+running = False                     # type: bool
+_session = None                     # type: ProfileSession
+
+
+class ProfileSession(object):
+    """A single profiling session. Use start_for_duration or start_for_command rather than making one directly.
+
+    Parameters
+    ----------
+    mode: str
+        MODE_PROFILE or MODE_SAMPLE.
+    command_name: str
+        If not None, profile only while this command (by any of its names) is executing.
+    num_calls: int
+        If command_name is given, the number of its invocations to profile.
+    """
+    def __init__(self, mode: str, command_name: str = None, num_calls: int = 0):
+        self.mode = mode
+        self.command_name = command_name
+        self.num_calls = num_calls
+        self.calls_remaining = num_calls
+        self.started_at = datetime.datetime.utcnow()
+        self.elapsed = 0.0
+        self.filename = None                # type: str
+        self.done = asyncio.Future()        # Result is the session itself
+
+        self._command_times = dict()        # type: Dict[str, List[float]]    # name -> [calls, wall, cpu]
+        self._begin = None                  # type: float
+        self._active_calls = 0
+        self._profiler = cProfile.Profile() if mode == MODE_PROFILE else None
+        self._sampler = _StackSampler(threading.get_ident()) if mode == MODE_SAMPLE else None
+        self._stop_handle = None
+
+    @property
+    def is_finished(self) -> bool:
+        return self.done.done()
+
+    def matches(self, command_type) -> bool:
+        return self.command_name is None or command_type.called_by(self.command_name)
+
+    async def run_command(self, command_type, coro) -> None:
+        """Run a command's coroutine, recording its wall and CPU time (and profiling it, if this session is waiting
+        for that command)
+        """
+        targeted = self.command_name is not None and self.calls_remaining > 0 and self.matches(command_type)
+        if targeted:
+            self.calls_remaining -= 1
+            self._active_calls += 1
+            if self._active_calls == 1:
+                self._start_recording()
+
+        wall_begin = time.perf_counter()
+        cpu_begin = time.process_time()
+        try:
+            await coro
+        finally:
+            if self.matches(command_type):
+                times = self._command_times.setdefault(type(command_type).__name__, [0, 0.0, 0.0])
+                times[0] += 1
+                times[1] += time.perf_counter() - wall_begin
+                times[2] += time.process_time() - cpu_begin
+            if targeted:
+                self._active_calls -= 1
+                if self._active_calls == 0:
+                    self._stop_recording()
+                    if self.calls_remaining == 0:
+                        _finish(self)
+
+    def summary(self, num_functions: int = NUM_TOP_FUNCTIONS, num_commands: int = NUM_TOP_COMMANDS) -> List[str]:
+        """The results, as a list of blocks of text (each short enough for one Discord message)"""
+        if self.command_name is not None:
+            scope = '{0} of {1} calls to {2}{3}'.format(
+                self.num_calls - self.calls_remaining, self.num_calls, Config.BOT_COMMAND_PREFIX, self.command_name)
+            if self.calls_remaining > 0:
+                scope += ', timed out waiting for the rest'
+        else:
+            scope = '{0:.1f} s'.format(self.elapsed)
+        header = '{0} of {1} (profiled {2:.1f} s); written to {3}.'.format(
+            'Sampled profile' if self.mode == MODE_SAMPLE else 'Profile', scope, self.elapsed, self.filename)
+
+        command_lines = ['{0:<24} {1:>6} {2:>10} {3:>10}'.format('command', 'calls', 'wall (s)', 'cpu (s)')]
+        ranked_commands = sorted(self._command_times.items(), key=lambda item: item[1][1], reverse=True)
+        for name, (calls, wall, cpu) in ranked_commands[:num_commands]:
+            command_lines.append('{0:<24} {1:>6} {2:>10.3f} {3:>10.3f}'.format(name[:24], calls, wall, cpu))
+        if len(ranked_commands) > num_commands:
+            command_lines.append('(and {0} more)'.format(len(ranked_commands) - num_commands))
+
+        function_lines = ['{0:>9} {1:>9} {2:>8}  {3}'.format(
+            'cum (s)', 'self (s)', 'samples' if self.mode == MODE_SAMPLE else 'calls', 'function')]
+        for name, calls, self_time, cum_time in self._top_functions(num_functions):
+            function_lines.append('{0:>9.3f} {1:>9.3f} {2:>8}  {3}'.format(cum_time, self_time, calls, name[:60]))
+
+        return [
+            header,
+            '```\n{0}\n```'.format('\n'.join(command_lines)),
+            '```\n{0}\n```'.format('\n'.join(function_lines)),
+        ]
+
+    def _start_recording(self) -> None:
+        self._begin = time.perf_counter()
+        if self._profiler is not None:
+            self._profiler.enable()
+        if self._sampler is not None:
+            self._sampler.start()
+
+    def _stop_recording(self) -> None:
+        if self._begin is None:
+            return
+        if self._profiler is not None:
+            self._profiler.disable()
+        if self._sampler is not None:
+            self._sampler.stop()
+        self.elapsed += time.perf_counter() - self._begin
+        self._begin = None
+
+    def _top_functions(self, num_functions: int) -> List[Tuple[str, int, float, float]]:
+        """The (name, calls, self time, cumulative time) of the functions with the most self time. (Ranking by
+        cumulative time would fill the list with the event loop and the command dispatch, which enclose everything.)
+        """
+        if self._profiler is not None:
+            stats = pstats.Stats(self._profiler).stats
+            functions = [
+                (_function_name(func), num_calls, self_time, cum_time)
+                for func, (_, num_calls, self_time, cum_time, _) in stats.items()
+            ]
+        else:
+            functions = self._sampler.functions()
+        return _rank_by_self_time(functions)[:num_functions]
+
+    def _write(self) -> None:
+        filename = os.path.join(
+            Config.LOG_DIRECTORY, 'profile-{0}.{1}'.format(
+                self.started_at.strftime('%Y%m%d-%H%M%S'), 'prof' if self._profiler is not None else 'txt'))
+        try:
+            if self._profiler is not None:
+                self._profiler.dump_stats(filename)
+            else:
+                with open(filename, 'w') as outfile:
+                    for name, calls, self_time, cum_time in _rank_by_self_time(self._sampler.functions()):
+                        outfile.write('{0:.3f}\t{1:.3f}\t{2}\t{3}\n'.format(cum_time, self_time, calls, name))
+            self.filename = filename
+        except OSError as e:
+            console.warning('Couldn\'t write profile to {0}: {1}'.format(filename, e))
+            self.filename = '(nowhere: {0})'.format(e)
+
+
+class _StackSampler(object):
+    """Samples the stack of one thread from a background thread"""
+    def __init__(self, thread_id: int, interval: float = SAMPLE_INTERVAL):
+        self.interval = interval
+        self._thread_id = thread_id
+        self._self_counts = dict()      # type: Dict[Tuple, int]
+        self._cum_counts = dict()       # type: Dict[Tuple, int]
+        self._stop_event = threading.Event()
+        self._thread = None             # type: threading.Thread
+
+    def start(self) -> None:
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='liveprofile-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def functions(self) -> List[Tuple[str, int, float, float]]:
+        """The (name, samples, self time, cumulative time) of each function seen; times are estimated from the
+        sample counts
+        """
+        return [
+            (_function_name(func), cum_count, self.interval * self._self_counts.get(func, 0), self.interval * cum_count)
+            for func, cum_count in self._cum_counts.items()
+        ]
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            self.sample()
+
+    def sample(self) -> None:
+        frame = sys._current_frames().get(self._thread_id)
+        if frame is None:
+            return
+        top = _frame_key(frame)
+        self._self_counts[top] = self._self_counts.get(top, 0) + 1
+        seen = set()
+        while frame is not None:
+            key = _frame_key(frame)
+            if key not in seen:
+                seen.add(key)
+                self._cum_counts[key] = self._cum_counts.get(key, 0) + 1
+            frame = frame.f_back
+
+
+def start_for_duration(seconds: float, mode: str = MODE_PROFILE) -> ProfileSession:
+    """Profile everything for the given number of seconds. Must be called from the event loop thread.
+
+    Raises
+    ------
+    RuntimeError
+        If a session is already running.
+    """
+    session = _start(ProfileSession(mode=mode))
+    session._start_recording()
+    session._stop_handle = asyncio.get_event_loop().call_later(seconds, _finish, session)
+    return session
+
+
+def start_for_command(
+        command_name: str,
+        num_calls: int,
+        command_types: Iterable,
+        mode: str = MODE_PROFILE,
+        timeout: float = COMMAND_TIMEOUT
+) -> ProfileSession:
+    """Profile the next num_calls invocations of the named command. Must be called from the event loop thread.
+
+    Parameters
+    ----------
+    command_name: str
+        Any of the names of the command to profile.
+    num_calls: int
+        The number of its invocations to profile.
+    command_types: Iterable[CommandType]
+        The commands that can currently be called; command_name must call one of these.
+    mode: str
+        MODE_PROFILE or MODE_SAMPLE.
+    timeout: float
+        If the command hasn't been called num_calls times after this many seconds, end the session with the calls
+        profiled so far.
+
+    Raises
+    ------
+    ValueError
+        If command_name doesn't call any of the command_types.
+    RuntimeError
+        If a session is already running.
+    """
+    command_name = command_name.lower()
+    if not any(command_type.called_by(command_name) for command_type in command_types):
+        raise ValueError('No command is called `{0}{1}`.'.format(Config.BOT_COMMAND_PREFIX, command_name))
+
+    session = _start(ProfileSession(mode=mode, command_name=command_name, num_calls=num_calls))
+    session._stop_handle = asyncio.get_event_loop().call_later(timeout, _finish, session)
+    return session
+
+
+def stop() -> ProfileSession or None:
+    """End the running session early; returns it, or None if none was running"""
+    session = _session
+    if session is not None:
+        session._stop_recording()
+        _finish(session)
+    return session
+
+
+async def run_command(command_type, coro) -> None:
+    """Run a CommandType's coroutine under the running session (call only when `running` is True)"""
+    session = _session
+    if session is None:
+        await coro
+    else:
+        await session.run_command(command_type, coro)
+
+
+def _start(session: ProfileSession) -> ProfileSession:
+    global running, _session
+    if _session is not None:
+        raise RuntimeError('A profile is already running.')
+    _session = session
+    running = True
+    return session
+
+
+def _finish(session: ProfileSession) -> None:
+    global running, _session
+    if session.is_finished:
+        return
+    if session._stop_handle is not None:
+        session._stop_handle.cancel()
+    session._stop_recording()
+    if _session is session:
+        _session = None
+        running = False
+    session._write()
+    session.done.set_result(session)
+
+
+def _rank_by_self_time(functions: List[Tuple[str, int, float, float]]) -> List[Tuple[str, int, float, float]]:
+    return sorted(functions, key=lambda function: (function[2], function[3]), reverse=True)
+
+
+def _frame_key(frame) -> Tuple[str, int, str]:
+    code = frame.f_code
+    return code.co_filename, code.co_firstlineno, code.co_name
+
+
+def _function_name(func: Tuple[str, int, str]) -> str:
+    filename, line, name = func
+    if filename == '~':
+        return name                                     # Built-ins, as recorded by cProfile
+    return '{0} ({1}:{2})'.format(name, os.path.basename(filename), line)
+
+
+class TestLiveProfile(unittest.TestCase):
+    class _CommandType(object):
+        def __init__(self, *names):
+            self.names = names
+
+        def called_by(self, name):
+            return name in self.names
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.saved_log_directory = Config.LOG_DIRECTORY
+        Config.LOG_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+        self.filenames = []
+
+    def tearDown(self):
+        stop()
+        Config.LOG_DIRECTORY = self.saved_log_directory
+        for filename in self.filenames:
+            if filename is not None and os.path.exists(filename):
+                os.remove(filename)
+        self.loop.close()
+
+    @staticmethod
+    async def _busy(seconds: float):
+        # Blocks the loop, as a slow command would
+        end = time.perf_counter() + seconds
+        while time.perf_counter() < end:
+            pass
+        await asyncio.sleep(0)
+
+    def test_duration(self):
+        async def run():
+            session = start_for_duration(0.05)
+            self.assertTrue(running)
+            self.assertRaises(RuntimeError, start_for_duration, 1)
+            await run_command(self._CommandType('make'), self._busy(0.01))
+            await session.done
+            self.filenames.append(session.filename)
+            return session
+
+        session = self.loop.run_until_complete(run())
+        self.assertFalse(running)
+        self.assertTrue(os.path.exists(session.filename))
+        blocks = session.summary()
+        self.assertIn('_CommandType', blocks[1])
+        self.assertIn('_busy', blocks[2])
+
+    def test_command_sampling(self):
+        async def run():
+            command_types = [self._CommandType('race'), self._CommandType('make', 'm')]
+            session = start_for_command('m', 2, command_types, mode=MODE_SAMPLE)
+            await run_command(self._CommandType('race'), self._busy(0.01))
+            await run_command(self._CommandType('make', 'm'), self._busy(0.05))
+            self.assertTrue(running)
+            await run_command(self._CommandType('make', 'm'), self._busy(0.05))
+            self.assertFalse(running)
+            self.filenames.append(session.filename)
+            return session
+
+        session = self.loop.run_until_complete(run())
+        self.assertTrue(session.is_finished)
+        self.assertEqual(session._command_times['_CommandType'][0], 2)
+        self.assertGreater(session.elapsed, 0.09)
+
+        # The command's own code ranks first, however deep the stack it runs under (e.g. a test runner's)
+        name, samples, self_time, cum_time = session._top_functions(1)[0]
+        self.assertIn('_busy', name)
+        self.assertGreater(self_time, 0.0)
+        self.assertIn('_busy', session.summary()[2].split('\n')[2])
+
+    def test_command_checks(self):
+        self.assertRaises(ValueError, start_for_command, 'mkae', 1, [self._CommandType('make')])
+        self.assertFalse(running)
+
+        async def run():
+            session = start_for_command('make', 3, [self._CommandType('make')], timeout=0.05)
+            await run_command(self._CommandType('make'), self._busy(0.01))
+            await asyncio.wait_for(session.done, timeout=1)
+            self.filenames.append(session.filename)
+            return session
+
+        session = self.loop.run_until_complete(run())
+        self.assertFalse(running)
+        self.assertEqual(session.calls_remaining, 2)
+        self.assertIn('1 of 3 calls', session.summary()[0])
+        self.assertIn('timed out', session.summary()[0])
+
+    def test_summary_fits_messages(self):
+        session = ProfileSession(MODE_SAMPLE)
+        for i in range(200):
+            session._command_times['command{0}'.format(i)] = [1, float(i), 0.0]
+        blocks = session.summary()
+        self.assertTrue(all(len(block) <= 2000 for block in blocks))
+        self.assertIn('command199', blocks[1])
+        self.assertNotIn('command100', blocks[1])
+        self.assertIn('(and {0} more)'.format(200 - NUM_TOP_COMMANDS), blocks[1])
@@ -1,29 +1,110 @@
+"""
+Parsing of user-entered times (for .suggest, .setdeadline, and the like).
+
+Times in the common formats ("friday 8p", "tomorrow 12:30", "2017-06-10 20:00") are parsed directly; anything else
+falls back to fuzzy parsing with dateutil. Results are cached by (input, timezone, current date), since the same
+few strings are parsed over and over (e.g. a league's deadline).
+"""
+
 import datetime
+import functools
 import pytz
+import re
+import unittest
 
 import necrobot.exception
-from dateutil import parser
-
-
-class CustomParserInfo(parser.parserinfo):
-    WEEKDAYS = [
-        ('Mon', 'Monday'),
-        ('Tue', 'Tues', 'Tuesday'),
-        ('Wed', 'Wednesday'),
-        ('Thu', 'Thurs', 'Thursday'),
-        ('Fri', 'Friday'),
-        ('Sat', 'Saturday'),
-        ('Sun', 'Sunday')
-    ]
+from necrobot.util import lazyimport
+
+parser = lazyimport.lazy_module('dateutil.parser')
+
+# The weekday names dateutil recognizes, by weekday number
+_WEEKDAYS = {}
+for _day_num, _day_name in enumerate(['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']):
+    _WEEKDAYS[_day_name] = _day_num
+    _WEEKDAYS[_day_name[:3]] = _day_num
+
+_ISO_DATE = re.compile(r'^(\d{4})-(\d{2})-(\d{2})$')
+_AMPM = ['a', 'am', 'p', 'pm']
+_TIME = re.compile(r'^(\d{1,2})(?::(\d{2}))?(a|am|p|pm)?$')
 
 
 def parse_datetime(parse_str: str, timezone: pytz.timezone = pytz.utc) -> datetime.datetime:
-    if parse_str.lower() == 'now':
+    normalized = ' '.join(parse_str.lower().split())
+    if normalized == 'now':
         return pytz.utc.localize(datetime.datetime.utcnow())
 
+    today = pytz.utc.localize(datetime.datetime.utcnow()).astimezone(timezone).date()
+    return _parse_on_date(normalized, timezone.zone, today)
+
+
+@functools.lru_cache(maxsize=256)
+def _parse_on_date(parse_str: str, timezone_name: str, today: datetime.date) -> datetime.datetime:
+    """Parse the (normalized) string as a time in the given timezone, taking the current date there to be today.
+    Returns a UTC datetime.
+    """
+    timezone = _get_timezone(timezone_name)
+    default_time = datetime.datetime.combine(today, datetime.time())
+    local_time = _parse_common_format(parse_str, default_time)
+    if local_time is None:
+        local_time = _parse_fuzzy(parse_str, default_time)
+    return timezone.localize(local_time).astimezone(pytz.utc)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_timezone(timezone_name: str) -> pytz.timezone:
+    return pytz.timezone(timezone_name)
+
+
+def _parse_common_format(parse_str: str, default_time: datetime.datetime) -> datetime.datetime or None:
+    """Parse strings of the form [day] [at] [time], where day is a weekday, "today", "tomorrow", or an ISO date,
+    and time is e.g. "8p", "8:30 pm", or "20:30". Gives the same result as _parse_fuzzy would, or None if the string
+    isn't of this form.
+    """
+    words = parse_str.split(' ')
+    date = default_time.date()
+    found_day = True
+    if words[0] in _WEEKDAYS:
+        date += datetime.timedelta(days=(_WEEKDAYS[words[0]] - date.weekday()) % 7)
+    elif words[0] == 'tomorrow':
+        date += datetime.timedelta(days=1)
+    elif words[0] != 'today':
+        iso_match = _ISO_DATE.match(words[0])
+        found_day = iso_match is not None
+        if found_day:
+            try:
+                date = datetime.date(*(int(group) for group in iso_match.groups()))
+            except ValueError:
+                return None
+    if found_day:
+        day_word = words.pop(0)
+        if not words:
+            # dateutil finds nothing to parse in "today" or "tomorrow" alone
+            return datetime.datetime.combine(date, datetime.time()) if day_word not in ['today', 'tomorrow'] else None
+
+    if words[0] == 'at':
+        words.pop(0)
+    if len(words) == 2 and words[1] in _AMPM:
+        words = [words[0] + words[1]]
+    time_match = _TIME.match(words[0]) if len(words) == 1 else None
+    if time_match is None:
+        return None
+    hour_str, minute_str, ampm = time_match.groups()
+    hour = int(hour_str)
+    minute = int(minute_str) if minute_str is not None else 0
+    if ampm is None:
+        if minute_str is None or hour > 23:
+            return None
+    else:
+        if not 1 <= hour <= 12:
+            return None
+        hour = hour % 12 + (12 if ampm.startswith('p') else 0)
+    if minute > 59:
+        return None
+    return datetime.datetime.combine(date, datetime.time(hour=hour, minute=minute))
+
+
+def _parse_fuzzy(parse_str: str, default_time: datetime.datetime) -> datetime.datetime:
     try:
-        default_time = (pytz.utc.localize(datetime.datetime.utcnow()).astimezone(timezone))\
-            .replace(tzinfo=None, hour=0, minute=0, second=0, microsecond=0)
         dateutil_parse = parser.parse(
             parse_str,
             default=default_time,
@@ -31,9 +112,9 @@ def parse_datetime(parse_str: str, timezone: pytz.timezone = pytz.utc) -> dateti
             dayfirst=False,
             yearfirst=False)
         if 'tomorrow' in parse_str:
-            return timezone.localize(dateutil_parse + datetime.timedelta(days=1)).astimezone(pytz.utc)
+            return dateutil_parse + datetime.timedelta(days=1)
         else:
-            return timezone.localize(dateutil_parse).astimezone(pytz.utc)
+            return dateutil_parse
     except ValueError:
         raise necrobot.exception.ParseException('Couldn\'t parse {0} as a time.'.format(parse_str))
     except OverflowError:
@@ -41,3 +122,41 @@ def parse_datetime(parse_str: str, timezone: pytz.timezone = pytz.utc) -> dateti
             'That date is really just too big. (Like, so big it doesn\'t fit in an int value on this system.) '
             'Congratulations! Please try again.'
         )
+
+
+class TestDateParse(unittest.TestCase):
+    common_inputs = [
+        'friday 8p', 'fri at 8:30 pm', 'sunday', 'tomorrow 12:30', 'today at 9 am', '12a', '20:00',
+        '2017-06-10', '2017-06-10 20:00', '2016-02-29 at 11:05am',
+    ]
+
+    def test_common_formats_match_fuzzy(self):
+        for day in range(7):
+            default_time = datetime.datetime(2017, 6, 5 + day)
+            for parse_str in self.common_inputs:
+                self.assertEqual(
+                    _parse_common_format(parse_str, default_time),
+                    _parse_fuzzy(parse_str, default_time),
+                    msg=parse_str
+                )
+
+    def test_fallback(self):
+        default_time = datetime.datetime(2017, 6, 5)
+        for parse_str in ['june 10 at 8pm', 'tomorrow', 'friday at 8', '8 30', 'sat 13pm', '2017-02-30']:
+            self.assertIsNone(_parse_common_format(parse_str, default_time), msg=parse_str)
+        self.assertEqual(
+            _parse_on_date('june 10 at 8pm', 'US/Eastern', default_time.date()),
+            pytz.utc.localize(datetime.datetime(2017, 6, 11, 0, 0))
+        )
+        self.assertRaises(necrobot.exception.ParseException, parse_datetime, 'tomorrow')
+
+    def test_parse_datetime(self):
+        eastern = pytz.timezone('US/Eastern')
+        today = pytz.utc.localize(datetime.datetime.utcnow()).astimezone(eastern).date()
+        tomorrow = today + datetime.timedelta(days=1)
+        tomorrow_noon = eastern.localize(datetime.datetime.combine(tomorrow, datetime.time(hour=12)))
+        self.assertEqual(parse_datetime('Tomorrow  12:00', eastern), tomorrow_noon.astimezone(pytz.utc))
+
+        hits = _parse_on_date.cache_info().hits
+        self.assertEqual(parse_datetime('tomorrow 12:00', eastern), tomorrow_noon.astimezone(pytz.utc))
+        self.assertEqual(_parse_on_date.cache_info().hits, hits + 1)
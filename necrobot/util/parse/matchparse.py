@@ -33,6 +33,8 @@ matchtype_keywords = {
 for char in NDChar:
     matchtype_keywords.add(Keyword(keyword=str(char), param_for='character'))
 
+matchtype_grammar = parseutil.compile_keywords(matchtype_keywords)
+
 
 def parse_matchtype_args(args: list) -> dict:
     """Parses a list of strings into a dictionary whose keys are the keys in matchtype_keywords, and such that the 
@@ -49,7 +51,7 @@ def parse_matchtype_args(args: list) -> dict:
         The parsed dictionary.
     """
 
-    parsed_dict = parseutil.parse(args=args, keyword_set=matchtype_keywords)
+    parsed_dict = parseutil.parse(args=args, keyword_set=matchtype_grammar)
     if 'bestof' in parsed_dict and int(parsed_dict['bestof'][0]) % 2 == 0:
         raise necrobot.exception.ParseException(
             "Can't make a best-of-{0} match because {0} is even.".format(parsed_dict['bestof'])
@@ -1,3 +1,6 @@
+import unittest
+from typing import Dict
+
 import necrobot.exception
 
 
@@ -28,78 +31,139 @@ class Keyword(object):
             return self.keyword
 
 
-def get_keyword(arg: str, keyword_set: set) -> Keyword or None:
+def compile_keywords(keyword_set: set) -> Dict[str, Keyword]:
+    """Compile a set of Keywords into a dict from each lowercase token (keyword or alias) to its Keyword, so that
+    each arg can be looked up in constant time. Keywords take precedence over aliases.
+
+    Parameters
+    ----------
+    keyword_set: set[Keyword]
+        The set of Keywords to compile.
+
+    Returns
+    -------
+    dict[str, Keyword]
+        The compiled keywords, suitable for passing to get_keyword or parse in place of keyword_set.
+    """
+    compiled = dict()
+    for keyword in keyword_set:
+        for alias in keyword.aliases:
+            compiled.setdefault(alias.lower(), keyword)
+    for keyword in keyword_set:
+        compiled[keyword.keyword] = keyword
+    return compiled
+
+
+def get_keyword(arg: str, keyword_set: set or Dict[str, Keyword]) -> Keyword or None:
     """Returns a Keyword object from keyword_set corresponding to the given string.
     
     Parameters
     ----------
     arg: str
         The argument to find a keyword for.
-    keyword_set: set
-        The set of Keywords to search.
+    keyword_set: set[Keyword] or dict[str, Keyword]
+        The set of Keywords to search, or the result of compile_keywords on one.
 
     Returns
     -------
     Optional[Keyword]
         The found Keyword, or None if none found.
     """
-    arg = arg.lower()
-    for keyword in keyword_set:
-        if arg == keyword.keyword or arg in keyword.aliases:
-            return keyword
-
-    return None
+    if not isinstance(keyword_set, dict):
+        keyword_set = compile_keywords(keyword_set)
+    return keyword_set.get(arg.lower())
 
 
-def parse(args: list, keyword_set: set) -> dict:
+def parse(args: list, keyword_set: set or Dict[str, Keyword]) -> dict:
     """Parses a list of strings into a dictionary whose keys are the keys in keyword_dict, and such that the value
     at the key K is a list of the next keyword_dict[K] strings after K in the list args.
     
     All keys in keyword_dict should be lowercase; keywords are not parsed case-sensitively. The returned dict holds
-    a list of args that were not successfully parsed under the empty-string key.
+    a list of args that were not successfully parsed under the empty-string key. The list args is not modified.
     
     Parameters
     ----------
     args: list[str]
         A list of strings, meant to represent a shlex-split user-input.
-    keyword_set: set[Keyword]
-        A dict whose keys are keywords, and whose values are the number of parameters following the keyword to 
-        parse out.
+    keyword_set: set[Keyword] or dict[str, Keyword]
+        The Keywords to parse, or the result of compile_keywords on them. Compile keyword sets that are used
+        repeatedly.
         
     Returns
     -------
     dict[str: list[str]]
         The parsed dictionary, mapping Keyword.keyword to their list of parameters.
     """
+    if not isinstance(keyword_set, dict):
+        keyword_set = compile_keywords(keyword_set)
+
     parsed_dict = {'': []}
-    while args:
-        keyword = get_keyword(arg=args[0], keyword_set=keyword_set)
-
-        if keyword is not None:
-            args.pop(0)
-            keyword_name = keyword.keyword_name
-
-            if keyword_name in parsed_dict:
-                raise necrobot.exception.DoubledArgException(keyword=keyword.keyword)
-
-            if keyword.param_for is not None:
-                parsed_dict[keyword_name] = [keyword.keyword]
-            else:
-                parsed_dict[keyword_name] = []
-                num_args_pulled = 0
-                while num_args_pulled < keyword.num_args:
-                    if not args:
-                        raise necrobot.exception.NumParametersException(
-                            keyword=keyword,
-                            num_expected=keyword.num_args,
-                            num_given=num_args_pulled
-                        )
-                    else:
-                        num_args_pulled += 1
-                        parsed_dict[keyword_name].append(args[0])
-                        args.pop(0)
+    num_args = len(args)
+    idx = 0
+    while idx < num_args:
+        arg = args[idx]
+        idx += 1
+        keyword = keyword_set.get(arg.lower())
+
+        if keyword is None:
+            parsed_dict[''].append(arg)
+            continue
+
+        keyword_name = keyword.keyword_name
+        if keyword_name in parsed_dict:
+            raise necrobot.exception.DoubledArgException(keyword=keyword.keyword)
+
+        if keyword.param_for is not None:
+            parsed_dict[keyword_name] = [keyword.keyword]
         else:
-            parsed_dict[''].append(args[0])
-            args.pop(0)
+            if idx + keyword.num_args > num_args:
+                raise necrobot.exception.NumParametersException(
+                    keyword=keyword,
+                    num_expected=keyword.num_args,
+                    num_given=num_args - idx
+                )
+            parsed_dict[keyword_name] = args[idx:idx + keyword.num_args]
+            idx += keyword.num_args
 
     return parsed_dict
+
+
+class TestParseUtil(unittest.TestCase):
+    keywords = {
+        Keyword(keyword='seeded', aliases=['s']),
+        Keyword(keyword='seed', num_args=1),
+        Keyword(keyword='custom', num_args=2),
+        Keyword(keyword='cadence', param_for='character'),
+        Keyword(keyword='melody', param_for='character'),
+    }
+
+    def test_get_keyword(self):
+        compiled = compile_keywords(self.keywords)
+        self.assertEqual(get_keyword('SEEDED', compiled).keyword, 'seeded')
+        self.assertEqual(get_keyword('s', compiled).keyword, 'seeded')
+        self.assertEqual(get_keyword('s', self.keywords).keyword, 'seeded')
+        self.assertIsNone(get_keyword('unseeded', compiled))
+
+    def test_parse(self):
+        args = ['Cadence', 'extra', 'seed', '123', 'custom', 'a', 'b', 's']
+        parsed = parse(args, compile_keywords(self.keywords))
+        self.assertEqual(parsed, {
+            '': ['extra'],
+            'character': ['cadence'],
+            'seed': ['123'],
+            'custom': ['a', 'b'],
+            'seeded': [],
+        })
+        self.assertEqual(len(args), 8)
+        self.assertEqual(parse(list(args), self.keywords), parsed)
+
+    def test_parse_errors(self):
+        compiled = compile_keywords(self.keywords)
+        self.assertRaises(necrobot.exception.DoubledArgException, parse, ['cadence', 'melody'], compiled)
+        self.assertRaises(necrobot.exception.DoubledArgException, parse, ['s', 'seeded'], compiled)
+        try:
+            parse(['custom', 'a'], compiled)
+            self.fail('Expected NumParametersException.')
+        except necrobot.exception.NumParametersException as e:
+            self.assertEqual(e.num_expected, 2)
+            self.assertEqual(e.num_given, 1)
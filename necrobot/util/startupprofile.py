@@ -0,0 +1,144 @@
+"""
+Startup profiling, enabled by running a bot with --profile-startup.
+
+When enabled, records how long each module takes to import (inclusive of the modules it imports in turn, and
+exclusive of them), and how long each named initialization step takes. report() logs the results once the bot
+is up.
+"""
+
+import builtins
+import contextlib
+import sys
+import time
+import unittest
+from typing import Dict, List, Tuple
+
+from necrobot.util import console
+
+FLAG = '--profile-startup'
+
+_enabled = False                    # type: bool
+_start_time = None                  # type: float
+_original_import = None
+
+_import_times = dict()              # type: Dict[str, Tuple[float, float]]   # name -> (inclusive, self)
+_import_stack = list()              # type: List[List]                       # [name, start, child_time]
+_init_times = list()                # type: List[Tuple[str, float]]
+
+
+def requested(argv: List[str] = None) -> bool:
+    """True if the command line asks for startup profiling"""
+    return FLAG in (argv if argv is not None else sys.argv)
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def enable() -> None:
+    """Begin recording import times. Call this as early as possible, before the bot's modules are imported."""
+    global _enabled, _start_time, _original_import
+    if _enabled:
+        return
+    _enabled = True
+    _start_time = time.monotonic()
+    _original_import = builtins.__import__
+    builtins.__import__ = _timed_import
+
+
+def disable() -> None:
+    """Stop recording import times"""
+    global _enabled
+    if not _enabled:
+        return
+    builtins.__import__ = _original_import
+    _enabled = False
+
+
+@contextlib.contextmanager
+def timed(step_name: str):
+    """Context manager recording the time taken by a named initialization step (no-op unless enabled).
+
+    Parameters
+    ----------
+    step_name: str
+        The name to record the time under (e.g. the name of a Manager).
+    """
+    start = time.monotonic()
+    try:
+        yield
+    finally:
+        if _enabled:
+            _init_times.append((step_name, time.monotonic() - start))
+
+
+def report(num_imports: int = 25) -> None:
+    """Log the slowest imports and every recorded initialization step, then stop recording imports"""
+    if not _enabled:
+        return
+    total = time.monotonic() - _start_time
+    disable()
+
+    lines = ['Startup profile ({0:.3f}s since profiling began):'.format(total)]
+    lines.append('  Slowest imports (inclusive / self, seconds):')
+    ranked = sorted(_import_times.items(), key=lambda item: item[1][0], reverse=True)
+    for name, (inclusive, self_time) in ranked[:num_imports]:
+        lines.append('    {0:8.3f} {1:8.3f}  {2}'.format(inclusive, self_time, name))
+    lines.append('  Initialization steps (seconds):')
+    for step_name, elapsed in _init_times:
+        lines.append('    {0:8.3f}  {1}'.format(elapsed, step_name))
+
+    console.info('\n'.join(lines))
+
+
+def _timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+    # Relative imports are resolved through their (already timed) parent package; skip them, and anything cached
+    if level != 0:
+        return _original_import(name, globals, locals, fromlist, level)
+
+    # For "from package import submodule", the package may be loaded while the submodule is not
+    unloaded_submodules = []
+    if name in sys.modules:
+        unloaded_submodules = [
+            '{0}.{1}'.format(name, f) for f in (fromlist or ()) if '{0}.{1}'.format(name, f) not in sys.modules
+        ]
+        if not unloaded_submodules:
+            return _original_import(name, globals, locals, fromlist, level)
+
+    frame = [name, time.monotonic(), 0.0]
+    _import_stack.append(frame)
+    try:
+        return _original_import(name, globals, locals, fromlist, level)
+    finally:
+        _import_stack.pop()
+        inclusive = time.monotonic() - frame[1]
+        loaded = [m for m in unloaded_submodules if m in sys.modules]
+        key = ', '.join(loaded) if loaded else name
+        if key not in _import_times:
+            _import_times[key] = (inclusive, inclusive - frame[2])
+        if _import_stack:
+            _import_stack[-1][2] += inclusive
+
+
+class TestStartupProfile(unittest.TestCase):
+    def tearDown(self):
+        disable()
+
+    def test_records_imports_and_steps(self):
+        sys.modules.pop('colorsys', None)
+        import xml.dom
+        sys.modules.pop('xml.dom.minidom', None)
+        enable()
+        import colorsys
+        from xml.dom import minidom
+        with timed('step'):
+            pass
+        self.assertIn('colorsys', _import_times)
+        self.assertIn('xml.dom.minidom', _import_times)
+        self.assertIsNotNone(minidom)
+        self.assertEqual(_init_times[-1][0], 'step')
+        self.assertIsNotNone(colorsys)
+
+    def test_requested(self):
+        self.assertTrue(requested(['run_necrobot.py', FLAG]))
+        self.assertFalse(requested(['run_necrobot.py']))
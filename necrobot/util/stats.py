@@ -0,0 +1,11 @@
+import math
+from typing import Iterable
+
+
+def percentile(values: Iterable[float], pct: float) -> float:
+    """The pct-th percentile of the values (nearest rank: the smallest value at least pct% of the values are less
+    than or equal to), or 0 if there are none"""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[max(0, math.ceil(len(ordered) * pct / 100) - 1)]
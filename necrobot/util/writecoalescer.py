@@ -0,0 +1,173 @@
+"""Merges bursts of non-critical writes to a single channel into one message."""
+
+import asyncio
+import unittest
+from typing import List
+
+from necrobot.util import console
+
+
+class WriteCoalescer(object):
+    """Buffers lines written to a single channel and sends them together.
+
+    Lines passed to write() are held for up to `window` seconds (measured from the first buffered line), then
+    joined with newlines and sent with a single call to `send_fn`. Lines passed to write_now() bypass the
+    buffer: pending lines are flushed first, so that message order is preserved, and the line is then sent
+    on its own.
+
+    Parameters
+    ----------
+    send_fn: [coro] (str) -> None
+        The coroutine that actually sends a message.
+    window: float
+        The number of seconds to hold buffered lines before sending them.
+    char_limit: int
+        The maximum length of a merged message; a line that would push the buffer past this forces a flush.
+    """
+    def __init__(self, send_fn, window: float, char_limit: int = 1900):
+        self._send_fn = send_fn
+        self._window = window
+        self._char_limit = char_limit
+
+        self._pending = []              # type: List[str]
+        self._pending_len = 0           # type: int
+        self._flush_future = None       # type: asyncio.Future
+        self._lock = asyncio.Lock()
+
+        self._lines_written = 0         # type: int
+        self._messages_sent = 0         # type: int
+
+    @property
+    def lines_written(self) -> int:
+        """The number of lines given to this object"""
+        return self._lines_written
+
+    @property
+    def messages_sent(self) -> int:
+        """The number of messages actually sent"""
+        return self._messages_sent
+
+    @property
+    def messages_saved(self) -> int:
+        """The number of messages avoided by merging lines"""
+        return self._lines_written - len(self._pending) - self._messages_sent
+
+    async def write(self, text: str) -> None:
+        """Buffer the line, to be sent within `window` seconds"""
+        self._lines_written += 1
+        if self._pending and self._pending_len + len(text) + 1 > self._char_limit:
+            await self.flush()
+
+        self._pending.append(text)
+        self._pending_len += len(text) + 1
+        if self._flush_future is None:
+            self._flush_future = asyncio.ensure_future(self._flush_after_window())
+
+    async def write_now(self, text: str) -> None:
+        """Send the line immediately (after any pending lines)"""
+        self._lines_written += 1
+        async with self._lock:
+            await self._send_pending()
+            await self._send(text)
+
+    async def flush(self) -> None:
+        """Send all pending lines now"""
+        async with self._lock:
+            await self._send_pending()
+
+    def cancel(self) -> None:
+        """Drop all pending lines without sending them"""
+        if self._flush_future is not None:
+            self._flush_future.cancel()
+            self._flush_future = None
+        self._pending = []
+        self._pending_len = 0
+
+    async def _flush_after_window(self) -> None:
+        await asyncio.sleep(self._window)
+        self._flush_future = None
+        await self.flush()
+
+    async def _send_pending(self) -> None:
+        if self._flush_future is not None:
+            self._flush_future.cancel()
+            self._flush_future = None
+
+        if not self._pending:
+            return
+
+        text = '\n'.join(self._pending)
+        self._pending = []
+        self._pending_len = 0
+        await self._send(text)
+
+    async def _send(self, text: str) -> None:
+        try:
+            await self._send_fn(text)
+        except Exception as e:
+            console.warning('Failed to send a coalesced message: {0}'.format(e))
+        else:
+            self._messages_sent += 1
+
+
+class TestWriteCoalescer(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.sent = []
+
+    def tearDown(self):
+        self.loop.close()
+
+    async def _record(self, text):
+        self.sent.append(text)
+
+    def test_merge_within_window(self):
+        async def run():
+            coalescer = WriteCoalescer(send_fn=self._record, window=0.05)
+            await coalescer.write('a')
+            await coalescer.write('b')
+            await coalescer.write('c')
+            await asyncio.sleep(0.1)
+            return coalescer
+
+        coalescer = self.loop.run_until_complete(run())
+        self.assertEqual(self.sent, ['a\nb\nc'])
+        self.assertEqual(coalescer.messages_saved, 2)
+
+    def test_write_now_preserves_order(self):
+        async def run():
+            coalescer = WriteCoalescer(send_fn=self._record, window=10)
+            await coalescer.write('a')
+            await coalescer.write('b')
+            await coalescer.write_now('GO!')
+            await coalescer.write('c')
+            await coalescer.flush()
+            return coalescer
+
+        coalescer = self.loop.run_until_complete(run())
+        self.assertEqual(self.sent, ['a\nb', 'GO!', 'c'])
+        self.assertEqual(coalescer.messages_sent, 3)
+        self.assertEqual(coalescer.messages_saved, 1)
+
+    def test_char_limit(self):
+        async def run():
+            coalescer = WriteCoalescer(send_fn=self._record, window=10, char_limit=5)
+            await coalescer.write('abc')
+            await coalescer.write('def')
+            await coalescer.flush()
+
+        self.loop.run_until_complete(run())
+        self.assertEqual(self.sent, ['abc', 'def'])
+
+    def test_failed_send_not_counted(self):
+        async def fail(text):
+            raise RuntimeError('Discord is down')
+
+        async def run():
+            coalescer = WriteCoalescer(send_fn=fail, window=10)
+            await coalescer.write_now('GO!')
+            return coalescer
+
+        with self.assertLogs('necrobot', level='WARNING'):
+            coalescer = self.loop.run_until_complete(run())
+        self.assertEqual(coalescer.messages_sent, 0)
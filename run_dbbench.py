@@ -0,0 +1,42 @@
+import argparse
+import asyncio
+import json
+
+from necrobot import config
+from necrobot.test import dbbench
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='Benchmark the database layer against a synthetic history, in a scratch schema on the '
+                    'database server named in the config file.')
+    parser.add_argument('--config', default='data/necrobot_config', help='The config file to use.')
+    parser.add_argument(
+        '--schema', default='necrobot__bench',
+        help='The scratch schema (dropped and remade, with its leagues); its name must end with "__bench".')
+    parser.add_argument('--users', type=int, default=5000, help='The number of users.')
+    parser.add_argument('--runs', type=int, default=500000, help='The number of race runs.')
+    parser.add_argument('--matches', type=int, default=5000, help='The number of matches.')
+    parser.add_argument('--dailies', type=int, default=365, help='The number of dailies.')
+    parser.add_argument('--leagues', type=int, default=3, help='The number of league schemas.')
+    parser.add_argument('--repeat', type=int, default=5, help='The number of calls to make to each function.')
+    parser.add_argument('--json', action='store_true', help='Print the results as JSON.')
+    parser.add_argument('--compare', metavar='OLD_JSON', help='Compare with the results of an earlier --json run.')
+    args = parser.parse_args()
+
+    config.init(args.config)
+    size = dbbench.HistorySize(
+        num_users=args.users,
+        num_race_runs=args.runs,
+        num_matches=args.matches,
+        num_dailies=args.dailies,
+        num_leagues=args.leagues
+    )
+    run = asyncio.get_event_loop().run_until_complete(
+        dbbench.run_benchmark(schema_name=args.schema, size=size, repeat=args.repeat)
+    )
+    if args.compare is not None:
+        with open(args.compare) as old_file:
+            print(dbbench.format_comparison(json.load(old_file), run))
+    else:
+        print(dbbench.results_json(run) if args.json else dbbench.format_results(run))
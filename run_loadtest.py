@@ -0,0 +1,31 @@
+import argparse
+import asyncio
+
+from necrobot import config
+from necrobot.test import loadgen
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='Run the bot against a simulated Discord server under scripted load. This writes to the '
+                    'database named in the config file, so use a scratch database.')
+    parser.add_argument('--config', default='data/necrobot_config', help='The config file to use.')
+    parser.add_argument('--races', type=int, default=8, help='The number of public races to run at once.')
+    parser.add_argument('--racers', type=int, default=3, help='The number of racers in each public race.')
+    parser.add_argument('--matches', type=int, default=4, help='The number of match rooms to run at once.')
+    parser.add_argument('--dailies', type=int, default=16, help='The number of daily submissions.')
+    parser.add_argument('--latency', type=float, default=0.05, help='The time each Discord API call takes, in seconds.')
+    parser.add_argument('--json', action='store_true', help='Print the results as JSON.')
+    args = parser.parse_args()
+
+    config.init(args.config)
+    result = asyncio.get_event_loop().run_until_complete(
+        loadgen.run_load(
+            num_races=args.races,
+            racers_per_race=args.racers,
+            num_matches=args.matches,
+            num_dailies=args.dailies,
+            api_latency=args.latency
+        )
+    )
+    print(loadgen.results_json(result) if args.json else loadgen.format_results(result))
@@ -1,3 +1,8 @@
+# Start timing imports before anything else is loaded (run with --profile-startup)
+from necrobot.util import startupprofile
+if startupprofile.requested():
+    startupprofile.enable()
+
 from necrobot.botbase import server
 from necrobot.config import Config
 from necrobot.daily.dailymgr import DailyMgr
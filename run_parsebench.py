@@ -0,0 +1,21 @@
+import argparse
+import json
+
+from necrobot.test import parsebench
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Time the parsing and formatting run for each command.')
+    parser.add_argument('--min-time', type=float, default=0.2, help='The minimum time for each repeat, in seconds.')
+    parser.add_argument('--repeat', type=int, default=5, help='The number of repeats; the fastest is reported.')
+    parser.add_argument('--only', nargs='+', help='The names of the benchmarks to run.')
+    parser.add_argument('--json', action='store_true', help='Print the results as JSON.')
+    parser.add_argument('--compare', metavar='OLD_JSON', help='Compare with the results of an earlier --json run.')
+    args = parser.parse_args()
+
+    results = parsebench.run_benchmark(min_time=args.min_time, repeat=args.repeat, only=args.only)
+    if args.compare is not None:
+        with open(args.compare) as old_file:
+            print(parsebench.format_comparison(json.load(old_file), results))
+    else:
+        print(parsebench.results_json(results) if args.json else parsebench.format_results(results))
@@ -0,0 +1,18 @@
+import argparse
+import asyncio
+
+from necrobot.test import sheetbench
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Count the Google Sheets API calls made over a week of matches.')
+    parser.add_argument('--matches', type=int, default=32, help='The number of matches in the week.')
+    parser.add_argument('--latency', type=float, default=0.05, help='The time each API call takes, in seconds.')
+    parser.add_argument('--throttle', type=float, default=0.0, help='The fraction of API calls that fail with 429.')
+    parser.add_argument('--json', action='store_true', help='Print the results as JSON.')
+    args = parser.parse_args()
+
+    results = asyncio.get_event_loop().run_until_complete(
+        sheetbench.run_benchmark(num_matches=args.matches, latency=args.latency, throttle_rate=args.throttle)
+    )
+    print(sheetbench.results_json(results) if args.json else sheetbench.format_results(results))
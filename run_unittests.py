@@ -19,7 +19,9 @@ TEST_CONDOR = True
 TEST_CONFIG = False
 TEST_PARSE = False
 TEST_SHEETS = False
+TEST_STREAM = False
 TEST_USER = False
+TEST_UTIL = False
 
 if TEST_CONDOR:
     # noinspection PyUnresolvedReferences
@@ -32,21 +34,75 @@ if TEST_CONFIG:
 if TEST_PARSE:
     # noinspection PyUnresolvedReferences
     from necrobot.util.parse.matchparse import TestMatchParse
+    # noinspection PyUnresolvedReferences
+    from necrobot.util.parse.parseutil import TestParseUtil
+    # noinspection PyUnresolvedReferences
+    from necrobot.util.parse.dateparse import TestDateParse
 
 if TEST_SHEETS:
     # noinspection PyUnresolvedReferences
     from necrobot.gsheet.spreadsheets import TestSpreadsheets
     # noinspection PyUnresolvedReferences
+    from necrobot.gsheet.makerequest import TestMakeRequest
+    # noinspection PyUnresolvedReferences
+    from necrobot.gsheet.sheetwritebuffer import TestSheetWriteBuffer
+    # noinspection PyUnresolvedReferences
+    from necrobot.gsheet.worksheetsnapshot import TestWorksheetSnapshot
+    # noinspection PyUnresolvedReferences
+    from necrobot.gsheet.worksheetindexdata import TestWorksheetIndexData
+    # noinspection PyUnresolvedReferences
+    from necrobot.gsheet.sheetsync import TestSheetSync
+    # noinspection PyUnresolvedReferences
+    from necrobot.gsheet.makematches import TestMakeMatches
+    # noinspection PyUnresolvedReferences
     # from necrobot.gsheet.matchupsheet import TestMatchupSheet
     # noinspection PyUnresolvedReferences
     from necrobot.gsheet.sheetrange import TestSheetRange
     # noinspection PyUnresolvedReferences
     from necrobot.gsheet.standingssheet import TestStandingsSheet
+    # noinspection PyUnresolvedReferences
+    from necrobot.test.sheetemulator import TestSheetEmulator
+    # noinspection PyUnresolvedReferences
+    from necrobot.test.sheetbench import TestSheetBench
+
+if TEST_STREAM:
+    # noinspection PyUnresolvedReferences
+    from necrobot.stream.vodrecord import TestVodRecorder
 
 if TEST_USER:
     # noinspection PyUnresolvedReferences
     from necrobot.user.necrouser import TestNecroUser
 
+if TEST_UTIL:
+    # noinspection PyUnresolvedReferences
+    from necrobot.util.writecoalescer import TestWriteCoalescer
+    # noinspection PyUnresolvedReferences
+    from necrobot.botbase.scheduler import TestScheduler
+    # noinspection PyUnresolvedReferences
+    from necrobot.botbase.loopwatchdog import TestLoopWatchdog
+    # noinspection PyUnresolvedReferences
+    from necrobot.botbase.channelactivity import TestChannelActivity
+    # noinspection PyUnresolvedReferences
+    from necrobot.botbase.liveboard import TestLiveBoard
+    # noinspection PyUnresolvedReferences
+    from necrobot.botbase.guildregistry import TestGuildRegistry
+    # noinspection PyUnresolvedReferences
+    from necrobot.daily.dailyleaderboard import TestDailyLeaderboard
+    # noinspection PyUnresolvedReferences
+    from necrobot.util.lazyimport import TestLazyImport
+    # noinspection PyUnresolvedReferences
+    from necrobot.util.startupprofile import TestStartupProfile
+    # noinspection PyUnresolvedReferences
+    from necrobot.util.liveprofile import TestLiveProfile
+    # noinspection PyUnresolvedReferences
+    from necrobot.test.discordsim import TestDiscordSim
+    # noinspection PyUnresolvedReferences
+    from necrobot.test.loadgen import TestLoadGen
+    # noinspection PyUnresolvedReferences
+    from necrobot.test.dbbench import TestDBBench
+    # noinspection PyUnresolvedReferences
+    from necrobot.test.parsebench import TestParseBench
+
 
 # Define client events
 async def on_ready_fn(necrobot):